@@ -0,0 +1,132 @@
+"""
+Streaming mini-batch k-means keeping, for each cluster, the sum and the
+count of the points assigned to it.
+
+Sculley, D. (2010). "Web-scale k-means clustering". WWW 2010: 1177-1178.
+doi:10.1145/1772690.1772862.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ..utils.errors import ProgressiveError
+
+__all__ = ['StreamingKMeans']
+
+
+class StreamingKMeans(object):
+    """
+    Mini-batch k-means where each center is the mean of the points assigned
+    to it, maintained with sufficient statistics (sum, count) per cluster.
+    The points are assigned by batches of `batch_size`, each batch moving
+    the centers, as with a per-center learning rate of 1/count. Removing
+    points subtracts their contribution, so deletions and updates of the
+    input do not restart the clustering. The assignment of the batches
+    larger than `chunk_size` is split in chunks computed by `n_jobs`
+    threads.
+    """
+    def __init__(self, n_clusters, batch_size=100, init='k-means++',
+                 random_state=None, n_jobs=1, chunk_size=10_000):
+        # pylint: disable=too-many-arguments
+        if n_clusters < 1:
+            raise ProgressiveError('n_clusters should be positive')
+        self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.init = init
+        self.random_state = random_state
+        self._random = np.random.RandomState(random_state)
+        if n_jobs < 0:  # same convention as joblib
+            n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+        self._executor = None
+        self.cluster_centers_ = None
+        self.sums = None
+        self.counts = None
+        self.labels_ = None
+
+    def close(self):
+        "Stop the assignment threads"
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _init_centers(self, X):
+        if not isinstance(self.init, str):
+            return np.array(self.init, dtype=np.float64)
+        if self.init == 'random':
+            return X[self._random.choice(len(X), self.n_clusters,
+                                         replace=False)].astype(np.float64)
+        # k-means++ seeding
+        centers = np.empty((self.n_clusters, X.shape[1]))
+        centers[0] = X[self._random.randint(len(X))]
+        closest = ((X - centers[0]) ** 2).sum(axis=1)
+        for i in range(1, self.n_clusters):
+            total = closest.sum()
+            if total > 0:
+                pick = np.searchsorted(np.cumsum(closest),
+                                       self._random.rand() * total)
+                pick = min(pick, len(X) - 1)
+            else:
+                pick = self._random.randint(len(X))
+            centers[i] = X[pick]
+            closest = np.minimum(closest, ((X - centers[i]) ** 2).sum(axis=1))
+        return centers
+
+    def _assign_chunk(self, X):
+        centers = self.cluster_centers_
+        dist = (np.einsum('ij,ij->i', X, X)[:, np.newaxis]
+                - 2 * X @ centers.T
+                + np.einsum('ij,ij->i', centers, centers))
+        return np.argmin(dist, axis=1)
+
+    def predict(self, X):
+        "Return the index of the closest center of each point"
+        X = np.asarray(X, dtype=np.float64)
+        if self.n_jobs <= 1 or len(X) <= self.chunk_size:
+            return self._assign_chunk(X)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.n_jobs)
+        chunks = [X[i:i+self.chunk_size]
+                  for i in range(0, len(X), self.chunk_size)]
+        return np.concatenate(list(self._executor.map(self._assign_chunk,
+                                                      chunks)))
+
+    def _accumulate(self, X, labels, sign):
+        k, dim = self.n_clusters, X.shape[1]
+        self.counts += sign * np.bincount(labels, minlength=k)
+        for j in range(dim):
+            self.sums[:, j] += sign * np.bincount(labels, weights=X[:, j],
+                                                  minlength=k)
+        moved = self.counts > 0  # empty clusters keep their center
+        self.cluster_centers_[moved] = (self.sums[moved] /
+                                        self.counts[moved, np.newaxis])
+
+    def partial_fit(self, X):
+        """
+        Assign the points by batches, update the centers, and return the
+        labels of the points
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if self.cluster_centers_ is None:
+            if len(X) < self.n_clusters and isinstance(self.init, str):
+                raise ProgressiveError('n_samples should be larger than k')
+            self.cluster_centers_ = self._init_centers(X)
+            self.sums = np.zeros_like(self.cluster_centers_)
+            self.counts = np.zeros(self.n_clusters, dtype=np.int64)
+        batch_size = self.batch_size or len(X)
+        labels = np.empty(len(X), dtype=np.int64)
+        for start in range(0, len(X), batch_size):
+            batch = X[start:start+batch_size]
+            labels[start:start+batch_size] = self.predict(batch)
+            self._accumulate(batch, labels[start:start+batch_size], 1)
+        self.labels_ = labels
+        return labels
+
+    def remove(self, X, labels):
+        "Subtract the contribution of the points with their labels"
+        if self.cluster_centers_ is None or len(labels) == 0:
+            return
+        self._accumulate(np.asarray(X, dtype=np.float64),
+                         np.asarray(labels, dtype=np.int64), -1)
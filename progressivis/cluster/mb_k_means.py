@@ -2,11 +2,9 @@ import logging
 
 from collections import deque
 import numpy as np
-from sklearn.utils import gen_batches
-from sklearn.cluster import MiniBatchKMeans
 from scipy.spatial import distance
 from progressivis import ProgressiveError, SlotDescriptor
-from progressivis.core.utils import indices_len, fix_loc
+from progressivis.core.utils import indices_len
 from ..table.module import TableModule
 from ..table import Table, TableSelectedView
 from ..table.dshape import dshape_from_dtype, dshape_from_columns
@@ -14,13 +12,19 @@ from ..io import DynVar
 from ..utils.psdict import PsDict
 from ..core.decorators import *
 from ..table.filtermod import FilterMod
+from .kmeans import StreamingKMeans
 
 logger = logging.getLogger(__name__)
 
 
 class MBKMeans(TableModule):
     """
-    Mini-batch k-means using the sklearn implementation.
+    Mini-batch k-means using the StreamingKMeans engine. Deleted and
+    updated rows are subtracted from the clusters, the updated rows are
+    assigned again, so the clustering is not restarted. The labels are
+    maintained in the `labels` output table, with the ids of the input.
+    The batches are assigned by `n_jobs` threads, in chunks of
+    `chunk_size` points, by default `batch_size // n_jobs`.
     """
     parameters = [('samples',  np.dtype(int), 50)]
     inputs = [
@@ -34,13 +38,16 @@ class MBKMeans(TableModule):
 
     DATA_CHANGED_MAX = 4
     def __init__(self, n_clusters, columns=None, batch_size=100, tol=0.01, conv_steps=2,
-                 is_input=True, is_greedy=True, random_state=None, **kwds):
+                 is_input=True, is_greedy=True, random_state=None, n_jobs=1,
+                 chunk_size=None, **kwds):
         super().__init__(**kwds)
-        self.mbk = MiniBatchKMeans(n_clusters=n_clusters,
+        self.mbk = StreamingKMeans(n_clusters=n_clusters,
                                    batch_size=batch_size,
-                                   verbose=True,
-                                   tol=tol,
-                                   random_state=random_state)
+                                   random_state=random_state,
+                                   n_jobs=n_jobs)
+        if chunk_size is None:
+            chunk_size = max(1, batch_size // self.mbk.n_jobs)
+        self.mbk.chunk_size = chunk_size
         self.columns = columns
         self.n_clusters = n_clusters
         self.default_step_size = 100
@@ -57,21 +64,28 @@ class MBKMeans(TableModule):
         self._min_p = None
         self._max_p = None
         self._is_greedy = is_greedy
-        
+        self._points = None  # the points assigned, by id
+        self._row_labels = np.zeros(0, dtype=np.int64)  # -1 if unassigned
+
     def predict_step_size(self, duration):
         p = super().predict_step_size(duration)
         return max(p, self.n_clusters)
 
     def reset(self, init='k-means++'):
         print("Reset, init=", init)
-        self.mbk = MiniBatchKMeans(n_clusters=self.mbk.n_clusters,
+        self.mbk.close()
+        self.mbk = StreamingKMeans(n_clusters=self.mbk.n_clusters,
                                    batch_size=self.mbk.batch_size,
                                    init=init,
-                                   # tol=self._rel_tol,
-                                   random_state=self.mbk.random_state)
+                                   random_state=self.mbk.random_state,
+                                   n_jobs=self.mbk.n_jobs,
+                                   chunk_size=self.mbk.chunk_size)
         dfslot = self.get_input_slot('table')
         dfslot.reset()
-        self._labels = None
+        if self._labels is not None:
+            self._labels.resize(0)
+        self._points = None
+        self._row_labels = np.zeros(0, dtype=np.int64)
         self.set_state(self.state_ready)
         self._data_changed = 0
         self._old_centers.clear()
@@ -97,6 +111,38 @@ class MBKMeans(TableModule):
     def labels(self):
         return self._labels
 
+    def ending(self):
+        self.mbk.close()
+        super().ending()
+
+    def _store(self, ids, X, labels):
+        "Keep the points and labels of the ids, to subtract them later"
+        size = int(ids.max()) + 1
+        if size > len(self._row_labels):
+            size = max(size, 2 * len(self._row_labels))
+            row_labels = np.full(size, -1, dtype=np.int64)
+            row_labels[:len(self._row_labels)] = self._row_labels
+            self._row_labels = row_labels
+            points = np.zeros((size, X.shape[1]))
+            if self._points is not None:
+                points[:len(self._points)] = self._points
+            self._points = points
+        self._row_labels[ids] = labels
+        self._points[ids] = X
+
+    def _assigned(self, ids):
+        ids = np.asarray(ids.to_array(), dtype=np.int64)
+        ids = ids[ids < len(self._row_labels)]
+        return ids[self._row_labels[ids] >= 0]
+
+    def _remove(self, ids):
+        "Subtract the rows from their clusters, return the ids removed"
+        ids = self._assigned(ids)
+        if len(ids):
+            self.mbk.remove(self._points[ids], self._row_labels[ids])
+            self._row_labels[ids] = -1
+        return ids
+
     def get_data(self, name):
         if name == 'labels':
             return self.labels()
@@ -143,20 +189,33 @@ class MBKMeans(TableModule):
                 dfslot.update(run_number)
         # dfslot.update(run_number)
 
-        if dfslot.deleted.any() or dfslot.updated.any():
-            logger.debug('has deleted or updated, reseting')
-            self.reset(init=init_centers)
-            dfslot.update(run_number)
-
-        # print('dfslot has buffered %d elements'% dfslot.created_length())
         input_df = dfslot.data()
-        if (input_df is None or len(input_df)  < self.mbk.n_clusters): #and \
-           #dfslot.created_length() < self.mbk.n_clusters:
-            # Should add more than k items per loop
+        if input_df is None:
             return self._return_run_step(self.state_blocked, steps_run=0)
-        indices = dfslot.created.next(step_size)  # returns a slice
+        cols = self.get_columns(input_df)
+        changes = 0
+        if dfslot.deleted.any():
+            deleted = self._remove(dfslot.deleted.next(as_slice=False))
+            changes += len(deleted)
+            if self._labels is not None and len(deleted):
+                del self._labels.loc[deleted]
+        if dfslot.updated.any():
+            updated = self._remove(dfslot.updated.next(as_slice=False))
+            changes += len(updated)
+            if len(updated):
+                X = input_df.to_array(columns=cols, locs=updated)
+                labels = self.mbk.partial_fit(X)
+                self._store(updated, X, labels)
+                if self._labels is not None:
+                    self._labels.loc[updated, 'labels'] = labels
+        if (self.mbk.cluster_centers_ is None and
+                dfslot.created.length() < self.mbk.n_clusters):
+            # Should add at least k items to initialize
+            return self._return_run_step(self.state_blocked,
+                                         steps_run=changes)
+        indices = dfslot.created.next(step_size, as_slice=False)
         steps = indices_len(indices)
-        if steps == 0:
+        if steps == 0 and changes == 0:
             self._data_changed -= 1
             #print("ZERO STEPS", self._data_changed)
             trm = dfslot.output_module.is_terminated() or dfslot.output_module.is_zombie()
@@ -166,42 +225,31 @@ class MBKMeans(TableModule):
                 args = (self.state_blocked,0) if trm  else (self.state_ready, 1)
                 return self._return_run_step(*args)
             return self._return_run_step(self.state_blocked, steps_run=0)
-        elif steps >= self.n_clusters:
-            #print("DATA_CHANGED_MAX")
-            self._data_changed = self.DATA_CHANGED_MAX
-        else: # n_samples should be larger than k
-            print("n_samples should be larger than k", steps, self.n_clusters, step_size)
-            return self._return_run_step(self.state_blocked, steps_run=0)
-        cols = self.get_columns(input_df)
+        self._data_changed = self.DATA_CHANGED_MAX
         if len(cols) == 0:
             return self._return_run_step(self.state_blocked, steps_run=0)
-        locs = fix_loc(indices)
-        if self._labels is not None and isinstance(indices, slice):
-            indices = np.arange(indices.start, indices.stop)
-
-        X = input_df.to_array(columns=cols, locs=locs)
-        _min = np.min(X, axis=0)
-        _max = np.max(X, axis=0)
-        if self._min_p is None:
-            self._min_p = _min
-            self._max_p = _max
-        else:
-            self._min_p = np.minimum(self._min_p, _min)
-            self._max_p = np.maximum(self._max_p, _max)
-            
-        batch_size = self.mbk.batch_size or 100
-        # print("STEPS...", steps, batch_size)        
-        for batch in gen_batches(steps, batch_size):
-            self.mbk.partial_fit(X[batch])
-            self._old_centers.append(self.mbk.cluster_centers_.copy())
+        if steps:
+            indices = np.asarray(indices.to_array(), dtype=np.int64)
+            X = input_df.to_array(columns=cols, locs=indices)
+            _min = np.min(X, axis=0)
+            _max = np.max(X, axis=0)
+            if self._min_p is None:
+                self._min_p = _min
+                self._max_p = _max
+            else:
+                self._min_p = np.minimum(self._min_p, _min)
+                self._max_p = np.maximum(self._max_p, _max)
+            labels = self.mbk.partial_fit(X)
+            self._store(indices, X, labels)
             if self._labels is not None:
-                self._labels.append({'labels': self.mbk.labels_},
-                                    indices=indices[batch])
+                self._labels.append({'labels': labels}, indices=indices)
+        self._old_centers.append(self.mbk.cluster_centers_.copy())
+        steps += changes
         if self._table is None:
-            dshape = dshape_from_columns(input_df, cols,
-                                              dshape_from_dtype(X.dtype))
             self._table = Table(self.generate_table_name('centers'),
-                                dshape=dshape,
+                                dshape=dshape_from_columns(
+                                    input_df, cols, dshape_from_dtype(
+                                        np.dtype(np.float64))),
                                 create=True)
             self._table.resize(self.mbk.cluster_centers_.shape[0])
         self._table[cols] = self.mbk.cluster_centers_
@@ -2,6 +2,8 @@
 from ._version import get_versions
 from .utils import (type_fullname, fix_loc, indices_len, integer_types, JSONEncoderNp, asynchronize)
 from .scheduler import Scheduler
+from .policy import SchedulingPolicy, DeadlinePolicy
+from .profiler import Profiler
 from .slot import Slot, SlotDescriptor
 from .storagemanager import StorageManager
 from .module import Module, Every, Print
@@ -20,7 +22,8 @@ del get_versions
 
 __all__ = ["type_fullname", "fix_loc", "indices_len",
            "integer_types", "JSONEncoderNp", "asynchronize", "bitmap",
-           "Scheduler", "BitmapChangeManager", "DictChangeManager",
+           "Scheduler", "SchedulingPolicy", "DeadlinePolicy", "Profiler",
+           "BitmapChangeManager", "DictChangeManager",
            "version", "__version__", "short_version",
            "Slot", "SlotDescriptor", "Module", "StorageManager",
            "Every", "Print", "Wait"]
@@ -13,6 +13,8 @@ logger = logging.getLogger(__name__)
 
 class BaseChangeManager(object):
     "Base class for change managers"
+    # True when the data notifies its changes with `changes.add_listener`
+    notifies = False
 
     def __init__(self,
                  slot,
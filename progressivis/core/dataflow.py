@@ -182,7 +182,7 @@ class Dataflow(object):
     def _remove_module_inputs(self, name):
         for slot in self.inputs[name].values():
             slots = self.outputs[slot.output_module.name][slot.output_name]
-            nslots = [s for s in slots if s.output_module.name != name]
+            nslots = [s for s in slots if s.input_module.name != name]
             if nslots:
                 self.outputs[slot.output_module.name][slot.output_name] = nslots
             else:
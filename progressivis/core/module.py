@@ -22,6 +22,7 @@ import progressivis.core.aio as aio
 from .utils import (type_fullname, get_random_name)
 from .slot import (SlotDescriptor, Slot)
 from .tracer_base import Tracer
+from .profiler import ProfilingTracer
 from .time_predictor import TimePredictor
 from .storagemanager import StorageManager
 from .scheduler import Scheduler
@@ -113,7 +114,8 @@ class Module(metaclass=ModuleMeta):
         if storagegroup is None:
             storagegroup = Group.default_internal(
                 get_random_name(name+'_tracer'))
-        tracer = Tracer.default(name, storagegroup)
+        tracer = ProfilingTracer(Tracer.default(name, storagegroup),
+                                 scheduler.profiler, name)
 
         self.order = None
         self.group = group
@@ -145,6 +147,7 @@ class Module(metaclass=ModuleMeta):
         # callbacks
         self._start_run = None
         self._end_run = None
+        self._state_before_run = None
         dataflow.add_module(self)
 
     def scheduler(self):
@@ -710,68 +713,100 @@ class Module(metaclass=ModuleMeta):
         s.freeze()
 
     def run(self, run_number):
+        quantum, step_size = self.begin_run(run_number)
+        ret = self.run_step_once(run_number, step_size, quantum)
+        self.finish_run(run_number, *ret)
+
+    def begin_run(self, run_number):
+        """
+        Start a run: compute the quantum and the step size.
+        Called from the scheduler loop, see `run`.
+        """
         assert not self.is_running()
         self.steps_acc = 0
-        next_state = self.state
-        exception = None
         now = self.timer()
         quantum = self.scheduler().fix_quantum(self, self.params.quantum)
-        tracer = self.tracer
         if quantum == 0:
             quantum = 0.1
             logger.error('Quantum is 0 in %s, setting it to a'
                          ' reasonable value', self.name)
+        self._state_before_run = self.state
         self.state = Module.state_running
         self._start_time = now
         self._end_time = self._start_time + quantum
         self._update_params(run_number)
 
-        run_step_ret = {}
         self.start_run(run_number)
-        tracer.start_run(now, run_number)
+        self.tracer.start_run(now, run_number, quantum=quantum)
         step_size = self.predict_step_size(quantum)
         logger.info(f'{self.name}: step_size={step_size}')
-        if step_size != 0:
-            # pylint: disable=broad-except
-            try:
-                tracer.before_run_step(now, run_number)
-                if self.debug:
-                    pdb.set_trace()
-                run_step_ret = self.run_step(run_number, step_size, quantum)
-                next_state = run_step_ret['next_state']
-                now = self.timer()
-            except ProgressiveStopIteration:
-                logger.info('In Module.run(): Received a StopIteration')
-                next_state = Module.state_zombie
-                run_step_ret['next_state'] = next_state
-                now = self.timer()
-            except Exception as e:
-                print_exc()
-                next_state = Module.state_zombie
-                run_step_ret['next_state'] = next_state
-                now = self.timer()
-                tracer.exception(now, run_number)
-                exception = e
-                self._had_error = True
-                self._start_time = now
-            finally:
-                assert (run_step_ret is not None), "Error: %s run_step_ret"\
-                  " not returning a dict" % self.pretty_typename()
-                if self.debug:
-                    run_step_ret['debug'] = True
-                tracer.after_run_step(now, run_number, **run_step_ret)
-                self.state = next_state
+        return quantum, step_size
 
+    def run_step_once(self, run_number, step_size, quantum):
+        """
+        Run the step of a run started by `begin_run` and return the next
+        state, the exception raised, if any, and the end time. It only
+        touches the module itself, so the scheduler can run it in a worker
+        thread, see `Scheduler(n_jobs=...)`.
+        """
+        if step_size == 0:
+            return None, None, None
+        next_state = self._state_before_run
+        exception = None
+        now = self.timer()
+        tracer = self.tracer
+        run_step_ret = {}
+        # pylint: disable=broad-except
+        try:
+            tracer.before_run_step(now, run_number)
+            if self.debug:
+                pdb.set_trace()
+            run_step_ret = self.run_step(run_number, step_size, quantum)
+            next_state = run_step_ret['next_state']
+            now = self.timer()
+        except ProgressiveStopIteration:
+            logger.info('In Module.run(): Received a StopIteration')
+            next_state = Module.state_zombie
+            run_step_ret['next_state'] = next_state
+            now = self.timer()
+        except Exception as e:
+            print_exc()
+            next_state = Module.state_zombie
+            run_step_ret['next_state'] = next_state
+            now = self.timer()
+            tracer.exception(now, run_number)
+            exception = e
+            self._had_error = True
+            self._start_time = now
+        finally:
+            assert (run_step_ret is not None), "Error: %s run_step_ret"\
+              " not returning a dict" % self.pretty_typename()
+            if self.debug:
+                run_step_ret['debug'] = True
+            tracer.after_run_step(now, run_number, **run_step_ret)
+        return next_state, exception, now
+
+    def finish_run(self, run_number, next_state, exception, now):
+        """
+        End a run, calling the `end_run` callback, and raise the exception
+        of the step if any. Called from the scheduler loop, see `run`.
+        """
+        if now is None:  # no step run
+            next_state = self._state_before_run
+            now = self.timer()
+        else:
+            self.state = next_state
             if self._start_time is None or self.state != Module.state_ready:
-                tracer.run_stopped(now, run_number)
+                self.tracer.run_stopped(now, run_number)
             self._start_time = now
         self.state = next_state
         if self.state == Module.state_zombie:
-            tracer.terminated(now, run_number)
+            self.tracer.terminated(now, run_number)
         progress = self.get_progress()
-        tracer.end_run(now, run_number,
-                       progress_current=progress[0], progress_max=progress[1],
-                       quality=self.get_quality())
+        self.tracer.end_run(now, run_number,
+                            progress_current=progress[0],
+                            progress_max=progress[1],
+                            quality=self.get_quality())
         self._stop(run_number)
         if exception:
             raise RuntimeError("{} {}".format(type(exception), exception))
@@ -0,0 +1,134 @@
+"""
+Scheduling policies, deciding which module the scheduler runs next
+and how long it can run.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['SchedulingPolicy', 'DeadlinePolicy']
+
+MIN_QUANTUM = 0.01
+MAX_SKIPS = 5
+
+
+class SchedulingPolicy(object):
+    """Base scheduling policy, runs all the modules in topological order
+    with their own quantum (round-robin).
+    """
+    def __init__(self):
+        self.scheduler = None
+
+    def attach(self, scheduler):
+        "Attach the policy to a scheduler."
+        self.scheduler = scheduler
+
+    def start_round(self, run_list):
+        """Return the list of modules to consider for the next round,
+        in the order they should run. The order should remain topological.
+        """
+        # pylint: disable=no-self-use
+        return run_list
+
+    def consider(self, module):
+        "Return True if the module should run now, False to skip it."
+        # pylint: disable=no-self-use,unused-argument
+        return True
+
+    def quantum(self, module, quantum):
+        "Return the quantum allocated to the module."
+        # pylint: disable=no-self-use,unused-argument
+        return quantum
+
+    def to_json(self):
+        "Return a dictionary describing the policy"
+        return {'classname': self.__class__.__name__}
+
+
+class DeadlinePolicy(SchedulingPolicy):
+    """Policy refreshing the visualization modules, and the modules they
+    depend on, within the interaction latency of the scheduler.
+
+    In each round, the visible modules run first and share the
+    latency budget. The other (background) modules run with the time
+    left before the deadline; when no time is left, they are skipped,
+    unless they have been skipped `max_skips` rounds in a row, in which
+    case they run with `min_quantum` to avoid starving their outputs.
+    """
+    def __init__(self, min_quantum=MIN_QUANTUM, max_skips=MAX_SKIPS):
+        super(DeadlinePolicy, self).__init__()
+        self.min_quantum = min_quantum
+        self.max_skips = max_skips
+        self._visible = set()
+        self._skips = {}
+        self._deadline = 0
+        self._visible_left = 0
+
+    def visible_modules(self, run_list):
+        "Return the names of the visualizations and their ancestors."
+        # pylint: disable=protected-access
+        ancestors = self.scheduler._ancestors
+        visible = set()
+        for module in run_list:
+            if module.is_visualization():
+                visible.add(module.name)
+                visible.update(ancestors.get(module.name, ()))
+        return visible
+
+    def is_visible(self, module):
+        "Return True if the module feeds a visualization."
+        return module.name in self._visible
+
+    def start_round(self, run_list):
+        self._visible = self.visible_modules(run_list)
+        if not self._visible:  # nothing to prioritize
+            return run_list
+        scheduler = self.scheduler
+        self._deadline = scheduler.timer() + scheduler.interaction_latency
+        # visible modules only depend on visible ones, so running them
+        # first keeps the order topological
+        visible = [m for m in run_list if m.name in self._visible]
+        background = [m for m in run_list if m.name not in self._visible]
+        self._visible_left = len(visible)
+        return visible + background
+
+    def time_left(self):
+        "Return the time left before the deadline of the current round."
+        return max(0, self._deadline - self.scheduler.timer())
+
+    def starving(self, module):
+        "Return True if the module has been skipped too many times."
+        return self._skips.get(module.name, 0) >= self.max_skips
+
+    def consider(self, module):
+        if not self._visible:
+            return True
+        if self.is_visible(module):
+            self._visible_left -= 1
+            return True
+        if self.time_left() > 0 or self.starving(module):
+            self._skips[module.name] = 0
+            return True
+        self._skips[module.name] = self._skips.get(module.name, 0) + 1
+        logger.debug('Module %s skipped %d time(s) by deadline policy',
+                     module.name, self._skips[module.name])
+        return False
+
+    def quantum(self, module, quantum):
+        if not self._visible:
+            return quantum
+        time_left = self.time_left()
+        if self.is_visible(module):  # share with the visible modules left
+            share = time_left / (max(0, self._visible_left) + 1)
+        else:
+            share = time_left
+        return max(self.min_quantum, min(quantum, share))
+
+    def to_json(self):
+        json = super(DeadlinePolicy, self).to_json()
+        json.update({
+            'visible': sorted(self._visible),
+            'time_left': self.time_left() if self.scheduler else 0,
+            'skips': dict(self._skips)
+        })
+        return json
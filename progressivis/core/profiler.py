@@ -0,0 +1,372 @@
+"""
+Scheduler-wide profiling: per-module timings, scheduler overhead and
+export of recorded windows to the Chrome trace and speedscope formats.
+"""
+import logging
+import threading
+from collections import deque
+from time import thread_time
+from timeit import default_timer
+
+from .tracer_base import Tracer
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['Profiler', 'ProfilingTracer']
+
+MAX_EVENTS = 100000
+
+
+class ModuleProfile(object):
+    "Aggregated timings of one module."
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, name):
+        self.name = name
+        self.runs = 0
+        self.steps = 0  # rows processed, as reported by steps_run
+        self.run_time = 0.0  # wall time of the runs
+        self.step_time = 0.0  # wall time spent in run_step
+        self.cpu_time = 0.0  # cpu time of the thread running run_step
+        self.update_time = 0.0  # time of prepare_run (slot updates)
+        self.tracer_time = 0.0  # time spent in the wrapped tracer
+        self.overruns = 0
+        self.overrun_ratio_sum = 0.0
+        self.overrun_ratio_max = 0.0
+
+    def rows_per_second(self):
+        "Return the number of rows processed per second of run_step."
+        if self.step_time <= 0:
+            return 0.0
+        return self.steps / self.step_time
+
+    def to_json(self):
+        "Return a dictionary describing the profile"
+        return {
+            'name': self.name,
+            'runs': self.runs,
+            'steps': self.steps,
+            'run_time': self.run_time,
+            'step_time': self.step_time,
+            'cpu_time': self.cpu_time,
+            'update_time': self.update_time,
+            'tracer_time': self.tracer_time,
+            'rows_per_second': self.rows_per_second(),
+            'overruns': self.overruns,
+            'overrun_ratio_mean': (self.overrun_ratio_sum / self.overruns
+                                   if self.overruns else 0.0),
+            'overrun_ratio_max': self.overrun_ratio_max,
+        }
+
+
+class Profiler(object):
+    """
+    Profiler of a scheduler, disabled by default.
+
+    When enabled, it aggregates for each module the wall and cpu times of
+    its runs, the rows processed per second, how often and by how much
+    the runs exceed their quantum, and the time spent updating the input
+    slots (change managers) and in the tracer. The scheduler overhead is
+    the time of the scheduler loop not spent running modules.
+
+    Between `start_recording()` and `stop_recording()`, the individual
+    runs, run_steps and updates are also kept, up to `max_events`, and
+    can be exported with `to_chrome_trace()` or `to_speedscope()`.
+    """
+    def __init__(self, max_events=MAX_EVENTS):
+        self.enabled = False
+        self.recording = False
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=max_events)
+        self._origin = default_timer()
+        self._loop_running = False
+        self._loop_start = None
+        self.clear()
+
+    def clear(self):
+        "Reset the aggregated statistics and the recorded events."
+        with self._lock:
+            self._modules = {}
+            self.loop_time = 0.0
+            if self._loop_start is not None:
+                self._loop_start = default_timer()
+            self._events.clear()
+
+    def enable(self, enabled=True):
+        "Enable or disable the profiler."
+        if enabled == self.enabled:
+            return
+        if self._loop_running:  # only count the loop time while enabled
+            if enabled:
+                self._loop_start = default_timer()
+            else:
+                self._stop_loop_timer()
+        self.enabled = enabled
+
+    def start_recording(self):
+        "Start recording the events, enabling the profiler if needed."
+        with self._lock:
+            self._events.clear()
+            self._origin = default_timer()
+        self.enable()
+        self.recording = True
+
+    def stop_recording(self):
+        "Stop recording the events, they remain available for export."
+        self.recording = False
+
+    def module_profile(self, name):
+        "Return the ModuleProfile of a module, creating it if needed."
+        prof = self._modules.get(name)
+        if prof is None:
+            prof = ModuleProfile(name)
+            self._modules[name] = prof
+        return prof
+
+    def start_loop(self):
+        "Called by the scheduler when its loop starts."
+        self._loop_running = True
+        if self.enabled:
+            self._loop_start = default_timer()
+
+    def end_loop(self):
+        "Called by the scheduler when its loop ends."
+        self._loop_running = False
+        self._stop_loop_timer()
+
+    def _stop_loop_timer(self):
+        if self._loop_start is not None:
+            self.loop_time += default_timer() - self._loop_start
+            self._loop_start = None
+
+    def elapsed(self):
+        "Return the time spent in the scheduler loop while enabled."
+        if self._loop_start is None:
+            return self.loop_time
+        return self.loop_time + default_timer() - self._loop_start
+
+    def _record(self, name, cat, start, duration, tid=None):
+        if self.recording:
+            if tid is None:
+                tid = threading.get_ident()
+            self._events.append((name, cat, start - self._origin, duration,
+                                 tid))
+
+    def record_update(self, name, start, duration):
+        "Record the time spent in prepare_run by a module."
+        with self._lock:
+            self.module_profile(name).update_time += duration
+            self._record(name, 'update', start, duration)
+
+    def record_run(self, name, start, duration, step_start, step_duration,
+                   cpu_time, tracer_time, steps, quantum, step_tid=None):
+        """Record a run of a module. The step may have run in another
+        thread, `step_tid`, when the scheduler has n_jobs > 1."""
+        # pylint: disable=too-many-arguments
+        with self._lock:
+            prof = self.module_profile(name)
+            prof.runs += 1
+            prof.steps += steps
+            prof.run_time += duration
+            prof.step_time += step_duration
+            prof.cpu_time += cpu_time
+            prof.tracer_time += tracer_time
+            if quantum and duration > quantum:
+                ratio = duration / quantum
+                prof.overruns += 1
+                prof.overrun_ratio_sum += ratio
+                prof.overrun_ratio_max = max(prof.overrun_ratio_max, ratio)
+            self._record(name, 'run', start, duration)
+            if step_start is not None:
+                self._record(name, 'run_step', step_start, step_duration,
+                             step_tid)
+
+    def overhead(self):
+        """Return a dictionary with the scheduler overhead: time spent
+        updating the slots, in the tracers and in the scheduler itself."""
+        with self._lock:
+            profiles = list(self._modules.values())
+        update = sum(p.update_time for p in profiles)
+        tracer = sum(p.tracer_time for p in profiles)
+        running = sum(p.run_time for p in profiles)
+        elapsed = self.elapsed()
+        # runs overlap when n_jobs > 1, the loop time may be lower
+        scheduling = max(0.0, elapsed - running - update)
+        return {
+            'elapsed': elapsed,
+            'modules': running - tracer,
+            'update': update,
+            'tracer': tracer,
+            'scheduling': scheduling,
+            'total': update + tracer + scheduling
+        }
+
+    def to_json(self):
+        "Return a dictionary describing the profile of all the modules"
+        with self._lock:
+            modules = [p.to_json() for p in self._modules.values()]
+        modules.sort(key=lambda p: p['run_time'], reverse=True)
+        return {
+            'enabled': self.enabled,
+            'recording': self.recording,
+            'events': len(self._events),
+            'modules': modules,
+            'overhead': self.overhead()
+        }
+
+    def events(self):
+        """Return the recorded events as a list of
+        (name, category, start, duration, thread id) tuples."""
+        with self._lock:
+            return list(self._events)
+
+    def to_chrome_trace(self):
+        """Return the recorded events in the Chrome trace event format,
+        loadable by chrome://tracing, Perfetto or speedscope."""
+        trace = []
+        for (name, cat, start, duration, tid) in self.events():
+            trace.append({'name': name if cat == 'run' else
+                          '%s.%s' % (name, cat),
+                          'cat': cat,
+                          'ph': 'X',
+                          'ts': start * 1e6,
+                          'dur': duration * 1e6,
+                          'pid': 0,
+                          'tid': tid})
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def to_speedscope(self, name='progressivis'):
+        "Return the recorded events in the speedscope file format."
+        frames = []
+        frame_index = {}
+        threads = {}
+        for (mod, cat, start, duration, tid) in self.events():
+            frame = mod if cat == 'run' else '%s.%s' % (mod, cat)
+            idx = frame_index.get(frame)
+            if idx is None:
+                idx = len(frames)
+                frame_index[frame] = idx
+                frames.append({'name': frame})
+            threads.setdefault(tid, []).append((start, duration, idx))
+        profiles = []
+        for tid, spans in sorted(threads.items()):
+            # longest first at equal starts so that run encloses run_step
+            spans.sort(key=lambda s: (s[0], -s[1]))
+            events = []
+            stack = []  # end times of the open frames
+            for (start, duration, idx) in spans:
+                while stack and stack[-1][0] <= start:
+                    end, closed = stack.pop()
+                    events.append({'type': 'C', 'frame': closed, 'at': end})
+                end = start + duration
+                if stack and end > stack[-1][0]:  # clip to the parent
+                    end = stack[-1][0]
+                events.append({'type': 'O', 'frame': idx, 'at': start})
+                stack.append((end, idx))
+            while stack:
+                end, closed = stack.pop()
+                events.append({'type': 'C', 'frame': closed, 'at': end})
+            profiles.append({
+                'type': 'evented',
+                'name': 'thread %s' % tid,
+                'unit': 'seconds',
+                'startValue': events[0]['at'] if events else 0,
+                'endValue': events[-1]['at'] if events else 0,
+                'events': events})
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'progressivis',
+            'activeProfileIndex': 0,
+            'shared': {'frames': frames},
+            'profiles': profiles
+        }
+
+
+class ProfilingTracer(Tracer):
+    """
+    Tracer wrapping the tracer of a module to feed the Profiler of its
+    scheduler. When the profiler is disabled, the calls are only
+    forwarded to the wrapped tracer.
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, tracer, profiler, name):
+        self.tracer = tracer
+        self.profiler = profiler
+        self.name = name
+        self._active = False
+        self._start = None
+        self._cpu_start = None
+        self._cpu_time = 0.0
+        self._step_start = None
+        self._step_tid = None
+        self._step_duration = 0.0
+        self._steps = 0
+        self._quantum = None
+        self._tracer_time = 0.0
+
+    def __getattr__(self, attr):
+        # forwards the tracer specific methods, e.g. get_speed
+        return getattr(self.__dict__['tracer'], attr)
+
+    def _forward(self, method, ts, run_number, kwds):
+        if not self._active:
+            return method(ts, run_number, **kwds)
+        start = default_timer()
+        ret = method(ts, run_number, **kwds)
+        self._tracer_time += default_timer() - start
+        return ret
+
+    def start_run(self, ts, run_number, **kwds):
+        self._active = self.profiler.enabled
+        if self._active:
+            self._start = default_timer()
+            self._cpu_time = 0.0
+            self._step_start = None
+            self._step_tid = None
+            self._step_duration = 0.0
+            self._steps = 0
+            self._tracer_time = 0.0
+            self._quantum = kwds.pop('quantum', None)
+        else:
+            kwds.pop('quantum', None)
+        return self._forward(self.tracer.start_run, ts, run_number, kwds)
+
+    def end_run(self, ts, run_number, **kwds):
+        ret = self._forward(self.tracer.end_run, ts, run_number, kwds)
+        if self._active:
+            self._active = False
+            self.profiler.record_run(self.name, self._start,
+                                     default_timer() - self._start,
+                                     self._step_start, self._step_duration,
+                                     self._cpu_time,
+                                     self._tracer_time, self._steps,
+                                     self._quantum, self._step_tid)
+        return ret
+
+    def run_stopped(self, ts, run_number, **kwds):
+        return self._forward(self.tracer.run_stopped, ts, run_number, kwds)
+
+    def before_run_step(self, ts, run_number, **kwds):
+        ret = self._forward(self.tracer.before_run_step, ts, run_number, kwds)
+        if self._active:
+            # run_step may run in a worker thread, measured here
+            self._step_tid = threading.get_ident()
+            self._step_start = default_timer()
+            self._cpu_start = thread_time()
+        return ret
+
+    def after_run_step(self, ts, run_number, **kwds):
+        if self._active and self._step_start is not None:
+            self._step_duration = default_timer() - self._step_start
+            self._cpu_time = thread_time() - self._cpu_start
+            self._steps = kwds.get('steps_run', 0) or 0
+        return self._forward(self.tracer.after_run_step, ts, run_number, kwds)
+
+    def exception(self, ts, run_number, **kwds):
+        return self._forward(self.tracer.exception, ts, run_number, kwds)
+
+    def terminated(self, ts, run_number, **kwds):
+        return self._forward(self.tracer.terminated, ts, run_number, kwds)
+
+    def trace_stats(self, max_runs=None):
+        return self.tracer.trace_stats(max_runs)
@@ -3,9 +3,12 @@ Base Scheduler class, runs progressive modules.
 """
 import logging
 import functools
+from concurrent.futures import ThreadPoolExecutor
 from timeit import default_timer
 import time
 from .dataflow import Dataflow
+from .policy import SchedulingPolicy
+from .profiler import Profiler
 import progressivis.core.aio as aio
 
 from progressivis.utils.errors import ProgressiveError
@@ -29,11 +32,15 @@ class Scheduler(object):
         "Return the specified scheduler of, in None, the default one."
         return scheduler or cls.default
 
-    def __init__(self, interaction_latency=1):
+    def __init__(self, interaction_latency=1, n_jobs=1, policy=None):
         if interaction_latency <= 0:
             raise ProgressiveError('Invalid interaction_latency, '
                                    'should be strictly positive: %s'
                                    % interaction_latency)
+        if n_jobs < 1:
+            raise ProgressiveError('Invalid n_jobs, '
+                                   'should be strictly positive: %s'
+                                   % n_jobs)
 
         # same as clear below
         Scheduler._last_id += 1
@@ -55,11 +62,21 @@ class Scheduler(object):
         self._idle_procs = []
         self.version = 0
         self._run_list = []
+        self._round_list = []
         self._run_index = 0
         self._module_selection = None
         self._selection_target_time = -1
         self.interaction_latency = interaction_latency
         self._reachability = {}
+        self._ancestors = {}
+        self._dirty = set()
+        self.n_jobs = n_jobs
+        self._executor = None
+        if policy is None:
+            policy = SchedulingPolicy()
+        self.policy = policy
+        policy.attach(self)
+        self.profiler = Profiler()
         self._start_inter = 0
         self._hibernate_cond = None
         self._keep_running = KEEP_RUNNING
@@ -82,6 +99,9 @@ class Scheduler(object):
             await aio.sleep(SHORTCUT_TIME)
             self._module_selection = None
             self.shortcut_evt.clear()
+            # the loop may have ended during the sleep, its event is lost
+            if self._stopped or not self._run_list:
+                break
 
     def new_run_number(self):
         self._run_number += 1
@@ -135,6 +155,9 @@ class Scheduler(object):
         msg['is_running'] = self.is_running()
         msg['is_terminated'] = self.is_terminated()
         msg['run_number'] = self.run_number()
+        msg['policy'] = self.policy.to_json()
+        if self.profiler.enabled:
+            msg['profile'] = self.profiler.to_json()
         msg['status'] = 'success'
         return msg
 
@@ -266,6 +289,8 @@ class Scheduler(object):
         self._before_run()
         # if self._new_modules:
         #    self._update_modules()
+        # created before the loop, which may end before the manager starts
+        self.shortcut_evt = aio.Event()
         runners = [self._run_loop(), self.shortcut_manager()]
         runners.extend([aio.create_task(coro)
                         for coro in self.coros])
@@ -273,7 +298,14 @@ class Scheduler(object):
         # TODO: find the "right" initialisation value ...
         KEEP_RUNNING = min(50, len(self._run_list) * 3)
         self._keep_running = KEEP_RUNNING
-        await aio.gather(*runners)
+        if self.n_jobs > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.n_jobs)
+        try:
+            await aio.gather(*runners)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
         modules = [self._modules[m] for m in self._runorder]
         for module in reversed(modules):
             module.ending()
@@ -287,14 +319,23 @@ class Scheduler(object):
         # pylint: disable=broad-except
         if self._hibernate_cond is None:
             self._hibernate_cond = aio.Condition()
+        profiler = self.profiler
+        profiler.start_loop()
+        batch = []
         for module in self._next_module():
             if self.no_more_data() and self.all_blocked() and \
                self.is_waiting_for_input():
                 if not self._keep_running:
+                    await self._run_batch(batch)
                     async with self._hibernate_cond:
                         await self._hibernate_cond.wait()
             if self._keep_running:
                 self._keep_running -= 1
+            # A module depending on a pending one should see its results
+            if not self._is_independent(module, batch):
+                await self._run_batch(batch)
+            if not self._may_run(module):
+                continue
             if not self._consider_module(module):
                 logger.info("Module %s not scheduled"
                             " because of interactive mode",
@@ -303,19 +344,135 @@ class Scheduler(object):
             # increment the run number, even if we don't call the module
             self._run_number += 1
             # import pdb; pdb.set_trace()
-            module.prepare_run(self._run_number)
+            self._dirty.discard(module.name)
+            if profiler.enabled:
+                start = default_timer()
+                module.prepare_run(self._run_number)
+                profiler.record_update(module.name, start,
+                                       default_timer() - start)
+            else:
+                module.prepare_run(self._run_number)
+            if module.is_terminated():
+                self._notify_consumers(module)
             if not(module.is_ready() or self.has_input() or module.is_greedy()):
                 logger.info("Module %s not scheduled"
                             " because not ready and has no input",
                             module.name)
                 continue
             await self._run_tick_procs()
-            module.run(self._run_number)
-            await module.after_run(self._run_number)
+            if (self._executor is None or
+                    not self._can_run_step_apart(module)):
+                await self._run_batch(batch)
+                try:
+                    module.run(self._run_number)
+                finally:
+                    self._notify_consumers(module)
+                await module.after_run(self._run_number)
+            else:
+                batch.append((module, self._run_number))
+                if len(batch) < self.n_jobs and not self._new_modules:
+                    continue
+                await self._run_batch(batch)
             await aio.sleep(0)
+        await self._run_batch(batch)
+        profiler.end_loop()
         if self.shortcut_evt is not None:
             self.shortcut_evt.set()
 
+    def _may_run(self, module):
+        """
+        Return False if the module is blocked and nothing happened
+        upstream since it was last visited, so it can be skipped without
+        polling its slots.
+        """
+        if (module.name in self._dirty or
+                module.state != module.state_blocked or
+                module.is_greedy() or module.is_input() or
+                self.has_input() or not module.has_any_input()):
+            return True
+        logger.debug("Module %s not visited because it is clean",
+                     module.name)
+        return False
+
+    def mark_dirty(self, module):
+        """
+        Mark the module as having new input, so it is visited at the next
+        round. Called when the data read by the module changes.
+        """
+        self._dirty.add(module.name)
+
+    def _notify_consumers(self, module):
+        """
+        Mark the module as dirty after it ran, since its state may change
+        without new input, e.g. when its inputs terminated. Its consumers
+        are marked by the change notifications of its outputs; only those
+        reading data without notifications, or all of them when the module
+        terminated, are marked here.
+        """
+        self._dirty.add(module.name)
+        terminated = module.is_terminated() or module.is_zombie()
+        for slots in module.output_slot_values():
+            if not slots:
+                continue
+            for slot in slots:
+                if terminated or not slot.notifies_changes():
+                    self._dirty.add(slot.input_module.name)
+
+    def _is_independent(self, module, batch):
+        "Return True if no dependency path links module to the batch"
+        ancestors = self._ancestors.get(module.name, ())
+        for other, _ in batch:
+            if (other is module or
+                    other.name in ancestors or
+                    module.name in self._ancestors.get(other.name, ())):
+                return False
+        return True
+
+    async def _run_batch(self, batch):
+        """
+        Run a batch of independent modules, then empty the batch. Only
+        their `run_step` is run concurrently in the worker pool; the slot
+        updates, the quanta and the `end_run` callbacks stay in the loop.
+        """
+        if not batch:
+            return
+        try:
+            if len(batch) == 1:
+                module, run_number = batch[0]
+                module.run(run_number)
+            else:
+                await self._run_steps(batch)
+        finally:
+            for module, _ in batch:
+                self._notify_consumers(module)
+        for module, run_number in batch:
+            await module.after_run(run_number)
+        batch.clear()
+
+    async def _run_steps(self, batch):
+        loop = aio.get_running_loop()
+        futures = []
+        for (module, run_number) in batch:
+            quantum, step_size = module.begin_run(run_number)
+            futures.append(loop.run_in_executor(self._executor,
+                                                module.run_step_once,
+                                                run_number, step_size,
+                                                quantum))
+        results = await aio.gather(*futures)
+        exception = None
+        for (module, run_number), ret in zip(batch, results):
+            try:
+                module.finish_run(run_number, *ret)
+            except RuntimeError as exc:
+                exception = exception or exc
+        if exception is not None:
+            raise exception
+
+    @staticmethod
+    def _can_run_step_apart(module):
+        "Return True unless the module overrides `run` as a whole"
+        return type(module).run.__qualname__ == 'Module.run'
+
     def _next_module(self):
         """
         Generator the yields a possibly infinite sequence of modules.
@@ -349,10 +506,13 @@ class Scheduler(object):
                 # Restart from beginning
                 self._run_index = 0
                 first_run = self._run_number
-            module = self._run_list[self._run_index]
+            if self._run_index == 0:  # new round
+                self._round_list = (self.policy.start_round(self._run_list)
+                                    or self._run_list)
+            module = self._round_list[self._run_index]
             self._run_index += 1  # allow it to be reset
             yield module
-            if self._run_index >= len(self._run_list):  # end of modules
+            if self._run_index >= len(self._round_list):  # end of modules
                 self._end_of_modules(first_run)
                 first_run = self._run_number
 
@@ -419,14 +579,23 @@ class Scheduler(object):
             for mid in added:
                 modules[mid].starting()
         self._new_modules = None
+        self._dirty = set(modules.keys())
         self._run_list = []
         self._runorder = self._new_runorder
         self._new_runorder = None
         logger.info("New modules order: %s", self._runorder)
+        self._ancestors = {}
         for i, mid in enumerate(self._runorder):
             module = self._modules[mid]
             self._run_list.append(module)
             module.order = i
+            # run order is topological so the ancestors of inputs are known
+            ancestors = set()
+            for slot in self._dependencies.get(mid, {}).values():
+                name = slot.output_module.name
+                ancestors.add(name)
+                ancestors.update(self._ancestors.get(name, ()))
+            self._ancestors[mid] = ancestors
 
     def _end_of_modules(self, first_run):
         # Reset interaction mode
@@ -559,6 +728,7 @@ class Scheduler(object):
         async with self._hibernate_cond:
             self._keep_running = KEEP_RUNNING
             self._hibernate_cond.notify()
+        self._dirty.add(module.name)
         sel = self._reachability.get(module.name, False)
         if sel:
             if not self._module_selection:
@@ -587,7 +757,7 @@ class Scheduler(object):
     def _consider_module(self, module):
         # FIxME For now, accept all modules in input management
         if not self.has_input():
-            return True
+            return self.policy.consider(module)
         if module.name in self._module_selection:
             # self._module_selection.remove(module.name)
             logger.debug('Module %s ready for scheduling', module.name)
@@ -606,6 +776,8 @@ class Scheduler(object):
         "Fix the quantum of the specified module"
         if self.has_input() and module.name in self._module_selection:
             quantum = self.time_left() / len(self._module_selection)
+        else:
+            quantum = self.policy.quantum(module, quantum)
         if quantum == 0:
             quantum = 0.1
             logger.info('Quantum is 0 in %s, setting it to'
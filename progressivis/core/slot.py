@@ -134,10 +134,21 @@ class Slot(object):
                 buffer_created=desc.buffer_created,
                 buffer_updated=desc.buffer_updated,
                 buffer_deleted=desc.buffer_deleted)
+            if self.changes and self.changes.notifies:
+                self.data().changes.add_listener(self._data_changed)
         if self.changes:
             df = self.data()
             self.changes.update(run_number, df, self.name())
 
+    def notifies_changes(self):
+        "Return True if the changes of the data wake up the input module"
+        return bool(self.changes) and self.changes.notifies
+
+    def _data_changed(self):
+        scheduler = self.input_module.scheduler()
+        if scheduler is not None:
+            scheduler.mark_dirty(self.input_module)
+
     def reset(self):
         "Reset the slot"
         if self.changes:
@@ -1,6 +1,7 @@
 
 from .csv_loader import CSVLoader
 from .vec_loader import VECLoader
+from .parquet_loader import ParquetLoader, ArrowLoader
 #from .input import Input
 from .variable import Variable, VirtualVariable
 from .dynvar import DynVar
@@ -8,6 +9,8 @@ from .dynvar import DynVar
 
 __all__ = ['CSVLoader',
            'VECLoader',
+           'ParquetLoader',
+           'ArrowLoader',
 #           'Input',
            'Variable',
            'VirtualVariable',
@@ -31,6 +31,8 @@ class CSVLoader(TableModule):
                  recovery=0,
                  recovery_table_size=3,
                  save_step_size=100000,
+                 n_jobs=0,
+                 read_ahead=None,
                  **kwds):
         super(CSVLoader, self).__init__(**kwds)
         self.default_step_size = kwds.get('chunksize', 1000)  # initial guess
@@ -62,6 +64,7 @@ class CSVLoader(TableModule):
         self._recovery_table = None
         self._recovery_table_inv = None
         self._save_step_size = save_step_size
+        self._parser_kwds = dict(n_jobs=n_jobs, read_ahead=read_ahead)
         self._last_saved_id = 0
         self._table = None
         #self._do_not_wait = ["filenames"]
@@ -118,7 +121,8 @@ class CSVLoader(TableModule):
             if self.filepath_or_buffer is not None:
                 if not self._recovery:
                     try:
-                        self.parser = read_csv(self.create_input_source(self.filepath_or_buffer), **self.csv_kwds)
+                        self.parser = read_csv(self.create_input_source(self.filepath_or_buffer),
+                                               **self._parser_kwds, **self.csv_kwds)
                     except IOError as e:
                         logger.error('Cannot open file %s: %s', self.filepath_or_buffer, e)
                         self.parser = None
@@ -164,7 +168,8 @@ class CSVLoader(TableModule):
                         logger.error('Cannot read the snapshot %s', e)
                         return self.state_terminated
                     try:
-                        self.parser = recovery(snapshot, self.filepath_or_buffer, **self.csv_kwds)
+                        self.parser = recovery(snapshot, self.filepath_or_buffer,
+                                               **self._parser_kwds, **self.csv_kwds)
                     except Exception as e:
                         #print('Cannot recover from snapshot {}, {}'.format(snapshot, e))
                         logger.error('Cannot recover from snapshot %s, %s', snapshot, e)
@@ -186,7 +191,8 @@ class CSVLoader(TableModule):
                         return self.state_blocked
                     filename = df.at[indices.start, 'filename']
                     try:
-                        self.parser = read_csv(self.create_input_source(filename), **self.csv_kwds)
+                        self.parser = read_csv(self.create_input_source(filename),
+                                               **self._parser_kwds, **self.csv_kwds)
                     except IOError as e:
                         logger.error('Cannot open file %s: %s', filename, e)
                         self.parser = None
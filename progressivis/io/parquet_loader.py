@@ -0,0 +1,384 @@
+"""
+Progressive loaders for columnar binary files: Parquet and Arrow IPC
+(Feather v2). The data is streamed batch by batch into a Table without
+any text parsing.
+"""
+import operator
+import logging
+
+import numpy as np
+
+from progressivis.utils.errors import (ProgressiveError,
+                                       ProgressiveStopIteration)
+from ..table.module import TableModule
+from ..table.table import Table
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is an optional dependency
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['ParquetLoader', 'ArrowLoader']
+
+BATCH_SIZE = 65536
+
+_OPS = {
+    '==': operator.eq,
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def _check_filters(filters):
+    if filters is None:
+        return []
+    filters = [tuple(f) for f in filters]
+    for f in filters:
+        if len(f) != 3 or (f[1] not in _OPS and f[1] not in ('in', 'not in')):
+            raise ProgressiveError('Invalid filter %s, should be '
+                                   '(column, op, value)' % (f,))
+    return filters
+
+
+def _stats_may_match(stats, op, value):
+    """Return False if no row of a row group with the given statistics
+    can satisfy the predicate `op value`, True if some row may."""
+    if stats is None or not stats.has_min_max:
+        return True
+    vmin, vmax = stats.min, stats.max
+    try:
+        if op in ('==', '='):
+            return vmin <= value <= vmax
+        if op == '!=':
+            return not vmin == vmax == value
+        if op == '<':
+            return vmin < value
+        if op == '<=':
+            return vmin <= value
+        if op == '>':
+            return vmax > value
+        if op == '>=':
+            return vmax >= value
+        if op == 'in':
+            return any(vmin <= v <= vmax for v in value)
+    except TypeError:  # incomparable statistics, e.g. bytes vs str
+        return True
+    return True  # 'not in'
+
+
+def _null_value(dtype, fillvalue):
+    "Return the value replacing the nulls of an arrow array"
+    if fillvalue is not None:
+        return fillvalue
+    if dtype == object:
+        return ''
+    if dtype.kind == 'f':
+        return None  # nulls become NaN
+    if dtype.kind == 'b':
+        return False
+    return 0
+
+
+def _to_numpy(array, dtype, fillvalue=None):
+    """Convert an arrow array to numpy, without copy when possible.
+    Times are returned as int64 nanoseconds since the epoch."""
+    if isinstance(array, pa.ChunkedArray):
+        if array.num_chunks == 1:
+            array = array.chunk(0)
+        else:
+            array = pa.concat_arrays(array.chunks)
+    fill = _null_value(dtype, fillvalue) if array.null_count else None
+    if fill is not None and dtype.kind != 'M':
+        array = array.fill_null(fill)
+    values = array.to_numpy(zero_copy_only=False)
+    if dtype.kind == 'M':
+        nulls = np.isnat(values) if fill is not None else None
+        values = values.astype(dtype).view(np.int64)
+        if nulls is not None and nulls.any():
+            values = values.copy()
+            values[nulls] = fill
+        return values
+    if values.dtype != dtype:
+        values = values.astype(dtype)
+    return values
+
+
+def _to_ns(value):
+    "Return a time as int64 nanoseconds since the epoch"
+    return np.datetime64(value, 'ns').astype(np.int64)
+
+
+def _arrow_dtype(arrow_type):
+    "Return the numpy dtype used to store an arrow type in a Table"
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return np.dtype(object)
+    if pa.types.is_dictionary(arrow_type):
+        return _arrow_dtype(arrow_type.value_type)
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return np.dtype('datetime64[ns]')  # stored as int64 nanoseconds
+    try:
+        return np.dtype(arrow_type.to_pandas_dtype())
+    except NotImplementedError:
+        raise ProgressiveError('Unsupported arrow type %s' % arrow_type)
+
+
+class ArrowBatchLoader(TableModule):
+    """
+    Base class of the loaders reading arrow record batches.
+
+    Subclasses implement `open_batches` returning the arrow schema and an
+    iterator over record batches. The batches are split or merged to
+    load `step_size` rows per step. When `filters` are specified as a
+    list of `(column, op, value)` tuples, combined with a logical and,
+    only the rows satisfying all of them are loaded; the ops are
+    `==, !=, <, <=, >, >=, in, not in`.
+
+    Timestamp and date columns are stored as int64 nanoseconds since the
+    epoch; their filter values can be given as datetimes or strings.
+    Null values are replaced by the `fillvalues` of their column when
+    specified, otherwise by 0 for numbers and times, by '' for strings,
+    and by NaN for floats.
+    """
+    def __init__(self, filepath, columns=None, filters=None,
+                 fillvalues=None, **kwds):
+        super(ArrowBatchLoader, self).__init__(**kwds)
+        if pa is None:
+            raise ProgressiveError('%s requires pyarrow' %
+                                   self.__class__.__name__)
+        self.default_step_size = kwds.get('chunksize', 10000)
+        self.filepath = filepath
+        self._columns = list(columns) if columns is not None else None
+        self._filters = _check_filters(filters)
+        self._fillvalues = fillvalues
+        self._batches = None
+        self._batch = None  # current record batch
+        self._offset = 0  # offset of the next row in the current batch
+        self._dtypes = None
+        self._rows_read = 0
+        self._table = None
+
+    def rows_read(self):
+        "Return the number of rows read so far."
+        return self._rows_read
+
+    def is_source(self):
+        return True
+
+    def is_data_input(self):
+        # pylint: disable=no-self-use
+        "Return True if this module brings new data"
+        return True
+
+    def open_batches(self):
+        """Return the schema of the loaded columns and an iterator over
+        the record batches."""
+        raise NotImplementedError('open_batches not defined')
+
+    def read_columns(self):
+        "Return the list of columns to read, including the filter columns."
+        if self._columns is None:
+            return None
+        columns = list(self._columns)
+        for col, _, _ in self._filters:
+            if col not in columns:
+                columns.append(col)
+        return columns
+
+    def close(self):
+        self._batches = None
+        self._batch = None
+        self._offset = 0
+
+    def _next_rows(self, step_size):
+        "Return up to step_size rows as a list of record batches."
+        batches = []
+        rows = 0
+        while rows < step_size:
+            if self._batch is None or self._offset >= self._batch.num_rows:
+                self._batch = next(self._batches, None)
+                self._offset = 0
+                if self._batch is None:
+                    break
+                continue
+            length = min(step_size - rows, self._batch.num_rows - self._offset)
+            batches.append(self._batch.slice(self._offset, length))  # no copy
+            self._offset += length
+            rows += length
+        return batches, rows
+
+    def _filter_mask(self, data):
+        mask = None
+        for col, op, value in self._filters:
+            values = data[col]
+            if self._dtypes[col].kind == 'M':
+                if op in ('in', 'not in'):
+                    value = [_to_ns(v) for v in value]
+                else:
+                    value = _to_ns(value)
+            if op == 'in':
+                m = np.isin(values, list(value))
+            elif op == 'not in':
+                m = ~np.isin(values, list(value))
+            else:
+                m = _OPS[op](values, value)
+            mask = m if mask is None else (mask & m)
+        return mask
+
+    def _create_table(self, schema):
+        self._dtypes = {field.name: _arrow_dtype(field.type)
+                        for field in schema}
+        dshapes = []
+        for name in self._columns or schema.names:
+            dtype = self._dtypes[name]
+            if dtype == object:
+                dshape = 'string'
+            elif dtype.kind == 'M':
+                dshape = 'int64'
+            else:
+                dshape = dtype.name
+            dshapes.append('%s: %s' % (name, dshape))
+        self._table = Table(self.generate_table_name('table'),
+                            dshape='{' + ','.join(dshapes) + '}',
+                            fillvalues=self._fillvalues,
+                            create=True)
+
+    def run_step(self, run_number, step_size, howlong):
+        if step_size == 0:  # bug
+            logger.error('Received a step_size of 0')
+            return self._return_run_step(self.state_ready, steps_run=0)
+        if self._batches is None:
+            if self.filepath is None:
+                raise ProgressiveStopIteration('no more files')
+            try:
+                schema, self._batches = self.open_batches()
+            except IOError as e:
+                logger.error('Cannot open file %s: %s', self.filepath, e)
+                raise ProgressiveStopIteration('cannot open file')
+            self.filepath = None
+            if self._table is None:
+                self._create_table(schema)
+        batches, rows = self._next_rows(step_size)
+        if rows == 0:
+            self.close()
+            raise ProgressiveStopIteration('end of file')
+        data = {}
+        fillvalues = self._fillvalues or {}
+        for name, dtype in self._dtypes.items():
+            arrays = [batch.column(name) for batch in batches]
+            fillvalue = fillvalues.get(name)
+            if len(arrays) == 1:
+                data[name] = _to_numpy(arrays[0], dtype, fillvalue)
+            else:
+                data[name] = np.concatenate([_to_numpy(a, dtype, fillvalue)
+                                             for a in arrays])
+        if self._filters:
+            mask = self._filter_mask(data)
+            data = {name: values[mask] for (name, values) in data.items()}
+        if self._columns is not None:
+            data = {name: data[name] for name in self._columns}
+        creates = len(next(iter(data.values())))
+        if creates:
+            self._table.append(data)
+            self._rows_read += creates
+        return self._return_run_step(self.state_ready, steps_run=rows)
+
+
+class ParquetLoader(ArrowBatchLoader):
+    """
+    Load a Parquet file progressively, row group by row group.
+
+    Only the `columns` specified are read. Row groups whose statistics
+    prove that no row can satisfy the `filters` are skipped without
+    being read.
+    """
+    def __init__(self, filepath, columns=None, filters=None,
+                 batch_size=BATCH_SIZE, **kwds):
+        super(ParquetLoader, self).__init__(filepath, columns=columns,
+                                            filters=filters, **kwds)
+        self._batch_size = batch_size
+        self._parquet_file = None
+        self._num_rows = 0
+        self.skipped_row_groups = 0
+
+    def row_groups(self, parquet_file):
+        "Return the indices of the row groups that may match the filters."
+        metadata = parquet_file.metadata
+        names = parquet_file.schema_arrow.names
+        selected = []
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            keep = True
+            for col, op, value in self._filters:
+                stats = row_group.column(names.index(col)).statistics
+                if not _stats_may_match(stats, op, value):
+                    keep = False
+                    break
+            if keep:
+                selected.append(i)
+        self.skipped_row_groups = metadata.num_row_groups - len(selected)
+        return selected
+
+    def open_batches(self):
+        parquet_file = pq.ParquetFile(self.filepath, memory_map=True)
+        self._parquet_file = parquet_file
+        self._num_rows = parquet_file.metadata.num_rows
+        columns = self.read_columns()
+        schema = parquet_file.schema_arrow
+        if columns is not None:
+            schema = pa.schema([schema.field(c) for c in columns])
+        row_groups = self.row_groups(parquet_file)
+        if not row_groups:
+            return schema, iter(())
+        return schema, parquet_file.iter_batches(batch_size=self._batch_size,
+                                                 row_groups=row_groups,
+                                                 columns=columns)
+
+    def get_progress(self):
+        return (self._rows_read, self._num_rows)
+
+    def close(self):
+        super(ParquetLoader, self).close()
+        self._parquet_file = None
+
+
+class ArrowLoader(ArrowBatchLoader):
+    """
+    Load an Arrow IPC file (Feather v2 format) progressively, record batch
+    by record batch. The file is memory mapped so the batches are not
+    copied before being stored in the Table.
+    """
+    def __init__(self, filepath, columns=None, filters=None, **kwds):
+        super(ArrowLoader, self).__init__(filepath, columns=columns,
+                                          filters=filters, **kwds)
+        self._source = None
+
+    def _iter_batches(self, reader, columns):
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = pa.RecordBatch.from_arrays(
+                    [batch.column(c) for c in columns], names=columns)
+            yield batch
+
+    def open_batches(self):
+        self._source = pa.memory_map(self.filepath, 'r')
+        reader = pa.ipc.open_file(self._source)
+        columns = self.read_columns()
+        schema = reader.schema
+        if columns is not None:
+            schema = pa.schema([schema.field(c) for c in columns])
+        return schema, self._iter_batches(reader, columns)
+
+    def close(self):
+        super(ArrowLoader, self).close()
+        if self._source is not None:
+            self._source.close()
+            self._source = None
@@ -8,7 +8,7 @@ import time
 import bz2
 import zlib
 import json
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from pandas.core.dtypes.inference import is_file_like, is_sequence
 import asyncio
 import concurrent.futures
@@ -51,12 +51,24 @@ def is_recoverable(inp):
     return is_str(inp[0])
 
 
+def _parse_csv(csv_bytes, header, names, usecols, pd_kwds):
+    return pd.read_csv(BytesIO(csv_bytes), header=header, names=names,
+                       usecols=usecols, **pd_kwds)
+
+
 class Parser(object):
     """
     Always use Parser.create() instead of Parser() because __init__() is not awaitable
+
+    When n_jobs > 0, once the column names are known, the input is split
+    at newline boundaries into chunks parsed ahead of demand by a pool
+    of n_jobs threads. At most read_ahead chunks are pending, they are
+    consumed in file order. Reading with flush=True stops the read-ahead
+    so the parser can be flushed and snapshotted.
     """    
     def __init__(self, input_source, remaining, estimated_row_size,
-                     offset=None, overflow_df=None, pd_kwds={}, chunksize=0, usecols=None, names=None, header='infer'):
+                     offset=None, overflow_df=None, pd_kwds={}, chunksize=0, usecols=None, names=None, header='infer',
+                     n_jobs=0, read_ahead=None):
         self._input = input_source
         self._pd_kwds = pd_kwds
         self._remaining = remaining
@@ -69,12 +81,18 @@ class Parser(object):
         self._usecols = usecols
         self._names = names
         self._header = header
+        self._n_jobs = n_jobs
+        self._read_ahead = read_ahead or 2 * n_jobs
+        self._executor = None
+        self._pending = deque()
 
     @staticmethod
     def create(input_source, remaining, estimated_row_size,
-                     offset=None, overflow_df=None, pd_kwds={}, chunksize=0, usecols=None, names=None, header='infer'):
+                     offset=None, overflow_df=None, pd_kwds={}, chunksize=0, usecols=None, names=None, header='infer',
+                     n_jobs=0, read_ahead=None):
         par = Parser(input_source, remaining, estimated_row_size, offset,
-                         overflow_df, pd_kwds, chunksize, usecols, names, header)
+                         overflow_df, pd_kwds, chunksize, usecols, names, header,
+                         n_jobs, read_ahead)
         if offset is None:
             par._offset = par._input.tell()
         return par
@@ -127,10 +145,7 @@ class Parser(object):
         # it remains n_ rows to read
         row_cnt = 0
         #at_least_n = int(n_*(1-MARGIN))
-        retries = 0
         while row_cnt < n_: #at_least_n:
-            row_size = self._estimated_row_size
-            recovery_n = n_
             n_ = n_ - row_cnt
             if flush:
                 nb_rows = n_
@@ -140,41 +155,20 @@ class Parser(object):
                 nb_rows = min(n_, HEADER_CHUNK)
             else:
                 nb_rows = max(n_, self._chunksize)
-            size = nb_rows * row_size
-            try:
-                bytes_ = self._input.read(size) # do not raise StopIteration, only returns b''
-            except HTTPError:
-                print("HTTPError ...", self._offset)
-                if retries >= MAX_RETRY:
-                    raise
-                retries += 1
-                self._recovery_cnt += 1
-                time.sleep(1)
-                self._input.reopen(self._offset)
-                n_ = recovery_n
-                print("... recovery")
-                continue
-            self._offset = self._input.tell()
-            if not bytes_ and not self._remaining:
-                break # end of file
-            last_nl = bytes_.rfind(NL) # stop after the last NL
-            if last_nl == -1: # NL not found => we read less than an entire row
-                self._remaining += bytes_
-                continue
-            csv_bytes = self._remaining+bytes_[:last_nl+1]
-            self._remaining = bytes_[last_nl+1:]
-            if not csv_bytes:
-                break
-            #print("self._pd_kwds: ", self._pd_kwds)
-            if self._names is None:
-                header = self._header
-                names = None
-                usecols=None
+            size = nb_rows * self._estimated_row_size
+            if self._n_jobs > 0 and self._names is not None and not flush:
+                self._fill_pending(size)
+            if self._pending:
+                csv_len, future = self._pending.popleft()
+                read_df = future.result()
             else:
-                header = None
-                names = self._names
-                usecols = self._usecols
-            read_df = pd.read_csv(BytesIO(csv_bytes), header=header, names=names, usecols=usecols, **self._pd_kwds)
+                csv_bytes = self._read_bytes(size)
+                if not csv_bytes:
+                    break # end of file
+                csv_len = len(csv_bytes)
+                header, names, usecols = self._parse_args()
+                read_df = _parse_csv(csv_bytes, header, names, usecols,
+                                     self._pd_kwds)
             if self._names is None:
                 self._names = read_df.columns.values
                 if self._usecols:
@@ -189,7 +183,7 @@ class Parser(object):
                                      "{} instead of {}".format(
                                          len(read_df.columns), self._nb_cols))
             len_df = len(read_df)
-            self._estimated_row_size = len(csv_bytes)//len_df
+            self._estimated_row_size = csv_len//len_df
             if len_df <= n_:
                 ret.append(read_df)
                 row_cnt += len_df
@@ -198,10 +192,70 @@ class Parser(object):
                 ret.append(read_df.iloc[:n_])
                 #print("produced overflow: ", len(self._overflow_df), "rows")
                 break
+        if not ret:
+            self.close()
         return ret
 
+    def _parse_args(self):
+        if self._names is None:
+            return self._header, None, None
+        return None, self._names, self._usecols
+
+    def _read_bytes(self, size):
+        """
+        Return the next bytes of the input, ending with a newline,
+        or b'' at the end of the input.
+        """
+        retries = 0
+        while True:
+            try:
+                bytes_ = self._input.read(size) # do not raise StopIteration, only returns b''
+            except HTTPError:
+                print("HTTPError ...", self._offset)
+                if retries >= MAX_RETRY:
+                    raise
+                retries += 1
+                self._recovery_cnt += 1
+                time.sleep(1)
+                self._input.reopen(self._offset)
+                print("... recovery")
+                continue
+            self._offset = self._input.tell()
+            if not bytes_ and not self._remaining:
+                return b'' # end of file
+            last_nl = bytes_.rfind(NL) # stop after the last NL
+            if last_nl == -1: # NL not found => we read less than an entire row
+                self._remaining += bytes_
+                if not bytes_: # last row without NL
+                    bytes_, self._remaining = self._remaining, b''
+                    return bytes_
+                continue
+            csv_bytes = self._remaining+bytes_[:last_nl+1]
+            self._remaining = bytes_[last_nl+1:]
+            return csv_bytes
+
+    def _fill_pending(self, size):
+        "Submit chunks to parse until read_ahead chunks are pending"
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self._n_jobs)
+        header, names, usecols = self._parse_args()
+        while len(self._pending) < self._read_ahead:
+            csv_bytes = self._read_bytes(size)
+            if not csv_bytes:
+                break
+            future = self._executor.submit(_parse_csv, csv_bytes, header,
+                                           names, usecols, self._pd_kwds)
+            self._pending.append((len(csv_bytes), future))
+
+    def close(self):
+        "Release the parsing threads, if any"
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
     def is_flushed(self):
-        return self._overflow_df is None
+        return self._overflow_df is None and not self._pending
 
 class InputSource(object):
     """
@@ -398,7 +452,8 @@ def get_first_row(fd):
         print("Warning: row longer than {}".format(guard))
     return ret.getvalue()
 
-def read_csv(input_source, silent_before=0, **csv_kwds):
+def read_csv(input_source, silent_before=0, n_jobs=0, read_ahead=None,
+             **csv_kwds):
     pd_kwds = dict(csv_kwds)
     chunksize = pd_kwds['chunksize']
     del pd_kwds['chunksize']
@@ -411,9 +466,11 @@ def read_csv(input_source, silent_before=0, **csv_kwds):
     if 'header' in pd_kwds:
         header = pd_kwds.pop('header')
         assert header is None or header == 0
-    return Parser.create(input_source, remaining=first_row, estimated_row_size=len(first_row), pd_kwds=pd_kwds, chunksize=chunksize, usecols=usecols, header=header)
+    return Parser.create(input_source, remaining=first_row, estimated_row_size=len(first_row), pd_kwds=pd_kwds, chunksize=chunksize, usecols=usecols, header=header,
+                         n_jobs=n_jobs, read_ahead=read_ahead)
 
-def recovery(snapshot, previous_file_seq, **csv_kwds):
+def recovery(snapshot, previous_file_seq, n_jobs=0, read_ahead=None,
+             **csv_kwds):
     print("RECOVERY ...")
     pd_kwds = dict(csv_kwds)
     chunksize = pd_kwds['chunksize']
@@ -452,4 +509,5 @@ def recovery(snapshot, previous_file_seq, **csv_kwds):
                   estimated_row_size=estimated_row_size,
                   offset=offset, overflow_df=overflow_df,
                   pd_kwds=pd_kwds, chunksize=chunksize, names=names,
-                  usecols=usecols, header=None)
+                  usecols=usecols, header=None,
+                  n_jobs=n_jobs, read_ahead=read_ahead)
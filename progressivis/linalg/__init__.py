@@ -3,3 +3,4 @@ from .linear_map import *
 from .nexpr import *
 from .mixufunc import *
 
+from .fused import *
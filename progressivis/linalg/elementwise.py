@@ -4,6 +4,7 @@ from ..table.module import TableModule
 from ..table import Table, BaseTable
 from ..core.decorators import *
 from ..core.bitmap import bitmap
+from ..table.slot_join import existing_ids
 
 from .. import ProgressiveError, SlotDescriptor, Slot
 from ..utils.psdict import PsDict
@@ -233,10 +234,12 @@ class Binary(TableModule):
                                              in self._columns_dict)
         assert _assert
         self._join = None
+        self._dict_updated = bitmap()
 
     def reset(self):
         if self._table is not None:
             self._table.resize(0)
+        self._dict_updated = bitmap()
 
     def run_step(self, run_number, step_size, howlong):
         first = self.get_input_slot('first')
@@ -246,19 +249,18 @@ class Binary(TableModule):
         if not (data and data2):
             return self._return_run_step(self.state_blocked, steps_run=0)
         _t2t = isinstance(data2, BaseTable)
+        dict_changed = False
         if not _t2t and second.has_buffered(): # i.e. second is a dict
-            first.reset()
-            second.reset()
-            self.reset()
-            first.update(run_number)
-            second.update(run_number)
             second.clear_buffers()
+            dict_changed = True
         steps = 0
         steps_todo = step_size
         if self._table is None:
             dshape_ = self.get_output_datashape("table")
             self._table = Table(self.generate_table_name(f'binary_{self._ufunc.__name__}'),
                                 dshape=dshape_, create=True)
+        elif dict_changed: # recompute all the rows progressively
+            self._dict_updated = existing_ids(self._table)
         if self._join is None:
             slots_ = (first, second) if isinstance(data2, BaseTable) else (first,)
             self._join = self.make_slot_join(*slots_)
@@ -266,12 +268,16 @@ class Binary(TableModule):
             if join.has_deleted():
                 indices = join.next_deleted(steps_todo)
                 del self._table.loc[indices]
+                self._dict_updated -= indices
                 steps += len(indices)
                 steps_todo -= len(indices)
                 if steps_todo <= 0:
-                    return self._return_run_step(self.next_state(first), steps_run=steps)
-            if join.has_updated():
+                    return self._return_run_step(self._next_state(first), steps_run=steps)
+            if join.has_updated() or self._dict_updated:
                 indices = join.next_updated(steps_todo)
+                if len(indices) < steps_todo and self._dict_updated:
+                    indices |= self._dict_updated.pop(steps_todo-len(indices))
+                self._dict_updated -= indices
                 other = self.filter_columns(data2, fix_loc(indices), "second") if _t2t else data2
                 vec = _binary(self.filter_columns(data, fix_loc(indices), "first"),
                               self._ufunc, other, self.get_columns(data2, "second"), **self._kwds)
@@ -279,16 +285,21 @@ class Binary(TableModule):
                 steps += len(indices)
                 steps_todo -= len(indices)
                 if steps_todo <= 0:
-                    return self._return_run_step(self.next_state(first), steps_run=steps)
+                    return self._return_run_step(self._next_state(first), steps_run=steps)
             if (not join.has_created()) or steps_todo <= 0:
-                return self._return_run_step(self.next_state(first), steps_run=steps)
+                return self._return_run_step(self._next_state(first), steps_run=steps)
             indices = join.next_created(steps_todo)
             steps += len(indices)
             other = self.filter_columns(data2, fix_loc(indices), "second") if _t2t else data2
             vec = _binary(self.filter_columns(data, fix_loc(indices), "first"),
                           self._ufunc, other, self.get_columns(data2, "second"), **self._kwds)
             self._table.append(vec, indices=indices)
-            return self._return_run_step(self.next_state(first), steps_run=steps)
+            return self._return_run_step(self._next_state(first), steps_run=steps)
+
+    def _next_state(self, slot):
+        if self._dict_updated:
+            return self.state_ready
+        return self.next_state(slot)
 
 for k, v in binary_dict_all.items():
     name = func2class_name(k)
@@ -0,0 +1,313 @@
+"""
+Fusion of chains of elementwise modules (Unary, Binary, ColsBinary) into a
+single module evaluating one kernel, without the intermediate tables.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import numexpr as ne
+
+from ..core.slot import SlotDescriptor
+from ..table import BaseTable
+from ..table.table import Table
+from ..table.slot_join import existing_ids
+from ..utils.psdict import PsDict
+from ..utils.errors import ProgressiveError
+from .elementwise import Unary, Binary, ColsBinary
+from .mixufunc import MixUfuncABC
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ['FusedUfunc', 'fuse_elementwise']
+
+# ufuncs with a numexpr equivalent, used when the whole kernel is float64
+NUMEXPR_OPS = {
+    np.add: '({} + {})',
+    np.subtract: '({} - {})',
+    np.multiply: '({} * {})',
+    np.true_divide: '({} / {})',
+    np.power: '({} ** {})',
+    np.arctan2: 'arctan2({}, {})',
+    np.negative: '(-{})',
+    np.absolute: 'abs({})',
+}
+for _name in ('sqrt', 'exp', 'expm1', 'log', 'log10', 'log1p', 'sin', 'cos',
+              'tan', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh'):
+    NUMEXPR_OPS[getattr(np, _name)] = _name + '({})'
+
+# Inputs of the fusable modules
+FUSABLE_INPUTS = {Unary: {'table'},
+                  ColsBinary: {'table'},
+                  Binary: {'first', 'second'}}
+
+# Nodes of a kernel are tuples:
+# ('col', leaf, column, dtype): column of a leaf table
+# ('key', leaf, key, None): value of a leaf dictionary
+# ('ufunc', ufunc, dtype, args): ufunc applied to the args, cast to dtype
+
+
+class _Columns(object):
+    "Stands for an intermediate table when selecting its columns"
+    def __init__(self, nodes):
+        self.columns = list(nodes.keys())
+
+
+def _dtype(node):
+    return node[3] if node[0] == 'col' else node[2]
+
+
+def _module_nodes(module, inputs):
+    "Return the nodes computing the output columns of a fusable module"
+    if isinstance(module, Unary):
+        table = inputs['table']
+        cols = module.get_columns(_Columns(table))
+        return OrderedDict((c, ('ufunc', module._ufunc, _dtype(table[c]),
+                                (table[c],)))
+                           for c in cols)
+    if isinstance(module, ColsBinary):
+        table = inputs['table']
+        cols_out = module._cols_out or module._first
+        return OrderedDict((co, ('ufunc', module._ufunc, _dtype(table[c1]),
+                                 (table[c1], table[c2])))
+                           for (c1, c2, co) in zip(module._first,
+                                                   module._second, cols_out))
+    if isinstance(module, Binary):
+        first = inputs['first']
+        second = inputs['second']
+        cols = module.get_columns(_Columns(first), 'first')
+        cols2 = module.get_columns(_Columns(second), 'second')
+        return OrderedDict((c, ('ufunc', module._ufunc, _dtype(first[c]),
+                                (first[c], second[cols2[i]])))
+                           for (i, c) in enumerate(cols))
+    raise ProgressiveError('Module %s cannot be fused' % module.name)
+
+
+def _to_numexpr(node, names):
+    "Return the numexpr expression of a node, or None if it has none"
+    kind = node[0]
+    if kind in ('col', 'key'):
+        if kind == 'col' and node[3] != np.float64:
+            return None
+        key = (node[1], node[2])
+        if key not in names:
+            names[key] = '_v%d' % len(names)
+        return names[key]
+    _, ufunc, dtype, args = node
+    fmt = NUMEXPR_OPS.get(ufunc)
+    if fmt is None or dtype != np.float64:
+        return None
+    args = [_to_numexpr(arg, names) for arg in args]
+    if None in args:
+        return None
+    return fmt.format(*args)
+
+
+def _evaluate(node, env, cache):
+    kind = node[0]
+    if kind in ('col', 'key'):
+        return env[(node[1], node[2])]
+    key = id(node)
+    res = cache.get(key)
+    if res is None:
+        _, ufunc, dtype, args = node
+        res = np.asarray(ufunc(*[_evaluate(arg, env, cache) for arg in args]))
+        if res.dtype != dtype:  # the intermediate table would cast it
+            res = res.astype(dtype)
+        cache[key] = res
+    return res
+
+
+class FusedUfunc(MixUfuncABC):
+    """
+    Evaluate a chain of elementwise modules as one kernel, writing only
+    the output table of the last module of the chain.
+
+    The chain is a list of `(module, sources)` in topological order, where
+    `sources` maps the input slots of the module to `('leaf', index)` for an
+    input of the chain, or `('module', name)` for a module of the chain.
+    The leaves are connected to the multiple `table` input slot. The
+    kernel is compiled with numexpr when all its values are float64, and
+    evaluated with NumPy otherwise. The intermediate tables are not
+    stored, but can be computed on demand with `intermediate()`.
+    """
+    inputs = [SlotDescriptor('table', type=(BaseTable, PsDict), required=True,
+                             multiple=True)]
+    outputs = [SlotDescriptor('table', type=Table, required=False)]
+    expr = {}
+
+    def __init__(self, chain, **kwds):
+        super().__init__(**kwds)
+        self._chain = chain
+        self._leaf_names = []
+        self._nodes = None
+        self._numexpr = None
+
+    @property
+    def fused_modules(self):
+        "Return the names of the fused modules"
+        return [module.name for (module, _) in self._chain]
+
+    def connect_leaf(self, output_module, output_name):
+        "Connect the next leaf of the chain to an output slot"
+        slot = output_module.connect_output(output_name, self, 'table')
+        self._leaf_names.append(slot.input_name)
+        return slot
+
+    def _leaves(self):
+        return [self.get_input_slot(name).data() for name in self._leaf_names]
+
+    def _resolve(self):
+        "Build the nodes of all the modules of the chain"
+        leaves = self._leaves()
+        nodes = {}
+
+        def _source(source):
+            kind, ref = source
+            if kind == 'module':
+                return nodes[ref]
+            data = leaves[ref]
+            if isinstance(data, dict):
+                return OrderedDict((k, ('key', ref, k, None))
+                                   for k in data.keys())
+            return OrderedDict((c, ('col', ref, c, data[c].dtype))
+                               for c in data.columns)
+        for (module, sources) in self._chain:
+            inputs = {name: _source(src) for (name, src) in sources.items()}
+            nodes[module.name] = _module_nodes(module, inputs)
+        self._nodes = nodes
+        outputs = nodes[self._chain[-1][0].name]
+        names = {}
+        exprs = {c: _to_numexpr(node, names) for (c, node) in outputs.items()}
+        if None not in exprs.values():
+            self._numexpr = (exprs, names)
+        return outputs
+
+    def _create_table(self):
+        outputs = self._resolve()
+        dshape_ = "{%s}" % ", ".join("%s: %s" % (c, np.dtype(_dtype(node)))
+                                     for (c, node) in outputs.items())
+        return Table(self.generate_table_name('fused_ufunc'),
+                     dshape=dshape_, create=True)
+
+    def _environment(self, nodes, indices):
+        "Return the values of the leaves used by the nodes"
+        leaves = self._leaves()
+        env = {}
+        todo = list(nodes)
+        while todo:
+            node = todo.pop()
+            if node[0] == 'ufunc':
+                todo.extend(node[3])
+                continue
+            key = (node[1], node[2])
+            if key in env:
+                continue
+            data = leaves[node[1]]
+            if node[0] == 'key':
+                env[key] = data[node[2]]
+            else:
+                env[key] = data.to_array(locs=indices, columns=[node[2]])[:, 0]
+        return env
+
+    def _evaluate_nodes(self, nodes, indices):
+        env = self._environment(nodes.values(), indices)
+        cache = {}
+        return {c: _evaluate(node, env, cache) for (c, node) in nodes.items()}
+
+    def _compute(self, indices):
+        outputs = self._nodes[self._chain[-1][0].name]
+        if self._numexpr is None:
+            return self._evaluate_nodes(outputs, indices)
+        exprs, names = self._numexpr
+        env = self._environment(outputs.values(), indices)
+        local_dict = {names[key]: value for (key, value) in env.items()}
+        return {c: ne.evaluate(expr, local_dict=local_dict)
+                for (c, expr) in exprs.items()}
+
+    def intermediate(self, name, indices=None):
+        """
+        Compute the columns of the table of a fused module, for the
+        specified ids or all the ids of the output table.
+        """
+        if self._nodes is None:
+            raise ProgressiveError('Module %s has not run yet' % self.name)
+        if name not in self._nodes:
+            raise ProgressiveError('Module %s is not fused in %s' %
+                                   (name, self.name))
+        if indices is None:
+            indices = existing_ids(self._table)
+        return self._evaluate_nodes(self._nodes[name], indices)
+
+
+def fuse_elementwise(scheduler):
+    """
+    Replace the chains of elementwise modules of the dataflow of a scheduler
+    by FusedUfunc modules. A module is fused with the module consuming its
+    table when it is its only consumer. Only the modules not started yet
+    are fused, the consumers of a chain are connected to its FusedUfunc.
+    Return the list of FusedUfunc modules created.
+    """
+    dataflow = scheduler.dataflow
+    if dataflow is None:
+        return []
+    started = scheduler.modules()
+
+    def _fusable(module):
+        for cls, inputs in FUSABLE_INPUTS.items():
+            if isinstance(module, cls):
+                return (module.name not in started and
+                        set(dataflow.inputs[module.name].keys()) == inputs)
+        return False
+
+    def _consumers(module):
+        return [slot for slots in dataflow.outputs.get(module.name,
+                                                       {}).values()
+                for slot in slots]
+
+    def _inlined(module):
+        slots = _consumers(module)
+        return (_fusable(module) and len(slots) == 1 and
+                slots[0].output_name == 'table' and
+                _fusable(slots[0].input_module))
+
+    fused = []
+    for module in list(dataflow.modules()):
+        if not _fusable(module) or _inlined(module):
+            continue
+        consumers = _consumers(module)
+        if any(slot.output_name != 'table' for slot in consumers):
+            continue
+        chain = []
+        leaves = []
+
+        def _collect(mod):
+            sources = {}
+            for name, slot in dataflow.inputs[mod.name].items():
+                src = slot.output_module
+                if _inlined(src):
+                    _collect(src)
+                    sources[name] = ('module', src.name)
+                    continue
+                key = (src.name, slot.output_name)
+                if key not in leaves:
+                    leaves.append(key)
+                sources[name] = ('leaf', leaves.index(key))
+            chain.append((mod, sources))
+        _collect(module)
+        if len(chain) < 2:
+            continue
+        fused_module = FusedUfunc(chain, scheduler=scheduler)
+        for (name, output_name) in leaves:
+            fused_module.connect_leaf(dataflow[name], output_name)
+        for slot in consumers:
+            consumer = slot.input_module
+            del dataflow.inputs[consumer.name][slot.input_name]
+            fused_module.connect_output('table', consumer,
+                                        slot.original_name or slot.input_name)
+        for (mod, _) in reversed(chain):  # consumers first
+            dataflow.remove_module(mod)
+        logger.info('Fused modules %s into %s',
+                    fused_module.fused_modules, fused_module.name)
+        fused.append(fused_module)
+    return fused
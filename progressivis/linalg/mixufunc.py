@@ -1,15 +1,19 @@
 import numpy as np
-from ..core.utils import indices_len, fix_loc, filter_cols
+from ..core.utils import indices_len, filter_cols
 from ..table.module import TableModule
 from ..table.table import Table
+from ..table.slot_join import existing_ids
+from ..core.bitmap import bitmap
 #from .elementwise import unary_dict_all, binary_dict_all
 
-def make_local(df, px):
+def make_local(df, px, locs=None, columns=None):
     if isinstance(df, dict):
         return make_local_dict(df, px)
-    arr = df.to_array()
+    if columns is None:
+        columns = df.columns
+    arr = df.to_array(locs=locs, columns=columns)
     result = {}
-    for i, n in enumerate(df.columns):
+    for i, n in enumerate(columns):
         key = f'{px}.{n}'
         result[key] = arr[:, i]
     return result
@@ -32,72 +36,101 @@ def get_ufunc_args(col_expr, local_env):
     
     
 class MixUfuncABC(TableModule):
+    """
+    Evaluate column-wise ufunc expressions over the rows of several tables,
+    joined on their ids, and dictionaries of scalars.
+
+    Deleted and updated input rows are propagated to the same ids of the
+    output table; when a dictionary changes, all the rows are recomputed
+    progressively, as updates.
+    """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.ref_expr = self.expr        
+        self.ref_expr = self.expr
+        self._join = None
+        self._dict_updated = bitmap()
+
     def reset(self):
         if self._table is not None:
             self._table.resize(0)
+        self._dict_updated = bitmap()
 
-    def run_step(self, run_number, step_size, howlong):
-        """
-        """
-        reset_all = False
-        for slot in self._input_slots.values():
-            if slot is None:
-                continue
-            if slot.updated.any() or slot.deleted.any():
-                reset_all = True
-                break
-        if reset_all:
-            for slot in self._input_slots.values():
-                slot.reset()
-                slot.update(run_number)
-            self.reset()
-        for slot in self._input_slots.values():
-            if slot is None:
-                continue
-            if not slot.has_buffered() and not isinstance(slot.data(), dict):
-                return self._return_run_step(self.state_blocked, steps_run=0)
-        if self._table is None:
-            if self.has_output_datashape("table"):
-                dshape_ = self.get_output_datashape("table")
-            else:
-                dshape_ = self.get_datashape_from_expr()
-                self.ref_expr = {k.split(":")[0]:v for (k, v) in self.expr.items()}
-            self._table = Table(self.generate_table_name(f'mix_ufunc'),
-                                dshape=dshape_, create=True)
+    def _create_table(self):
+        if self.has_output_datashape("table"):
+            dshape_ = self.get_output_datashape("table")
+        else:
+            dshape_ = self.get_datashape_from_expr()
+            self.ref_expr = {k.split(":")[0]:v for (k, v) in self.expr.items()}
+        return Table(self.generate_table_name(f'mix_ufunc'),
+                     dshape=dshape_, create=True)
+
+    def _compute(self, indices):
         local_env = {}
-        vars_dict = {}
-        for n, sl in self._input_slots.items():
-            if n == '_params':
-                continue
-            data_ = sl.data()
-            if not isinstance(data_, dict):
-                step_size = min(step_size, sl.created.length())
-            if (step_size == 0 or data_ is None) and not isinstance(data_, dict):
-                return self._return_run_step(self.state_blocked, steps_run=0)
-        first_slot = None
         for n, sl in self._input_slots.items():
             if n == '_params':
                 continue
-            if first_slot is None:
-                first_slot = sl
-            indices = sl.created.next(step_size)
             data_ = sl.data()
-            is_dict = isinstance(data_, dict)
-            df = data_ if is_dict else self.filter_columns(data_, fix_loc(indices), n)
-            if is_dict:
-                sl.clear_buffers()
-            dict_ = make_local(df, n)
-            local_env.update(dict_)
+            local_env.update(make_local(data_, n, indices,
+                                        self.get_columns(data_, n)))
         result = {}
-        steps = None
         for c in self._table.columns:
             col_expr_ = self.ref_expr[c]
             ufunc, args = get_ufunc_args(col_expr_, local_env)
             result[c] = ufunc(*args)
-            if steps is None:
-                steps = len(result[c])
-        self._table.append(result)
+        return result
+
+    def run_step(self, run_number, step_size, howlong):
+        """
+        """
+        table_slots = []
+        dict_changed = False
+        for n, sl in self._input_slots.items():
+            if n == '_params' or sl is None:
+                continue
+            data_ = sl.data()
+            if data_ is None:
+                return self._return_run_step(self.state_blocked, steps_run=0)
+            if isinstance(data_, dict):
+                if sl.has_buffered():
+                    sl.clear_buffers()
+                    dict_changed = True
+            else:
+                table_slots.append(sl)
+        if not table_slots:
+            return self._return_run_step(self.state_blocked, steps_run=0)
+        first_slot = table_slots[0]
+        if self._table is None:
+            self._table = self._create_table()
+        elif dict_changed:
+            self._dict_updated = existing_ids(self._table)
+        if self._join is None:
+            self._join = self.make_slot_join(*table_slots)
+        steps = 0
+        steps_todo = step_size
+        with self._join as join:
+            if join.has_deleted():
+                indices = join.next_deleted(steps_todo)
+                if indices:
+                    del self._table.loc[indices]
+                    self._dict_updated -= indices
+                steps += len(indices)
+                steps_todo -= len(indices)
+            if steps_todo > 0 and join.has_updated():
+                indices = join.next_updated(steps_todo)
+                if indices:
+                    self._table.loc[indices, :] = self._compute(indices)
+                    self._dict_updated -= indices
+                steps += len(indices)
+                steps_todo -= len(indices)
+            if steps_todo > 0 and self._dict_updated:
+                indices = self._dict_updated.pop(steps_todo)
+                self._table.loc[indices, :] = self._compute(indices)
+                steps += len(indices)
+                steps_todo -= len(indices)
+            if steps_todo > 0 and join.has_created():
+                indices = join.next_created(steps_todo)
+                self._table.append(self._compute(indices), indices=indices)
+                steps += len(indices)
+        if self._dict_updated:
+            return self._return_run_step(self.state_ready, steps_run=steps)
         return self._return_run_step(self.next_state(first_slot), steps_run=steps)
@@ -1,84 +1,95 @@
 import numpy as np
-from ..core.utils import indices_len, fix_loc, filter_cols
+from ..core.utils import indices_len, filter_cols
 from ..table.module import TableModule
 from ..table.table import Table
 import numexpr as ne
 
-def make_local(df, px):
-    arr = df.to_array()
+def make_local(df, px, locs=None, columns=None):
+    if columns is None:
+        columns = df.columns
+    arr = df.to_array(locs=locs, columns=columns)
     result = {}
     class _Aux: pass
     aux = _Aux()
-    for i, n in enumerate(df.columns):
+    for i, n in enumerate(columns):
         key = f'_{px}__{i}'
         result[key] = arr[:, i]
         setattr(aux, n, key)
     return aux, result
 
 class NumExprABC(TableModule):
+    """
+    Evaluate numexpr expressions over the rows of several tables, joined
+    on their ids.
+
+    Deleted and updated input rows are propagated to the same ids of the
+    output table instead of recomputing everything.
+    """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.ref_expr = self.expr        
+        self.ref_expr = self.expr
+        self._join = None
+
     def reset(self):
         if self._table is not None:
             self._table.resize(0)
 
-    def run_step(self, run_number, step_size, howlong):
-        """
-        """
-        reset_all = False
-        for slot in self._input_slots.values():
-            if slot is None:
-                continue
-            if slot.updated.any() or slot.deleted.any():
-                reset_all = True
-                break
-        if reset_all:
-            for slot in self._input_slots.values():
-                slot.reset()
-                slot.update(run_number)
-            self.reset()
-        for slot in self._input_slots.values():
-            if slot is None:
-                continue
-            if not slot.has_buffered():
-                return self._return_run_step(self.state_blocked, steps_run=0)
-        if self._table is None:
-            if self.has_output_datashape("table"):
-                dshape_ = self.get_output_datashape("table")
-            else:
-                dshape_ = self.get_datashape_from_expr()
-                self.ref_expr = {k.split(":")[0]:v for (k, v) in self.expr.items()}
-            self._table = Table(self.generate_table_name(f'num_expr'),
-                                dshape=dshape_, create=True)
+    def _compute(self, indices):
         local_env = {}
         vars_dict = {}
         for n, sl in self._input_slots.items():
             if n == '_params':
                 continue
-            step_size = min(step_size, sl.created.length())
             data_ = sl.data()
-            if step_size == 0 or data_ is None:
-                return self._return_run_step(self.state_blocked, steps_run=0)
-        first_slot = None
-        for n, sl in self._input_slots.items():
-            if n == '_params':
-                continue
-            if first_slot is None:
-                first_slot = sl
-            indices = sl.created.next(step_size)
-            df = self.filter_columns(sl.data(), fix_loc(indices), n)
-            fobj, dict_ = make_local(df, n)
+            fobj, dict_ = make_local(data_, n, indices,
+                                     self.get_columns(data_, n))
             local_env.update(dict_)
             vars_dict[n] = fobj
         result = {}
-        steps = None
         for c in self._table.columns:
             col_expr_ = self.ref_expr[c]
-
             col_expr_ = col_expr_.format(**vars_dict)
             result[c] = ne.evaluate(col_expr_, local_dict=local_env)
-            if steps is None:
-                steps = len(result[c])
-        self._table.append(result)
+        return result
+
+    def run_step(self, run_number, step_size, howlong):
+        """
+        """
+        slots = []
+        for n, sl in self._input_slots.items():
+            if n == '_params' or sl is None:
+                continue
+            if sl.data() is None:
+                return self._return_run_step(self.state_blocked, steps_run=0)
+            slots.append(sl)
+        first_slot = slots[0]
+        if self._table is None:
+            if self.has_output_datashape("table"):
+                dshape_ = self.get_output_datashape("table")
+            else:
+                dshape_ = self.get_datashape_from_expr()
+                self.ref_expr = {k.split(":")[0]:v for (k, v) in self.expr.items()}
+            self._table = Table(self.generate_table_name(f'num_expr'),
+                                dshape=dshape_, create=True)
+        if self._join is None:
+            self._join = self.make_slot_join(*slots)
+        steps = 0
+        steps_todo = step_size
+        with self._join as join:
+            if join.has_deleted():
+                indices = join.next_deleted(steps_todo)
+                if indices:
+                    del self._table.loc[indices]
+                steps += len(indices)
+                steps_todo -= len(indices)
+            if steps_todo > 0 and join.has_updated():
+                indices = join.next_updated(steps_todo)
+                if indices:
+                    self._table.loc[indices, :] = self._compute(indices)
+                steps += len(indices)
+                steps_todo -= len(indices)
+            if steps_todo > 0 and join.has_created():
+                indices = join.next_created(steps_todo)
+                self._table.append(self._compute(indices), indices=indices)
+                steps += len(indices)
         return self._return_run_step(self.next_state(first_slot), steps_run=steps)
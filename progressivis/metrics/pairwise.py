@@ -1,106 +1,226 @@
 # -*- coding: utf-8 -*-
-""" Computes the distance matrix from each row of a data frame.
+""" Computes the distance matrix from each row of a table, or the k nearest
+neighbors of each row.
 """
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
 from progressivis.utils.errors import ProgressiveError
-from progressivis.core.utils import indices_len, fix_loc
+from progressivis.core.utils import indices_len
+from progressivis.core.decorators import process_slot, run_if_any
 from progressivis.table.module import TableModule, SlotDescriptor
 from progressivis.table.table import Table
+from progressivis.table.buffered_matrix import TiledMatrix
+from progressivis.storage.mmap import MMapGroup
 
 
 import numpy as np
-import pandas as pd
 from sklearn.metrics.pairwise import _VALID_METRICS, pairwise_distances
 
 import logging
 logger = logging.getLogger(__name__)
 
 
+def merge_neighbors(dist, ids, new_dist, new_ids, k):
+    """
+    Merge the k nearest neighbors of rows, `dist` and `ids`, with the
+    distances `new_dist` to the rows `new_ids`. Return the k nearest
+    distances and ids sorted by distance, and the mask of the rows whose
+    neighbors changed. Missing neighbors have an infinite distance and -1 id.
+    """
+    cand_dist = np.hstack([dist, new_dist])
+    cand_ids = np.hstack([ids, np.broadcast_to(new_ids, new_dist.shape)])
+    if cand_dist.shape[1] > k:
+        part = np.argpartition(cand_dist, k-1, axis=1)[:, :k]
+        cand_dist = np.take_along_axis(cand_dist, part, axis=1)
+        cand_ids = np.take_along_axis(cand_ids, part, axis=1)
+    order = np.argsort(cand_dist, axis=1, kind='stable')
+    cand_dist = np.take_along_axis(cand_dist, order, axis=1)
+    cand_ids = np.take_along_axis(cand_ids, order, axis=1)
+    cand_ids[np.isinf(cand_dist)] = -1
+    changed = (cand_ids != ids).any(axis=1)
+    return cand_dist, cand_ids, changed
+
+
 class PairwiseDistances(TableModule):
-    inputs = [SlotDescriptor('table', type=Table)]
+    """
+    Compute the distances between the rows of a table.
 
-    def __init__(self, metric='euclidean', columns=None, n_jobs=1, **kwds):
-        super(PairwiseDistances, self).__init__(dataframe_slot='distance',
-                                                **kwds)
-        self.default_step_size = kwds.get('step_Size', 100)  # initial guess
-        self.columns = columns
-        self._metric = metric
-        self._n_jobs = n_jobs
-        self._last_index = None
+    By default, the whole distance matrix is kept in a TiledMatrix returned
+    by `dist()`; with `mmap=True` its tiles are memory-mapped files. With
+    `k`, only the k nearest neighbors of each row are kept, in the output
+    table with the columns `neighbors` (ids) and `distances`, so the memory
+    is O(n*k) instead of O(n^2). The distances between the new rows and
+    the previous rows are computed by blocks of `tile_size` rows, in
+    parallel with `n_jobs` threads. Updates and deletions restart the
+    computation.
+    """
+    inputs = [SlotDescriptor('table', type=Table, required=True)]
+
+    def __init__(self, metric='euclidean', columns=None, n_jobs=1, k=None,
+                 tile_size=1024, mmap=False, **kwds):
+        super(PairwiseDistances, self).__init__(columns=columns, **kwds)
+        self.default_step_size = 100  # initial guess
         if metric not in _VALID_METRICS and \
            not callable(metric) and \
            metric != "precomputed":
             raise ProgressiveError('Unknown distance %s', metric)
-        self._table = Table(self.generate_table_name('distance'),
-                            dshape="{distance: var * real}",
-                            scheduler=self.scheduler(),
-                            storagegroup=self.storagegroup)
+        self._metric = metric
+        if n_jobs < 0:  # same convention as joblib
+            n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+        self._n_jobs = n_jobs
+        self._executor = None
+        self._k = k
+        self._tile_size = tile_size
+        self._ids = np.zeros(0, dtype=np.int64)  # rows in the order computed
+        self._dist = None
+        self._group = None
+        self._tmpdir = None
+        if k is None:
+            if mmap:
+                self._tmpdir = tempfile.mkdtemp(prefix='progressivis_')
+                self._group = MMapGroup(os.path.join(self._tmpdir,
+                                                     self.name))
+            self._dist = TiledMatrix(tile_size, self._group)
+        else:
+            self._knn_dist = np.zeros((0, k))
+            self._knn_ids = np.zeros((0, k), dtype=np.int64)
+            self._table = Table(self.generate_table_name('knn'),
+                                dshape="{neighbors: %d * int64, "
+                                "distances: %d * float64}" % (k, k),
+                                create=True)
 
-    def is_ready(self):
-        if self.get_input_slot('table').created.any():
-            return True
-        return super(PairwiseDistances, self).is_ready()
+    def reset(self):
+        self._ids = np.zeros(0, dtype=np.int64)
+        if self._dist is not None:
+            self._dist.reset()
+        else:
+            self._knn_dist = np.zeros((0, self._k))
+            self._knn_ids = np.zeros((0, self._k), dtype=np.int64)
+            self._table.resize(0)
+
+    def ending(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._group is not None:
+            self._group.delete()
+            self._group = None
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+        super(PairwiseDistances, self).ending()
 
     def dist(self):
-        return self._table
+        "Return the distance matrix, ordered as `ids()`"
+        return self._dist
+
+    def ids(self):
+        "Return the ids of the rows of the distance matrix"
+        return self._ids
 
     def get_data(self, name):
         if name == 'dist':
             return self.dist()
         return super(PairwiseDistances, self).get_data(name)
 
+    def _blocks(self, df, columns, new_rows):
+        """
+        Iterate over (start, distances) for the blocks of previous rows
+        starting at `start`, computed in parallel when n_jobs > 1.
+        """
+        def _compute(start):
+            rows = df.to_array(locs=self._ids[start:start+self._tile_size],
+                               columns=columns)
+            return pairwise_distances(rows, new_rows, metric=self._metric)
+        starts = range(0, len(self._ids), self._tile_size)
+        if self._n_jobs <= 1 or len(starts) <= 1:
+            for start in starts:
+                yield start, _compute(start)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._n_jobs)
+        window = 2 * self._n_jobs  # bounds the blocks kept in memory
+        for i in range(0, len(starts), window):
+            batch = starts[i:i+window]
+            yield from zip(batch, self._executor.map(_compute, batch))
+
+    def _add_distances(self, df, columns, new_ids, new_rows):
+        n0 = len(self._ids)
+        m = len(new_ids)
+        self._dist.resize(n0 + m)
+        for start, block in self._blocks(df, columns, new_rows):
+            self._dist.set_block(start, n0, block)
+            self._dist.set_block(n0, start, block.T)
+        self._dist.set_block(n0, n0, pairwise_distances(new_rows,
+                                                        metric=self._metric))
+
+    def _add_neighbors(self, df, columns, new_ids, new_rows):
+        k = self._k
+        m = len(new_ids)
+        dist = np.full((m, k), np.inf)
+        ids = np.full((m, k), -1, dtype=np.int64)
+        inner = pairwise_distances(new_rows, metric=self._metric)
+        np.fill_diagonal(inner, np.inf)
+        dist, ids, _ = merge_neighbors(dist, ids, inner, new_ids, k)
+        changed = np.zeros(len(self._ids), dtype=bool)
+        for start, block in self._blocks(df, columns, new_rows):
+            end = start + block.shape[0]
+            (self._knn_dist[start:end], self._knn_ids[start:end],
+             changed[start:end]) = merge_neighbors(self._knn_dist[start:end],
+                                                   self._knn_ids[start:end],
+                                                   block, new_ids, k)
+            dist, ids, _ = merge_neighbors(dist, ids, block.T,
+                                           self._ids[start:end], k)
+        changed = np.flatnonzero(changed)
+        if len(changed):
+            self._table.loc[self._ids[changed], 'neighbors'] = \
+                self._knn_ids[changed]
+            self._table.loc[self._ids[changed], 'distances'] = \
+                self._knn_dist[changed]
+        self._table.append({'neighbors': ids, 'distances': dist},
+                           indices=new_ids)
+        n0 = len(self._ids)
+        self._grow_neighbors(n0 + m)
+        self._knn_dist[n0:n0+m] = dist
+        self._knn_ids[n0:n0+m] = ids
+
+    def _grow_neighbors(self, size):
+        """
+        Grow the neighbor arrays to hold at least `size` rows, doubling
+        their capacity so appending the rows costs amortized constant time.
+        Only the first `len(self._ids)` rows are meaningful.
+        """
+        capacity = len(self._knn_dist)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        dist = np.full((capacity, self._k), np.inf)
+        ids = np.full((capacity, self._k), -1, dtype=np.int64)
+        dist[:len(self._knn_dist)] = self._knn_dist
+        ids[:len(self._knn_ids)] = self._knn_ids
+        self._knn_dist, self._knn_ids = dist, ids
+
+    @process_slot("table", reset_cb="reset")
+    @run_if_any
     def run_step(self, run_number, step_size, howlong):
-        dfslot = self.get_input_slot('table')
-        df = dfslot.data()
-        # dfslot.update(run_number)
-        if dfslot.updated.any() or dfslot.deleted.any():
-            dfslot.reset()
-            logger.info('Reseting history because of changes in the input')
-            dfslot.update(run_number)
-            # TODO: be smarter with changed values
-
-        m = step_size
-        indices = dfslot.created.next(m)
-        m = indices_len(indices)
-
-        i = None
-        j = None
-        Si = self._table['document']
-
-        arrayslot = self.get_input_slot('array')
-        if arrayslot is not None and arrayslot.data() is not None:
-            array = arrayslot.data()
-            logger.debug('Using array instead of DataFrame columns')
-            if Si is not None:
-                i = array[self._last_index]
-            j = array[indices]
-        if j is None:
-            if self.columns is None:
-                self.columns = df.columns.delete(np.where(df.columns==UPDATE_COLUMN))
-            elif not isinstance(self.columns, pd.Index):
-                self.columns = pd.Index(self.columns)
-            rows = df[self.columns]
-            if Si is not None:
-                i = rows.loc[self._last_index]
-                assert len(i)==len(self._last_index)
-            j = rows.loc[fix_loc(indices)]
-            assert len(j)==indices_len(indices)
-
-        Sj = pairwise_distances(j, metric=self._metric, n_jobs=self._n_jobs)
-        if Si is None:
-            mat = self._buf.resize(Sj.shape[0])
-            mat[:,:] = Sj
-            self._last_index = dfslot.last_index[indices]
-        else:
-            Sij = pairwise_distances(i,j, metric=self._metric, n_jobs=self._n_jobs)
-            n0 = i.shape[0]
-            n1 = n0+j.shape[0]
-            mat = self._buf.resize(n1)
-            mat[0:n0,n0:n1] = Sij
-            mat[n0:n1,0:n0] = Sij.T
-            mat[n0:n1,n0:n1] = Sj
-            self._last_index = self._last_index.append(df.index[indices])
-            #truth = pairwise_distances(array[0:n1], metric=self._metric)
-            #import pdb
-            #pdb.set_trace()
-            #assert np.allclose(mat,truth)
-        return self._return_run_step(self.next_state(dfslot), steps_run=m)
+        with self.context as ctx:
+            dfslot = ctx.table
+            df = dfslot.data()
+            indices = dfslot.created.next(step_size)
+            m = indices_len(indices)
+            if isinstance(indices, slice):
+                new_ids = np.arange(indices.start, indices.stop,
+                                    dtype=np.int64)
+            else:
+                new_ids = np.array(indices, dtype=np.int64)
+            columns = self.get_columns(df)
+            new_rows = df.to_array(locs=new_ids, columns=columns)
+            if self._k is None:
+                self._add_distances(df, columns, new_ids, new_rows)
+            else:
+                self._add_neighbors(df, columns, new_ids, new_rows)
+            self._ids = np.concatenate([self._ids, new_ids])
+            return self._return_run_step(self.next_state(dfslot), steps_run=m)
@@ -15,6 +15,15 @@ to be sent by the server. This mechansim is meant to get a responsive browser wi
 updates.  Between the time the "tick" is received by the browser and the value is sent back by
 the server, many iterations may have been run.  The browser receives data as fast as it can, and
 the server sends a simple notification and serves the data as fast as it can.
+
+The ticks are coalesced per browser (see ticks.py): a browser receives the
+ticks of the modules updated since its last batch of ticks, once it has
+acknowledged that batch, at a rate adapted to its round trip and render time.
+
+For the modules on the "hotline", the tick carries the module json as payload,
+computed once for all the browsers.
+Its NumPy arrays are sent as binary attachments, only as the changes since the
+payload last acknowledged by the browser (see transport.py).
 """
 import time
 import logging
@@ -41,6 +50,8 @@ import aiohttp_jinja2
 import progressivis.core.aio as aio
 from progressivis import Scheduler, Module
 from ..core import JSONEncoderNp
+from .transport import PayloadEncoder
+from .ticks import TickCoalescer
 
 logger = logging.getLogger(__name__)
 
@@ -53,9 +64,12 @@ class ProgressivisBlueprint(web.Application):
     def __init__(self, *args, **kwargs):
         super(ProgressivisBlueprint, self).__init__(*args, **kwargs)
         self._sids_for_path = {}
-        self._run_number_for_sid = {}
+        self._path_for_sid = {}
         self.scheduler = None
         self.hotline_set = set()
+        self.compress = False  # compress the binary payloads with zlib
+        self._encoders = {}  # sid -> PayloadEncoder
+        self.ticks = TickCoalescer(self.sids_for_path, self._emit_ticks)
         self.start_logging()
 
     def start_logging(self):
@@ -80,11 +94,10 @@ class ProgressivisBlueprint(web.Application):
 
     def register_module(self, path, sid):
         "Register a module with a specified path"
-        if sid in self._run_number_for_sid:
-            self._run_number_for_sid[sid] = 0
+        if sid in self._path_for_sid:
             return
         print('Register module:', path, 'sid:', sid)
-        self._run_number_for_sid[sid] = 0
+        self._path_for_sid[sid] = path
         if path in self._sids_for_path:
             sids = self._sids_for_path[path]
             sids.add(sid)
@@ -93,46 +106,53 @@ class ProgressivisBlueprint(web.Application):
 
     def unregister_module(self, sid):
         "Unregister a specified path"
-        if sid in self._run_number_for_sid:
-            del self._run_number_for_sid[sid]
-        for sids in self._sids_for_path.values():
-            if sid in sids:
-                sids.remove(sid)
-                return
+        self._encoders.pop(sid, None)
+        self.ticks.remove(sid)
+        path = self._path_for_sid.pop(sid, None)
+        if path is not None:
+            self._sids_for_path[path].discard(sid)
 
     def sids_for_path(self, path):
         "Get the sid list from a path"
         return self._sids_for_path.get(path, set())
 
-    def sid_run_number(self, sid):
-        "Return the last run_number sent for the specified sid"
-        return self._run_number_for_sid.get(sid, 0)
-
-    def _prevent_tick(self, sid, run_number, ack):
-        if ack:
-            self._run_number_for_sid[sid] = run_number
-        else:
-            logging.debug('Ack not well received')
-            print('Preventing ticks for', sid)
-
-    def reset_sid(self, sid):
-        "Resets the sid to 0 to stop sending ticks for that sid"
-        #print('Reseting sid', sid)
-        self._run_number_for_sid[sid] = 0
+    def payload_encoder(self, sid):
+        "Return the encoder of the payloads sent to sid"
+        encoder = self._encoders.get(sid)
+        if encoder is None:
+            encoder = self._encoders[sid] = PayloadEncoder(self.compress)
+        return encoder
+
+    def _ack_tick(self, sid, batch, path, run_number, payload, ack=None):
+        # pylint: disable=too-many-arguments
+        encoder = self._encoders.get(sid)
+        if payload and encoder is not None:
+            if ack:
+                encoder.ack(path, run_number)
+            else:
+                logging.debug('Payload not decoded')
+                encoder.reset(path)
+        self.ticks.acked(sid, batch)
+
+    async def _emit_ticks(self, sid, batch, ticks):
+        for (path, run_number, payload) in ticks:
+            #print('Emiting tick for', sid, 'in path', path)
+            json_ = {'run_number': run_number}
+            if payload is not None:
+                json_['path'] = path  # the client keeps the arrays by path
+                encoder = self.payload_encoder(sid)
+                if encoder.is_pending(path):  # lost, send it all
+                    encoder.reset(path)
+                json_['payload'] = encoder.encode(path, payload, run_number)
+            await socketio.emit('tick', json_, room=sid,
+                                callback=partial(self._ack_tick, sid, batch,
+                                                 path, run_number,
+                                                 payload is not None))
 
     async def emit_tick(self, path, run_number, payload=None):
-        "Emit a tick unless it has not been acknowledged"
-        sids = self.sids_for_path(path)
-        for sid in set(sids): # size could change
-            if self._run_number_for_sid[sid] == 0:
-                #print('Emiting tick for', sid, 'in path', path)
-                json_ = {'run_number': run_number}
-                if payload is not None: json_['payload'] = payload
-                await socketio.emit('tick', json_, room=sid,
-                              callback=partial(self._prevent_tick, sid, run_number))
-            #else:
-            #    #print('No tick for', sid, 'in path', path)
-        #await aio.sleep(0) # yield ...
+        "Emit a tick, coalesced with the other ticks of the browsers"
+        self.ticks.update(path, run_number,
+                          None if payload is None else lambda: payload)
 
     async def tick_scheduler(self, scheduler, run_number):
         "Run at each tick"
@@ -155,11 +175,10 @@ class ProgressivisBlueprint(web.Application):
         
     def tick_module(self, module, run_number):
         "Run when a module has run"
-        # pylint: disable=no-self-use
-        payload = None
+        make_payload = None
         if module.name in self.hotline_set:
-            payload = module.to_json()
-        aio.create_task(self.emit_tick(module.name, run_number, payload=payload))
+            make_payload = module.to_json
+        self.ticks.update(module.name, run_number, make_payload)
 
     def get_log(self):
         "Return the log"
@@ -257,6 +276,36 @@ def _on_scheduler(sid, short=False):
     assert sid in progressivis_bp.sids_for_path('scheduler')
     return scheduler.to_json(short)
 
+#@on.socketio('/progressivis/scheduler/profile')
+def _on_scheduler_profile(sid, command=None):
+    profiler = progressivis_bp.scheduler.profiler
+    if command == 'enable':
+        profiler.enable()
+    elif command == 'disable':
+        profiler.enable(False)
+    elif command == 'record':
+        profiler.start_recording()
+    elif command == 'stop':
+        profiler.stop_recording()
+    elif command == 'clear':
+        profiler.clear()
+    elif command is not None:
+        return {'status': 'failed',
+                'reason': 'unknown profile command %s' % command}
+    ret = profiler.to_json()
+    ret['status'] = 'success'
+    return ret
+
+#@on.socketio('/progressivis/scheduler/profile/trace')
+def _on_scheduler_profile_trace(sid, fmt='chrome'):
+    profiler = progressivis_bp.scheduler.profiler
+    if fmt == 'chrome':
+        return profiler.to_chrome_trace()
+    if fmt == 'speedscope':
+        return profiler.to_speedscope()
+    return {'status': 'failed',
+            'reason': 'unknown trace format %s' % fmt}
+
 #@on.socketio('/progressivis/module/get')
 def _on_module_get(sid, path, *unused_all, **kwargs ):
     module = path_to_module(path)
@@ -276,6 +325,7 @@ def _on_module_hotline_on(sid, path):
         return {'status': 'failed',
                 'reason': 'unknown module %s'%path}
     progressivis_bp.hotline_set.add(module.name)
+    progressivis_bp.payload_encoder(sid).reset(module.name)
 
 #@on.socketio('/progressivis/module/hotline_off')
 def _on_module_hotline_off(sid, path):
@@ -468,6 +518,10 @@ async def start_server(scheduler=None, debug=False):
     socketio.on_event('/progressivis/scheduler/step', _on_step)
     socketio.on_event('/progressivis/scheduler/stop', _on_stop)
     socketio.on_event('/progressivis/scheduler', _on_scheduler)
+    socketio.on_event('/progressivis/scheduler/profile',
+                      _on_scheduler_profile)
+    socketio.on_event('/progressivis/scheduler/profile/trace',
+                      _on_scheduler_profile_trace)
     socketio.on_event('/progressivis/module/get', _on_module_get)
     socketio.on_event('/progressivis/module/hotline_on', _on_module_hotline_on)
     socketio.on_event('/progressivis/module/hotline_off', _on_module_hotline_off)
@@ -21,13 +21,114 @@ function progressivis_websocket_open(msg, handler, refresh) {
         socket.emit('join', {"type": "ping", "path": msg}, function(x){ack(x);refresh();});
     });
     socket.on('disconnect', function() { handshake = false; });
-    socket.on('tick', function(msg) {
+    socket.on('tick', function(msg, ack) {
         console.log('socketio tick');
-        if (handler) handler(msg);
+        var decoded = Promise.resolve(msg);
+        if (msg.payload !== undefined) {
+            decoded = progressivis_decode(msg.payload, msg.path).then(function(payload) {
+                msg.payload = payload;
+                return msg;
+            });
+        }
+        decoded.then(function(msg) {
+            Promise.resolve(handler ? handler(msg) : null)
+                .catch(function(err) { console.log(err); })
+                .then(function() { progressivis_ack_rendered(ack); });
+        }, function(err) {
+            console.log(err);
+            if (ack) ack(false); // the next payload will be sent in full
+        });
         return 1;
     });
 }
 
+// The server sends the next ticks once this one is acknowledged, at a rate
+// adapted to the delay until the acknowledgment, see server/ticks.py
+function progressivis_ack_rendered(ack) {
+    if (!ack) return;
+    if (window.requestAnimationFrame)
+        window.requestAnimationFrame(function() { ack(true); });
+    else
+        ack(true);
+}
+
+// Arrays received as binary attachments, by module path and key,
+// see server/transport.py
+var progressivis_arrays = {};
+
+var progressivis_dtypes = {
+    'f8': Float64Array, 'f4': Float32Array,
+    'i4': Int32Array, 'i2': Int16Array, 'i1': Int8Array,
+    'u4': Uint32Array, 'u2': Uint16Array, 'u1': Uint8Array,
+    'b1': Uint8Array
+};
+
+function progressivis_typed(msg) {
+    var buffer = Promise.resolve(msg.data);
+    if (msg.compression == 'zlib') {
+        buffer = new Response(new Blob([msg.data]).stream()
+                              .pipeThrough(new DecompressionStream('deflate')))
+            .arrayBuffer();
+    }
+    return buffer.then(function(data) {
+        return new progressivis_dtypes[msg.dtype](data);
+    });
+}
+
+function progressivis_nested(flat, shape) {
+    if (shape.length <= 1)
+        return Array.from(flat);
+    var rows = [], size = flat.length / shape[0], i;
+    for (i = 0; i < shape[0]; i++)
+        rows.push(progressivis_nested(flat.subarray(i*size, (i+1)*size),
+                                      shape.slice(1)));
+    return rows;
+}
+
+function progressivis_decode_array(msg, key) {
+    var base = progressivis_arrays[key];
+    return progressivis_typed(msg).then(function(values) {
+        var flat = values, shape = msg.shape, i;
+        if (msg.__ndarray__ == 'delta') {
+            return progressivis_typed(msg.indices).then(function(indices) {
+                flat = base.flat.slice();
+                for (i = 0; i < indices.length; i++)
+                    flat[indices[i]] = values[i];
+                return {flat: flat, shape: shape};
+            });
+        }
+        if (msg.__ndarray__ == 'append') {
+            flat = new base.flat.constructor(base.flat.length + values.length);
+            flat.set(base.flat);
+            flat.set(values, base.flat.length);
+            shape = [base.shape[0] + shape[0]].concat(shape.slice(1));
+        }
+        return {flat: flat, shape: shape};
+    }).then(function(array) {
+        progressivis_arrays[key] = array;
+        return progressivis_nested(array.flat, array.shape);
+    });
+}
+
+function progressivis_decode(value, key) {
+    if (value === null || typeof(value) !== "object")
+        return Promise.resolve(value);
+    if (value.__ndarray__)
+        return progressivis_decode_array(value, key);
+    if (Array.isArray(value))
+        return Promise.all(value.map(function(v, i) {
+            return progressivis_decode(v, key+'/'+i);
+        }));
+    var keys = Object.keys(value);
+    return Promise.all(keys.map(function(k) {
+        return progressivis_decode(value[k], key+'/'+k);
+    })).then(function(values) {
+        var ret = {};
+        keys.forEach(function(k, i) { ret[k] = values[i]; });
+        return ret;
+    });
+}
+
 function progressivis_update(data) {
     progressivis_data = data;
     progressivis_run_number = data['run_number'];
@@ -165,7 +266,7 @@ function progressivis_socketmsg(json) {
 
     if (run_number > progressivis_run_number) {
         progressivis_run_number = run_number;
-        refresh(json);
+        return refresh(json);
     }
 }
 
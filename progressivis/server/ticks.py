@@ -0,0 +1,185 @@
+"""
+Coalescing of the ticks sent to the browsers.
+
+A module run only records the last run number of the module for the
+clients subscribed to it. A single task sends the updates pending for
+each client in one batch, once the client has acknowledged its previous
+batch and its emission interval has elapsed. The interval follows the
+delay measured between the emission of a batch and its acknowledgment,
+i.e. the round trip and the render time of the client. The payload of a
+module is computed at most once per batch for all its subscribers.
+"""
+import time
+
+import progressivis.core.aio as aio
+
+__all__ = ['ClientRate', 'TickCoalescer']
+
+
+class ClientRate(object):
+    """
+    Emission rate of the ticks sent to one client. The interval between
+    two batches is the smoothed acknowledgment delay of the batches,
+    bounded by `min_interval` and `max_interval`. A batch not fully
+    acknowledged after `max_interval` is considered lost.
+    """
+    def __init__(self, min_interval=0.02, max_interval=1.0, alpha=0.25):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.alpha = alpha
+        self.delay = min_interval
+        self.batch = 0
+        self.unacked = 0
+        self.sent_at = None
+
+    @property
+    def interval(self):
+        "Minimal time between two batches"
+        return min(max(self.delay, self.min_interval), self.max_interval)
+
+    def due(self):
+        "Return the time when the next batch can be sent"
+        if self.sent_at is None:
+            return 0
+        if self.unacked:
+            return self.sent_at + self.max_interval
+        return self.sent_at + self.interval
+
+    def ready(self, now):
+        "Return True if a batch can be sent at time now"
+        return now >= self.due()
+
+    def sent(self, count, now):
+        "Record a batch of count ticks sent at time now, return its number"
+        if self.unacked:  # lost, slow down
+            self.delay = self.max_interval
+        self.batch += 1
+        self.unacked = count
+        self.sent_at = now
+        return self.batch
+
+    def acked(self, batch, now):
+        """
+        Record the acknowledgment of a tick of the batch at time now,
+        return True when the whole batch is acknowledged
+        """
+        if batch != self.batch or self.unacked == 0:
+            return False  # late acknowledgment of a lost batch
+        self.unacked -= 1
+        if self.unacked:
+            return False
+        self.delay += self.alpha * (now - self.sent_at - self.delay)
+        return True
+
+
+class TickCoalescer(object):
+    """
+    Coalesce the updates of the paths and send them by batches to the
+    clients. `subscribers(path)` returns the clients of a path and the
+    coroutine `emit(sid, batch, ticks)` sends to the client sid a list of
+    ticks (path, run_number, payload), each tick being acknowledged with
+    `acked(sid, batch)`.
+    """
+    def __init__(self, subscribers, emit, min_interval=0.02,
+                 max_interval=1.0):
+        self._subscribers = subscribers
+        self._emit = emit
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._updates = {}  # path -> (run_number, make_payload)
+        self._pending = {}  # sid -> set of paths
+        self._rates = {}  # sid -> ClientRate
+        self._task = None
+        self._wakeup = None
+
+    def rate(self, sid):
+        "Return the emission rate of the client sid"
+        rate = self._rates.get(sid)
+        if rate is None:
+            rate = self._rates[sid] = ClientRate(self.min_interval,
+                                                 self.max_interval)
+        return rate
+
+    def remove(self, sid):
+        "Forget the client sid"
+        self._pending.pop(sid, None)
+        self._rates.pop(sid, None)
+
+    def pending(self, sid):
+        "Return the paths with updates not sent yet to the client sid"
+        return self._pending.get(sid, set())
+
+    def update(self, path, run_number, make_payload=None):
+        """
+        Record the update of path at run_number. The optional function
+        `make_payload` is called when the tick is sent, once for all the
+        clients, to compute the payload of the tick.
+        """
+        sids = self._subscribers(path)
+        if not sids:
+            return
+        self._updates[path] = (run_number, make_payload)
+        now = time.monotonic()
+        wakeup = False
+        for sid in sids:
+            if sid not in self._pending:
+                self._pending[sid] = set()
+                wakeup = wakeup or self.rate(sid).ready(now)
+            self._pending[sid].add(path)
+        if self._task is None:
+            self._task = aio.create_task(self._run())
+        elif wakeup and self._wakeup is not None:
+            self._wakeup.set()
+
+    def acked(self, sid, batch):
+        "Record the acknowledgment of a tick of the batch sent to sid"
+        rate = self._rates.get(sid)
+        if rate is None or not rate.acked(batch, time.monotonic()):
+            return
+        if sid in self._pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self):
+        "Send their pending updates to the clients ready to receive them"
+        now = time.monotonic()
+        payloads = {}
+        for sid in list(self._pending):
+            rate = self.rate(sid)
+            if not rate.ready(now):
+                continue
+            paths = self._pending.pop(sid, None)
+            if paths is None:  # removed while emitting
+                continue
+            ticks = []
+            for path in sorted(paths):
+                run_number, make_payload = self._updates[path]
+                payload = None
+                if make_payload is not None:
+                    if path not in payloads:
+                        payloads[path] = make_payload()
+                    payload = payloads[path]
+                ticks.append((path, run_number, payload))
+            batch = rate.sent(len(ticks), now)
+            await self._emit(sid, batch, ticks)
+        waiting = set().union(*self._pending.values())
+        for path in list(self._updates):
+            if path not in waiting:
+                del self._updates[path]
+
+    async def _run(self):
+        if self._wakeup is None:
+            self._wakeup = aio.Event()
+        try:
+            while self._pending:
+                self._wakeup.clear()
+                await self.flush()
+                if not self._pending:
+                    break
+                due = min(self.rate(sid).due() for sid in self._pending)
+                delay = due - time.monotonic()
+                if delay > 0:
+                    wakeup = aio.create_task(self._wakeup.wait())
+                    await aio.wait([wakeup], timeout=delay)
+                    wakeup.cancel()
+        finally:
+            self._task = None
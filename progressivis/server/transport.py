@@ -0,0 +1,140 @@
+"""
+Binary and delta encoding of the payloads sent to the browsers.
+
+The NumPy arrays of a payload are sent as binary socket.io attachments
+instead of JSON lists, optionally compressed with zlib. For each client,
+the arrays acknowledged by the client are kept, so an array is sent as
+the changed elements, or as the rows appended, when this is smaller than
+the whole array. The decoding is done by `progressivis_decode` in
+static/js/progressivis.js, which keeps the arrays by module path and key.
+"""
+import time
+import zlib
+
+import numpy as np
+
+__all__ = ['encode_array', 'PayloadEncoder']
+
+MIN_SIZE = 64  # smaller arrays are left to the JSON encoder
+PENDING_TIMEOUT = 5.0  # seconds to wait for the acknowledgment of a payload
+
+
+def _array_message(array, compress):
+    array = np.ascontiguousarray(array)
+    if array.dtype == np.float16 or array.dtype.kind not in 'biuf':
+        array = array.astype(np.float64)
+    if array.dtype.kind == 'b':
+        array = array.astype(np.uint8)
+    if array.dtype.itemsize == 8 and array.dtype.kind in 'iu':
+        array = array.astype(np.float64)  # no 64 bits integers in JS
+    data = array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes()
+    ret = {'dtype': array.dtype.kind + str(array.dtype.itemsize),
+           'shape': list(array.shape)}
+    if compress:
+        data = zlib.compress(data, 1)
+        ret['compression'] = 'zlib'
+    ret['data'] = data
+    return ret
+
+
+def encode_array(array, compress=False):
+    "Return the binary message of an array"
+    ret = _array_message(array, compress)
+    ret['__ndarray__'] = 'full'
+    return ret
+
+
+def _is_encodable(value):
+    return (isinstance(value, np.ndarray) and value.size >= MIN_SIZE and
+            value.dtype.kind in 'biuf')
+
+
+class PayloadEncoder(object):
+    """
+    Encode the payloads sent to one client, keeping the arrays of the last
+    payload acknowledged by the client for each path to send the deltas.
+    A single payload is pending per path: until it is acknowledged with
+    `ack`, `is_pending` is True. A payload not acknowledged after `timeout`
+    seconds, because the client failed to decode it or never acknowledges,
+    is dropped with its arrays, and the next payload is sent in full.
+    """
+    def __init__(self, compress=False, timeout=PENDING_TIMEOUT):
+        self.compress = compress
+        self.timeout = timeout
+        self._acked = {}  # path -> {key: array}
+        self._pending = {}  # path -> (run_number, {key: array}, time sent)
+
+    def _expire(self, now):
+        expired = [path for (path, pending) in self._pending.items()
+                   if now - pending[2] > self.timeout]
+        for path in expired:
+            # the client may hold the expired payload or not: send in full
+            del self._pending[path]
+            self._acked.pop(path, None)
+
+    def is_pending(self, path):
+        "Return True if a payload sent on path is not acknowledged"
+        self._expire(time.monotonic())
+        return path in self._pending
+
+    def ack(self, path, run_number):
+        "Acknowledge the payload sent on path at run_number"
+        pending = self._pending.get(path)
+        if pending is None or pending[0] != run_number:
+            return
+        del self._pending[path]
+        self._acked[path] = pending[1]
+
+    def reset(self, path=None):
+        "Forget the arrays of the client, e.g. when it reloads its page"
+        if path is None:
+            self._acked.clear()
+            self._pending.clear()
+        else:
+            self._acked.pop(path, None)
+            self._pending.pop(path, None)
+
+    def _encode_array(self, key, array, base, sent):
+        sent[key] = array.copy()
+        if base is not None and base.dtype == array.dtype:
+            if base.shape == array.shape:
+                changed = np.flatnonzero(base.ravel() != array.ravel())
+                if len(changed) * (4 + array.itemsize) < array.nbytes // 2:
+                    ret = _array_message(array.ravel()[changed],
+                                         self.compress)
+                    ret['__ndarray__'] = 'delta'
+                    ret['shape'] = list(array.shape)
+                    ret['indices'] = _array_message(
+                        changed.astype(np.uint32), self.compress)
+                    return ret
+            elif (array.ndim and base.ndim == array.ndim and
+                  base.shape[1:] == array.shape[1:] and
+                  len(base) < len(array) and
+                  np.array_equal(base, array[:len(base)])):
+                ret = _array_message(array[len(base):], self.compress)
+                ret['__ndarray__'] = 'append'
+                return ret
+        return encode_array(array, self.compress)
+
+    def _encode(self, value, key, base, sent):
+        if _is_encodable(value):
+            return self._encode_array(key, value, base.get(key), sent)
+        if isinstance(value, dict):
+            return {k: self._encode(v, key + '/' + str(k), base, sent)
+                    for (k, v) in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._encode(v, key + '/' + str(i), base, sent)
+                    for (i, v) in enumerate(value)]
+        return value
+
+    def encode(self, path, payload, run_number):
+        """
+        Return the payload for path with its arrays encoded, relative to
+        the arrays acknowledged by the client, and mark it pending
+        """
+        now = time.monotonic()
+        self._expire(now)
+        sent = {}
+        ret = self._encode(payload, '', self._acked.get(path, {}), sent)
+        self._pending[path] = (run_number, sent, now)
+        return ret
@@ -5,6 +5,7 @@ from .max import Max, ScalarMax
 from .idxmax import IdxMax
 from .idxmin import IdxMin
 from .var import Var
+from .covariance import Covariance
 from .percentiles import Percentiles
 #from .linear_regression import LinearRegression
 from .histogram1d import Histogram1D
@@ -12,7 +13,7 @@ from .histogram2d import Histogram2D
 from .mchistogram2d import MCHistogram2D
 from .sample import Sample
 from .random_table import RandomTable, RandomDict
-#from .kernel_density import KernelDensity
+from .kernel_density import KernelDensity
 
 
 __all__ = ["Stats",
@@ -21,6 +22,7 @@ __all__ = ["Stats",
            "IdxMax",
            "IdxMin",
            "Var",
+           "Covariance",
            "Percentiles",
 #           "LinearRegression",
            "Histogram1D",
@@ -28,7 +30,6 @@ __all__ = ["Stats",
            "MCHistogram2D",           
            "Sample",
            "RandomTable",
-           "RandomDict"
-               #"KernelDensity"
-               ]
+           "RandomDict",
+           "KernelDensity"]
 
@@ -0,0 +1,281 @@
+"""
+Progressive approximate nearest neighbor index over NumPy, used by the
+KNN kernel density estimation.
+"""
+import numpy as np
+
+from ..utils.errors import ProgressiveError
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ['RPForestIndex']
+
+
+class _RPTree(object):
+    """
+    Random projection tree over the positions of the points of an index.
+    Internal nodes split their points at the median of their projection on
+    a random direction, leaves hold at most `leaf_size` positions, unless
+    their points cannot be split (duplicates).
+    """
+    def __init__(self, dim, leaf_size, rng):
+        self.leaf_size = leaf_size
+        self.rng = rng
+        self.size = 1  # number of nodes
+        self.children = np.full((16, 2), -1, dtype=np.int64)
+        self.normals = np.zeros((16, dim))
+        self.offsets = np.zeros(16)
+        self.contents = {0: np.zeros(0, dtype=np.int64)}
+
+    def _new_node(self, positions):
+        node = self.size
+        if node == len(self.children):  # grow the arrays geometrically
+            self.children = np.vstack([self.children,
+                                       np.full_like(self.children, -1)])
+            self.normals = np.vstack([self.normals,
+                                      np.zeros_like(self.normals)])
+            self.offsets = np.concatenate([self.offsets,
+                                           np.zeros_like(self.offsets)])
+        self.size += 1
+        self.contents[node] = positions
+        return node
+
+    def descend(self, points):
+        "Return the leaf reached by each point"
+        node = np.zeros(len(points), dtype=np.int64)
+        active = np.flatnonzero(self.children[node, 0] >= 0)
+        while len(active):
+            cur = node[active]
+            side = np.einsum('ij,ij->i', points[active],
+                             self.normals[cur]) >= self.offsets[cur]
+            node[active] = self.children[cur, side.astype(np.int64)]
+            active = active[self.children[node[active], 0] >= 0]
+        return node
+
+    def insert(self, positions, points, all_points):
+        "Insert the `positions` of the `points`, stored in `all_points`"
+        leaves = self.descend(points)
+        order = np.argsort(leaves, kind='stable')
+        positions = positions[order]
+        uniq, starts = np.unique(leaves[order], return_index=True)
+        ends = np.append(starts[1:], len(positions)).tolist()
+        contents = self.contents
+        for leaf, start, end in zip(uniq.tolist(), starts.tolist(), ends):
+            content = np.concatenate([contents[leaf], positions[start:end]])
+            contents[leaf] = content
+            if len(content) > self.leaf_size:
+                self._split(leaf, all_points)
+
+    def _split(self, node, all_points):
+        positions = self.contents[node]
+        direction = self.rng.standard_normal(all_points.shape[1])
+        proj = all_points[positions] @ direction
+        offset = np.partition(proj, len(proj) // 2)[len(proj) // 2]
+        right = proj >= offset
+        if right.all():
+            return  # duplicate points, keep the leaf as is
+        del self.contents[node]
+        left_node = self._new_node(positions[~right])
+        right_node = self._new_node(positions[right])
+        self.children[node] = (left_node, right_node)
+        self.normals[node] = direction
+        self.offsets[node] = offset
+        for child in (left_node, right_node):
+            if len(self.contents[child]) > self.leaf_size:
+                self._split(child, all_points)
+
+    def candidates(self, points):
+        """
+        Return a matrix with the positions in the leaf reached by each
+        point, padded with -1.
+        """
+        leaves = self.descend(points)
+        uniq, inverse = np.unique(leaves, return_inverse=True)
+        lengths = np.array([len(self.contents[leaf]) for leaf in uniq])
+        padded = np.full((len(uniq), lengths.max()), -1, dtype=np.int64)
+        for i, leaf in enumerate(uniq):
+            padded[i, :lengths[i]] = self.contents[leaf]
+        return padded[inverse]
+
+
+class RPForestIndex(object):
+    """
+    Progressive approximate nearest neighbor index using a forest of
+    random projection trees.
+
+    The points are inserted incrementally, either by ids with `run_ids`, or
+    in order with `run` and `add_points`, and copied in a growing buffer.
+    `knn_search_points` searches a batch of query points at once in the
+    leaves they reach in each tree, and falls back to an exact search for
+    the queries with less than `k` candidates. While the index holds at
+    most `exact_threshold` points, all the searches are exact. The trees
+    are seeded with `seed`, so inserting the same points in the same order
+    always builds the same index.
+    """
+    def __init__(self, X=None, n_trees=8, leaf_size=128, seed=0,
+                 exact_threshold=None, chunk_size=1_000_000):
+        if n_trees < 1 or leaf_size < 1:
+            raise ProgressiveError('n_trees and leaf_size should be positive')
+        self.X = X
+        self.n_trees = n_trees
+        self.leaf_size = leaf_size
+        self.seed = seed
+        if exact_threshold is None:
+            exact_threshold = leaf_size * n_trees
+        self.exact_threshold = exact_threshold
+        self.chunk_size = chunk_size  # max number of distances in memory
+        self._trees = None
+        self._points = None
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._next = 0  # next row inserted by `run`
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def points(self):
+        "The inserted points, in insertion order"
+        if self._points is None:
+            return np.zeros((0, 0))
+        return self._points[:self._size]
+
+    @property
+    def ids(self):
+        "The ids of the inserted points, in insertion order"
+        return self._ids[:self._size]
+
+    def _fetch(self, ids):
+        if hasattr(self.X, 'to_array'):
+            return self.X.to_array(locs=ids)
+        return np.asarray(self.X)[ids]
+
+    def add_points(self, n):
+        "Insert the next `n` rows of X"
+        return self.run(n)
+
+    def run(self, ops):
+        "Insert the next `ops` rows of X"
+        stop = min(len(self.X), self._next + ops)
+        res = self.run_ids(np.arange(self._next, stop, dtype=np.int64))
+        self._next = stop
+        return res
+
+    def run_ids(self, ids):
+        "Insert the rows of X with the specified ids"
+        ids = np.asarray(ids, dtype=np.int64)
+        return self.insert(ids, self._fetch(ids))
+
+    def insert(self, ids, points):
+        "Insert the points with the specified ids"
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim == 1:
+            points = points.reshape(-1, 1)
+        m = len(ids)
+        if m == 0:
+            return {'numPointsInserted': 0}
+        if self._points is None:
+            self._points = np.zeros((max(m, 1024), points.shape[1]))
+            self._ids = np.zeros(len(self._points), dtype=np.int64)
+            rng = np.random.RandomState(self.seed)
+            self._trees = [_RPTree(points.shape[1], self.leaf_size,
+                                   np.random.RandomState(rng.randint(2**31)))
+                           for _ in range(self.n_trees)]
+        elif points.shape[1] != self._points.shape[1]:
+            raise ProgressiveError('Expected points of dimension %d, got %d' %
+                                   (self._points.shape[1], points.shape[1]))
+        start = self._size
+        end = start + m
+        if end > len(self._points):  # grow the buffers geometrically
+            capacity = max(end, 2 * len(self._points))
+            self._points = np.resize(self._points,
+                                     (capacity, points.shape[1]))
+            self._ids = np.resize(self._ids, capacity)
+        self._points[start:end] = points
+        self._ids[start:end] = ids
+        self._size = end
+        positions = np.arange(start, end, dtype=np.int64)
+        for tree in self._trees:
+            tree.insert(positions, points, self._points)
+        return {'numPointsInserted': m}
+
+    def _exact(self, queries, k):
+        "Return the positions and distances of the exact k nearest neighbors"
+        points = self.points
+        norms = np.einsum('ij,ij->i', points, points)
+        step = max(1, self.chunk_size // len(points))
+        pos = np.empty((len(queries), k), dtype=np.int64)
+        for i in range(0, len(queries), step):
+            q = queries[i:i+step]
+            d2 = (np.einsum('ij,ij->i', q, q)[:, np.newaxis] + norms -
+                  2 * (q @ points.T))
+            pos[i:i+step] = _smallest(d2, k)[0]
+        # the expansion of the squared norm is not accurate for the
+        # nearest points, recompute their distances directly
+        diff = points[pos] - queries[:, np.newaxis, :]
+        dist = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+        order = np.argsort(dist, axis=1, kind='stable')
+        return (np.take_along_axis(pos, order, axis=1),
+                np.take_along_axis(dist, order, axis=1))
+
+    def _approximate(self, queries, k):
+        """
+        Return the positions and distances of the k nearest neighbors among
+        the candidates of the trees, and the mask of the exact queries.
+        """
+        cands = np.sort(np.hstack([tree.candidates(queries)
+                                   for tree in self._trees]), axis=1)
+        cands[:, 1:][cands[:, 1:] == cands[:, :-1]] = -1  # duplicates
+        valid = cands >= 0
+        incomplete = valid.sum(axis=1) < k
+        step = max(1, self.chunk_size // cands.shape[1])
+        pos = np.empty((len(queries), k), dtype=np.int64)
+        dist = np.empty((len(queries), k))
+        for i in range(0, len(queries), step):
+            c = cands[i:i+step]
+            diff = self._points[c] - queries[i:i+step, np.newaxis, :]
+            d2 = np.einsum('ijk,ijk->ij', diff, diff)
+            d2[~valid[i:i+step]] = np.inf
+            idx, dist[i:i+step] = _smallest(d2, k)
+            pos[i:i+step] = np.take_along_axis(c, idx, axis=1)
+        return pos, np.sqrt(dist), incomplete
+
+    def knn_search_points(self, queries, k=10):
+        """
+        Return the ids and distances of the k nearest neighbors of each of
+        the query points, sorted by distance. When the index holds less
+        than `k` points, the missing neighbors have a -1 id and an infinite
+        distance.
+        """
+        queries = np.asarray(queries, dtype=np.float64)
+        if queries.ndim == 1:
+            queries = queries.reshape(-1, 1)
+        m = len(queries)
+        ids = np.full((m, k), -1, dtype=np.int64)
+        dists = np.full((m, k), np.inf)
+        kk = min(k, self._size)
+        if kk == 0 or m == 0:
+            return ids, dists
+        if self._size <= self.exact_threshold:
+            pos, dist = self._exact(queries, kk)
+        else:
+            pos, dist, incomplete = self._approximate(queries, kk)
+            if incomplete.any():
+                pos[incomplete], dist[incomplete] = \
+                    self._exact(queries[incomplete], kk)
+        ids[:, :kk] = self._ids[pos]
+        dists[:, :kk] = dist
+        return ids, dists
+
+
+def _smallest(values, k):
+    "Return the indices and values of the k smallest values of each row"
+    if values.shape[1] > k:
+        idx = np.argpartition(values, k-1, axis=1)[:, :k]
+    else:
+        idx = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    vals = np.take_along_axis(values, idx, axis=1)
+    order = np.argsort(vals, axis=1, kind='stable')
+    return (np.take_along_axis(idx, order, axis=1),
+            np.take_along_axis(vals, order, axis=1))
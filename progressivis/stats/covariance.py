@@ -0,0 +1,74 @@
+from ..core.utils import indices_len, fix_loc
+from ..core.slot import SlotDescriptor
+from ..table.module import TableModule
+from ..table.table import Table
+from ..utils.psdict import PsDict
+from ..core.decorators import *
+from .var import OnlineCovariance
+
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Covariance(TableModule):
+    """
+    Compute the covariance matrices of groups of columns of an input table.
+
+    The groups are specified as a dictionary name -> list of columns or
+    as a list of lists of columns, named by their comma-separated
+    columns. Without groups, one group named 'cov' contains all the columns.
+    The output is a PsDict associating each group name to its
+    covariance matrix, rows and columns in the order of the group.
+    """
+    inputs = [SlotDescriptor('table', type=Table, required=True)]
+
+    def __init__(self, groups=None, ddof=1, **kwds):
+        super(Covariance, self).__init__(**kwds)
+        if isinstance(groups, (list, tuple)):
+            groups = {','.join(cols): list(cols) for cols in groups}
+        self._groups = groups
+        self._ddof = ddof
+        self._data = {}
+        self.default_step_size = 10000
+
+    def is_ready(self):
+        if self.get_input_slot('table').created.any():
+            return True
+        return super(Covariance, self).is_ready()
+
+    def get_groups(self, input_df):
+        "Return the dictionary of column groups"
+        if self._groups is None:
+            return {'cov': self.get_columns(input_df)}
+        return self._groups
+
+    def reset(self):
+        self._data = {}
+        if self._table is not None:
+            self._table.clear()
+
+    @process_slot("table", reset_cb="reset")
+    @run_if_any
+    def run_step(self, run_number, step_size, howlong):
+        with self.context as ctx:
+            dfslot = ctx.table
+            indices = dfslot.created.next(step_size)  # returns a slice
+            steps = indices_len(indices)
+            if steps == 0:
+                return self._return_run_step(self.state_blocked, steps_run=0)
+            input_df = dfslot.data()
+            if self._table is None:
+                self._table = PsDict()
+            chunk = input_df.loc[fix_loc(indices)]
+            for name, cols in self.get_groups(input_df).items():
+                data = self._data.get(name)
+                if data is None:
+                    data = OnlineCovariance(ddof=self._ddof)
+                    self._data[name] = data
+                data.add(chunk.to_array(columns=cols))
+                self._table[name] = data.covariance
+            return self._return_run_step(self.next_state(dfslot),
+                                         steps_run=steps)
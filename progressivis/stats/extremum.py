@@ -0,0 +1,184 @@
+"""
+Progressive order statistic structure maintaining the minimum or maximum
+of columns, with their ids, under insertions, updates and deletions.
+"""
+import numpy as np
+
+from ..core.bitmap import bitmap
+from ..table.table import Table
+from ..table.table_selected import TableSelectedView
+
+import logging
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024
+
+
+def ids_array(indices):
+    "Return the ids of a slice, bitmap or sequence as an int64 array"
+    if isinstance(indices, slice):
+        return np.arange(indices.start, indices.stop, dtype=np.int64)
+    if isinstance(indices, bitmap):
+        return np.frombuffer(indices.to_array(), dtype=np.uint32)\
+                 .astype(np.int64)
+    return np.asarray(indices, dtype=np.int64).reshape(-1)
+
+
+class ExtremumTree(object):
+    """
+    Minimum (or maximum) of `columns` of a table over a set of its rows.
+
+    The rows are grouped by chunks of `chunk_size` consecutive ids; each
+    chunk stores the extremum of each column and its id, and a tree over
+    the chunks stores the extremum of its subtrees. The values themselves
+    are not copied: inserting, updating or deleting a batch of rows reads
+    again from the table the rows of the chunks it touches and recomputes
+    these chunks and their ancestors, so it costs
+    O(batch * (chunk_size + log(chunks))) instead of a scan of all the
+    rows. The extrema keep the type of their column and NaN values are
+    ignored.
+    """
+    def __init__(self, table, columns, op='min', chunk_size=CHUNK_SIZE):
+        if op not in ('min', 'max'):
+            raise ValueError('op should be min or max, not %s' % op)
+        self.table = table
+        self.columns = list(columns)
+        self.op = op
+        self.chunk_size = chunk_size
+        self._better = np.less if op == 'min' else np.greater
+        self.clear()
+
+    def clear(self):
+        "Remove all the rows"
+        self._ids = bitmap()
+        # per column, list of (values, ids) from the chunks to the root
+        self._levels = [[] for _ in self.columns]
+        self._nchunks = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _grow(self, size):
+        nchunks = -(-size // self.chunk_size)
+        if nchunks <= self._nchunks:
+            return
+        nchunks = max(nchunks, 2 * self._nchunks)
+        for (col, levels) in zip(self.columns, self._levels):
+            values = np.zeros(nchunks, dtype=self.table[col].dtype)
+            ids = np.full(nchunks, -1, dtype=np.int64)
+            if levels:
+                values[:self._nchunks] = levels[0][0]
+                ids[:self._nchunks] = levels[0][1]
+            levels[:] = [(values, ids)]
+            while len(values) > 1:
+                values, ids = self._merge(values, ids,
+                                          np.arange((len(values)+1)//2))
+                levels.append((values, ids))
+        self._nchunks = nchunks
+
+    def _merge(self, values, ids, parents):
+        "Return the extrema of the children of the parents"
+        left = 2 * parents
+        right = np.minimum(left + 1, len(values) - 1)
+        take_right = (ids[right] >= 0) & ((ids[left] < 0) |
+                                          self._better(values[right],
+                                                       values[left]))
+        return (np.where(take_right, values[right], values[left]),
+                np.where(take_right, ids[right], ids[left]))
+
+    def _reader(self, rows):
+        "Return a function reading the values of the rows in a column"
+        table = self.table
+        if isinstance(table, TableSelectedView):
+            table = table.base  # same ids
+        if isinstance(table, Table):  # faster than loc
+            indices = table.id_to_index(rows, as_slice=False)
+            return lambda col: table[col].values[indices]
+        return lambda col: np.asarray(table[col].loc[rows])
+
+    def _update_chunks(self, chunks):
+        chunk_size = self.chunk_size
+        rows = bitmap()
+        for chunk in chunks.tolist():
+            rows.add_range(chunk * chunk_size, (chunk + 1) * chunk_size)
+        rows = ids_array(self._ids & rows)
+        read = self._reader(rows)
+        reduce = np.minimum if self.op == 'min' else np.maximum
+        for (col, levels) in zip(self.columns, self._levels):
+            level_values, level_ids = levels[0]
+            level_ids[chunks] = -1
+            values = read(col)
+            ids = rows
+            if values.dtype.kind in 'fc':
+                valid = ~np.isnan(values)
+                values, ids = values[valid], ids[valid]
+            if len(ids):
+                # ids are sorted, so the rows of each chunk are contiguous
+                owners = ids // chunk_size
+                starts = np.flatnonzero(np.diff(owners, prepend=-1))
+                extrema = reduce.reduceat(values, starts)
+                counts = np.diff(starts, append=len(ids))
+                # the smallest id wins among equal extrema
+                hits = np.flatnonzero(values == np.repeat(extrema, counts))
+                first = hits[np.flatnonzero(np.diff(owners[hits],
+                                                    prepend=-1))]
+                level_values[owners[first]] = values[first]
+                level_ids[owners[first]] = ids[first]
+            nodes = chunks
+            for depth in range(1, len(levels)):
+                nodes = np.unique(nodes // 2)
+                values, ids = self._merge(level_values, level_ids, nodes)
+                level_values, level_ids = levels[depth]
+                level_values[nodes] = values
+                level_ids[nodes] = ids
+
+    def update(self, ids):
+        "Insert the rows of the specified ids or read their new values"
+        ids = ids_array(ids)
+        if len(ids) == 0:
+            return
+        self._grow(int(ids.max()) + 1)
+        self._ids.update(ids)
+        self._update_chunks(np.unique(ids // self.chunk_size))
+
+    def delete(self, ids):
+        "Remove the rows of the specified ids"
+        ids = ids_array(ids)
+        ids = ids[ids < self._nchunks * self.chunk_size]
+        if len(ids) == 0:
+            return
+        self._ids -= bitmap(ids)
+        self._update_chunks(np.unique(ids // self.chunk_size))
+
+    def values(self):
+        """Return the extremum of each column, +inf (resp. -inf) for a
+        column without values"""
+        empty = np.inf if self.op == 'min' else -np.inf
+        return [levels[-1][0][0] if levels and levels[-1][1][0] >= 0
+                else empty for levels in self._levels]
+
+    def ids(self):
+        "Return the id of the extremum of each column, -1 when undefined"
+        return np.array([levels[-1][1][0] if levels else -1
+                         for levels in self._levels], dtype=np.int64)
+
+
+def update_extremum(tree, slot, step_size):
+    """
+    Apply the deletions, updates and creations of a slot to an
+    ExtremumTree, processing up to step_size rows of each kind.
+    All the deletions are applied at once since the tree reads its rows
+    from the table. Return the number of rows processed.
+    """
+    steps = 0
+    if slot.deleted.any():
+        ids = slot.deleted.next(as_slice=False)
+        tree.delete(ids)
+        steps += len(ids)
+    for changes in (slot.updated, slot.created):
+        if not changes.any():
+            continue
+        ids = ids_array(changes.next(step_size))
+        tree.update(ids)
+        steps += len(ids)
+    return steps
@@ -5,6 +5,8 @@ from ..table.module import TableModule
 from ..table.table import Table
 from ..utils.psdict import PsDict
 from ..core.decorators import *
+from ..core.bitmap import bitmap
+from .rebinning import RebinningHistogram, HistogramRefinement
 import numpy as np
 
 import logging
@@ -12,9 +14,18 @@ logger = logging.getLogger(__name__)
 
 class Histogram1D(TableModule):
     """
+    Compute the histogram of a column, within the range of its min and max
+    inputs extended by `delta`.
+
+    When the min or max extend beyond the range, the bins are merged to
+    widen it without reading the data again. When the bins become at
+    least twice as coarse as needed and `refine` is True, the histogram
+    is rebuilt in the background with finer bins, and replaces the
+    coarse one once all the rows have been read again.
     """
     parameters = [('bins', np.dtype(int), 128),
-                  ('delta', np.dtype(float), -5)] # 5%
+                  ('delta', np.dtype(float), -5),  # 5%
+                  ('refine', np.dtype(bool), True)]
     inputs = [
         SlotDescriptor('table', type=Table, required=True),
         SlotDescriptor('min', type=PsDict, required=True),
@@ -30,6 +41,7 @@ class Histogram1D(TableModule):
         self._histo = None
         self._edges = None
         self._bounds = None
+        self._refinement = None
         self._h_cnt = 0
         self._table = Table(self.generate_table_name('Histogram1D'),
                             dshape=Histogram1D.schema,
@@ -39,6 +51,7 @@ class Histogram1D(TableModule):
         self._histo = None
         self._edges = None
         self._bounds = None
+        self._refinement = None
         self.total_read = 0
         self._h_cnt = 0
         if self._table:
@@ -47,8 +60,57 @@ class Histogram1D(TableModule):
     def is_ready(self):
         if self._bounds and self.get_input_slot('table').created.any():
             return True
+        if self._refinement is not None:
+            return True
         return super(Histogram1D, self).is_ready()
 
+    def _add_values(self, histo, values):
+        "Add the values to the histogram, widening its range if needed"
+        if len(values) == 0:
+            return
+        histo.cover_values(0, values)
+        counts, _ = np.histogram(values, bins=histo.bins[0],
+                                 range=histo.bounds(0), density=False)
+        histo.histo += counts
+
+    def _update_bounds(self, run_number, dfslot, bound_min, bound_max):
+        delta = self.get_delta(bound_min, bound_max)
+        target = (bound_min - delta, bound_max + delta)
+        histo = self._histo
+        if histo is None or histo.is_empty():
+            if histo is None:
+                self._histo = RebinningHistogram([self.params.bins], [target])
+            else:
+                histo.reset([target])
+            logger.info("New bounds at run %d: %s", run_number, target)
+            return
+        (old_min, old_max) = histo.bounds(0)
+        if bound_min < old_min or bound_max > old_max:
+            # widen the bins of the histogram and of its refinement
+            histo.cover(0, *target)
+            if self._refinement is not None:
+                self._refinement.histogram.cover(0, *target)
+            logger.info('Updated bounds at run %d: %s',
+                        run_number, histo.bounds(0))
+        elif (self._refinement is None and self.params.refine and
+              histo.coarseness([target]) >= 2):
+            todo = bitmap(dfslot.data().index) - dfslot.created.changes
+            self._refinement = HistogramRefinement(
+                RebinningHistogram([self.params.bins], [target]), todo)
+            logger.info('Refining bounds at run %d: %s', run_number, target)
+
+    def _refine(self, column, step_size):
+        "Read again up to step_size rows for the refinement"
+        refinement = self._refinement
+        indices = refinement.next(step_size)
+        self._add_values(refinement.histogram,
+                         column.loc[fix_loc(indices)])
+        if refinement.is_done():
+            self._histo = refinement.histogram
+            self._refinement = None
+            logger.info('Refined bounds: %s', self._histo.bounds(0))
+        return len(indices)
+
     @process_slot("table", reset_cb="reset")
     @process_slot("min", "max", reset_if=False)
     @run_if_any
@@ -57,7 +119,9 @@ class Histogram1D(TableModule):
             dfslot = ctx.table
             min_slot = ctx.min
             max_slot = ctx.max
-            if not (dfslot.created.any() or min_slot.has_buffered() or max_slot.has_buffered()):
+            if not (dfslot.created.any() or min_slot.has_buffered()
+                    or max_slot.has_buffered() or
+                    self._refinement is not None):
                 logger.info('Input buffers empty')
                 return self._return_run_step(self.state_blocked, steps_run=0)
             min_slot.clear_buffers()
@@ -67,53 +131,35 @@ class Histogram1D(TableModule):
                 logger.debug('No bounds yet at run %d', run_number)
                 return self._return_run_step(self.state_blocked, steps_run=0)
             bound_min, bound_max = bounds
-            if self._bounds is None:
-                delta = self.get_delta(*bounds)
-                self._bounds = (bound_min - delta, bound_max + delta)
-                logger.info("New bounds at run %d: %s", run_number, self._bounds)
-            else:
-                (old_min, old_max) = self._bounds
-                delta = self.get_delta(*bounds)
-                if(bound_min < old_min or bound_max > old_max) \
-                  or bound_min > (old_min + delta) or bound_max < (old_max - delta):
-                    self._bounds = (bound_min - delta, bound_max + delta)
-                    logger.info('Updated bounds at run %d: %s', run_number, self._bounds)
-                    dfslot.reset()
-                    dfslot.update(run_number)
-                    min_slot.reset()
-                    min_slot.update(run_number)
-                    max_slot.reset()
-                    max_slot.update(run_number)
-                    self.reset()
-                    return self._return_run_step(self.state_blocked, steps_run=0)
-            (curr_min, curr_max) = self._bounds
-            if curr_min >= curr_max:
-                logger.error('Invalid bounds: %s', self._bounds)
+            if not bound_min < bound_max:
+                logger.error('Invalid bounds: %s', bounds)
                 return self._return_run_step(self.state_blocked, steps_run=0)
+            self._update_bounds(run_number, dfslot, bound_min, bound_max)
             input_df = dfslot.data()
             indices = dfslot.created.next(step_size) # returns a slice or ... ?
             steps = indices_len(indices)
             logger.info('Read %d rows', steps)
             self.total_read += steps
             column = input_df[self.column]
-            column = column.loc[fix_loc(indices)]
-            bins = self._edges if self._edges is not None else self.params.bins
-            histo = None
-            if len(column) > 0:
-                histo, self._edges = np.histogram(column,
-                                                  bins=bins,
-                                                  range=[curr_min, curr_max],
-                                                  density=False)
-                self._h_cnt += len(column)
-            if self._histo is None:
-                self._histo = histo
-            elif histo is not None:
-                self._histo += histo
-            values = {'array': [self._histo], 'min': [curr_min], 'max': [curr_max], 'time': [run_number]}
+            values = column.loc[fix_loc(indices)]
+            self._add_values(self._histo, values)
+            if self._refinement is not None:
+                self._add_values(self._refinement.histogram, values)
+                if steps < step_size:
+                    steps += self._refine(column, step_size - steps)
+            self._h_cnt += len(values)
+            self._bounds = self._histo.bounds(0)
+            self._edges = self._histo.edges(0)
+            (curr_min, curr_max) = self._bounds
+            values = {'array': [self._histo.histo.astype(np.int32)],
+                      'min': [curr_min], 'max': [curr_max],
+                      'time': [run_number]}
             self._table['array'].set_shape((self.params.bins,))
             self._table.append(values)
-            return self._return_run_step(self.next_state(dfslot), steps_run=steps)
-  
+            next_state = self.next_state(dfslot)
+            if self._refinement is not None:
+                next_state = self.state_ready
+            return self._return_run_step(next_state, steps_run=steps)
 
     def get_bounds(self, min_slot, max_slot):
         min_df = min_slot.data()
@@ -143,7 +189,8 @@ class Histogram1D(TableModule):
         else:
             edges = edges.tolist()
         return {"edges": edges,
-                "values": self._histo.tolist() if self._histo else [],
+                "values": (self._histo.histo.tolist()
+                           if self._histo is not None else []),
                 "min": min_,
                 "max": max_}
 
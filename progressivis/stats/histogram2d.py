@@ -8,6 +8,8 @@ from ..table.table import Table
 from ..utils.psdict import PsDict
 from fast_histogram import histogram2d
 from ..core.decorators import *
+from ..core.bitmap import bitmap
+from .rebinning import RebinningHistogram, HistogramRefinement
 
 import scipy as sp
 import numpy as np
@@ -17,11 +19,22 @@ logger = logging.getLogger(__name__)
 
 
 class Histogram2D(TableModule):
+    """
+    Compute the 2D histogram of two columns, within the range of their
+    min and max inputs extended by `xdelta` and `ydelta`.
+
+    When the min or max extend beyond the range, the bins are merged to
+    widen it without reading the data again. When the bins become at
+    least twice as coarse as needed and `refine` is True, the histogram
+    is rebuilt in the background with finer bins, and replaces the
+    coarse one once all the rows have been read again.
+    """
     parameters = [('xbins',  np.dtype(int),   256),
                   ('ybins',  np.dtype(int),   256),
                   ('xdelta', np.dtype(float), -5),  # means 5%
                   ('ydelta', np.dtype(float), -5),  # means 5%
-                  ('history', np.dtype(int),   3)]
+                  ('history', np.dtype(int),   3),
+                  ('refine', np.dtype(bool),  True)]
     inputs = [
         SlotDescriptor('table', type=Table, required=True),
         SlotDescriptor('min', type=PsDict, required=True),
@@ -46,9 +59,8 @@ class Histogram2D(TableModule):
         self.default_step_size = 10000
         self.total_read = 0
         self._histo = None
-        self._xedges = None
-        self._yedges = None
         self._bounds = None
+        self._refinement = None
         self._with_output = with_output
         self._heatmap_cache = None
         self._table = Table(self.generate_table_name('Histogram2D'),
@@ -58,8 +70,7 @@ class Histogram2D(TableModule):
 
     def reset(self):
         self._histo = None
-        self._xedges = None
-        self._yedges = None
+        self._refinement = None
         self.total_read = 0
         self.get_input_slot('table').reset()
         if self._table:
@@ -69,6 +80,8 @@ class Histogram2D(TableModule):
         # If we have created data but no valid min/max, we can only wait
         if self._bounds and self.get_input_slot('table').created.any():
             return True
+        if self._refinement is not None:
+            return True
         return super(Histogram2D, self).is_ready()
 
     def get_bounds(self, min_slot, max_slot):
@@ -109,6 +122,66 @@ class Histogram2D(TableModule):
             logger.info('ydelta is %f', ydelta)
         return (xdelta, ydelta)
 
+    def _new_histogram(self, target):
+        p = self.params
+        # axis 0 is y, axis 1 is x, as computed by histogram2d
+        return RebinningHistogram([p.ybins, p.xbins], target,
+                                  dtype=np.float64)
+
+    def _compute(self, histo, input_df, indices, cover=True):
+        "Return the histogram of the rows, widening its range if needed"
+        x = input_df.to_array(locs=indices, columns=[self.x_column]).reshape(-1)
+        y = input_df.to_array(locs=indices, columns=[self.y_column]).reshape(-1)
+        if len(x) == 0:
+            return None
+        if cover:
+            histo.cover_values(0, y)
+            histo.cover_values(1, x)
+        return histogram2d(y, x, bins=histo.bins, range=histo.ranges())
+
+    def _update_bounds(self, run_number, dfslot, bounds):
+        xmin, xmax, ymin, ymax = bounds
+        (xdelta, ydelta) = self.get_delta(*bounds)
+        assert xdelta >= 0 and ydelta >= 0
+        target = [(ymin-ydelta, ymax+ydelta), (xmin-xdelta, xmax+xdelta)]
+        histo = self._histo
+        if histo is None or histo.is_empty():
+            if histo is None:
+                self._histo = self._new_histogram(target)
+            else:
+                histo.reset(target)
+            logger.info("New bounds at run %d: %s", run_number, target)
+            return
+        (dymin, dymax), (dxmin, dxmax) = histo.ranges()
+        if xmin < dxmin or xmax > dxmax or ymin < dymin or ymax > dymax:
+            # widen the bins of the histogram and of its refinement
+            for axis, (lo, hi) in enumerate(target):
+                histo.cover(axis, lo, hi)
+                if self._refinement is not None:
+                    self._refinement.histogram.cover(axis, lo, hi)
+            logger.info('Updated bounds at run %s: %s',
+                        run_number, histo.ranges())
+        elif (self._refinement is None and self.params.refine and
+              histo.coarseness(target) >= 2):
+            todo = bitmap(dfslot.data().index) - dfslot.created.changes
+            self._refinement = HistogramRefinement(
+                self._new_histogram(target), todo)
+            logger.info('Refining bounds at run %s: %s', run_number, target)
+
+    def _refine(self, input_df, step_size):
+        "Read again up to step_size rows for the refinement"
+        refinement = self._refinement
+        indices = refinement.next(step_size)
+        histo = self._compute(refinement.histogram, input_df,
+                              fix_loc(indices))
+        if histo is not None:
+            refinement.histogram.histo += histo
+        if refinement.is_done():
+            self._histo = refinement.histogram
+            self._refinement = None
+            logger.info('Refined bounds: %s', self._histo.ranges())
+        return len(indices)
+
     @process_slot('table', reset_if='update', reset_cb='reset')
     @process_slot('min', 'max', reset_if=False)
     @run_if_any
@@ -117,7 +190,9 @@ class Histogram2D(TableModule):
             dfslot = ctx.table
             min_slot = ctx.min
             max_slot = ctx.max
-            if not (dfslot.created.any() or min_slot.has_buffered() or max_slot.has_buffered()):
+            if not (dfslot.created.any() or min_slot.has_buffered() or
+                    max_slot.has_buffered() or
+                    self._refinement is not None):
                 logger.info('Input buffers empty')
                 return self._return_run_step(self.state_blocked, steps_run=0)
             min_slot.clear_buffers()
@@ -127,95 +202,69 @@ class Histogram2D(TableModule):
                 logger.debug('No bounds yet at run %d', run_number)
                 return self._return_run_step(self.state_blocked, steps_run=0)
             xmin, xmax, ymin, ymax = bounds
-            if self._bounds is None:
-                (xdelta, ydelta) = self.get_delta(*bounds)
-                self._bounds = (xmin-xdelta, xmax+xdelta, ymin-ydelta, ymax+ydelta)
-                logger.info("New bounds at run %d: %s", run_number, self._bounds)
-            else:
-                (dxmin, dxmax, dymin, dymax) = self._bounds
-                (xdelta, ydelta) = self.get_delta(*bounds)
-                assert xdelta >= 0 and ydelta >= 0
-                # Either the min/max has extended, or has shrunk beyond the deltas
-                if ((xmin < dxmin or xmax > dxmax or ymin < dymin or ymax > dymax)
-                    or (xmin > (dxmin+xdelta) or xmax < (dxmax-xdelta)
-                        or ymin > (dymin+ydelta) or ymax < (dymax-ydelta))):
-                    self._bounds = (xmin-xdelta, xmax+xdelta,
-                                    ymin-ydelta, ymax+ydelta)
-                    logger.info('Updated bounds at run %s: %s',
-                                run_number, self._bounds)
-                    self.reset()
-                    dfslot.update(run_number)
-
-            xmin, xmax, ymin, ymax = self._bounds
             if xmin >= xmax or ymin >= ymax:
-                logger.error('Invalid bounds: %s', self._bounds)
+                logger.error('Invalid bounds: %s', bounds)
                 return self._return_run_step(self.state_blocked, steps_run=0)
+            self._update_bounds(run_number, dfslot, bounds)
 
             # Now, we know we have data and bounds, proceed to create a
             # new histogram or to update the previous if is still exists
             # (i.e. no reset)
-            p = self.params
             steps = 0
             # if there are new deletions, build the histogram of the deleted pairs
             # then subtract it from the main histogram
             if isinstance(dfslot.data(), Table) and dfslot.deleted.any():
                 self.reset()
                 dfslot.update(run_number)
-            elif dfslot.deleted.any() and self._histo is not None: # i.e. TableSelectedView, TableSlicedView
+                self._update_bounds(run_number, dfslot, bounds)
+            elif dfslot.deleted.any() and not self._histo.is_empty(): # i.e. TableSelectedView, TableSlicedView
                 input_df = get_physical_base(dfslot.data()) # the original table
                 raw_indices = dfslot.deleted.next(step_size) # we assume that deletions are only local to the view
                 # and the related records still exist in the original table ...
                 # TODO : test this hypothesis and reset if false
                 indices = fix_loc(raw_indices)
                 steps += indices_len(indices)
-                x = input_df.to_array(locs=indices, columns=[self.x_column]).reshape(-1)
-                y = input_df.to_array(locs=indices, columns=[self.y_column]).reshape(-1)
-                bins = [p.ybins, p.xbins]
-                if len(x) > 0:
-                    histo = histogram2d(y, x,
-                                        bins=bins,
-                                        range=[[ymin, ymax], [xmin, xmax]])
-                    self._histo -= histo
+                histo = self._compute(self._histo, input_df, indices,
+                                      cover=False)
+                if histo is not None:
+                    self._histo.histo -= histo
+                # the refinement may have read the deleted rows already
+                self._refinement = None
             # if there are new creations, build a partial histogram with them then
             # add it to the main histogram
-            #input_df = dfslot.data()
-            if not dfslot.created.any():
-                return self._return_run_step(self.state_blocked, steps_run=0)
             input_df = dfslot.data()
-            raw_indices = dfslot.created.next(step_size)
-            indices = fix_loc(raw_indices)
-            steps += indices_len(indices)
-            logger.info('Read %d rows', steps)
-            self.total_read += steps
-            x = input_df.to_array(locs=indices, columns=[self.x_column]).reshape(-1)
-            y = input_df.to_array(locs=indices, columns=[self.y_column]).reshape(-1)
-            if self._xedges is not None:
-                bins = [self._xedges, self._yedges]
-            else:
-                bins = [p.ybins, p.xbins]
-            if len(x) > 0:
-                histo = histogram2d(y, x,
-                                    bins=bins,
-                                    range=[[ymin, ymax], [xmin, xmax]])
-            else:
+            if dfslot.created.any():
+                raw_indices = dfslot.created.next(step_size)
+                indices = fix_loc(raw_indices)
+                steps += indices_len(indices)
+                logger.info('Read %d rows', steps)
+                self.total_read += steps
+                histo = self._compute(self._histo, input_df, indices)
+                if histo is not None:
+                    self._histo.histo += histo
+                if self._refinement is not None:
+                    histo = self._compute(self._refinement.histogram,
+                                          input_df, indices)
+                    if histo is not None:
+                        self._refinement.histogram.histo += histo
+            if self._refinement is not None and steps < step_size:
+                steps += self._refine(input_df, step_size - steps)
+            if steps == 0:
                 return self._return_run_step(self.state_blocked,
                                              steps_run=0)
-
-            if self._histo is None:
-                self._histo = histo
-            elif histo is not None:
-                self._histo += histo
-            if self._histo is not None:
-                cmax = self._histo.max()
-            values = {'array': np.flip(self._histo, axis=0),
+            (ymin, ymax), (xmin, xmax) = self._histo.ranges()
+            self._bounds = (xmin, xmax, ymin, ymax)
+            histo = self._histo.histo
+            values = {'array': np.flip(histo, axis=0),
                       'cmin': 0,
-                      'cmax': cmax,
+                      'cmax': histo.max(),
                       'xmin': xmin,
                       'xmax': xmax,
                       'ymin': ymin,
                       'ymax': ymax,
                       'time': run_number}
             if self._with_output:
+                p = self.params
                 table = self._table
                 table['array'].set_shape([p.ybins, p.xbins])
                 last = table.last()
@@ -224,7 +273,10 @@ class Histogram2D(TableModule):
                 else:
                     table.iloc[last.row] = values
             self.build_heatmap(values)
-            return self._return_run_step(self.next_state(dfslot), steps_run=steps)
+            next_state = self.next_state(dfslot)
+            if self._refinement is not None:
+                next_state = self.state_ready
+            return self._return_run_step(next_state, steps_run=steps)
 
     def build_heatmap(self, values):
         if not values:
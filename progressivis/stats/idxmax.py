@@ -7,11 +7,11 @@ import logging
 
 import numpy as np
 
-from ..core.utils import indices_len, fix_loc
 from ..core.slot import SlotDescriptor
 from ..table.module import TableModule
 from ..table.table import Table
 from ..core.decorators import *
+from .extremum import ExtremumTree, update_extremum
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +25,7 @@ class IdxMax(TableModule):
     def __init__(self, **kwds):
         super(IdxMax, self).__init__(**kwds)
         self._max = None
+        self._tree = None
         self.default_step_size = 10000
 
     def max(self):
@@ -36,60 +37,51 @@ class IdxMax(TableModule):
         return super(IdxMax, self).get_data(name)
 
     def is_ready(self):
-        if self.get_input_slot('table').created.any():
+        slot = self.get_input_slot('table')
+        if slot.created.any() or slot.updated.any() or slot.deleted.any():
             return True
         return super(IdxMax, self).is_ready()
 
     def reset(self):
         self._table = None
         self._max = None
+        if self._tree is not None:
+            self._tree.clear()
 
-    @process_slot("table", reset_cb='reset')
+    @process_slot("table", reset_if=False)
     @run_if_any
     def run_step(self, run_number, step_size, howlong):
-
         with self.context as ctx:
             dfslot = ctx.table
-            indices = dfslot.created.next(step_size)
-            steps = indices_len(indices)
+            input_table = dfslot.data()
+            columns = self.get_columns(input_table)
+            if self._tree is None:
+                self._tree = ExtremumTree(input_table, columns, op='max')
+            steps = update_extremum(self._tree, dfslot, step_size)
             if steps == 0:
                 return self._return_run_step(self.state_blocked, steps_run=0)
-            input_df = dfslot.data()
-            op = self.filter_columns(input_df, fix_loc(indices)).idxmax()
+            op = OrderedDict()
+            max_ = OrderedDict()
+            for col, ix, val in zip(columns, self._tree.ids(),
+                                    self._tree.values()):
+                op[col] = ix
+                max_[col] = val if ix >= 0 else np.nan
             if self._max is None:
-                max_ = OrderedDict(zip(op.keys(), [np.nan]*len(op.keys())))
-                for col, ix in op.items():
-                    max_[col] = input_df.at[ix, col]  # lookup value, is there a better way?
                 self._max = Table(self.generate_table_name('_max'),
-                                  dshape=input_df.dshape,
+                                  dshape=input_table.dshape,
                                   create=True)
-                self._max.append(max_, indices=[run_number])
                 self._table = Table(self.generate_table_name('table'),
-                                    dshape=input_df.dshape,
+                                    dshape=input_table.dshape,
+                                    create=True)
+            self._table.append(op, indices=[run_number])
+            self._max.append(max_, indices=[run_number])
+            if len(self._table) > self.params.history:
+                data = self._table.loc[self._table.index[-self.params.history:]]
+                self._table = Table(self.generate_table_name('table'),
+                                    data=data,
                                     create=True)
-                self._table.append(op, indices=[run_number])
-            else:
-                prev_max = self._max.last()
-                prev_idx = self._table.last()
-                max_ = OrderedDict(prev_max.items())
-                for col, ix in op.items():
-                    val = input_df.at[ix, col]
-                    if np.isnan(val):
-                        pass
-                    elif np.isnan(max_[col]) or val > max_[col]:
-                        op[col] = prev_idx[col]
-                        max_[col] = val
-                self._table.append(op, indices=[run_number])
-                self._max.append(max_, indices=[run_number])
-                if len(self._table) > self.params.history:
-                    data = self._table.loc[self._table.index[-self.params.history:]]
-                    self._table = Table(self.
-                                        generate_table_name('table'),
-                                        data=data,
-                                        create=True)
-                    data = self._max.loc[self._max.index[-self.params.history:]]
-                    self._max = Table(self.
-                                      generate_table_name('_max'),
-                                      data=data,
-                                      create=True)
+                data = self._max.loc[self._max.index[-self.params.history:]]
+                self._max = Table(self.generate_table_name('_max'),
+                                  data=data,
+                                  create=True)
             return self._return_run_step(self.next_state(dfslot), steps_run=steps)
@@ -7,11 +7,11 @@ import logging
 
 import numpy as np
 
-from ..core.utils import indices_len, fix_loc
 from ..core.slot import SlotDescriptor
 from ..table.module import TableModule
 from ..table.table import Table
 from ..core.decorators import *
+from .extremum import ExtremumTree, update_extremum
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +24,7 @@ class IdxMin(TableModule):
     def __init__(self, **kwds):
         super(IdxMin, self).__init__(**kwds)
         self._min = None
+        self._tree = None
         self.default_step_size = 10000
 
     def min(self):
@@ -35,59 +36,51 @@ class IdxMin(TableModule):
         return super(IdxMin, self).get_data(name)
 
     def is_ready(self):
-        if self.get_input_slot('table').created.any():
+        slot = self.get_input_slot('table')
+        if slot.created.any() or slot.updated.any() or slot.deleted.any():
             return True
         return super(IdxMin, self).is_ready()
 
     def reset(self):
         self._table = None
         self._min = None
+        if self._tree is not None:
+            self._tree.clear()
 
-    @process_slot("table", reset_cb='reset')
+    @process_slot("table", reset_if=False)
     @run_if_any
     def run_step(self, run_number, step_size, howlong):
         with self.context as ctx:
-            dfslot = ctx.table        
-            indices = dfslot.created.next(step_size)  # returns a slice
-            steps = indices_len(indices)
+            dfslot = ctx.table
+            input_table = dfslot.data()
+            columns = self.get_columns(input_table)
+            if self._tree is None:
+                self._tree = ExtremumTree(input_table, columns, op='min')
+            steps = update_extremum(self._tree, dfslot, step_size)
             if steps == 0:
                 return self._return_run_step(self.state_blocked, steps_run=0)
-            input_table = dfslot.data()
-            op = self.filter_columns(input_table, fix_loc(indices)).idxmin()
+            op = OrderedDict()
+            min_ = OrderedDict()
+            for col, ix, val in zip(columns, self._tree.ids(),
+                                    self._tree.values()):
+                op[col] = ix
+                min_[col] = val if ix >= 0 else np.nan
             if self._min is None:
-                min_ = OrderedDict(zip(op.keys(), [np.nan]*len(op.keys())))
-                for col, ix in op.items():
-                    min_[col] = input_table.at[ix, col]  # lookup value, is there a better way?
                 self._min = Table(self.generate_table_name('_min'),
                                   dshape=input_table.dshape,
                                   create=True)
-                self._min.append(min_, indices=[run_number])
                 self._table = Table(self.generate_table_name('_table'),
                                     dshape=input_table.dshape,
                                     create=True)
-                self._table.append(op, indices=[run_number])
-            else:
-                prev_min = self._min.last()
-                prev_idx = self._table.last()
-                min_ = OrderedDict(prev_min.items())
-                for col, ix in op.items():
-                    val = input_table.at[ix, col]
-                    if np.isnan(val):
-                        pass
-                    elif np.isnan(min_[col]) or val < min_[col]:
-                        op[col] = prev_idx[col]
-                        min_[col] = val
-                if True:
-                    self._table.append(op, indices=[run_number])
-                    self._min.append(min_, indices=[run_number])
-                    if len(self._table) > self.params.history:
-                        data = self._table.loc[self._table.index[-self.params.history:]]
-                        self._table = Table(self.generate_table_name('_table'),
-                                            data=data,
-                                            create=True)
-                        data = self._min.loc[self._min.index[-self.params.history:]]
-                        self._min = Table(self.generate_table_name('_min'),
-                                          data=data,
-                                          create=True)
-
+            self._table.append(op, indices=[run_number])
+            self._min.append(min_, indices=[run_number])
+            if len(self._table) > self.params.history:
+                data = self._table.loc[self._table.index[-self.params.history:]]
+                self._table = Table(self.generate_table_name('_table'),
+                                    data=data,
+                                    create=True)
+                data = self._min.loc[self._min.index[-self.params.history:]]
+                self._min = Table(self.generate_table_name('_min'),
+                                  data=data,
+                                  create=True)
             return self._return_run_step(self.next_state(dfslot), steps_run=steps)
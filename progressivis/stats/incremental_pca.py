@@ -0,0 +1,108 @@
+"""
+Incremental PCA with a mergeable SVD state.
+
+Ross, David A.; Lim, Jongwoo; Lin, Ruei-Sung; Yang, Ming-Hsuan (2008).
+"Incremental Learning for Robust Visual Tracking". International Journal
+of Computer Vision. 77 (1-3): 125-141. doi:10.1007/s11263-007-0075-7.
+"""
+import numpy as np
+
+from ..utils.errors import ProgressiveError
+
+__all__ = ['IncrementalPCA']
+
+
+def _svd_flip(u, vt):
+    "Make the signs of the components deterministic"
+    signs = np.sign(vt[np.arange(len(vt)), np.argmax(np.abs(vt), axis=1)])
+    signs[signs == 0] = 1
+    return u * signs, vt * signs[:, np.newaxis]
+
+
+class IncrementalPCA(object):
+    """
+    PCA of a stream of batches, keeping the mean, the count and the truncated
+    SVD (singular values and components) of the centered data seen. Two
+    states of separate batches are merged with `merge`, by an SVD of their
+    stacked scaled components and of the difference of their means, so the
+    cost does not depend on the number of rows seen. The attributes follow
+    `sklearn.decomposition.IncrementalPCA`.
+    """
+    def __init__(self, n_components):
+        self.n_components = n_components
+        self.n_samples_seen_ = 0
+        self.mean_ = None
+        self.singular_values_ = None
+        self.components_ = None
+        self.explained_variance_ = None
+
+    def copy(self):
+        "Return a snapshot of the state"
+        ret = IncrementalPCA(self.n_components)
+        ret.n_samples_seen_ = self.n_samples_seen_
+        ret.mean_ = self.mean_
+        ret.singular_values_ = self.singular_values_
+        ret.components_ = self.components_
+        ret.explained_variance_ = self.explained_variance_
+        return ret  # the arrays are replaced, never modified in place
+
+    def _set(self, n, mean, singular_values, components):
+        k = min(self.n_components, len(singular_values))
+        self.n_samples_seen_ = n
+        self.mean_ = mean
+        self.singular_values_ = singular_values[:k]
+        self.components_ = components[:k]
+        self.explained_variance_ = self.singular_values_ ** 2 / max(n - 1, 1)
+
+    def merge(self, other):
+        "Merge the state of another IncrementalPCA and return self"
+        if other.n_samples_seen_ == 0:
+            return self
+        if self.n_samples_seen_ == 0:
+            self._set(other.n_samples_seen_, other.mean_,
+                      other.singular_values_, other.components_)
+            return self
+        n1, n2 = self.n_samples_seen_, other.n_samples_seen_
+        n = n1 + n2
+        stacked = np.vstack([
+            self.singular_values_[:, np.newaxis] * self.components_,
+            other.singular_values_[:, np.newaxis] * other.components_,
+            np.sqrt(n1 * n2 / n) * (self.mean_ - other.mean_)])
+        u, s, vt = np.linalg.svd(stacked, full_matrices=False)
+        _, vt = _svd_flip(u, vt)
+        self._set(n, (n1 * self.mean_ + n2 * other.mean_) / n, s, vt)
+        return self
+
+    def partial_fit(self, X):
+        "Add a batch of rows and return self"
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            return self
+        if self.mean_ is not None and X.shape[1] != len(self.mean_):
+            raise ProgressiveError('Expected %d columns, got %d'
+                                   % (len(self.mean_), X.shape[1]))
+        mean = X.mean(axis=0)
+        u, s, vt = np.linalg.svd(X - mean, full_matrices=False)
+        _, vt = _svd_flip(u, vt)
+        batch = IncrementalPCA(len(s))  # merged before the truncation
+        batch._set(len(X), mean, s, vt)
+        return self.merge(batch)
+
+    def transform(self, X):
+        "Project the rows on the components"
+        return (np.asarray(X, dtype=np.float64) - self.mean_) @ \
+            self.components_.T
+
+    def inverse_transform(self, X):
+        "Return the rows of the original space projecting to X"
+        return np.asarray(X, dtype=np.float64) @ self.components_ + \
+            self.mean_
+
+    def subspace_angle(self, other):
+        """
+        Return the largest principal angle, in radians, between the
+        subspaces spanned by the components of self and other
+        """
+        cosines = np.linalg.svd(self.components_ @ other.components_.T,
+                                compute_uv=False)
+        return float(np.arccos(np.clip(cosines.min(), -1.0, 1.0)))
@@ -3,11 +3,7 @@ from ..table.module import TableModule
 from ..table import Table
 from ..core.utils import indices_len
 from progressivis import SlotDescriptor
-try:
-    import pynene
-    from .knnkde import KNNKernelDensity
-except:
-    pass
+from .knnkde import KNNKernelDensity
 
 
 class KernelDensity(TableModule):
@@ -21,6 +17,7 @@ class KernelDensity(TableModule):
         self._json_cache = {}
         self._inserted = 0
         self._lately_inserted = 0
+        self._points = np.zeros((0, 0))  # first points, for the json
         super(KernelDensity, self).__init__(**kwds)
 
     def run_step(self, run_number, step_size, howlong):
@@ -36,24 +33,30 @@ class KernelDensity(TableModule):
             return self._return_run_step(self.state_blocked, steps_run=0)
         if self._kde is None:
             self._kde = KNNKernelDensity(dfslot.data(), online=True)
-        res = self._kde.run_ids(indices.to_array())
+        ids = indices.to_array()
+        res = self._kde.run_ids(ids)
+        if len(self._points) < 500:
+            points = dfslot.data().to_array(
+                locs=ids[:500-len(self._points)])
+            self._points = np.vstack([self._points.reshape(-1, points.shape[1]),
+                                      points])
         self._inserted += res['numPointsInserted']
         self._lately_inserted += steps
         samples = self.params.samples
         sample_num = self.params.bins
         threshold = self.params.threshold
         knn = self.params.knn
-        if self._lately_inserted > threshold:
-            scores = self._kde.score_samples(samples.astype(np.float32), k=knn)
+        # refresh the scores periodically and when caught up with the input
+        if self._lately_inserted > threshold or not dfslot.created.any():
+            # all the samples are scored at once
+            scores = self._kde.score_samples(samples, k=knn)
             self._lately_inserted = 0
             self._json_cache = {
-                'points': np.array(dfslot.data().loc[:500, :].to_dict(orient='split')['data']).tolist(),
+                'points': self._points.tolist(),
                 'bins': sample_num,
                 'inserted': self._inserted,
                 'total': len(dfslot.data()),
-                'samples': [
-                    (sample, score) for sample, score in zip(samples.tolist(), scores.tolist())
-                ]
+                'samples': list(zip(samples.tolist(), scores.tolist()))
             }
         return self._return_run_step(self.state_ready, steps_run=steps)
 
@@ -0,0 +1,155 @@
+"""
+Mergeable quantile sketch of Karnin, Lang and Liberty (KLL), vectorized
+with NumPy.
+
+Karnin, Zohar; Lang, Kevin; Liberty, Edo (2016). "Optimal Quantile
+Approximation in Streams". FOCS 2016: 71-78. doi:10.1109/FOCS.2016.17.
+"""
+import numpy as np
+
+from ..utils.errors import ProgressiveError
+
+__all__ = ['KLLSketch']
+
+
+class KLLSketch(object):
+    """
+    Quantile sketch keeping O(k) values, stored in levels of compactors.
+    A value at level h stands for 2**h values of the stream. When a level
+    exceeds its capacity, it is sorted and every other value, starting at
+    random, is promoted to the next level. Values are added by batches and
+    sketches of separate chunks of a stream are merged with `merge`; the
+    rank error is about 1.7/k with high probability.
+    """
+    def __init__(self, k=200, c=2/3):
+        if k < 2:
+            raise ProgressiveError('k should be at least 2')
+        self.k = k
+        self.c = c
+        self.levels = [np.zeros(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, h):
+        depth = len(self.levels) - h - 1
+        return max(2, int(np.ceil(self.k * self.c ** depth)))
+
+    def _compress(self):
+        compacted = True
+        while compacted:
+            compacted = False
+            for h, level in enumerate(self.levels):
+                if len(level) <= self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.zeros(0))
+                level = np.sort(level)
+                odd = len(level) % 2  # an odd value stays at this level
+                promoted = level[odd+np.random.randint(2)::2]
+                self.levels[h] = level[:odd]
+                self.levels[h+1] = np.concatenate([self.levels[h+1],
+                                                   promoted])
+                compacted = True
+
+    def update(self, values):
+        "Add a batch of values, ignoring NaNs, and return the sketch"
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """
+        Merge another sketch into this one and return it. The sketches
+        should have the same c; the result keeps the k of this sketch.
+        """
+        if other.c != self.c:
+            raise ProgressiveError('Cannot merge sketches with c=%s and c=%s'
+                                   % (self.c, other.c))
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.zeros(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    @staticmethod
+    def merged(sketches, k=None):
+        """
+        Return a new sketch merging the sketches, with the largest k of
+        the sketches unless k is specified
+        """
+        sketches = list(sketches)
+        if not sketches:
+            return KLLSketch(200 if k is None else k)
+        if k is None:
+            k = max(sketch.k for sketch in sketches)
+        ret = KLLSketch(k, sketches[0].c)
+        for sketch in sketches:
+            ret.merge(sketch)
+        return ret
+
+    def _weighted(self):
+        "Return the sorted values and their cumulated weights"
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2**h, dtype=np.int64)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        "Return the approximate quantiles, for qs in [0, 1]"
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        values, cumweights = self._weighted()
+        idx = np.searchsorted(cumweights, qs * cumweights[-1], side='left')
+        ret = values[np.minimum(idx, len(values)-1)]
+        ret = np.where(qs <= 0, self.min, ret)
+        return np.where(qs >= 1, self.max, ret)
+
+    def quantile(self, q):
+        "Return the approximate quantile q, in [0, 1]"
+        return float(self.quantiles([q])[0])
+
+    def ranks(self, xs):
+        "Return the approximate fraction of the values lower or equal to xs"
+        xs = np.asarray(xs, dtype=np.float64)
+        if self.n == 0:
+            return np.full(xs.shape, np.nan)
+        values, cumweights = self._weighted()
+        idx = np.searchsorted(values, xs, side='right')
+        cum = np.concatenate([[0], cumweights])
+        return cum[idx] / cumweights[-1]
+
+    def to_dict(self):
+        "Return a dictionary serializing the sketch, e.g. in JSON"
+        return {'k': self.k, 'c': self.c, 'n': self.n,
+                'min': float(self.min), 'max': float(self.max),
+                'levels': [level.tolist() for level in self.levels]}
+
+    @staticmethod
+    def from_dict(data):
+        "Return the sketch serialized by `to_dict`"
+        ret = KLLSketch(data['k'], data['c'])
+        ret.n = data['n']
+        ret.min = data['min']
+        ret.max = data['max']
+        ret.levels = [np.asarray(level, dtype=np.float64)
+                      for level in data['levels']]
+        return ret
@@ -1,18 +1,36 @@
 # Author: Jaemin Jo <jmjo@hcil.snu.ac.kr>
 
 import numpy as np
+
+from ..utils.errors import ProgressiveError
+from .ann import RPForestIndex
+
 try:
     from pynene import Index
-except:
-    pass
+except ImportError:  # pynene is an optional dependency
+    Index = None
+
 
 class KNNKernelDensity():
+    """
+    Kernel density estimation from the k nearest neighbors of the query
+    points. The neighbors are searched in a progressive index, the native
+    RPForestIndex by default, or the pynene index with `backend='pynene'`.
+    The other keywords are passed to the index.
+    """
     SQRT2PI = np.sqrt(2 * np.pi)
 
-    def __init__(self, X, online=False):
+    def __init__(self, X, online=False, backend='native', **kwds):
         self.X = X
-        self.index = Index(X)
-        
+        if backend == 'native':
+            self.index = RPForestIndex(X, **kwds)
+        elif backend == 'pynene':
+            if Index is None:
+                raise ProgressiveError('pynene is not installed')
+            self.index = Index(X, **kwds)
+        else:
+            raise ProgressiveError('Unknown backend %s' % backend)
+
         if not online: # if offline
             self.index.add_points(len(X))
 
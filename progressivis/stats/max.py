@@ -1,10 +1,9 @@
-from ..core.utils import indices_len, fix_loc
-from ..core.bitmap import bitmap
 from ..table.module import TableModule
 from ..table.table import Table
 from ..core.slot import SlotDescriptor
 from ..utils.psdict import PsDict
 from ..core.decorators import *
+from .extremum import ExtremumTree, update_extremum
 import numpy as np
 
 import logging
@@ -12,118 +11,69 @@ logger = logging.getLogger(__name__)
 
 
 class Max(TableModule):
+    """
+    Compute the maximum of the columns of a table.
+
+    Deletions and updates are handled incrementally by an ExtremumTree,
+    without reading the table again.
+    """
     parameters = [('history', np.dtype(int), 3)]
     inputs = [SlotDescriptor('table', type=Table, required=True)]
+    op = 'max'
 
     def __init__(self, columns=None, **kwds):
         super(Max, self).__init__(**kwds)
         self._columns = columns
+        self._tree = None
         self.default_step_size = 10000
 
     def is_ready(self):
-        if self.get_input_slot('table').created.any():
+        slot = self.get_input_slot('table')
+        if slot.created.any() or slot.updated.any() or slot.deleted.any():
             return True
         return super(Max, self).is_ready()
 
     def reset(self):
+        if self._tree is not None:
+            self._tree.clear()
         if self._table is not None:
             self._table.fill(-np.inf)
 
-    @process_slot("table", reset_cb="reset")
+    @process_slot("table", reset_if=False)
     @run_if_any
     def run_step(self, run_number, step_size, howlong):
         with self.context as ctx:
-            indices = ctx.table.created.next(step_size) # returns a slice
-            steps = indices_len(indices)
-            input_df = ctx.table.data()
-            op = self.filter_columns(input_df, fix_loc(indices)).max(keepdims=False)
+            dfslot = ctx.table
+            input_df = dfslot.data()
+            columns = self.get_columns(input_df)
+            if self._tree is None:
+                self._tree = ExtremumTree(input_df, columns, op=self.op)
+            steps = update_extremum(self._tree, dfslot, step_size)
+            op = dict(zip(columns, self._tree.values()))
             if self._table is None:
                 self._table = PsDict(op)
             else:
-                for k, v in self._table.items():
-                    self._table[k] = np.maximum(op[k], v)
-            return self._return_run_step(self.next_state(ctx.table), steps_run=steps)
+                self._table.update(op)
+            return self._return_run_step(self.next_state(dfslot),
+                                         steps_run=steps)
 
-def maximum_val_id(candidate_val, candidate_id, current_val, current_id):
-    if candidate_val > current_val:
-        return candidate_val, candidate_id, True
-    return current_val, current_id, False
+    def extremum_ids(self):
+        "Return a dictionary of the ids of the maximum of each column"
+        if self._tree is None:
+            return {}
+        columns = self.get_columns(self.get_input_slot('table').data())
+        return {col: int(id_) for (col, id_) in zip(columns, self._tree.ids())
+                if id_ >= 0}
 
-class ScalarMax(TableModule):
-    inputs = [SlotDescriptor('table', type=Table, required=True)]
 
+class ScalarMax(Max):
+    """
+    Compute the maximum of all the columns of a table, keeping the ids of
+    the rows holding them in `_sensitive_ids`.
+    """
     def __init__(self, **kwds):
         super().__init__(**kwds)
-        self.default_step_size = 10000
-        self._sensitive_ids = {}
-
-    def is_ready(self):
-        if self.get_input_slot('table').created.any():
-            return True
-        return super().is_ready()
-
-    def reset(self):
-        if self._table is not None:
-            self._table.fill(-np.inf)
-
-    def reset_all(self, slot, run_number):
-        slot.reset()
-        self.reset()
-        slot.update(run_number)
 
-    def are_critical(self, updated_ids, data):
-        """
-        check if updates invalidate the current max
-        """
-        for col, id in self._sensitive_ids.items():
-            if id not in updated_ids:
-                continue
-            if data.loc[id, col] < self._table[col]:
-                return True
-        return False
-
-    def run_step(self, run_number, step_size, howlong):
-        slot = self.get_input_slot('table')
-        # slot.update(run_number)
-        indices = None
-        sensitive_ids_bm = bitmap(self._sensitive_ids.values())
-        if slot.deleted.any():
-            del_ids = slot.deleted.next(as_slice=False)
-            if del_ids & sensitive_ids_bm:
-                self.reset_all(slot, run_number)
-            # else : deletes are not sensitive, just ignore them
-        if slot.updated.any():
-            sensitive_update_ids = slot.updated.changes & sensitive_ids_bm
-            if sensitive_update_ids and self.are_critical(
-                    sensitive_update_ids, slot.data()):
-                self.reset_all(slot, run_number)
-            else:
-                # updates are not critical BUT some values
-                # might become greater than the current MAX
-                # so we will process these updates as creations
-                # and we avoid a reset
-                indices = slot.updated.next(step_size, as_slice=False)
-        if indices is None:
-            if not slot.created.any():
-                return self._return_run_step(self.state_blocked, steps_run=0)
-            indices = slot.created.next(step_size) # returns a slice
-        steps = indices_len(indices)
-        input_df = slot.data()
-        idxop = self.filter_columns(input_df, fix_loc(indices)).idxmax()
-        if not self._sensitive_ids:
-            self._sensitive_ids.update(idxop)
-        if self._table is None:
-            op = {k:input_df.loc[i, k] for (k, i) in idxop.items()}    
-            self._table = PsDict(op)
-        else:
-            rich_op = {k:(input_df.loc[i, k], i) for (k, i) in idxop.items()}
-            for k, v in self._table.items():
-                candidate_val, candidate_id = rich_op[k]
-                current_val = self._table[k]
-                current_id = self._sensitive_ids[k]
-                new_val, new_id, tst = maximum_val_id(candidate_val, candidate_id,
-                                                      current_val, current_id)
-                if tst:
-                    self._table[k] = new_val
-                    self._sensitive_ids[k] = new_id
-        return self._return_run_step(self.next_state(slot), steps_run=steps)
+    @property
+    def _sensitive_ids(self):
+        return self.extremum_ids()
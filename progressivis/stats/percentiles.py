@@ -8,8 +8,7 @@ from ..core.decorators import *
 
 import numpy as np
 
-# Should use a Cython implementation eventually
-from tdigest import TDigest
+from .kll import KLLSketch
 
 
 def _pretty_name(x):
@@ -21,17 +20,23 @@ def _pretty_name(x):
 
 
 class Percentiles(TableModule):
+    """
+    Compute approximate percentiles of a column with a KLL sketch of size
+    `k`. The sketch of each chunk of the input is merged into the sketch
+    of the column, returned by `sketch()`.
+    """
     parameters = [('percentiles', object, [0.25, 0.5, 0.75]),
                   ('history', np.dtype(int), 3)]
     inputs = [SlotDescriptor('table', type=Table)]
 
-    def __init__(self, column, percentiles=None, **kwds):
+    def __init__(self, column, percentiles=None, k=512, **kwds):
         if not column:
             raise ProgressiveError('Need a column name')
         super(Percentiles, self).__init__(**kwds)
         self._columns = [column]
         self.default_step_size = 1000
-        self.tdigest = TDigest()
+        self._k = k
+        self._sketch = KLLSketch(k)
 
         if percentiles is None:
             percentiles = np.array([0.25, 0.5, 0.75])
@@ -61,8 +66,12 @@ class Percentiles(TableModule):
         return super(Percentiles, self).is_ready()
 
 
+    def sketch(self):
+        "Return the KLL sketch of the column"
+        return self._sketch
+
     def reset(self):
-        self.tdigest = TDigest()
+        self._sketch = KLLSketch(self._k)
 
     @process_slot("table", reset_cb="reset")
     @run_if_any
@@ -74,13 +83,12 @@ class Percentiles(TableModule):
             if steps == 0:
                 return self._return_run_step(self.state_blocked, steps_run=steps)
             input_df = dfslot.data()
-            x = self.filter_columns(input_df, fix_loc(indices))
-            self.tdigest.batch_update(x[0])
+            x = input_df.to_array(locs=fix_loc(indices),
+                                  columns=self._columns)[:, 0]
+            self._sketch.merge(KLLSketch(self._k).update(x))
             df = self._table
-            values = {}
-            for n, p in zip(self._pername, self._percentiles):
-                values[n] = self.tdigest.percentile(p*100)
-            df.add(values)
+            values = self._sketch.quantiles(self._percentiles)
+            df.add(dict(zip(self._pername, values)))
             # with self.lock:
             #     df.loc[run_number] = values
             #     if len(df) > self.params.history:
@@ -1,6 +1,5 @@
 import logging
 import numpy as np
-import copy
 from ..core.utils import indices_len, fix_loc, filter_cols
 from ..core.bitmap import bitmap
 from ..table.module import TableModule
@@ -11,7 +10,7 @@ from .. import ProgressiveError, SlotDescriptor
 from ..utils.psdict import PsDict
 from . import Sample
 import pandas as pd
-from sklearn.decomposition import IncrementalPCA
+from .incremental_pca import IncrementalPCA
 from scipy.spatial import distance as dist
 import numexpr as ne
 
@@ -36,6 +35,7 @@ class PPCA(TableModule):
     def reset(self):
         print("RESET PPCA")
         self.inc_pca = IncrementalPCA(n_components=self.params.n_components)
+        self._transformer['inc_pca'] = self.inc_pca
         self.inc_pca_wtn = None
         if self._table is not None:
             self._table.selection = bitmap()
@@ -89,13 +89,15 @@ class PPCA(TableModule):
             self.reduced.create_dependent_modules(self.output.table)
     def create_dependent_modules(self, atol=0.0, rtol=0.001,
                                  trace=False, threshold=None, resetter=None,
-                                 resetter_slot='table', resetter_func=None):
+                                 resetter_slot='table', resetter_func=None,
+                                 max_angle=None):
         s = self.scheduler()
         self.reduced = PPCATransformer(scheduler=s,
                                        atol=atol, rtol=rtol,
                                        trace=trace,
                                        threshold=threshold,
                                        resetter_func=resetter_func,
+                                       max_angle=max_angle,
                                        group=self.name)
         self.reduced.input.table = self.output.table
         self.reduced.input.transformer = self.output.transformer
@@ -105,6 +107,16 @@ class PPCA(TableModule):
         self.reduced.create_dependent_modules(self.output.table)
 
 class PPCATransformer(TableModule):
+    """
+    Project the input table with the PCA maintained by a PPCA module.
+
+    The rows are projected with the current PCA as they come. When the PCA
+    drifts from the one used at the previous re-projection, measured on a
+    sample of the rows (`rtol`) or by the largest angle between their
+    subspaces (`max_angle`, in radians), the rows already projected are
+    marked stale and projected again, at most `step_size` rows per step,
+    so the output table keeps all its rows in the meantime.
+    """
     inputs = [SlotDescriptor('table', type=Table, required=True),
               SlotDescriptor('samples', type=Table, required=True),
               SlotDescriptor('transformer', type=PsDict, required=True),
@@ -113,8 +125,10 @@ class PPCATransformer(TableModule):
                SlotDescriptor('prev_samples', type=Table, required=False)]
 
     def __init__(self, atol=0.0, rtol=0.001, trace=False, threshold=None,
-                 resetter_func=None, **kwds):
+                 resetter_func=None, max_angle=None, **kwds):
         super().__init__(**kwds)
+        self._max_angle = max_angle
+        self._stale = bitmap()  # rows projected with an outdated PCA
         self._atol = atol
         self._rtol = rtol
         self._trace = trace
@@ -166,12 +180,31 @@ class PPCATransformer(TableModule):
         mean = np.mean(dist)
         max_ = np.max(dist)
         ret = mean > self._rtol
+        if self._max_angle is not None:
+            ret = ret or inc_pca.subspace_angle(inc_pca_wtn) > self._max_angle
         return self.trace_if(ret, mean, max_, len(input_table))
-            
+
     def reset(self):
+        self._stale = bitmap()
         if self._table is not None:
             self._table.resize(0)
 
+    def _project(self, inc_pca, input_table, ids):
+        return inc_pca.transform(
+            self.filter_columns(input_table, ids).to_array())
+
+    def _reproject(self, inc_pca, input_table, step_size):
+        "Project again at most step_size stale rows, return their count"
+        ids = self._stale.to_array()[:step_size]
+        if len(ids) == 0:
+            return 0
+        ids = np.asarray(ids, dtype=np.int64)
+        reduced = self._project(inc_pca, input_table, ids)
+        for i, col in enumerate(self._table.columns):
+            self._table.loc[ids, col] = reduced[:, i]
+        self._stale -= bitmap(ids)
+        return len(ids)
+
     def starting(self):
         super().starting()
         samples_slot = self.get_output_slot('samples')
@@ -229,33 +262,36 @@ class PPCATransformer(TableModule):
         """    
         with self.context as ctx:
             input_table = ctx.table.data()
-            indices = ctx.table.created.next(step_size) # returns a slice
-            steps = indices_len(indices)
-            if steps == 0:
-                return self._return_run_step(self.state_blocked, steps_run=0)
             transformer = ctx.transformer.data()
             ctx.transformer.clear_buffers()
             inc_pca = transformer.get('inc_pca')
             ctx.samples.clear_buffers()
+            if inc_pca is None or inc_pca.components_ is None:
+                return self._return_run_step(self.state_blocked, steps_run=0)
             if self.inc_pca_wtn is not None:
                 samples = ctx.samples.data()
                 if self.needs_reset(inc_pca, self.inc_pca_wtn, input_table, samples):
-                    self.inc_pca_wtn = None
-                    ctx.table.reset()
-                    ctx.table.update(run_number)
-                    self.reset()
-                    indices = ctx.table.created.next(step_size)
-                    steps = indices_len(indices)
-                    if steps == 0:
-                        return self._return_run_step(self.state_blocked, steps_run=0)
+                    self.inc_pca_wtn = inc_pca.copy()
+                    if self._table is not None:
+                        self._stale = bitmap(self._table.index.to_array())
             else:
-                self.inc_pca_wtn = copy.deepcopy(inc_pca)
-            data = self.filter_columns(input_table, fix_loc(indices)).to_array()
-            reduced = inc_pca.transform(data)
-            if self._table is None:
-                df = self._make_df(reduced)
-                self._table = Table(self.generate_table_name('ppca'),
-                                    data=df, create=True)
-            else:
-                self._table.append(reduced)
+                self.inc_pca_wtn = inc_pca.copy()
+            steps = 0
+            if self._stale:
+                steps = self._reproject(inc_pca, input_table, step_size)
+            if steps < step_size and ctx.table.created.any():
+                indices = ctx.table.created.next(step_size - steps,
+                                                 as_slice=False)
+                ids = np.asarray(indices.to_array(), dtype=np.int64)
+                reduced = self._project(inc_pca, input_table, ids)
+                if self._table is None:
+                    df = self._make_df(reduced[:0])
+                    self._table = Table(self.generate_table_name('ppca'),
+                                        data=df, create=True)
+                self._table.append(self._make_df(reduced), indices=ids)
+                steps += len(ids)
+            if steps == 0:
+                return self._return_run_step(self.state_blocked, steps_run=0)
+            if self._stale:
+                return self._return_run_step(self.state_ready, steps_run=steps)
             return self._return_run_step(self.next_state(ctx.table), steps_run=steps)
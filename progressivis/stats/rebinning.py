@@ -0,0 +1,161 @@
+"""
+Histograms with regular bins whose range can be widened by merging
+adjacent bins, without reading the original data again.
+"""
+import numpy as np
+
+from ..core.bitmap import bitmap
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class RebinningHistogram(object):
+    """
+    N-dimensional histogram with a fixed number of regular bins per axis.
+
+    The bins of each axis are aligned on a grid `origin + k * width`. When
+    values fall outside of the range, the range is first shifted and, if
+    needed, the bins are coarsened by merging them by powers of two, so
+    the counts of the bins remain exact. Widening the range costs
+    O(bins) instead of a scan of the data. The counts of the histogram
+    are in `histo`, indexed by axis in the order of `bins`.
+    """
+    def __init__(self, bins, bounds, dtype=np.int64):
+        self.bins = tuple(int(b) for b in bins)
+        self.dtype = dtype
+        self.histo = None
+        self.reset(bounds)
+
+    def reset(self, bounds):
+        "Clear the histogram and set its bounds, a list of (min, max)"
+        assert len(bounds) == len(self.bins)
+        self._origin = [float(lo) for (lo, _) in bounds]
+        self._width = [(float(hi) - float(lo)) / n
+                       for ((lo, hi), n) in zip(bounds, self.bins)]
+        self._start = [0] * len(self.bins)  # first bin index on the grid
+        self.histo = np.zeros(self.bins, dtype=self.dtype)
+
+    def is_empty(self):
+        "Return True if the histogram counts nothing"
+        return not self.histo.any()
+
+    def width(self, axis=0):
+        "Return the width of the bins of an axis"
+        return self._width[axis]
+
+    def bounds(self, axis=0):
+        "Return the (min, max) range of an axis"
+        lo = self._origin[axis] + self._start[axis] * self._width[axis]
+        return (lo, lo + self.bins[axis] * self._width[axis])
+
+    def ranges(self):
+        "Return the list of [min, max] ranges of all the axes"
+        return [list(self.bounds(axis)) for axis in range(len(self.bins))]
+
+    def edges(self, axis=0):
+        "Return the edges of the bins of an axis"
+        lo, hi = self.bounds(axis)
+        return np.linspace(lo, hi, self.bins[axis] + 1)
+
+    def _occupied(self, axis):
+        "Return the first and last non empty bins of an axis on the grid"
+        other = tuple(i for i in range(len(self.bins)) if i != axis)
+        nonzero = np.flatnonzero(self.histo.any(axis=other) if other
+                                 else self.histo)
+        if len(nonzero) == 0:
+            return None
+        return (self._start[axis] + int(nonzero[0]),
+                self._start[axis] + int(nonzero[-1]))
+
+    def cover(self, axis, vmin, vmax):
+        """
+        Widen the range of an axis to contain [vmin, vmax], merging bins if
+        needed. Return True if the bins changed.
+        """
+        lo, hi = self.bounds(axis)
+        if lo <= vmin and vmax < hi:
+            return False
+        if not (np.isfinite(vmin) and np.isfinite(vmax)):
+            logger.warning('Cannot cover non finite range [%s, %s]',
+                           vmin, vmax)
+            return False
+        n = self.bins[axis]
+        origin = self._origin[axis]
+        occupied = self._occupied(axis)
+        factor = 0
+        while True:
+            width = self._width[axis] * 2**factor
+            if not np.isfinite(width):
+                logger.warning('Cannot cover range [%s, %s]', vmin, vmax)
+                return False
+            first = int(np.floor((vmin - origin) / width))
+            last = int(np.floor((vmax - origin) / width))
+            if occupied is not None:
+                first = min(first, occupied[0] >> factor)
+                last = max(last, occupied[1] >> factor)
+            span = last - first + 1
+            if span <= n:
+                start = first - (n - span) // 2  # centers the free bins
+                if (origin + start * width <= vmin and
+                        vmax < origin + (start + n) * width):
+                    break
+            factor += 1
+        self._rebin(axis, factor, start)
+        return True
+
+    def cover_values(self, axis, values):
+        "Widen the range of an axis to contain the finite values"
+        values = np.asarray(values)
+        if values.dtype.kind == 'f':
+            values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return False
+        return self.cover(axis, values.min(), values.max())
+
+    def _rebin(self, axis, factor, start):
+        n = self.bins[axis]
+        ids = np.arange(self._start[axis], self._start[axis] + n)
+        ids = np.floor_divide(ids, 2**factor) - start
+        keep = (ids >= 0) & (ids < n)
+        histo = np.moveaxis(self.histo, axis, 0)
+        assert not histo[~keep].any(), 'non empty bins out of range'
+        rebinned = np.zeros_like(histo)
+        np.add.at(rebinned, ids[keep], histo[keep])
+        self.histo = np.ascontiguousarray(np.moveaxis(rebinned, 0, axis))
+        self._width[axis] *= 2**factor
+        self._start[axis] = start
+        logger.info('Rebinned axis %d by %d, new range %s',
+                    axis, 2**factor, self.bounds(axis))
+
+    def coarseness(self, bounds):
+        """
+        Return how many times wider the bins are than the bins of a
+        histogram created with the specified bounds.
+        """
+        ratio = 1.0
+        for axis, (lo, hi) in enumerate(bounds):
+            target = (hi - lo) / self.bins[axis]
+            if target > 0:
+                ratio = max(ratio, self._width[axis] / target)
+        return ratio
+
+
+class HistogramRefinement(object):
+    """
+    Background rescan of the rows of a table to rebuild a histogram with
+    finer bins. The rows already accounted for when the refinement starts
+    are listed in `todo`, the new rows should be added to `histogram`
+    while the refinement runs.
+    """
+    def __init__(self, histogram, todo):
+        self.histogram = histogram
+        self.todo = bitmap(todo)
+
+    def next(self, length):
+        "Return the next rows to rescan"
+        return self.todo.pop(length)
+
+    def is_done(self):
+        "Return True when all the rows have been rescanned"
+        return len(self.todo) == 0
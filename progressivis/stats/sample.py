@@ -1,16 +1,16 @@
 # -*- coding: utf-8 -*-
-"""Fast Approximate Reservoir Sampling.
-See http://erikerlandson.github.io/blog/2015/11/20/very-fast-reservoir-sampling/
-and https://en.wikipedia.org/wiki/Reservoir_sampling
+"""Fast Reservoir Sampling.
+See https://en.wikipedia.org/wiki/Reservoir_sampling
 
 Vitter, Jeffrey S. (1 March 1985). "Random sampling with a reservoir" (PDF). ACM Transactions on Mathematical Software. 11 (1): 37-57. doi:10.1145/3147.3165.
+Li, Kim-Hung (4 December 1994). "Reservoir-Sampling Algorithms of Time Complexity O(n(1+log(N/n)))". ACM Transactions on Mathematical Software. 20 (4): 481-493. doi:10.1145/198429.198435.
+Efraimidis, Pavlos S.; Spirakis, Paul G. (16 March 2006). "Weighted random sampling with a reservoir". Information Processing Letters. 97 (5): 181-185. doi:10.1016/j.ipl.2005.11.003.
 """
 
 from progressivis import SlotDescriptor
 from ..core.bitmap import bitmap
 from ..table import Table
 from ..table.module import TableModule
-from ..core.utils import indices_len
 from ..table import TableSelectedView
 from ..core.decorators import *
 
@@ -24,23 +24,148 @@ def has_len(d):
     return hasattr(d, '__len__')
 
 
+def _skips(logw):
+    """
+    Draw the gaps between two replacements of Algorithm L for the values
+    of W (in log).
+    """
+    with np.errstate(divide='ignore'):
+        return np.floor(np.log(np.random.rand(len(logw))) /
+                        np.log1p(-np.exp(logw))) + 1
+
+
+class Reservoir(object):
+    """
+    Reservoir sample of at most `k` ids from a stream of ids.
+
+    Without weights, the sample is uniform and maintained with Algorithm L:
+    the gaps between two replacements are drawn directly, by batches with
+    NumPy, so the cost does not depend on the ids skipped. With weights,
+    each id gets the key u**(1/w) (A-ES) and the sample keeps the ids with
+    the k largest keys. The `seen` bitmap holds the ids of the stream, so
+    removed ids are replaced without restarting the stream.
+    """
+    def __init__(self, k, weighted=False):
+        self.k = k
+        self.weighted = weighted
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.keys = np.zeros(0)  # log of the keys, when weighted
+        self.seen = bitmap()
+        self._next = 0  # position in the stream of the next replacement
+        self._logw = 0.0  # log of W in Algorithm L
+
+    def __len__(self):
+        return len(self.seen)
+
+    def _start(self, n):
+        "Draw the next replacement when the reservoir is full at position n"
+        # W is distributed as the k-th smallest of n uniform keys
+        self._logw = np.log(np.random.beta(self.k, n - self.k + 1))
+        self._next = n - 1 + _skips(np.array([self._logw]))[0]
+
+    def _top_keys(self, ids, keys):
+        if len(ids) > self.k:
+            top = np.argpartition(keys, len(keys) - self.k)[-self.k:]
+            ids, keys = ids[top], keys[top]
+        self.ids, self.keys = ids, keys
+
+    def add(self, ids, weights=None):
+        "Add the ids, with their weights when weighted, to the stream"
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        start = len(self.seen)
+        self.seen.update(ids)
+        if self.weighted:
+            with np.errstate(divide='ignore'):
+                keys = np.log(np.random.rand(len(ids))) / weights
+            self._top_keys(np.concatenate([self.ids, ids]),
+                           np.concatenate([self.keys, keys]))
+            return
+        fill = min(len(ids), self.k - len(self.ids))
+        if fill > 0:
+            self.ids = np.concatenate([self.ids, ids[:fill]])
+            if len(self.ids) == self.k:
+                self._start(start + fill)
+        if len(self.ids) < self.k:
+            return
+        end = start + len(ids)
+        accepted = []
+        while self._next < end:
+            # draw the replacements by batches of the expected count
+            count = max(16, int(self.k * np.log(end / (self._next + 1))) + 1)
+            logw = self._logw + np.cumsum(np.log(np.random.rand(count)) /
+                                          self.k)
+            nexts = self._next + np.cumsum(_skips(logw))
+            pos = np.concatenate([[self._next], nexts[:-1]])
+            taken = np.searchsorted(pos, end)
+            accepted.append(pos[:taken])
+            self._next = nexts[taken-1]
+            self._logw = logw[taken-1]
+        if not accepted:
+            return
+        positions = np.concatenate(accepted).astype(np.int64) - start
+        slots = np.random.randint(self.k, size=len(positions))
+        # a slot replaced several times keeps the last id
+        slots, last = np.unique(slots[::-1], return_index=True)
+        self.ids[slots] = ids[positions[::-1][last]]
+
+    def remove(self, ids, weights=None):
+        """
+        Remove the ids from the stream and replace the ones in the sample.
+        When weighted, `weights` is a function returning the weights of the
+        remaining ids.
+        """
+        removed = self.seen & bitmap.asbitmap(ids)
+        if not removed:
+            return
+        self.seen -= removed
+        keep = ~np.isin(self.ids, removed.to_array())
+        lost = len(self.ids) - int(keep.sum())
+        self.ids = self.ids[keep]
+        if self.weighted:
+            self.keys = self.keys[keep]
+            if lost:  # draw new keys for all the ids
+                live = np.asarray(self.seen.to_array(), dtype=np.int64)
+                with np.errstate(divide='ignore'):
+                    keys = np.log(np.random.rand(len(live))) / weights(live)
+                self._top_keys(live, keys)
+            return
+        if lost:  # replace with random ids not in the sample
+            candidates = self.seen - bitmap(self.ids)
+            count = min(lost, len(candidates))
+            picks = np.random.choice(len(candidates), count, replace=False)
+            self.ids = np.concatenate([self.ids,
+                                       np.array([candidates[int(i)]
+                                                 for i in picks],
+                                                dtype=np.int64)])
+        if len(self.ids) == self.k:
+            self._start(len(self.seen))
+
+
 class Sample(TableModule):
+    """
+    Maintain a reservoir sample of `samples` rows of the input table.
+
+    The sample is uniform, or weighted by the `weight_column` values. With
+    a `class_column`, a reservoir of `samples` rows is kept for each value
+    of this column (stratified sampling). Deleted rows are replaced in the
+    sample, and updated rows are sampled again when weighted or stratified.
+    """
     parameters = [('samples',  np.dtype(int), 50)]
     inputs = [SlotDescriptor('table', type=Table)]
     outputs = [SlotDescriptor('select', type=bitmap, required=False)]
 
-    def __init__(self, **kwds):
+    def __init__(self, weight_column=None, class_column=None, **kwds):
         super(Sample, self).__init__(**kwds)
-        self._tmp_table = Table(self.generate_table_name('sample'),
-                                dshape='{select: int64}',
-                                create=True)
-        self._size = 0  # holds the size consumed from the input table so far
+        self._weight_column = weight_column
+        self._class_column = class_column
+        self._reservoirs = {}  # one reservoir per class
         self._bitmap = None
         self._table = None
 
     def reset(self):
-        self._tmp_table.resize(0)
-        self._size = 0
+        self._reservoirs = {}
         self._bitmap = None
         self.get_input_slot('table').reset()
 
@@ -53,75 +178,66 @@ class Sample(TableModule):
 
     def get_bitmap(self):
         if self._bitmap is None:
-            len_ = len(self._tmp_table['select'])
-            # Avoid "ValueError: Iteration of zero-sized operands is not enabled"
-            self._bitmap = bitmap(self._tmp_table['select']) if len_ else bitmap()
+            self._bitmap = bitmap.union(bitmap(),
+                                        *[bitmap(res.ids) for res
+                                          in self._reservoirs.values()])
         return self._bitmap
 
-    @process_slot("table", reset_if='delete', reset_cb="reset")
+    def _column(self, df, name, ids):
+        return df.to_array(locs=ids, columns=[name])[:, 0]
+
+    def _weights(self, df, ids):
+        return self._column(df, self._weight_column,
+                            ids).astype(np.float64)
+
+    def _reservoir(self, cls):
+        res = self._reservoirs.get(cls)
+        if res is None:
+            res = Reservoir(int(self.params.samples),
+                            self._weight_column is not None)
+            self._reservoirs[cls] = res
+        return res
+
+    def _add(self, df, ids):
+        if self._class_column is None:
+            groups = [(None, ids)]
+        else:
+            classes = self._column(df, self._class_column, ids)
+            uniq, inverse = np.unique(classes, return_inverse=True)
+            order = np.argsort(inverse, kind='stable')
+            bounds = np.cumsum(np.bincount(inverse))[:-1]
+            groups = zip(uniq.tolist(), np.split(ids[order], bounds))
+        for (cls, group) in groups:
+            weights = None
+            if self._weight_column is not None:
+                weights = self._weights(df, group)
+            self._reservoir(cls).add(group, weights)
+
+    @process_slot("table", reset_if=False, reset_cb="reset")
     @run_if_any
-    def run_step(self,run_number,step_size,howlong):
+    def run_step(self, run_number, step_size, howlong):
         with self.context as ctx:
+            dfslot = ctx.table
+            df = dfslot.data()
             if self._table is None:
-                self._table = TableSelectedView(ctx.table.data(), bitmap([]))
-            indices = ctx.table.created.next(step_size, as_slice=False)
-            steps = indices_len(indices)
-            k = int(self.params.samples)
-            reservoir = self._tmp_table
-            res = reservoir['select']
-            size = self._size # cache in local variable
-            if size < k:
-                logger.info('Filling the reservoir %d/%d', size, k)
-                # fill the reservoir array until it contains k elements
-                rest = indices.pop(k-size)
-                reservoir.append({'select': rest})
-                size = len(reservoir)
-
-            if len(indices)==0: # nothing else to do
-                self._size = size
-                if steps:
-                    self._bitmap = None
-                return self._return_run_step(self.state_blocked, steps_run=steps)
-
-            t = 4 * k
-            # Threshold (t) determines when to start fast sampling
-            # logic. The optimal value for (t) may vary depending on RNG
-            # performance characteristics.
-
-            if size < t and len(indices)!=0:
-                logger.info('Normal sampling from %d to %d', size, t)
-            while size < t and len(indices)!=0:
-                # Normal reservoir sampling is fastest up to (t) samples
-                j = np.random.randint(size)
-                if j < k:
-                    res[j] = indices.pop()[0]
-                size += 1
-
-            if len(indices)==0:
-                self._size = size
-                if steps:
-                    self._bitmap = None
-                return self._return_run_step(self.state_blocked, steps_run=steps)
-
-            logger.info('Fast sampling with %d indices', len(indices))
-            while indices:
-                # draw gap size (g) from geometric distribution with probability p = k / size
-                p = k / size
-                u = np.random.rand()
-                g = int(np.floor(np.log(u) / np.log(1-p)))
-                # advance over the gap, and assign next element to the reservoir
-                if (g+1) < len(indices):
-                    j = np.random.randint(k)
-                    res[j] = indices[g]
-                    indices.pop(g+1)
-                    size += g+1
-                else:
-                    size += len(indices)
-                    break
-
-            self._size = size
+                self._table = TableSelectedView(df, bitmap([]))
+            removed = bitmap()
+            added = bitmap()
+            if dfslot.deleted.any():
+                removed |= dfslot.deleted.next(as_slice=False)
+            if dfslot.updated.any():
+                updated = dfslot.updated.next(as_slice=False)
+                if self._weight_column or self._class_column:
+                    removed |= updated
+                    added |= updated
+            if removed:
+                for res in self._reservoirs.values():
+                    res.remove(removed, lambda ids: self._weights(df, ids))
+            added |= dfslot.created.next(step_size, as_slice=False)
+            steps = len(removed) + len(added)
+            if added:
+                self._add(df, np.asarray(added.to_array(), dtype=np.int64))
             if steps:
                 self._bitmap = None
-            return self._return_run_step(self.state_blocked, steps_run=steps)
-
-
+            return self._return_run_step(self.next_state(dfslot),
+                                         steps_run=steps)
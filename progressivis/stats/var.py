@@ -11,10 +11,25 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-# Should translate that to Cython eventually
+def chunk_moments(values):
+    """
+    Return the count, mean and sum of squared deviations from the mean
+    of the non-nan values of a chunk.
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1)
+    values = values[~np.isnan(values)]
+    n = len(values)
+    if n == 0:
+        return 0, 0.0, 0.0
+    mean = values.mean()
+    centered = values - mean
+    return n, mean, np.dot(centered, centered)
+
+
 class OnlineVariance(object):
     """
-    Welford's algorithm computes the sample variance incrementally.
+    Welford's algorithm computes the sample variance incrementally,
+    chunks are folded in with Chan et al. parallel formula.
     """
 
     def __init__(self, ddof=1):
@@ -24,8 +39,7 @@ class OnlineVariance(object):
 
     def add(self, iterable):
         if iterable is not None:
-            for datum in iterable:
-                self.include(datum)
+            self.merge(*chunk_moments(iterable))
 
     def include(self, datum):
         if np.isnan(datum): return
@@ -33,13 +47,75 @@ class OnlineVariance(object):
         self.delta = datum - self.mean
         self.mean += self.delta / self.n
         self.M2 += self.delta * (datum - self.mean)
-        self.variance = self.M2 / (self.n - self.ddof)
+        self._update_variance()
+
+    def merge(self, n, mean, M2):
+        """
+        Merge the moments of another set of values, computed
+        with chunk_moments or by another OnlineVariance.
+        """
+        if n == 0:
+            return
+        total = self.n + n
+        self.delta = mean - self.mean
+        self.mean += self.delta * n / total
+        self.M2 += M2 + self.delta * self.delta * self.n * n / total
+        self.n = total
+        self._update_variance()
+
+    def _update_variance(self):
+        if self.n > self.ddof:
+            self.variance = self.M2 / (self.n - self.ddof)
+        else:
+            self.variance = np.nan
 
     @property
     def std(self):
         return np.sqrt(self.variance)
 
 
+class OnlineCovariance(object):
+    """
+    Incremental covariance matrix of a group of columns, chunks
+    are folded in with Chan et al. parallel formula.
+    """
+
+    def __init__(self, ddof=1):
+        self.ddof, self.n, self.mean, self.C = ddof, 0, None, None
+
+    def add(self, data):
+        "Add a 2D array with one row per observation, rows with nan are skipped"
+        data = np.asarray(data, dtype=np.float64)
+        data = data[~np.isnan(data).any(axis=1)]
+        n = len(data)
+        if n == 0:
+            return
+        mean = data.mean(axis=0)
+        centered = data - mean
+        self.merge(n, mean, np.dot(centered.T, centered))
+
+    def merge(self, n, mean, C):
+        "Merge the count, mean and co-moment matrix of another set of rows"
+        if n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.C = n, np.array(mean), np.array(C)
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.C = self.C + C + np.outer(delta, delta) * (self.n * n / total)
+        self.mean = self.mean + delta * (n / total)
+        self.n = total
+
+    @property
+    def covariance(self):
+        if self.C is None:
+            return None
+        if self.n <= self.ddof:
+            return np.full(self.C.shape, np.nan)
+        return self.C / (self.n - self.ddof)
+
+
 class Var(TableModule):
     """
     Compute the variance of the columns of an input dataframe.
@@ -51,7 +127,7 @@ class Var(TableModule):
         super(Var, self).__init__(dataframe_slot='table', **kwds)
         self._columns = columns
         self._data = {}
-        self.default_step_size = 1000
+        self.default_step_size = 10000
 
     def is_ready(self):
         if self.get_input_slot('table').created.any():
@@ -66,12 +142,13 @@ class Var(TableModule):
             if data is None:
                 data = OnlineVariance()
                 self._data[c] = data
-            data.add(chunk[c])
+            data.add(chunk[c].values)
             ret[c] = data.variance
         return ret
 
     def reset(self):
         self._table = None
+        self._data = {}
 
     @process_slot("table", reset_cb="reset")
     @run_if_any
@@ -89,7 +166,6 @@ class Var(TableModule):
                                     dshape=input_df.dshape,
                                     create=True)
             self._table.append(op, indices=[run_number])
-            print(self._table)
 
             if len(self._table) > self.params.history:
                 self._table = self._table.loc[self._table.index[-self.params.history:]]
@@ -10,6 +10,9 @@ numpyengine = NumpyStorageEngine()
 from .mmap import MMapStorageEngine
 #mmapengine = MMapStorageEngine()
 
+from .chunked import ChunkedStorageEngine
+chunkedengine = ChunkedStorageEngine()
+
 if get_option('storage.default'):
     StorageEngine.default = get_option('storage.default')
 
@@ -0,0 +1,409 @@
+"""
+Numpy arrays stored in fixed-size compressed chunks.
+
+Each dataset is split along its first axis in chunks of `chunklen` rows,
+compressed with a numcodecs compressor after optional filters (e.g.
+Delta). A small LRU cache keeps the most recently used chunks
+decompressed; modified chunks are compressed again when evicted.
+"""
+from collections import OrderedDict
+import threading
+import logging
+
+import numpy as np
+from numcodecs import Blosc, Pickle
+from numcodecs.compat import ensure_ndarray
+
+from progressivis.core.utils import integer_types, get_random_name
+from .base import StorageEngine, Dataset
+from .hierarchy import GroupImpl, AttributeImpl
+
+logger = logging.getLogger(__name__)
+
+OBJECT = np.dtype('O')
+CHUNK_BYTES = 256 * 1024  # uncompressed size of a chunk
+CACHE_SIZE = 8  # number of decompressed chunks kept per dataset
+
+
+def default_compressor():
+    "Return the default compressor, fast lz4 with byte shuffling."
+    return Blosc(cname='lz4', clevel=5, shuffle=Blosc.SHUFFLE)
+
+
+class ChunkedDataset(Dataset):
+    """
+    Dataset storing its rows in compressed chunks, decompressed on demand.
+    """
+    def __init__(self, name, shape=None, dtype=None, data=None,
+                 chunklen=None, compressor='default', filters=None,
+                 cache_size=CACHE_SIZE, **kwds):
+        self._name = name
+        if data is not None:
+            data = np.asarray(data, dtype=dtype)
+            shape = data.shape
+            dtype = data.dtype
+        if dtype is None:
+            raise ValueError('dtype required when no data is provided')
+        self._dtype = np.dtype(dtype)
+        self._shape = tuple(shape) if shape else (0,)
+        if 'maxshape' in kwds:
+            del kwds['maxshape']
+        if 'fillvalue' in kwds:
+            self._fillvalue = kwds.pop('fillvalue')
+        elif self._dtype == OBJECT:
+            self._fillvalue = ''
+        elif np.issubdtype(self._dtype, np.floating):
+            self._fillvalue = np.nan
+        else:
+            self._fillvalue = 0
+        if kwds:
+            logger.warning('Ignored keywords in ChunkedDataset: %s', kwds)
+        if chunklen is None:
+            rowbytes = self._dtype.itemsize * _shape_len(self._shape[1:])
+            chunklen = max(1, CHUNK_BYTES // max(1, rowbytes))
+        self._chunklen = int(chunklen)
+        if compressor == 'default':
+            compressor = default_compressor()
+        self._compressor = compressor
+        self._filters = list(filters) if filters else []
+        if self._dtype == OBJECT:
+            self._filters.insert(0, Pickle())
+        self._cache_size = max(1, cache_size)
+        self._cache = OrderedDict()  # chunk number -> [array, dirty]
+        self._chunks = [None] * self._nchunks(self._shape[0])  # None: filled
+        self._lock = threading.RLock()
+        self._attrs = AttributeImpl()
+        if data is not None:
+            self[:] = data
+
+    def _nchunks(self, length):
+        return (length + self._chunklen - 1) // self._chunklen
+
+    def _encode(self, array):
+        data = array
+        for codec in self._filters:
+            data = codec.encode(data)
+        if self._compressor is not None:
+            data = self._compressor.encode(data)
+        return bytes(data)
+
+    def _decode(self, buf):
+        data = buf
+        if self._compressor is not None:
+            data = self._compressor.decode(data)
+        for codec in reversed(self._filters):
+            data = codec.decode(data)
+        chunkshape = (self._chunklen,) + self._shape[1:]
+        if self._dtype == OBJECT:
+            return np.asarray(data, dtype=OBJECT).reshape(chunkshape)
+        array = ensure_ndarray(data).view(self._dtype).reshape(chunkshape)
+        if not array.flags.writeable:
+            array = array.copy()
+        return array
+
+    def _chunk(self, num, dirty=False):
+        "Return the decompressed chunk `num`, loading it in the cache."
+        entry = self._cache.get(num)
+        if entry is not None:
+            self._cache.move_to_end(num)
+            entry[1] |= dirty
+            return entry[0]
+        buf = self._chunks[num]
+        if buf is None:
+            array = np.full((self._chunklen,) + self._shape[1:],
+                            self._fillvalue, dtype=self._dtype)
+        else:
+            array = self._decode(buf)
+        self._cache[num] = [array, dirty]
+        while len(self._cache) > self._cache_size:
+            old, (oldarray, olddirty) = self._cache.popitem(last=False)
+            if olddirty:
+                self._chunks[old] = self._encode(oldarray)
+        return array
+
+    def flush(self):
+        "Compress the modified chunks kept in the cache."
+        with self._lock:
+            for num, entry in self._cache.items():
+                if entry[1]:
+                    self._chunks[num] = self._encode(entry[0])
+                    entry[1] = False
+
+    @staticmethod
+    def _split_args(args):
+        if args is None or args is Ellipsis:
+            return slice(None), ()
+        if isinstance(args, tuple):
+            if not args:
+                return slice(None), ()
+            return args[0], args[1:]
+        return args, ()
+
+    def _normalize(self, index):
+        """Return the row index as an int, a slice with a step of 1, or an
+        array of non-negative ints."""
+        length = self._shape[0]
+        if isinstance(index, integer_types):
+            index = int(index)
+            if index < 0:
+                index += length
+            if not 0 <= index < length:
+                raise IndexError('index %d out of bounds' % index)
+            return index
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            if step == 1:
+                return slice(start, max(start, stop))
+            return np.arange(start, stop, step)
+        index = np.asarray(index)
+        if index.dtype == bool:
+            if len(index) != length:
+                raise IndexError('boolean index of wrong length %d' %
+                                 len(index))
+            return np.flatnonzero(index)
+        index = index.astype(np.int64).reshape(-1)
+        index = np.where(index < 0, index + length, index)
+        if len(index) and (index.min() < 0 or index.max() >= length):
+            raise IndexError('index out of bounds')
+        return index
+
+    def _slice_pieces(self, index):
+        "Iterate over (chunk, start, stop) covering the slice"
+        start, stop = index.start, index.stop
+        while start < stop:
+            num = start // self._chunklen
+            offset = num * self._chunklen
+            end = min(stop, offset + self._chunklen)
+            yield num, start - offset, end - offset
+            start = end
+
+    def _index_groups(self, index):
+        "Iterate over (chunk, positions in index) for an array of indices"
+        nums = index // self._chunklen
+        order = np.argsort(nums, kind='stable')
+        sorted_nums = nums[order]
+        bounds = np.flatnonzero(np.diff(sorted_nums)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(index)]))
+        for start, end in zip(starts, ends):
+            if start < end:
+                yield int(sorted_nums[start]), order[start:end]
+
+    def __getitem__(self, args):
+        index, rest = self._split_args(args)
+        index = self._normalize(index)
+        chunklen = self._chunklen
+        with self._lock:
+            if isinstance(index, int):
+                chunk = self._chunk(index // chunklen)
+                res = chunk[(index % chunklen,) + rest]
+                return res.copy() if isinstance(res, np.ndarray) else res
+            if isinstance(index, slice):
+                res = np.empty((index.stop - index.start,) + self._shape[1:],
+                               dtype=self._dtype)
+                pos = 0
+                for num, start, stop in self._slice_pieces(index):
+                    res[pos:pos + stop - start] = self._chunk(num)[start:stop]
+                    pos += stop - start
+            else:
+                res = np.empty((len(index),) + self._shape[1:],
+                               dtype=self._dtype)
+                for num, sel in self._index_groups(index):
+                    res[sel] = self._chunk(num)[index[sel] - num * chunklen]
+        if rest:
+            res = res[(slice(None),) + rest]
+        return res
+
+    def __setitem__(self, args, val):
+        index, rest = self._split_args(args)
+        index = self._normalize(index)
+        chunklen = self._chunklen
+        with self._lock:
+            if isinstance(index, int):
+                chunk = self._chunk(index // chunklen, dirty=True)
+                chunk[(index % chunklen,) + rest] = val
+                return
+            if isinstance(index, slice):
+                nrows = index.stop - index.start
+            else:
+                nrows = len(index)
+            subshape = np.empty((1,) + self._shape[1:],
+                                dtype=bool)[(slice(None),) + rest].shape[1:]
+            if self._dtype == OBJECT:
+                val = np.asarray(val, dtype=OBJECT)
+            val = np.broadcast_to(val, (nrows,) + subshape)
+            if isinstance(index, slice):
+                pos = 0
+                for num, start, stop in self._slice_pieces(index):
+                    chunk = self._chunk(num, dirty=True)
+                    chunk[(slice(start, stop),) + rest] = \
+                        val[pos:pos + stop - start]
+                    pos += stop - start
+            else:
+                for num, sel in self._index_groups(index):
+                    chunk = self._chunk(num, dirty=True)
+                    chunk[(index[sel] - num * chunklen,) + rest] = val[sel]
+
+    def _reshape_chunks(self, subshape):
+        "Change the shape of the dimensions after the first one."
+        self.flush()
+        self._cache.clear()
+        oldshape = self._shape
+        common = tuple(slice(0, min(o, n))
+                       for (o, n) in zip(oldshape[1:], subshape))
+        self._shape = (oldshape[0],) + tuple(subshape)
+        for num, buf in enumerate(self._chunks):
+            if buf is None:
+                continue
+            old = self._decode_shape(buf, oldshape)
+            array = np.full((self._chunklen,) + tuple(subshape),
+                            self._fillvalue, dtype=self._dtype)
+            array[(slice(None),) + common] = old[(slice(None),) + common]
+            self._chunks[num] = self._encode(array)
+
+    def _decode_shape(self, buf, shape):
+        saved = self._shape
+        self._shape = shape
+        try:
+            return self._decode(buf)
+        finally:
+            self._shape = saved
+
+    def resize(self, size, axis=None):
+        if isinstance(size, integer_types):
+            shape = (int(size),) + self._shape[1:]
+        else:
+            shape = tuple(int(s) for s in size)
+        with self._lock:
+            if shape[1:] != self._shape[1:]:
+                self._reshape_chunks(shape[1:])
+            length = shape[0]
+            nchunks = self._nchunks(length)
+            if length < self._shape[0]:
+                del self._chunks[nchunks:]
+                for num in [n for n in self._cache if n >= nchunks]:
+                    del self._cache[num]
+                # keep the invariant that rows past the end are filled
+                if length % self._chunklen:
+                    chunk = self._chunk(length // self._chunklen, dirty=True)
+                    chunk[length % self._chunklen:] = self._fillvalue
+            else:
+                self._chunks.extend([None] * (nchunks - len(self._chunks)))
+            self._shape = shape
+
+    @property
+    def nbytes(self):
+        "Size of the data when uncompressed."
+        return _shape_len(self._shape) * self._dtype.itemsize
+
+    @property
+    def cbytes(self):
+        "Size of the compressed chunks, after compressing the cached ones."
+        self.flush()
+        return sum(len(buf) for buf in self._chunks if buf is not None)
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def maxshape(self):
+        return self._shape
+
+    @property
+    def fillvalue(self):
+        return self._fillvalue
+
+    @property
+    def chunks(self):
+        return (self._chunklen,) + self._shape[1:]
+
+    @property
+    def size(self):
+        return self._shape[0]
+
+    def __len__(self):
+        return self._shape[0]
+
+    @property
+    def attrs(self):
+        return self._attrs
+
+    @property
+    def name(self):
+        return self._name
+
+
+def _shape_len(shape):
+    length = 1
+    for dim in shape:
+        length *= dim
+    return length
+
+
+class ChunkedGroup(GroupImpl):
+    """
+    Group of compressed chunked datasets. The keywords `compressor`,
+    `filters`, `chunklen` and `cache_size` given to the group are used
+    as defaults when creating its datasets.
+    """
+    def __init__(self, name=None, parent=None, **dataset_kwds):
+        if name is None:
+            name = get_random_name("chunked_")
+        super(ChunkedGroup, self).__init__(name, parent=parent)
+        self._dataset_kwds = dataset_kwds
+
+    def create_dataset(self, name, shape=None, dtype=None, data=None, **kwds):
+        if name in self.dict:
+            raise KeyError('name %s already defined' % name)
+        chunks = kwds.pop('chunks', None)
+        for key, value in self._dataset_kwds.items():
+            kwds.setdefault(key, value)
+        if 'chunklen' not in kwds and chunks is not None and dtype is not None:
+            # honor the chunk size hint when larger than ours
+            if isinstance(chunks, tuple):
+                chunks = chunks[0]
+            rowbytes = np.dtype(dtype).itemsize * \
+                _shape_len((shape or (0,))[1:])
+            kwds['chunklen'] = max(int(chunks),
+                                   CHUNK_BYTES // max(1, rowbytes))
+        fillvalue = kwds.pop('fillvalue', None)
+        if fillvalue is None:
+            if dtype is not None and np.dtype(dtype) == OBJECT:
+                fillvalue = ''
+            else:
+                fillvalue = 0
+        arr = ChunkedDataset(name, shape=shape, dtype=dtype, data=data,
+                             fillvalue=fillvalue, **kwds)
+        self.dict[name] = arr
+        return arr
+
+    def _create_group(self, name, parent):
+        return ChunkedGroup(name, parent=parent, **self._dataset_kwds)
+
+    def flush(self):
+        "Compress all the modified chunks of the datasets and subgroups."
+        for obj in self.dict.values():
+            obj.flush()
+
+
+class ChunkedStorageEngine(StorageEngine, ChunkedGroup):
+    "StorageEngine for compressed chunked storage"
+    def __init__(self, **dataset_kwds):
+        StorageEngine.__init__(self, "chunked")
+        ChunkedGroup.__init__(self, '/', None, **dataset_kwds)
+
+    def flush(self):
+        ChunkedGroup.flush(self)
+
+    def __contains__(self, name):
+        return ChunkedGroup.__contains__(self, name)
+
+    @staticmethod
+    def create_group(name=None, create=True):
+        _ = create  # for pylint
+        return ChunkedGroup(name)
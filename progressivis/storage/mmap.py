@@ -34,8 +34,11 @@ class MMapDataset(Dataset):
     Can grow as desired without needing any copy.
     """
     #datasets = []
-    def __init__(self, path, name, shape=None, dtype=None, data=None, **kwds):
-        "Create a MMapDataset."
+    def __init__(self, path, name, shape=None, dtype=None, data=None,
+                 dictionary=False, **kwds):
+        """Create a MMapDataset.
+        For object columns, `dictionary=True` stores each distinct value once.
+        """
         self._name = name
         self._filename = os.path.join(path, name)
         self._metafile = os.path.join(path, METADATA_FILE+'.'+name)
@@ -63,7 +66,8 @@ class MMapDataset(Dataset):
                 # NB: shape=(1,) means single empty string, offset=0, so shared by all
                 # entries in self.base
             #self._strings = MMapDataset(path, name+"_strings", shape=(1,), dtype=np.int8)
-            self._strings = MMapObject(self._filename+"_strings")
+            self._strings = MMapObject(self._filename+"_strings",
+                                       dictionary=dictionary)
             if data is not None:
                 pass # TODO: ...
             dtype = np.dtype(np.int64)
@@ -113,9 +117,8 @@ class MMapDataset(Dataset):
         assert self._buffer is not None
         if end is None:
             end = start + len(data)
-        if self.base.dtype == OBJECT:
-            for i, v in enumerate(data):
-                self._set_value_at(start+i, v)
+        if self._strings is not None:
+            self.view[start:end] = self._strings.add_many(data)
         else:
             self.view[start:end] = np.asarray(data)
 
@@ -244,32 +247,27 @@ class MMapDataset(Dataset):
             if offset == -1:
                 return None
             return self._strings.get(offset)
-        elif isinstance(args, slice):
-            stop_ = args.stop if args.stop is not None else len(self.view)
-            args = range(*args.indices(stop_))
-        res = np.empty((len(args),),dtype=OBJECT)
-        for k, i in enumerate(args):
-            offset = self.view[i]
-            if offset == -1:
-                res[k] = None
-                continue
-            res[k] = self._strings.get(offset)
-        return np.array(res, dtype=OBJECT)
+        if isinstance(args, tuple):
+            args = list(args)
+        return self._strings.get_many(self.view[args])
 
     def __setitem__(self, args, val):
         if self.dtype != OBJECT:
             self.view[args] = val
             return
         if isinstance(args, integer_types):
-            args = (args,)
-            val = (val,)
-        elif isinstance(args, slice):
-            stop_ = args.stop if args.stop is not None else len(self.view)
-            args = range(*args.indices(stop_))
-        for i, k in enumerate(args):
-            self.view[k]  = self._strings.set_at(self.view[k], val[i])
-            #if new_idx != k:
-            #    view[k] = new_idx
+            self.view[args] = self._strings.set_at(self.view[args], val)
+            return
+        if isinstance(args, tuple):
+            args = list(args)
+        offsets = self.view[args]
+        for offset in np.unique(offsets).tolist():
+            if offset != -1:
+                self._strings.release(offset)
+        if isinstance(val, str):
+            val = [val]
+        val = np.broadcast_to(np.asarray(val, dtype=OBJECT), offsets.shape)
+        self.view[args] = self._strings.add_many(val, with_reuse=True)
 
     def __len__(self):
         return self.view.shape[0]
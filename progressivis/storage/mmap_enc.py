@@ -22,7 +22,15 @@ def _ofs(idx):
     return (idx+1)*WB
 
 class MMapObject(object):
-    def __init__(self, filename):
+    """
+    Objects (mostly strings) marshalled in a mmap file, each one
+    referenced by its offset in words.
+
+    In dictionary mode, each distinct object is stored once and shared
+    by all its references; this is efficient for low-cardinality columns.
+    The entries are then never released.
+    """
+    def __init__(self, filename, dictionary=False):
         if os.path.isfile(filename):
             self._file = open(filename, "r+b")
             self._new_file = False
@@ -35,6 +43,7 @@ class MMapObject(object):
         if self._new_file:
             self.sizes[0] = 1
         self._freelist = [bitmap() for _ in range(FREELIST_SIZE)]
+        self._dictionary = {} if dictionary else None
 
     def _allocate(self, size):
         self.mmap.resize(size*PAGESIZE)
@@ -72,6 +81,8 @@ class MMapObject(object):
         return self.get(idx)
 
     def add(self, obj):
+        if self._dictionary is not None:
+            return self._add_many_dictionary([obj])[0]
         buf = self.encode(obj)
         lb = len(buf)
         if lb >= MAX_SHORT:
@@ -83,7 +94,7 @@ class MMapObject(object):
         return self._add_long(buf, lb, with_reuse=False)
         
     def release(self, idx):
-        if not idx:
+        if not idx or self._dictionary is not None:
             return
         lb = self.sizes[idx]*WB
         if lb <= MAX_SHORT:
@@ -128,6 +139,8 @@ class MMapObject(object):
     def set_at(self, idx, obj):
         if idx < 0 or idx > len(self):
             raise IndexError('index %d is out of range' % idx)
+        if self._dictionary is not None:
+            return self.add(obj)
         buf = self.encode(obj)
         lb = len(buf)
         self.release(idx)
@@ -136,6 +149,110 @@ class MMapObject(object):
         # long string case
         return self._add_long(buf, lb, with_reuse=True)
 
+    def add_many(self, objs, with_reuse=False):
+        """
+        Add all the objects at once and return the array of their indices.
+        None values are not stored and get the index -1. With `with_reuse`,
+        the long objects first take the released entries of their size
+        class, like in `set_at`; the others are written contiguously at
+        the end of the file.
+        """
+        objs = np.asarray(objs, dtype=object).reshape(-1)
+        if self._dictionary is not None:
+            return self._add_many_dictionary(objs)
+        res = np.full(len(objs), -1, dtype=np.int64)
+        valid = np.flatnonzero(np.not_equal(objs, None))
+        if len(valid) == 0:
+            return res
+        bufs = [self.encode(obj) for obj in objs[valid]]
+        if with_reuse and any(self._freelist):
+            reused = np.array([self._reuse(buf) for buf in bufs],
+                              dtype=np.int64)
+            res[valid] = reused
+            bufs = [buf for (buf, idx) in zip(bufs, reused) if idx == -1]
+            valid = valid[reused == -1]
+        if len(valid):
+            res[valid] = self._append_bufs(bufs)
+        return res
+
+    def _reuse(self, buf):
+        "Write buf in a released entry if there is one, return its index"
+        lb = len(buf)
+        if lb < MAX_SHORT:
+            return -1
+        idx = self._get_from_freelist(lb+1)
+        if idx != -1:
+            bufsize = lb + WB - lb%WB
+            off = _ofs(idx)
+            self.mmap[off:off+bufsize] = buf + b'\x00'*(bufsize-lb)
+        return idx
+
+    def _add_many_dictionary(self, objs):
+        dictionary = self._dictionary
+        res = np.empty(len(objs), dtype=np.int64)
+        new_objs = {}
+        for i, obj in enumerate(objs):
+            if obj is None:
+                res[i] = -1
+                continue
+            idx = dictionary.get(obj)
+            if idx is None:
+                idx = new_objs.setdefault(obj, -2 - len(new_objs))
+            res[i] = idx
+        if new_objs:
+            indices = self._append_bufs([self.encode(obj) for obj in new_objs])
+            dictionary.update(zip(new_objs, indices.tolist()))
+            new = res < -1
+            res[new] = indices[-2 - res[new]]
+        return res
+
+    def _append_bufs(self, bufs):
+        """Write the encoded buffers in one arena at the end of the file,
+        using the layout of `_add_long`, and return their indices."""
+        lengths = np.fromiter((len(buf) for buf in bufs), dtype=np.int64,
+                              count=len(bufs))
+        words = lengths // WB + 1  # payload size in words, with padding
+        # each entry is one size word followed by the payload words
+        starts = np.cumsum(words + 1) - (words + 1)
+        total = int(starts[-1] + words[-1] + 1)
+        first = len(self)
+        arena = np.zeros(total * WB, dtype=np.uint8)
+        arena.view(np.uint32)[starts] = words
+        data = np.frombuffer(b''.join(bufs), dtype=np.uint8)
+        data_starts = np.cumsum(lengths) - lengths
+        dest = np.repeat((starts + 1) * WB - data_starts, lengths)
+        dest += np.arange(len(data))
+        arena[dest] = data
+        offset = first * WB  # byte offset of the first size word
+        self.resize(offset + len(arena) + WB)
+        self.mmap[offset:offset+len(arena)] = arena.tobytes()
+        self.sizes[0] = first + total
+        return starts + first
+
+    def get_many(self, indices):
+        """
+        Return an array of objects from an array of indices, decoding each
+        distinct index once. Negative indices return None.
+        """
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        res = np.empty(len(indices), dtype=object)
+        if len(indices) == 0:
+            return res
+        uniq, inverse = np.unique(indices, return_inverse=True)
+        if uniq[-1] >= len(self):
+            raise IndexError('index %d is out of range' % uniq[-1])
+        values = np.empty(len(uniq), dtype=object)
+        mmap_ = self.mmap
+        decode = self.decode
+        sizes = self.sizes[np.maximum(uniq, 0)].astype(np.int64) * WB
+        offsets = (uniq + 1) * WB
+        for i, (idx, off, size) in enumerate(zip(uniq.tolist(),
+                                                 offsets.tolist(),
+                                                 sizes.tolist())):
+            values[i] = None if idx < 0 else decode(mmap_[off:off+size])
+        res[:] = values[inverse]
+        return res
+
     def close(self):
         if self.mmap is not None:
             self.mmap.close()
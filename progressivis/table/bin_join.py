@@ -33,7 +33,18 @@ class BinJoin(TableModule):
         second_slot = self.get_input_slot('second')
         # second_slot.update(run_number)
         steps = 0
-        if first_slot.deleted.any() or second_slot.deleted.any():
+        deleted = {}
+        if self.join_kwds.get('on') is not None:
+            # the hash join processes the deletions incrementally
+            if first_slot.deleted.any():
+                indices = first_slot.deleted.next()
+                steps += indices_len(indices)
+                deleted["table"] = indices
+            if second_slot.deleted.any():
+                indices = second_slot.deleted.next()
+                steps += indices_len(indices)
+                deleted["other"] = indices
+        elif first_slot.deleted.any() or second_slot.deleted.any():
             first_slot.reset()
             second_slot.reset()
             if self._table is not None:
@@ -64,10 +75,10 @@ class BinJoin(TableModule):
         if not self._dialog.is_started:
             join_start(first_table, second_table,
                        dialog=self._dialog,
-                       created=created, updated=updated,
+                       created=created, updated=updated, deleted=deleted,
                        **self.join_kwds)
         else:
             join_cont(first_table, second_table,
                       dialog=self._dialog,
-                      created=created, updated=updated)
+                      created=created, updated=updated, deleted=deleted)
         return self._return_run_step(self.next_state(first_slot), steps_run=steps)
@@ -37,3 +37,79 @@ class BufferedMatrix(object):
                 logger.debug('Base matrix copied')
         self._mat = self._base[0:l,0:l]
         return self._mat
+
+
+class TiledMatrix(object):
+    """
+    Square matrix stored by square tiles of `tile_size`, allocated when
+    first written. Growing the matrix never copies the existing tiles.
+    When a `group` is provided, e.g. an MMapGroup, the tiles are datasets
+    of that group and can spill to disk.
+    """
+    def __init__(self, tile_size=1024, group=None, dtype=np.float64):
+        self.tile_size = tile_size
+        self.group = group
+        self.dtype = np.dtype(dtype)
+        self._tiles = {}
+        self._size = 0
+
+    def reset(self):
+        if self.group is not None:
+            self.group.delete_children()
+            self.group.dict.clear()
+        self._tiles = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def resize(self, l):
+        "Change the size of the matrix, new tiles are allocated lazily"
+        self._size = l
+
+    def _tile(self, row, col):
+        tile = self._tiles.get((row, col))
+        if tile is None:
+            shape = (self.tile_size, self.tile_size)
+            if self.group is None:
+                tile = np.empty(shape, dtype=self.dtype)
+            else:
+                tile = self.group.create_dataset('tile_%d_%d' % (row, col),
+                                                 shape=shape,
+                                                 dtype=self.dtype)
+            self._tiles[(row, col)] = tile
+        return tile
+
+    def _spans(self, start, stop):
+        "Iterate over (tile, start, stop, offset) covering [start, stop)"
+        size = self.tile_size
+        while start < stop:
+            tile, begin = divmod(start, size)
+            end = min(stop - tile * size, size)
+            yield tile, begin, end, start
+            start = tile * size + end
+
+    def set_block(self, row, col, values):
+        "Set the block of values with its top left corner at (row, col)"
+        nrows, ncols = values.shape
+        assert row + nrows <= self._size and col + ncols <= self._size
+        for (trow, rbeg, rend, rstart) in self._spans(row, row + nrows):
+            for (tcol, cbeg, cend, cstart) in self._spans(col, col + ncols):
+                self._tile(trow, tcol)[rbeg:rend, cbeg:cend] = \
+                    values[rstart-row:rstart-row+rend-rbeg,
+                           cstart-col:cstart-col+cend-cbeg]
+
+    def get_block(self, row, col, nrows, ncols):
+        "Return a copy of the block of values at (row, col)"
+        assert row + nrows <= self._size and col + ncols <= self._size
+        values = np.empty((nrows, ncols), dtype=self.dtype)
+        for (trow, rbeg, rend, rstart) in self._spans(row, row + nrows):
+            for (tcol, cbeg, cend, cstart) in self._spans(col, col + ncols):
+                values[rstart-row:rstart-row+rend-rbeg,
+                       cstart-col:cstart-col+cend-cbeg] = \
+                    self._tile(trow, tcol)[rbeg:rend, cbeg:cend]
+        return values
+
+    def matrix(self):
+        "Return a copy of the whole matrix"
+        return self.get_block(0, 0, self._size, self._size)
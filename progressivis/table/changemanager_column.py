@@ -10,6 +10,8 @@ class ColumnChangeManager(BaseChangeManager):
     """
     Manage changes that occured in a Column between runs.
     """
+    notifies = True
+
     def __init__(self,
                  slot,
                  buffer_created=True,
@@ -12,6 +12,8 @@ class TableChangeManager(BaseChangeManager):
     """
     Manage changes that occured in a Table between runs.
     """
+    notifies = True
+
     def __init__(self,
                  slot,
                  buffer_created=True,
@@ -48,7 +48,9 @@ class IdColumnSelectedView(ColumnProxy):
         return ids
 
     def to_array(self):
-        return np.array(self._selection)
+        # read the bitmap buffer instead of iterating in Python
+        return np.frombuffer(self._selection.to_array(),
+                             dtype=np.uint32).astype(np.int64)
 
     def __setitem__(self, index, value):
         raise RuntimeError('Setting id index not supported')
@@ -4,7 +4,7 @@ from . import Table
 from . import TableSelectedView
 from ..core.slot import SlotDescriptor
 from .module import TableModule
-from ..core.utils import indices_len, fix_loc
+from ..core.utils import indices_len
 #from .filter_impl import FilterImpl
 from ..core.bitmap import bitmap
 import numexpr as ne
@@ -13,6 +13,12 @@ logger = logging.getLogger(__name__)
 
 
 class FilterMod(TableModule):
+    """
+    Filter the rows of the input table satisfying the numexpr expression
+    `expr`, which can use the columns of the table and the values of
+    `user_dict`. The expression is compiled once; created and updated rows
+    are evaluated as they come, so the cost is proportional to the changes.
+    """
     parameters = [('expr', str, "unknown"),
                   ('user_dict', object, None)]
 
@@ -21,34 +27,71 @@ class FilterMod(TableModule):
     def __init__(self, **kwds):
         super().__init__(**kwds)
         #self._impl = FilterImpl(self.params.expr, self.params.user_dict)
+        self._expr = None
+        self._names = None
 
     def reset(self):
         if self._table is not None:
              self._table.selection = bitmap([])
+
+    def _compile(self, table):
+        expr = self.params.expr
+        user_dict = self.params.user_dict or {}
+        self._names = ne.necompiler.getExprNames(expr, {})[0]
+        signature = []
+        for name in self._names:
+            if name in table.columns:
+                signature.append((name, table[name].dtype.type))
+            elif name in user_dict:
+                signature.append((name,
+                                  np.asarray(user_dict[name]).dtype.type))
+            else:
+                raise ValueError("unknown name '{}' in {}".format(name, expr))
+        try:
+            self._expr = ne.NumExpr(expr, signature=signature)
+        except (KeyError, TypeError, ValueError, NotImplementedError):
+            # types not supported by the compiler, evaluated each time
+            self._expr = lambda *args: ne.evaluate(
+                expr, local_dict=dict(zip(self._names, args)))
+
+    def eval_ids(self, table, ids):
+        "Return the ids of `ids` satisfying the expression"
+        ids = np.asarray(ids.to_array(), dtype=np.int64)
+        if len(ids) == 0:
+            return bitmap()
+        if self._expr is None:
+            self._compile(table)
+        user_dict = self.params.user_dict or {}
+        args = [table[name].loc[ids] if name in table.columns
+                else user_dict[name] for name in self._names]
+        res = self._expr(*args)
+        if res.dtype != 'bool':
+            raise ValueError('expr must be a conditional expr.!')
+        return bitmap(ids[res])
+
     def run_step(self, run_number, step_size, howlong):
         input_slot = self.get_input_slot('table')
         # input_slot.update(run_number)
-        input_table = input_slot.data()        
+        input_table = input_slot.data()
         if input_table is None:
             return self._return_run_step(self.state_blocked, steps_run=0)
         if self._table is None:
             self._table = TableSelectedView(input_table, bitmap([]))
         steps = 0
-        if input_slot.updated.any():
-            input_slot.reset()
-            input_slot.update(run_number)
-            self.reset()
         if input_slot.deleted.any():
             deleted = input_slot.deleted.next(step_size, as_slice=False)
             self._table.selection -= deleted
             steps += indices_len(deleted)
+        if input_slot.updated.any():
+            updated = input_slot.updated.next(step_size, as_slice=False)
+            steps += indices_len(updated)
+            # flip the membership of the updated rows only
+            self._table.selection = ((self._table.selection - updated) |
+                                     self.eval_ids(input_table, updated))
         if input_slot.created.any():
             created = input_slot.created.next(step_size, as_slice=False)
-            indices = fix_loc(created)
             steps += indices_len(created)
-            eval_idx = input_table.eval(expr=self.params.expr, locs=np.array(indices),
-                                        as_slice=False,result_object='index')
-            self._table.selection |=  bitmap(eval_idx)
+            self._table.selection |= self.eval_ids(input_table, created)
         if not steps:
             return self._return_run_step(self.state_blocked, steps_run=0)
         return self._return_run_step(self.next_state(input_slot), steps)
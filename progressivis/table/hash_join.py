@@ -0,0 +1,348 @@
+"""
+Progressive equi-join on key columns, with symmetric hash join semantics:
+the new rows of each side probe the rows of the other side already seen,
+so the join is maintained incrementally as both tables grow, and deleted
+or updated rows only touch the output rows they produced.
+"""
+import numpy as np
+
+from progressivis.core.bitmap import bitmap
+from progressivis.utils.intdict import IntDict
+from .table import Table
+from .dshape import dshape_create, dshape_join
+
+__all__ = ['HashJoinState', 'hash_join_step', 'all_ids']
+
+LEFT, RIGHT = 0, 1
+
+
+def all_ids(table):
+    "Return the ids of the rows of the table as a bitmap"
+    ids = table.index.values
+    return bitmap(ids[ids >= 0])
+
+
+def _as_list(columns):
+    if columns is None:
+        return None
+    if isinstance(columns, str):
+        return [columns]
+    return list(columns)
+
+
+def _is_integer(table, column):
+    return np.issubdtype(table[column].dtype, np.integer)
+
+
+class _KeyIndex(object):
+    """
+    Map the keys to dense group ids, with a khash table for single integer
+    keys and a dict for the other keys (strings, floats, tuples).
+    """
+    def __init__(self, integer):
+        self._ints = IntDict() if integer else None
+        self._dict = None if integer else {}
+        self._count = 0
+
+    def groups(self, keys):
+        "Return the group ids of the keys, allocating the new ones"
+        if self._ints is None:
+            groups = self._dict
+            return np.array([groups.setdefault(k, len(groups))
+                             for k in keys], dtype=np.int64)
+        keys = np.asarray(keys, dtype=np.int64)
+        ret = self._ints.lookup(keys)
+        missing = ret < 0
+        if missing.any():
+            new_keys = np.unique(keys[missing])
+            self._ints.update(new_keys,
+                              np.arange(self._count,
+                                        self._count+len(new_keys)))
+            self._count += len(new_keys)
+            ret[missing] = self._ints.lookup(keys[missing])
+        return ret
+
+
+class _Rows(object):
+    """
+    Rows of a 2D int64 array appended in amortized constant time, the
+    capacity growing geometrically.
+    """
+    def __init__(self, width):
+        self._data = np.empty((16, width), dtype=np.int64)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def values(self):
+        "The rows appended, as a view"
+        return self._data[:self._size]
+
+    def append(self, rows):
+        "Append the rows and return their positions"
+        size = self._size + len(rows)
+        if size > len(self._data):
+            data = np.empty((max(size, 2*len(self._data)),
+                             self._data.shape[1]), dtype=np.int64)
+            data[:self._size] = self.values
+            self._data = data
+        self._data[self._size:size] = rows
+        positions = np.arange(self._size, size)
+        self._size = size
+        return positions
+
+    def keep(self, mask):
+        "Keep only the rows where mask is True"
+        kept = self.values[mask]
+        self._size = len(kept)
+        self._data[:self._size] = kept
+
+
+def _expand(starts, counts):
+    "Return the concatenation of the ranges [start, start+count)"
+    total = int(counts.sum())
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts,
+                                           counts)
+    return np.repeat(starts, counts) + offsets
+
+
+class _GroupIndex(object):
+    """
+    Rows of one side of the join, sorted by group: the partners of a set
+    of groups are found with binary searches. Each registration of a row
+    is an entry with a serial number; an entry is valid while the row
+    maps to its serial, so deleting or moving a row only updates that
+    mapping. The entries added since the last sort are kept apart, and
+    merged, dropping the stale entries, when they are numerous enough to
+    amortize the sort.
+    """
+    def __init__(self):
+        self.row_serial = IntDict()  # row id -> serial, -1 when deleted
+        self._entries = _Rows(2)  # by serial: group, row id
+        empty = np.zeros(0, dtype=np.int64)
+        self._sorted = (empty, empty, empty)  # groups, row ids, serials
+        self._pending = []  # serials not sorted yet
+        self._pending_len = 0
+
+    def groups(self, ids):
+        "Return the groups of the rows, -1 for the unknown rows"
+        serials = self.row_serial.lookup(ids)
+        ret = np.full(len(ids), -1, dtype=np.int64)
+        known = serials >= 0
+        ret[known] = self._entries.values[serials[known], 0]
+        return ret
+
+    def add(self, ids, groups):
+        "Register the rows with their groups"
+        serials = self._entries.append(np.column_stack([groups, ids]))
+        self.row_serial.update(ids, serials)
+        self._pending.append(serials)
+        self._pending_len += len(serials)
+        if self._pending_len * 4 > len(self._sorted[0]):
+            self._merge()
+
+    def remove(self, ids):
+        "Unregister the rows"
+        self.row_serial.update(ids, np.full(len(ids), -1, dtype=np.int64))
+
+    def _valid(self, ids, serials):
+        return self.row_serial.lookup(ids) == serials
+
+    def _sort(self, serials):
+        entries = self._entries.values[serials]
+        order = np.argsort(entries[:, 0], kind='stable')
+        return entries[order, 0], entries[order, 1], serials[order]
+
+    def _merge(self):
+        serials = np.concatenate([self._sorted[2]] + self._pending)
+        ids = self._entries.values[serials, 1]
+        self._sorted = self._sort(serials[self._valid(ids, serials)])
+        self._pending = []
+        self._pending_len = 0
+
+    def partners(self, groups):
+        """
+        Return the pairs (i, row id) of the rows of each group `groups[i]`,
+        as 2 arrays
+        """
+        parts = [self._sorted]
+        if self._pending:
+            parts.append(self._sort(np.concatenate(self._pending)))
+        queries, partners = [], []
+        for (keys, ids, serials) in parts:
+            lower = np.searchsorted(keys, groups, side='left')
+            counts = np.searchsorted(keys, groups, side='right') - lower
+            positions = _expand(lower, counts)
+            query = np.repeat(np.arange(len(groups)), counts)
+            valid = self._valid(ids[positions], serials[positions])
+            queries.append(query[valid])
+            partners.append(ids[positions[valid]])
+        return np.concatenate(queries), np.concatenate(partners)
+
+
+class HashJoinState(object):
+    """
+    State of a progressive inner join of a left and a right table on
+    key columns, maintaining the output `table`.
+
+    For each side, the rows are indexed by the group of their key; the
+    group of a new row gives its partners on the other side. Each output
+    row is a pair of left and right ids, kept in arrays, so deletions and
+    updates are applied incrementally.
+    """
+    def __init__(self, left, right, on=None, left_on=None, right_on=None,
+                 suffixes=('', ''), name=None):
+        # pylint: disable=too-many-arguments
+        if on is not None:
+            left_on = right_on = _as_list(on)
+        else:
+            left_on, right_on = _as_list(left_on), _as_list(right_on)
+        if not left_on or not right_on or len(left_on) != len(right_on):
+            raise ValueError("join keys should be given with 'on' or "
+                             "with 'left_on' and 'right_on' of same length")
+        self.on = (left_on, right_on)
+        right_fields = [(c, t) for (c, t) in right.dshape[0].fields
+                        if on is None or c not in right_on]
+        right_dshape = dshape_create('{' + ",".join(
+            ["{}: {}".format(c, t) for (c, t) in right_fields]) + '}')
+        dshape, rename = dshape_join(left.dshape, right_dshape, *suffixes)
+        self.columns = (
+            [(c, rename['left'].get(c, c)) for c in left.columns],
+            [(c, rename['right'].get(c, c)) for (c, _) in right_fields])
+        integer = (len(left_on) == 1 and _is_integer(left, left_on[0]) and
+                   _is_integer(right, right_on[0]))
+        self._keys = _KeyIndex(integer)
+        self._index = (_GroupIndex(), _GroupIndex())
+        self._pairs = _Rows(3)  # left id, right id, output id
+        self._dead = 0  # deleted pairs not dropped yet
+        self._next_id = 0
+        self.table = Table(name=name, dshape=dshape, create=True)
+
+    def keys(self, side, table, ids):
+        "Return the keys of the rows `ids` of the table on the side"
+        columns = [table[c].loc[ids] for c in self.on[side]]
+        if len(columns) == 1:
+            return columns[0]
+        return list(zip(*[c.tolist() for c in columns]))
+
+    def _probe(self, side, ids, groups):
+        "Register the rows and return the pairs they form, as 2 arrays"
+        query, other_ids = self._index[1-side].partners(groups)
+        self._index[side].add(ids, groups)
+        this_ids = ids[query]
+        order = np.lexsort((other_ids, this_ids))
+        return this_ids[order], other_ids[order]
+
+    def _write(self, side, table, this_ids, other_table, other_ids):
+        count = len(this_ids)
+        if count == 0:
+            return bitmap()
+        out_ids = np.arange(self._next_id, self._next_id+count,
+                            dtype=np.int64)
+        self._next_id += count
+        pairs = np.empty((count, 3), dtype=np.int64)
+        pairs[:, side] = this_ids
+        pairs[:, 1-side] = other_ids
+        pairs[:, 2] = out_ids
+        self._pairs.append(pairs)
+        data = {}
+        for (s, src, ids) in ((side, table, this_ids),
+                              (1-side, other_table, other_ids)):
+            for (c, alias) in self.columns[s]:
+                data[alias] = src[c].loc[ids]
+        self.table.append(data, indices=out_ids)
+        return bitmap(out_ids)
+
+    def _outputs(self, side, ids):
+        "Return the positions in the pairs of the output rows of the ids"
+        pairs = self._pairs.values
+        return np.flatnonzero(np.isin(pairs[:, side], ids) &
+                              (pairs[:, 2] >= 0))
+
+    def create(self, side, table, ids, other_table):
+        """
+        Add the rows `ids` of the table on the side, joining them with the
+        rows of `other_table` already added. Return the new output ids.
+        """
+        ids = np.asarray(bitmap.asbitmap(ids).to_array(), dtype=np.int64)
+        if len(ids) == 0:
+            return bitmap()
+        groups = self._keys.groups(self.keys(side, table, ids))
+        this_ids, other_ids = self._probe(side, ids, groups)
+        return self._write(side, table, this_ids, other_table, other_ids)
+
+    def delete(self, side, ids):
+        "Remove the rows `ids` of the side and return the deleted output ids"
+        ids = np.asarray(bitmap.asbitmap(ids).to_array(), dtype=np.int64)
+        ids = ids[self._index[side].groups(ids) >= 0]
+        if len(ids) == 0:
+            return bitmap()
+        self._index[side].remove(ids)
+        positions = self._outputs(side, ids)
+        if len(positions) == 0:
+            return bitmap()
+        pairs = self._pairs.values
+        out_ids = pairs[positions, 2].copy()
+        pairs[positions, 2] = -1
+        self._dead += len(positions)
+        if self._dead * 2 > len(self._pairs):
+            self._pairs.keep(self._pairs.values[:, 2] >= 0)
+            self._dead = 0
+        del self.table.loc[out_ids]
+        return bitmap(out_ids)
+
+    def update(self, side, table, ids, other_table):
+        """
+        Apply the updates of the rows `ids` of the side. The output rows
+        are rewritten in place when the key is unchanged; otherwise, the
+        row is deleted and added again. Return the updated output ids.
+        """
+        ids = np.asarray(bitmap.asbitmap(ids).to_array(), dtype=np.int64)
+        old = self._index[side].groups(ids)
+        known = old >= 0  # rows not created yet are read when created
+        ids, old = ids[known], old[known]
+        if len(ids) == 0:
+            return bitmap()
+        new = self._keys.groups(self.keys(side, table, ids))
+        moved = ids[old != new]
+        if len(moved):
+            self.delete(side, moved)
+            self.create(side, table, moved, other_table)
+        positions = self._outputs(side, ids[old == new])
+        if len(positions) == 0:
+            return bitmap()
+        pairs = self._pairs.values
+        out_ids = pairs[positions, 2]
+        src_ids = pairs[positions, side]
+        for (c, alias) in self.columns[side]:
+            self.table.loc[out_ids, alias] = table[c].loc[src_ids]
+        return bitmap(out_ids)
+
+
+def hash_join_step(state, left_slot, right_slot, step_size):
+    """
+    Process the changes of the slots of the left and right tables into the
+    join state: deletions and updates first, then at most `step_size`
+    created rows per side. Return the number of rows processed.
+    """
+    steps = 0
+    slots = (left_slot, right_slot)
+    tables = (left_slot.data(), right_slot.data())
+    for side, slot in enumerate(slots):
+        if slot.deleted.any():
+            ids = slot.deleted.next(as_slice=False)
+            steps += len(ids)
+            state.delete(side, ids)
+    for side, slot in enumerate(slots):
+        if slot.updated.any():
+            ids = slot.updated.next(as_slice=False)
+            steps += len(ids)
+            state.update(side, tables[side], ids, tables[1-side])
+    for side, slot in enumerate(slots):
+        if slot.created.any():
+            ids = slot.created.next(step_size, as_slice=False)
+            steps += len(ids)
+            state.create(side, tables[side], ids, tables[1-side])
+    return steps
@@ -5,15 +5,17 @@ lower than the first specifid value, and the last bin corresponds to
 half infinite values higher than the last specified value.
 """
 
+import array
 import operator
 import logging
 
 import numpy as np
 from progressivis.core.bitmap import bitmap
 from progressivis.core.slot import SlotDescriptor
-from progressivis.core.utils import (slice_to_arange, fix_loc)
+from progressivis.core.utils import (slice_to_arange, fix_loc, next_pow2)
 from .module import TableModule
 from . import Table
+from ..stats.kll import KLLSketch
 from . import TableSelectedView
 from ..core.utils import indices_len, fix_loc
 
@@ -21,15 +23,60 @@ APPROX = False
 logger = logging.getLogger(__name__)
 
 
+def _to_array(bm):
+    "Convert a bitmap to an array of int64 without iterating in Python"
+    return np.frombuffer(bm.to_array(), dtype=np.uint32).astype(np.int64)
+
+
+def _to_bitmap(ids):
+    "Convert an array of ids to a bitmap without iterating in Python"
+    arr = array.array('I')
+    arr.frombytes(np.asarray(ids, dtype=np.uint32).tobytes())
+    return bitmap(arr)
+
+
+def _group_by_bin(ids, positions):
+    "Iterate over (bin position, sorted ids in that bin)"
+    order = np.argsort(positions, kind='stable')
+    sorted_pos = positions[order]
+    bounds = np.flatnonzero(np.diff(sorted_pos)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(ids)]))
+    for start, end in zip(starts, ends):
+        if start < end:
+            yield int(sorted_pos[start]), ids[order[start:end]]
+
+
 class _HistogramIndexImpl(object):
-    "Implementation part of Histogram Index"
+    """Implementation part of Histogram Index.
+
+    Each bin has a bitmap of its ids and a count; prefix sums of the
+    counts answer range counts without touching the bitmaps. Each bin
+    also has a stable label, and the label of the bin of each indexed id
+    is kept in an array so updated and deleted ids are removed from their
+    bin directly. Bins are divided and merged progressively by `reshape`,
+    within a budget of ids processed per call. A KLL sketch of the values
+    chooses the pivots of large bins; it is rebuilt when too many of its
+    values have been deleted or updated.
+    """
     # pylint: disable=too-many-instance-attributes
     def __init__(self, column, table, e_min, e_max, nb_bin):
         self.column = table[column]
+        self._table = table
+        self._sketch = KLLSketch()
+        self._sketch_removed = 0  # values removed since the sketch was built
         self.e_min = e_min
         self.e_max = e_max
         self.bitmaps = None
         self.bins = None
+        self.counts = None
+        self._cumcounts = None  # prefix sums of counts, computed lazily
+        self._labels = None  # label of each bin
+        self._label_pos = None  # position of each bin label
+        self._next_label = 0
+        self._id_label = np.full(0, -1, dtype=np.int32)
+        self._division = None  # state of the bin division in progress
+        self._undividable = {}  # label -> size when its division failed
         self._sampling_size = 1000
         self._perm_deviation = 0.1  # permitted deviation
         self._divide_threshold = 1000  # TODO: make it settable!
@@ -45,31 +92,62 @@ class _HistogramIndexImpl(object):
         self.bins = np.linspace(e_min, e_max, nb_bin, endpoint=True)
         assert len(self.bins) == nb_bin
         self.bitmaps = [bitmap() for _ in range(nb_bin+1)]
+        self.counts = np.zeros(nb_bin+1, dtype=np.int64)
+        self._labels = np.arange(nb_bin+1, dtype=np.int32)
+        self._next_label = nb_bin+1
+        self._update_label_pos()
+
+    @property
+    def sketch(self):
+        "KLL sketch of the indexed values"
+        if self._sketch_removed > 0.1 * self._sketch.n:
+            # only the ids indexed, the others are added when indexed
+            ids = np.flatnonzero(self._id_label >= 0)
+            existing = self._table.index.values
+            ids = np.intersect1d(ids, existing[existing >= 0])
+            self._sketch = KLLSketch().update(
+                self._table.to_array(locs=ids,
+                                     columns=[self.column.name])[:, 0])
+            self._sketch_removed = 0
+        return self._sketch
+
+    def _update_label_pos(self):
+        self._label_pos = np.full(self._next_label, -1, dtype=np.int32)
+        self._label_pos[self._labels] = np.arange(len(self._labels))
+        self._cumcounts = None
+
+    def _set_labels(self, ids, labels):
+        if len(ids) == 0:
+            return
+        size = int(ids.max()) + 1
+        if size > len(self._id_label):
+            id_label = np.full(next_pow2(size), -1, dtype=np.int32)
+            id_label[:len(self._id_label)] = self._id_label
+            self._id_label = id_label
+        self._id_label[ids] = labels
+
+    def _bin_positions(self, ids):
+        "Return the ids indexed and the position of their bin"
+        ids = ids[ids < len(self._id_label)]
+        labels = self._id_label[ids]
+        known = labels >= 0
+        ids = ids[known]
+        return ids, self._label_pos[labels[known]]
+
+    @property
+    def cumcounts(self):
+        "Prefix sums of the bin counts"
+        if self._cumcounts is None:
+            self._cumcounts = np.cumsum(self.counts)
+        return self._cumcounts
+
+    def _mean_size(self):
+        return float(len(self.column))/len(self.bins)
 
     def _needs_division(self, size):
-        len_c = len(self.column)
-        len_b = len(self.bins)
-        mean = float(len_c)/len_b
         if size < self._divide_threshold:
             return False
-        return size > self._divide_coef*mean
-
-    # def __reshape__still_inconclusive_variant(self, i):
-    #     "Change the bounds of the index if needed"
-    #     prev_ = sum([len(bm) for bm in self.bitmaps[:i]])
-    #     p_ = (prev_ + len(self.bitmaps[i])/2.0)/len(self.column) * 100
-    #     v = self._tdigest.percentile(p_)
-    #     try:
-    #         assert self.bins[i-1] < v < self.bins[i]
-    #     except:
-    #         import pdb;pdb.set_trace()
-    #     ids = np.array(self.bitmaps[i], np.int64)
-    #     values = self.column.loc[ids]
-    #     lower_bin = bitmap(ids[values < v])
-    #     upper_bin = self.bitmaps[i] - lower_bin
-    #     np.insert(self.bins, i, v)
-    #     self.bitmaps.insert(i, lower_bin)
-    #     self.bitmaps[i] = upper_bin
+        return size > self._divide_coef*self._mean_size()
 
     def show_histogram(self):
         "Print the histogram on the display"
@@ -79,78 +157,162 @@ class _HistogramIndexImpl(object):
     def _is_merging_required(self):
         return len(self.bitmaps) > self._max_hist_size
 
-    def _is_mergeable_pair(self, bm1, bm2, merge_cnt):
+    def _is_mergeable_pair(self, size1, size2, merge_cnt):
         if len(self.bitmaps) - merge_cnt < self._min_hist_size:
             return False
-        len_c = len(self.column)
-        len_b = len(self.bins)
-        mean = float(len_c)/len_b
-        return len(bm1)+len(bm2) < max(self._merge_coef*mean,
-                                       self._merge_threshold)
+        return size1+size2 < max(self._merge_coef*self._mean_size(),
+                                 self._merge_threshold)
 
-    def merge_once(self):
+    def merge_once(self, budget=np.inf):
+        """Merge the pairs of small adjacent bins, relabeling at most
+        about `budget` ids, and return the number of ids relabeled."""
         assert len(self.bins)+1 == len(self.bitmaps), "unexpected # of bins"
-        bins_1 = list(self.bins)
-        bins_1.append(None)
-        bin_tuples = list(zip(self.bitmaps, bins_1))
+        if len(self.bitmaps) <= 2:
+            return 0
+        busy = self._division['label'] if self._division else None
+        bitmaps = [self.bitmaps[0]]
+        counts = [self.counts[0]]
+        labels = [self._labels[0]]
+        bins = []
         merge_cnt = 0
-        if len(bin_tuples) <= 2:
-            return merge_cnt
-        merged_tuples = []
-        prev_bm, prev_sep = bin_tuples[0]
-        for bm, sep in bin_tuples[1:]:
-            if self._is_mergeable_pair(prev_bm, bm, merge_cnt):
-                prev_bm = prev_bm | bm
-                prev_sep = sep
+        work = 0
+        for i in range(1, len(self.bitmaps)):
+            count = self.counts[i]
+            if work < budget and busy not in (labels[-1], self._labels[i]) \
+               and self._is_mergeable_pair(counts[-1], count, merge_cnt):
+                bm = self.bitmaps[i]
+                bitmaps[-1] = bitmaps[-1] | bm
+                counts[-1] += count
+                self._id_label[_to_array(bm)] = labels[-1]
                 merge_cnt += 1
+                work += count
             else:
-                merged_tuples.append((prev_bm, prev_sep))
-                prev_bm, prev_sep = bm, sep
-        assert prev_sep is None
-        merged_bitmaps, merged_bins = zip(*merged_tuples)
-        merged_bitmaps = list(merged_bitmaps) + [prev_bm]
-        self.bins = np.array(merged_bins)
-        self.bitmaps = merged_bitmaps
-        return merge_cnt
-
-    def reshape(self):
-        for i, bm in enumerate(self.bitmaps):
-            if self._needs_division(len(bm)):
+                bins.append(self.bins[i-1])
+                bitmaps.append(self.bitmaps[i])
+                counts.append(count)
+                labels.append(self._labels[i])
+        if merge_cnt:
+            self.bins = np.array(bins)
+            self.bitmaps = bitmaps
+            self.counts = np.array(counts, dtype=np.int64)
+            self._labels = np.array(labels, dtype=np.int32)
+            self._update_label_pos()
+        return work
+
+    def _bin_to_divide(self):
+        """Return the position of the largest bin to divide, or None.
+        The bins whose division failed are skipped until they double."""
+        if len(self.counts) == 0:
+            return None
+        counts = self.counts
+        if self._undividable:
+            counts = counts.copy()
+            for label, failed in self._undividable.items():
+                i = self._label_pos[label] if label < len(self._label_pos) \
+                    else -1
+                if i >= 0 and counts[i] < 2*failed:
+                    counts[i] = -1
+        i = int(np.argmax(counts))
+        if counts[i] < 0 or not self._needs_division(counts[i]):
+            return None
+        return i
+
+    def needs_reshape(self):
+        "Return True if a bin division is pending."
+        return (self._division is not None
+                or self._bin_to_divide() is not None)
+
+    def reshape(self, budget=np.inf):
+        """Divide the bins too large and merge the bins too small,
+        processing about `budget` ids at most; the remaining work is
+        resumed at the next call. Return the number of ids processed."""
+        work = 0
+        while work < budget:
+            if self._division is None:
+                i = self._bin_to_divide()
+                if i is None:
+                    break
                 self.divide_bin(i)
-        if self._is_merging_required():
-            self.merge_once()
+                continue
+            work += self._continue_division(budget - work)
+        if work < budget and self._is_merging_required():
+            work += self.merge_once(budget - work)
+        return work
+
+    def _bin_bounds(self, i):
+        lower = self.bins[i-1] if i > 0 else -np.inf
+        upper = self.bins[i] if i < len(self.bins) else np.inf
+        return lower, upper
+
+    def _sketch_pivot(self, i):
+        "Return the median of bin `i` estimated by the sketch, or None"
+        sketch = self.sketch
+        if sketch.n == 0:
+            return None
+        lower, upper = self._bin_bounds(i)
+        rank_lower, rank_upper = sketch.ranks([lower, upper])
+        if rank_upper - rank_lower < 8 / sketch.k:
+            return None  # the bin is too small for the sketch accuracy
+        v = sketch.quantile((rank_lower + rank_upper) / 2)
+        return v if lower < v < upper else None
 
     def divide_bin(self, i):
-        "Change the bounds of the index if needed"
-        ids = np.array(self.bitmaps[i], np.int64)
-        if self._sampling_size*1.2 < len(ids):
-            samples = np.random.choice(ids, self._sampling_size, replace=False)
-        else:
-            samples = ids
-        s_vals = self.column.loc[samples]
-        v = np.median(s_vals)
-        if i >= len(self.bins):
-            assert self.bins[i-1] < v
-        else:
-            assert self.bins[i-1] < v < self.bins[i] if i > 0 else v < self.bins[i]
-        values = self.column.loc[ids]
-        lower_bin = bitmap(ids[values < v])
-        upper_bin = self.bitmaps[i] - lower_bin
+        """Start dividing bin `i` around the median of its values, estimated
+        by the sketch or from a sample. The ids are then partitioned by
+        `reshape`."""
+        bm = self.bitmaps[i]
+        label = self._labels[i]
+        v = self._sketch_pivot(i)
+        if v is None and self._sampling_size*1.2 < len(bm):
+            picks = np.random.choice(len(bm), self._sampling_size,
+                                     replace=False)
+            samples = np.array([bm[int(k)] for k in np.sort(picks)])
+            v = np.median(self.column.loc[samples])
+        elif v is None:
+            v = np.median(self.column.loc[_to_array(bm)])
+        lower, upper = self._bin_bounds(i)
+        if not lower < v < upper:  # the values are mostly identical
+            self._undividable[label] = len(bm)
+            return False
+        self._division = {'label': label, 'pivot': v,
+                          'lower': bitmap(), 'todo': bitmap(bm)}
+        return True
+
+    def _continue_division(self, budget):
+        division = self._division
+        todo = division['todo']
+        ids = _to_array(todo.pop(int(max(1, min(budget, len(todo))))))
+        if len(ids):
+            values = self.column.loc[ids]
+            division['lower'].update(_to_bitmap(ids[values < division['pivot']]))
+        if not todo:
+            self._finish_division()
+        return len(ids)
+
+    def _finish_division(self):
+        division = self._division
+        self._division = None
+        label = division['label']
+        i = self._label_pos[label]
+        bm = self.bitmaps[i]
+        lower_bin = division['lower'] & bm
+        upper_bin = bm - lower_bin
         lower_len = len(lower_bin)
         upper_len = len(upper_bin)
-        t = len(ids)*self._perm_deviation
-        if abs(lower_len - upper_len) > t:
-            print("DIFF: ", lower_len, upper_len,
-                  float(abs(lower_len - upper_len))/len(ids))
-        self.bins = np.insert(self.bins, i, v)
-        if i+1 >= len(self.bins):
-            assert self.bins[i-1] < self.bins[i]
-        else:
-            assert (self.bins[i-1] < self.bins[i] < self.bins[i+1] if i > 0
-                    else self.bins[i] < self.bins[i+1])
-        self.bitmaps.insert(i, lower_bin)
-        self.bitmaps[i+1] = upper_bin
-        print('*', end='')
+        if lower_len == 0 or upper_len == 0:
+            self._undividable[label] = len(bm)
+            return
+        if abs(lower_len - upper_len) > len(bm)*self._perm_deviation:
+            logger.debug("Unbalanced division: %d %d", lower_len, upper_len)
+        new_label = self._next_label
+        self._next_label += 1
+        self.bins = np.insert(self.bins, i, division['pivot'])
+        self.bitmaps[i:i+1] = [lower_bin, upper_bin]
+        self.counts = np.insert(self.counts, i, lower_len)
+        self.counts[i+1] = upper_len
+        self._labels = np.insert(self._labels, i, new_label)
+        self._id_label[_to_array(lower_bin)] = new_label
+        self._update_label_pos()
 
     def _get_bin(self, val):
         i = np.digitize(val, self.bins)
@@ -161,22 +323,65 @@ class _HistogramIndexImpl(object):
         created = bitmap.asbitmap(created)
         updated = bitmap.asbitmap(updated)
         deleted = bitmap.asbitmap(deleted)
-        # if deleted:
-        #     self._tdigest_is_valid = False
+        division = self._division
         if deleted or updated:
             to_remove = updated | deleted
-            for bm in self.bitmaps:
-                bm -= to_remove
+            ids, positions = self._bin_positions(_to_array(to_remove))
+            self._id_label[ids] = -1
+            self._sketch_removed += len(ids)
+            for i, sel in _group_by_bin(ids, positions):
+                self.bitmaps[i] -= _to_bitmap(sel)
+                self.counts[i] -= len(sel)
+            if division is not None:
+                division['todo'] -= to_remove
+                division['lower'] -= to_remove
         if created or updated:
             to_add = created | updated
-            ids = np.array(to_add, np.int64)
-            values = self.column.loc[to_add]
-            bins = np.digitize(values, self.bins)
-            counts = np.bincount(bins)
-            for i in np.nonzero(counts)[0]:
-                bm = self.bitmaps[i]
-                selection = (bins == i)    # boolean mask of values in bin i
-                bm.update(ids[selection])  # add them to the bitmap
+            ids = _to_array(to_add)
+            values = self.column.loc[ids]
+            self._sketch.update(values)
+            positions = np.searchsorted(self.bins, values, side='right')
+            self._set_labels(ids, self._labels[positions])
+            self.counts += np.bincount(positions,
+                                       minlength=len(self.counts))
+            div_pos = (self._label_pos[division['label']]
+                       if division is not None else -1)
+            for i, sel in _group_by_bin(ids, positions):
+                sel = _to_bitmap(sel)
+                self.bitmaps[i].update(sel)
+                if i == div_pos:
+                    division['todo'].update(sel)
+        self._cumcounts = None
+
+    def _bin_range_count(self, i, lower, upper, approximate):
+        "Count the values of bin i in [lower, upper["
+        if not approximate:
+            values = self.column.loc[_to_array(self.bitmaps[i])]
+            return int(np.count_nonzero((lower <= values) & (values < upper)))
+        bin_lower, bin_upper = self._bin_bounds(i)
+        if not (np.isfinite(bin_lower) and np.isfinite(bin_upper)):
+            return 0
+        overlap = min(upper, bin_upper) - max(lower, bin_lower)
+        return int(round(self.counts[i] * max(0, overlap) /
+                         (bin_upper - bin_lower)))
+
+    def range_count(self, lower, upper, approximate=APPROX):
+        """
+        Return the number of rows with values in range [`lower`, `upper`[.
+        The bins fully inside the range are counted in O(log(bins)) with
+        the prefix sums of the counts. With `approximate`, the values of
+        the two boundary bins are not read but interpolated.
+        """
+        if lower > upper:
+            lower, upper = upper, lower
+        pos = np.searchsorted(self.bins, [lower, upper], side='right')
+        if pos[0] == pos[1]:
+            return self._bin_range_count(pos[0], lower, upper, approximate)
+        cumcounts = self.cumcounts
+        count = int(cumcounts[pos[1]-1] - cumcounts[pos[0]])
+        count += self._bin_range_count(pos[0], lower, upper, approximate)
+        count += self._bin_range_count(pos[1], lower, upper, approximate)
+        return count
 
     def query(self, operator_, limit, approximate=APPROX):  # blocking...
         """
@@ -187,18 +392,16 @@ class _HistogramIndexImpl(object):
         pos = np.digitize(limit, self.bins)
         detail = bitmap()
         if not approximate:
-            ids = np.array(self.bitmaps[pos], np.int64)
+            ids = _to_array(self.bitmaps[pos])
             values = self.column.loc[ids]
             selected = ids[operator_(values, limit)]
-            detail.update(selected)
+            detail.update(_to_bitmap(selected))
 
         if operator_ in (operator.lt, operator.le):
-            for bm in self.bitmaps[:pos]:
-                detail.update(bm)
+            bms = self.bitmaps[:pos]
         else:
-            for bm in self.bitmaps[pos + 1:]:
-                detail.update(bm)
-        return detail
+            bms = self.bitmaps[pos + 1:]
+        return bitmap.union(detail, *bms)
 
     def restricted_query(self, operator_, limit, only_locs,
                          approximate=APPROX):  # blocking...
@@ -209,17 +412,36 @@ class _HistogramIndexImpl(object):
         pos = np.digitize(limit, self.bins)
         detail = bitmap()
         if not approximate:
-            ids = np.array(self.bitmaps[pos] & only_locs, np.int64)
+            ids = _to_array(self.bitmaps[pos] & only_locs)
             values = self.column.loc[ids]
             selected = ids[operator_(values, limit)]
-            detail.update(selected)
+            detail.update(_to_bitmap(selected))
 
         if operator_ in (operator.lt, operator.le):
-            for bm in self.bitmaps[:pos]:
-                detail.update(bm & only_locs)
+            bms = self.bitmaps[:pos]
+        else:
+            bms = self.bitmaps[pos + 1:]
+        return detail | (bitmap.union(*bms) & only_locs) if bms else detail
+
+    def _boundary_detail(self, pos, lower, upper, only_locs=None):
+        "Return the ids of the two boundary bins in [lower, upper["
+        detail = bitmap()
+        bm = self.bitmaps[pos[0]]
+        if only_locs is not None:
+            bm = bm & only_locs
+        ids = _to_array(bm)
+        values = self.column.loc[ids]
+        if pos[0] == pos[1]:
+            detail.update(_to_bitmap(ids[(lower <= values) &
+                                         (values < upper)]))
         else:
-            for bm in self.bitmaps[pos + 1:]:
-                detail.update(bm & only_locs)
+            detail.update(_to_bitmap(ids[lower <= values]))
+            bm = self.bitmaps[pos[1]]
+            if only_locs is not None:
+                bm = bm & only_locs
+            ids = _to_array(bm)
+            values = self.column.loc[ids]
+            detail.update(_to_bitmap(ids[values < upper]))
         return detail
 
     def range_query(self, lower, upper, approximate=APPROX):
@@ -231,20 +453,8 @@ class _HistogramIndexImpl(object):
         pos = np.digitize([lower, upper], self.bins)
         detail = bitmap()
         if not approximate:
-            ids = np.array(self.bitmaps[pos[0]], np.int64)
-            values = self.column.loc[ids]
-            if pos[0] == pos[1]:
-                selected = ids[(lower <= values) & (values < upper)]
-            else:
-                selected = ids[lower <= values]
-                detail.update(selected)
-                ids = np.array(self.bitmaps[pos[1]], np.int64)
-                values = self.column.loc[ids]
-                selected = ids[values < upper]
-                detail.update(selected)
-        for bm in self.bitmaps[pos[0] + 1:pos[1]]:
-            detail.update(bm)
-        return detail
+            detail = self._boundary_detail(pos, lower, upper)
+        return bitmap.union(detail, *self.bitmaps[pos[0] + 1:pos[1]])
 
     def range_query_aslist(self, lower, upper, approximate=APPROX):
         """
@@ -253,21 +463,9 @@ class _HistogramIndexImpl(object):
         if lower > upper:
             lower, upper = upper, lower
         pos = np.digitize([lower, upper], self.bins)
-        detail = bitmap()
         res = self.bitmaps[pos[0] + 1:pos[1]]
         if not approximate:
-            ids = np.array(self.bitmaps[pos[0]], np.int64)
-            values = self.column.loc[ids]
-            if pos[0] == pos[1]:
-                selected = ids[(lower <= values) & (values < upper)]
-            else:
-                selected = ids[lower <= values]
-                detail.update(selected)
-                ids = np.array(self.bitmaps[pos[1]], np.int64)
-                values = self.column.loc[ids]
-                selected = ids[values < upper]
-                detail.update(selected)
-            res.append(detail)
+            res.append(self._boundary_detail(pos, lower, upper))
         return res
 
     def restricted_range_query(self, lower, upper, only_locs,
@@ -281,35 +479,22 @@ class _HistogramIndexImpl(object):
         pos = np.digitize([lower, upper], self.bins)
         detail = bitmap()
         if not approximate:
-            ids = np.array(self.bitmaps[pos[0]] & only_locs, np.int64)
-            values = self.column.loc[ids]
-            if pos[0] == pos[1]:
-                selected = ids[(lower <= values) & (values < upper)]
-            else:
-                selected = ids[lower <= values]
-                detail.update(selected)
-                ids = np.array(self.bitmaps[pos[1]] & only_locs, np.int64)
-                values = self.column.loc[ids]
-                selected = ids[values < upper]
-                detail.update(selected)
-        for bm in self.bitmaps[pos[0] + 1:pos[1]]:
-            detail.update(bm & only_locs)
-        return detail
+            detail = self._boundary_detail(pos, lower, upper, only_locs)
+        bms = self.bitmaps[pos[0] + 1:pos[1]]
+        return detail | (bitmap.union(*bms) & only_locs) if bms else detail
 
     def get_min_bin(self):
         if self.bitmaps is None:
             return None
-        for bm in self.bitmaps:
-            if bm:
-                return bm
+        for i in np.flatnonzero(self.counts):
+            return self.bitmaps[i]
         return None
 
     def get_max_bin(self):
         if self.bitmaps is None:
             return None
-        for bm in reversed(self.bitmaps):
-            if bm:
-                return bm
+        for i in np.flatnonzero(self.counts)[::-1]:
+            return self.bitmaps[i]
         return None
 
 
@@ -372,6 +557,12 @@ class HistogramIndex(TableModule):
             return None
         return self._impl.get_min_bin()
 
+    def sketch(self):
+        "Return the KLL sketch of the column values, or None"
+        if self._impl is None:
+            return None
+        return self._impl.sketch
+
     def get_max_bin(self):
         if self._impl is None:
             return None
@@ -402,13 +593,13 @@ class HistogramIndex(TableModule):
             return self._return_run_step(self.state_blocked,
                                          len(self.selection))
         else:
-            # Many not always, or should the implementation decide?
-            self._impl.reshape()
+            # divide or merge bins, resuming the work left by previous steps
+            steps = self._impl.reshape(step_size)
         deleted = None
         if input_slot.deleted.any():
             deleted = input_slot.deleted.next(as_slice=False)
             # steps += indices_len(deleted) # deleted are constant time
-            steps = 1
+            steps += 1
             deleted = fix_loc(deleted)
             self.selection -= deleted
         created = None
@@ -427,8 +618,11 @@ class HistogramIndex(TableModule):
         input_table = input_slot.data()
         # self._table = input_table
         self._impl.update_histogram(created, updated, deleted)
-        return self._return_run_step(
-            self.next_state(input_slot), steps_run=steps)
+        if self._impl.needs_reshape():
+            next_state = self.state_ready
+        else:
+            next_state = self.next_state(input_slot)
+        return self._return_run_step(next_state, steps_run=steps)
 
     def _eval_to_ids(self, operator_, limit, input_ids=None):
         input_slot = self.get_input_slot('table')
@@ -475,6 +669,14 @@ class HistogramIndex(TableModule):
             return self._impl.range_query_aslist(lower, upper, approximate)
         return None
 
+    def range_count(self, lower, upper, approximate=APPROX):
+        """
+        Return the number of rows with values in range [`lower`, `upper`[
+        """
+        if self._impl:
+            return self._impl.range_count(lower, upper, approximate)
+        return len(self.range_query(lower, upper, approximate))
+
     def range_query(self, lower, upper, approximate=APPROX):
         """
         Return the list of rows with values in range [`lower`, `upper`[
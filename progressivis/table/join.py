@@ -7,15 +7,42 @@ from progressivis.core.bitmap import bitmap
 from .nary import NAry
 from .table import Table
 from .dshape import dshape_join
+from .hash_join import (HashJoinState, hash_join_step, all_ids,
+                        LEFT, RIGHT)
+
+
+def _hash_join(table, other, name, on, how, lsuffix, rsuffix, sort):
+    # pylint: disable=too-many-arguments
+    if how != 'inner':
+        raise ValueError("how={} not yet implemented with 'on'".format(how))
+    state = HashJoinState(table, other, on=on, suffixes=(lsuffix, rsuffix),
+                          name=None if sort else name)
+    state.create(LEFT, table, all_ids(table), other)
+    state.create(RIGHT, other, all_ids(other), table)
+    join_table = state.table
+    if not sort:
+        return join_table
+    ids = np.asarray(all_ids(join_table).to_array(), dtype=np.int64)
+    keys = [join_table[alias].loc[ids] for (c, alias) in state.columns[LEFT]
+            if c in state.on[LEFT]]
+    order = np.lexsort(keys[::-1])
+    data = {c: join_table[c].loc[ids[order]] for c in join_table.columns}
+    sorted_table = Table(name=name, dshape=join_table.dshape, create=True)
+    sorted_table.append(data)
+    return sorted_table
 
 
 def join(table, other, name=None, on=None, how='left', lsuffix='', rsuffix='', sort=False):
     # pylint: disable=too-many-arguments, invalid-name
-    "Compute the join of two table."
+    """Compute the join of two table.
+
+    Without `on`, the rows are joined by id; with `on`, the inner join on
+    the key columns is computed with a hash join (see `hash_join`).
+    """
+    if on is not None:
+        return _hash_join(table, other, name, on, how, lsuffix, rsuffix, sort)
     if sort:
         raise ValueError("'sort' not yet implemented in Table.join()")
-    if on is not None:
-        raise ValueError("'on' not yet implemented in Table.join()")
     dshape, rename = dshape_join(table.dshape, other.dshape, lsuffix, rsuffix)
     join_table = Table(name=name, dshape=dshape)
     if how == 'left':
@@ -45,8 +72,17 @@ def join_start(table, other, dialog, name=None, on=None, how='left',
     "Start the progressive join function"
     if sort:
         raise ValueError("'sort' not yet implemented in Table.join()")
+    bag = dialog.bag
     if on is not None:
-        raise ValueError("'on' not yet implemented in Table.join()")
+        if how != 'inner':
+            raise ValueError("how={} not yet implemented with 'on'".format(how))
+        bag.hash_join = HashJoinState(table, other, on=on,
+                                      suffixes=(lsuffix, rsuffix), name=name)
+        dialog.set_output_table(bag.hash_join.table)
+        dialog.set_started()
+        return join_cont(table, other, dialog, created, updated, deleted,
+                         order)
+    bag.hash_join = None
     dshape, rename = dshape_join(table.dshape, other.dshape, lsuffix, rsuffix)
     left_cols = [rename['left'].get(c, c) for c in table.columns]
     right_cols = [rename['right'].get(c, c) for c in other.columns]
@@ -61,7 +97,6 @@ def join_start(table, other, dialog, name=None, on=None, how='left',
     else:
         raise ValueError("how={} not yet implemented".format(how))
 
-    bag = dialog.bag
     bag.dshape = dshape
     bag.first_cols = first_cols
     bag.second_cols = second_cols
@@ -79,6 +114,9 @@ def join_cont(table, other, dialog, created=None, updated=None,
               deleted=None, order='cud', reset=False):
     # pylint: disable=too-many-arguments, invalid-name, too-many-locals, unused-argument
     "Continue the progressive join function"
+    if getattr(dialog.bag, 'hash_join', None) is not None:
+        return _hash_join_cont(table, other, dialog.bag.hash_join,
+                               created, updated, deleted, order)
     join_table = dialog.output_table
     first_cols = dialog.bag.first_cols
     second_cols = dialog.bag.second_cols
@@ -177,6 +215,28 @@ def join_cont(table, other, dialog, created=None, updated=None,
     return ret
 
 
+def _hash_join_cont(table, other, state, created, updated, deleted, order):
+    # pylint: disable=too-many-arguments
+    tables = {'table': (LEFT, table, other), 'other': (RIGHT, other, table)}
+
+    def _process(changes, action):
+        for key, (side, this, that) in tables.items():
+            ids = (changes or {}).get(key, None)
+            if ids is None:
+                continue
+            if action == 'd':
+                state.delete(side, ids)
+            elif action == 'u':
+                state.update(side, this, ids, that)
+            else:
+                state.create(side, this, ids, that)
+
+    changes = {'c': created, 'u': updated, 'd': deleted}
+    for operator in order:
+        _process(changes[operator], operator)
+    return {}
+
+
 class Join(NAry):
     "Module executing join."
     def __init__(self, **kwds):
@@ -185,8 +245,37 @@ class Join(NAry):
         """
         super(Join, self).__init__(**kwds)
         self.join_kwds = self._filter_kwds(kwds, join)
+        self._hash_join = None
+
+    def predict_step_size(self, duration):
+        if self.join_kwds.get('on') is not None:
+            return super(NAry, self).predict_step_size(duration)
+        return super(Join, self).predict_step_size(duration)
+
+    def _run_hash_join(self, step_size):
+        slots = [self.get_input_slot(name)
+                 for name in self.get_input_slot_multiple()]
+        if len(slots) != 2:
+            raise ValueError("Join on key columns needs exactly 2 inputs")
+        left, right = slots
+        if self._hash_join is None:
+            kwds = self.join_kwds
+            if kwds.get('how') != 'inner' or kwds.get('sort'):
+                raise ValueError("only how='inner' without sort is "
+                                 "implemented with 'on'")
+            self._hash_join = HashJoinState(
+                left.data(), right.data(), on=kwds['on'],
+                suffixes=(kwds.get('lsuffix', ''), kwds.get('rsuffix', '')),
+                name=self.generate_table_name('join'))
+            self._table = self._hash_join.table
+        steps = hash_join_step(self._hash_join, left, right, step_size)
+        if left.has_buffered() or right.has_buffered():
+            return self._return_run_step(self.state_ready, steps_run=steps)
+        return self._return_run_step(self.state_blocked, steps_run=steps)
 
     def run_step(self, run_number, step_size, howlong):
+        if self.join_kwds.get('on') is not None:
+            return self._run_hash_join(step_size)
         frames = []
         for name in self.get_input_slot_multiple():
             slot = self.get_input_slot(name)
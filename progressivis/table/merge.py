@@ -3,6 +3,8 @@
 from .nary import NAry
 from .table import Table
 from .dshape import dshape_join
+from .hash_join import (HashJoinState, hash_join_step, all_ids,
+                        LEFT, RIGHT)
 
 def merge(left, right, name=None, how='inner', on=None,
           left_on=None, right_on=None,
@@ -10,8 +12,21 @@ def merge(left, right, name=None, how='inner', on=None,
           sort=False, suffixes=('_x', '_y'),
           copy=True, indicator=False, merge_ctx=None):
     # pylint: disable=too-many-arguments, invalid-name, unused-argument, too-many-locals
-    "Merge function"
+    """Merge function
+
+    With `on`, or `left_on` and `right_on`, the inner join on the key
+    columns is computed with a hash join (see `hash_join`).
+    """
     lsuffix, rsuffix = suffixes
+    if on is not None or left_on is not None:
+        if how != 'inner':
+            raise ValueError("how={} not implemented in Table.merge()"
+                             .format(how))
+        state = HashJoinState(left, right, on=on, left_on=left_on,
+                              right_on=right_on, suffixes=suffixes, name=name)
+        state.create(LEFT, left, all_ids(left), right)
+        state.create(RIGHT, right, all_ids(right), left)
+        return state.table
     if not all((left_index, right_index)):
         raise ValueError("currently, only right_index=True and "
                          "left_index=True are allowed in Table.merge()")
@@ -55,8 +70,42 @@ class Merge(NAry):
         super(Merge, self).__init__(**kwds)
         self.merge_kwds = self._filter_kwds(kwds, merge)
         self._context = {}
+        self._hash_join = None
+
+    def _on_keys(self):
+        return (self.merge_kwds.get('on') is not None or
+                self.merge_kwds.get('left_on') is not None)
+
+    def predict_step_size(self, duration):
+        if self._on_keys():
+            return super(NAry, self).predict_step_size(duration)
+        return super(Merge, self).predict_step_size(duration)
+
+    def _run_hash_join(self, step_size):
+        slots = [self.get_input_slot(name)
+                 for name in self.get_input_slot_multiple()]
+        if len(slots) != 2:
+            raise ValueError("Merge on key columns needs exactly 2 inputs")
+        left, right = slots
+        if self._hash_join is None:
+            kwds = self.merge_kwds
+            if kwds.get('how', 'inner') != 'inner':
+                raise ValueError("how={} not implemented in Table.merge()"
+                                 .format(kwds['how']))
+            self._hash_join = HashJoinState(
+                left.data(), right.data(), on=kwds.get('on'),
+                left_on=kwds.get('left_on'), right_on=kwds.get('right_on'),
+                suffixes=kwds.get('suffixes', ('_x', '_y')),
+                name=self.generate_table_name('merge'))
+            self._table = self._hash_join.table
+        steps = hash_join_step(self._hash_join, left, right, step_size)
+        if left.has_buffered() or right.has_buffered():
+            return self._return_run_step(self.state_ready, steps_run=steps)
+        return self._return_run_step(self.state_blocked, steps_run=steps)
 
     def run_step(self, run_number, step_size, howlong):
+        if self._on_keys():
+            return self._run_hash_join(step_size)
         frames = []
         for name in self.get_input_slot_multiple():
             slot = self.get_input_slot(name)
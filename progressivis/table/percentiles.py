@@ -9,7 +9,13 @@ from ..utils.psdict import PsDict
 
 
 class Percentiles(TableModule):
-    parameters = [('accuracy', np.dtype(float), 0.5)]
+    """
+    Compute the percentiles of a column from the bins of its HistogramIndex.
+    With `approximate`, the percentiles of a whole table are read from the
+    KLL sketch of the index instead.
+    """
+    parameters = [('accuracy', np.dtype(float), 0.5),
+                  ('approximate', np.dtype(bool), False)]
     inputs = [SlotDescriptor('table', type=Table, required=True),
               SlotDescriptor('percentiles', type=PsDict, required=True)]
 
@@ -17,6 +23,7 @@ class Percentiles(TableModule):
         super(Percentiles, self).__init__(**kwds)
         self._accuracy = self.params.accuracy
         self._hist_index = hist_index
+        self._stale = False  # the index was behind the table
         self.default_step_size = 1000
 
     def compute_percentiles(self, points, input_table):
@@ -57,10 +64,21 @@ class Percentiles(TableModule):
                 ret_values.append(column[bm_list[i][0]])
             else:
                 values = column.loc[bm_list[i]]
-                part = np.partition(values, reminder)
-                ret_values.append(values[reminder])
+                pos = sz_list[i] - 1 - reminder  # reminder counts from the top
+                part = np.partition(values, pos)
+                ret_values.append(part[pos])
         return OrderedDict(zip(points.keys(), ret_values))
 
+    def _index_behind(self):
+        index_slot = self._hist_index.get_input_slot('table')
+        return (index_slot.has_buffered() or
+                len(self._hist_index.selection) != len(index_slot.data()))
+
+    def sketch_percentiles(self, points):
+        sketch = self._hist_index.sketch()
+        values = sketch.quantiles(np.array(list(points.values())) * 0.01)
+        return OrderedDict(zip(points.keys(), values.tolist()))
+
     def run_step(self, run_number, step_size, howlong):
         input_slot = self.get_input_slot('table')
         if input_slot.data() is None:
@@ -94,13 +112,22 @@ class Percentiles(TableModule):
             percentiles_changed = True
         if len(percentiles_slot.data()) == 0:
             return self._return_run_step(self.state_blocked, steps_run=0)
-        if steps == 0 and not percentiles_changed:
+        if steps == 0 and not percentiles_changed and not self._stale:
             return self._return_run_step(self.state_blocked, steps_run=0)
         if not self._hist_index._impl:
             return self._return_run_step(self.state_blocked, steps_run=0)
-        computed = self.compute_percentiles(
-            percentiles_slot.data(),
-            input_slot.data())
+        if self._index_behind():
+            # the bins do not hold all the rows yet, wait for the index
+            self._stale = True
+            return self._return_run_step(self.state_ready, steps_run=steps)
+        self._stale = False
+        if (self.params.approximate and
+                not isinstance(input_slot.data(), TableSelectedView)):
+            computed = self.sketch_percentiles(percentiles_slot.data())
+        else:
+            computed = self.compute_percentiles(
+                percentiles_slot.data(),
+                input_slot.data())
         if not self._table:
             self._table = Table(name=None,
                                 dshape=percentiles_slot.data().dshape)
@@ -92,7 +92,8 @@ class RangeQuery(TableModule):
               SlotDescriptor('min', type=PsDict, required=False),
               SlotDescriptor('max', type=PsDict, required=False)]
     outputs = [SlotDescriptor('min', type=Table, required=False),
-               SlotDescriptor('max', type=Table, required=False)]
+               SlotDescriptor('max', type=Table, required=False),
+               SlotDescriptor('count', type=PsDict, required=False)]
 
     def __init__(self, hist_index=None, approximate=False, **kwds):
         super(RangeQuery, self).__init__(**kwds)
@@ -110,6 +111,7 @@ class RangeQuery(TableModule):
         self.input_module = None
         self._min_table = None
         self._max_table = None
+        self._count = None
 
     @property
     def hist_index(self):
@@ -190,11 +192,19 @@ class RangeQuery(TableModule):
     def _set_max_out(self, val):
         return self._set_minmax_out('_max_table', val)
 
+    def _set_count_out(self, lower, upper):
+        # counted by the index in O(log(bins)), without the selection
+        count = self._hist_index.range_count(lower, upper,
+                                             approximate=self._approximate)
+        self._set_minmax_out('_count', count)
+
     def get_data(self, name):
         if name == 'min':
             return self._min_table
         if name == 'max':
             return self._max_table
+        if name == 'count':
+            return self._count
         return super(RangeQuery, self).get_data(name)
 
     def run_step(self, run_number, step_size, howlong):
@@ -301,4 +311,6 @@ class RangeQuery(TableModule):
                               updated=updated,
                               deleted=deleted)
             self._table.selection = self._impl.result._values
+        if self.get_output_slot('count'):
+            self._set_count_out(lower_value, upper_value)
         return self._return_run_step(self.next_state(input_slot), steps)
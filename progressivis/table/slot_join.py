@@ -1,10 +1,33 @@
 from ..core.bitmap import bitmap
 from .. import ProgressiveError, Slot
 from ..table import BaseTable
+from .column_id import IdColumn
+from .column_id_selected import IdColumnSelectedView
 import operator
 from functools import reduce
 import weakref
 
+
+def existing_ids(table, ids=None):
+    """
+    Return the ids of the table, or the subset of `ids` present in the table.
+    The common indexes are checked without scanning all the ids of the
+    table, so the cost is O(len(ids)) instead of O(len(table)).
+    """
+    index = table.index
+    if isinstance(index, IdColumnSelectedView):
+        return index.selection if ids is None else ids & index.selection
+    if isinstance(index, IdColumn):
+        if index.is_identity:
+            all_ids = bitmap(range(0, index.size))
+            return all_ids if ids is None else ids & all_ids
+        ids_dict = index._ids_dict
+        if ids is not None and ids_dict is not None:
+            return bitmap([i for i in ids if i in ids_dict])
+    all_ids = bitmap(index)
+    return all_ids if ids is None else ids & all_ids
+
+
 class SlotJoin:
     def __init__(self, module, *slots):
         assert len(slots) > 0
@@ -51,8 +74,7 @@ class SlotJoin:
             if todo <= 0:
                 break
         if not raw:
-            existing = bitmap(self._module._table.index)
-            return res & existing
+            return existing_ids(self._module._table, res)
         return res
 
     def next_updated(self, step_size, raw=False):
@@ -65,24 +87,25 @@ class SlotJoin:
             if todo <= 0:
                 break
         if not raw:
-            idx_ =  [bitmap(slot.data().index) for slot in self._slots]
-            return reduce(operator.and_, idx_, res)
+            for slot in self._slots:
+                res = existing_ids(slot.data(), res)
         return res
 
     def has_deleted(self, raw=False):
         changes_ = [slot.deleted.changes for slot in self._slots]
         res = reduce(operator.or_, changes_)
-        if not raw:
-            existing = bitmap(self._module._table.index)
-            res &= existing
+        if not raw and res:
+            res = existing_ids(self._module._table, res)
         return res != bitmap()
 
     def has_updated(self, raw=False):
         changes_ = [slot.updated.changes for slot in self._slots]
         res = reduce(operator.or_, changes_)
         if not raw:
-            idx_ =  [bitmap(slot.data().index) for slot in self._slots]
-            res = reduce(operator.and_, idx_, res)
+            for slot in self._slots:
+                if not res:
+                    break
+                res = existing_ids(slot.data(), res)
         return res != bitmap()
 
     def has_created(self):
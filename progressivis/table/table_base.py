@@ -12,8 +12,14 @@ from progressivis.core.utils import (integer_types,
                                      is_none_alike, get_physical_base)
 from progressivis.core.config import get_option
 from progressivis.core.bitmap import bitmap
+from progressivis.utils.errors import ProgressiveError
 from .dshape import dshape_print
 
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is an optional dependency
+    pa = None
+
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +27,23 @@ logger = logging.getLogger(__name__)
 FAST = 1
 
 
+def _column_buffer(column):
+    """Return the values of a physical column, sharing the memory of its
+    storage when it is a NumPy array of the column type"""
+    view = getattr(getattr(column, 'dataset', None), 'view', None)
+    if isinstance(view, np.ndarray) and view.dtype == column.dtype:
+        return view
+    return np.asarray(column[:])
+
+
+def _arrow_array(values):
+    if values.ndim == 1:
+        return pa.array(values)
+    flat = np.ascontiguousarray(values).reshape(-1)
+    return pa.FixedSizeListArray.from_arrays(pa.array(flat),
+                                             int(np.prod(values.shape[1:])))
+
+
 class _BaseLoc(object):
     # pylint: disable=too-few-public-methods
     def __init__(self, this_table, as_loc=True):
@@ -665,6 +688,65 @@ class BaseTable(metaclass=ABCMeta):
             return indices, arr
         return arr
 
+    def to_buffers(self, columns=None):
+        """Return the rows of this table without copying the column data
+
+        Return a tuple `(take, buffers)`, where `buffers` maps the column
+        names to the arrays of their physical columns, sharing the memory
+        of the storage when possible. `take` is None when the rows are the
+        buffers in order, as for tables using the identity mapping without
+        deleted rows, or an array of positions so that `buffers[c][take]`
+        are the values of the column `c`.
+
+        Parameters
+        ----------
+        columns: a list or None
+            the columns to export
+        """
+        if columns is None:
+            columns = self.columns
+        table = get_physical_base(self)
+        buffers = OrderedDict(
+            (c, _column_buffer(get_physical_base(self._column(c))))
+            for c in columns)
+        if self is table and self.is_identity and \
+           not self.index.has_freelist() and \
+           all(len(b) == len(self) for b in buffers.values()):
+            return None, buffers  # no deleted rows, even at the end
+        ids = self.index.to_array()
+        if table.is_identity:
+            take = np.asarray(ids, dtype=np.int64)
+        else:
+            take = np.asarray(table.id_to_index(ids), dtype=np.int64)
+        if len(take) and take[-1] - take[0] + 1 == len(take) and \
+           (np.diff(take) == 1).all():  # contiguous rows, use views
+            rows = slice(int(take[0]), int(take[-1]) + 1)
+            return None, OrderedDict((c, b[rows]) for c, b in buffers.items())
+        return take, buffers
+
+    def to_arrow(self, columns=None):
+        """Return the rows of this table as Arrow data, without copying the
+        numerical column data
+
+        Return a tuple `(batch, take)`, where `batch` is a
+        `pyarrow.RecordBatch` over the buffers returned by `to_buffers`,
+        and `take` is None or an Arrow array of positions such that
+        `batch.take(take)` holds the rows. Multidimensional columns are
+        exported as fixed size lists.
+
+        Parameters
+        ----------
+        columns: a list or None
+            the columns to export
+        """
+        if pa is None:
+            raise ProgressiveError('to_arrow requires pyarrow')
+        take, buffers = self.to_buffers(columns)
+        batch = pa.RecordBatch.from_arrays(
+            [_arrow_array(b) for b in buffers.values()],
+            names=list(buffers.keys()))
+        return batch, (None if take is None else pa.array(take))
+
     def unary(self, op, **kwargs):
         axis = kwargs.get('axis', 0)
         # get() is cheaper than pop(), it avoids to update unused kwargs
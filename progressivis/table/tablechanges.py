@@ -5,6 +5,7 @@ in tables/columns.
 
 import bisect
 import logging
+from threading import Lock
 
 
 from ..core.index_update import IndexUpdate
@@ -26,11 +27,26 @@ class Bookmark(object):
 
 
 class TableChanges(BaseChanges):
-    "Keep track of changes in tables"
+    """
+    Keep track of changes in tables. The consumers of a table may update
+    their slots from the worker threads of the scheduler, so the
+    bookmarks are protected by a lock. The listeners are called each time
+    changes are recorded, wherever they come from.
+    """
     def __init__(self):
         self._times = []      # list of times sorted
         self._bookmarks = []  # list of bookmarks synchronized with times
         self._mid_time = {}   # time associated with last mid update
+        self._listeners = []
+        self._lock = Lock()
+
+    def add_listener(self, listener):
+        "Call listener() each time changes are recorded"
+        self._listeners.append(listener)
+
+    def _notify(self):
+        for listener in self._listeners:
+            listener()
 
     def _last_update(self):
         if not self._bookmarks:
@@ -86,24 +102,34 @@ class TableChanges(BaseChanges):
         assert len(self._bookmarks) == len(self._times)
 
     def add_created(self, locs):
-        update = self._last_update()
-        if update is None:
-            return
-        update.add_created(locs)
+        with self._lock:
+            update = self._last_update()
+            if update is None:
+                return
+            update.add_created(locs)
+        self._notify()
 
     def add_updated(self, locs):
-        update = self._last_update()
-        if update is None:
-            return
-        update.add_updated(locs)
+        with self._lock:
+            update = self._last_update()
+            if update is None:
+                return
+            update.add_updated(locs)
+        self._notify()
 
     def add_deleted(self, locs):
-        update = self._last_update()
-        if update is None:
-            return
-        update.add_deleted(locs)
+        with self._lock:
+            update = self._last_update()
+            if update is None:
+                return
+            update.add_deleted(locs)
+        self._notify()
 
     def compute_updates(self, last, now, mid, cleanup=True):
+        with self._lock:
+            return self._compute_updates(last, now, mid)
+
+    def _compute_updates(self, last, now, mid):
         assert mid is not None
         time = now
         if last == 0:
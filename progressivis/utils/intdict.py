@@ -38,6 +38,10 @@ try:
             self._ht.get_items(key_value)
             return key_value
 
+        def lookup(self, keys, default=-1):
+            "Return the values of the keys, or `default` for missing keys"
+            return self._ht.lookup(np.asarray(keys, dtype=np.int64), default)
+
         def __contains__(self, key):
             return key in self._ht
 
@@ -79,6 +83,10 @@ except ImportError:  # pragma no cover
         def get_values(self, values):
             self.get_items(self, values)
 
+        def lookup(self, keys, default=-1):
+            return np.array([self.get(k, default) for k in keys],
+                            dtype=np.int64)
+
         def contains_any(self, keys):
             assert isinstance(keys, np.ndarray) and keys.dtype == np.int64
             for k in keys:
@@ -170,6 +170,22 @@ cdef class Int64HashTable:
             key = key_value[i]
             key_value[i] = self.get_item(key)
 
+    def lookup(self, ndarray[int64_t] keys, int64_t default=-1):
+        """Return the values of the keys in a new array, with `default`
+        for the missing keys"""
+        cdef:
+            Py_ssize_t i, n = len(keys)
+            khiter_t k
+            ndarray[int64_t] result = np.empty(n, dtype=np.int64)
+
+        for i in range(n):
+            k = kh_get_int64(self.table, keys[i])
+            if k != self.table.n_buckets:
+                result[i] = self.table.vals[k]
+            else:
+                result[i] = default
+        return result
+
     def contains_any(self, ndarray[int64_t] key_value):
         cdef:
             Py_ssize_t i, n = len(key_value)
@@ -105,7 +105,6 @@ setup(
                       "tables>=3.3.0",
                       "pandas>=1.0.0",
                       "scikit-learn>=0.18.1",
-                      "tdigest>=0.4.1.0",
                       "numcodecs>=0.5.5",
                       "datashape>=0.5.2",
                       "pyroaring>=0.2.3",
@@ -123,6 +122,7 @@ setup(
                       "aiohttp_jinja2",
                       "python_socketio", "click"],
     # "pptable",
+    extras_require={"arrow": ["pyarrow>=1.0.0"]},
     setup_requires=['cython', 'numpy', 'nose>=1.3.7', 'coverage'],
     # test_suite='tests',
     test_suite='nose.collector',
@@ -3,7 +3,7 @@ from . import ProgressiveTest
 import pandas as pd
 import numpy as np
 
-from progressivis.table.buffered_matrix import BufferedMatrix
+from progressivis.table.buffered_matrix import BufferedMatrix, TiledMatrix
 
 import logging
 import sys
@@ -34,3 +34,17 @@ class TestBufferedMatrix(ProgressiveTest):
                 self.assertTrue((omat==mat[0:omat.shape[0],0:omat.shape[1]]).all())
             mat[:,:] = np.random.rand(i,i)
             omat = mat
+
+    def test_tiled_matrix(self):
+        buf = TiledMatrix(tile_size=16)
+        self.assertEqual(len(buf), 0)
+        truth = np.random.rand(100, 100)
+        for i in range(10, 110, 10):
+            buf.resize(i)
+            buf.set_block(0, i-10, truth[0:i, i-10:i])
+            buf.set_block(i-10, 0, truth[i-10:i, 0:i])
+            self.assertEqual(len(buf), i)
+            self.assertTrue((buf.matrix() == truth[0:i, 0:i]).all())
+        self.assertTrue((buf.get_block(5, 37, 40, 21) ==
+                         truth[5:45, 37:58]).all())
+        self.assertEqual(len(buf._tiles), 49)
@@ -52,3 +52,6 @@ class TestIntDict(ProgressiveTest):
 
         self.assertTrue(d.contains_any(np.arange(19,21, dtype=np.int64)))
         self.assertFalse(d.contains_any(np.arange(20, 22, dtype=np.int64)))
+        self.assertTrue(np.array_equal(d.lookup(np.array([3, 25, 19])),
+                                       [13, -1, 29]))
+        self.assertTrue(np.array_equal(d.lookup([25], default=0), [0]))
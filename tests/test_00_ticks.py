@@ -0,0 +1,63 @@
+from . import ProgressiveTest
+
+from progressivis.core import aio
+from progressivis.server.ticks import ClientRate, TickCoalescer
+
+
+class TestTicks(ProgressiveTest):
+    def test_client_rate(self):
+        rate = ClientRate(min_interval=0.01, max_interval=1.0, alpha=0.5)
+        self.assertTrue(rate.ready(0))
+        batch = rate.sent(2, 10.0)
+        self.assertFalse(rate.ready(10.5))  # not acknowledged
+        self.assertFalse(rate.acked(batch, 10.1))
+        self.assertTrue(rate.acked(batch, 10.2))
+        self.assertAlmostEqual(rate.delay, 0.105)
+        self.assertFalse(rate.ready(10.1))
+        self.assertTrue(rate.ready(10.2))
+        batch = rate.sent(1, 11.0)
+        self.assertTrue(rate.ready(12.0))  # lost
+        rate.sent(1, 12.0)
+        self.assertEqual(rate.interval, 1.0)
+        self.assertFalse(rate.acked(batch, 12.1))
+
+    def test_coalescer(self):
+        sent = []
+        calls = []
+        subscribers = {'m': ['a', 'b'], 'n': ['a']}
+
+        def make_payload():
+            calls.append(1)
+            return {'x': len(calls)}
+
+        async def emit(sid, batch, ticks):
+            sent.append((sid, ticks))
+            if sid == 'a':
+                for _ in ticks:
+                    coalescer.acked(sid, batch)
+
+        coalescer = TickCoalescer(lambda path: subscribers.get(path, []),
+                                  emit, min_interval=0, max_interval=0.3)
+
+        async def _run():
+            for run_number in range(1, 5):
+                coalescer.update('m', run_number, make_payload)
+                coalescer.update('n', run_number)
+                coalescer.update('unknown', run_number, make_payload)
+            await aio.sleep(0.05)
+            coalescer.update('m', 5, make_payload)
+            await aio.sleep(0.01)
+            self.assertEqual(coalescer.pending('a'), set())
+            self.assertEqual(coalescer.pending('b'), {'m'})  # unacked
+            await aio.sleep(0.4)  # then lost
+        aio.run(_run())
+        self.assertEqual(sent[0], ('a', [('m', 4, {'x': 1}), ('n', 4, None)]))
+        self.assertEqual(sent[1], ('b', [('m', 4, {'x': 1})]))
+        self.assertEqual(sent[2], ('a', [('m', 5, {'x': 2})]))
+        self.assertEqual(sent[3], ('b', [('m', 5, {'x': 3})]))  # later flush
+        self.assertEqual(len(sent), 4)
+        self.assertEqual(len(calls), 3)
+
+
+if __name__ == '__main__':
+    ProgressiveTest.main()
@@ -0,0 +1,74 @@
+from . import ProgressiveTest
+
+import time
+import zlib
+
+import numpy as np
+
+from progressivis.server.transport import PayloadEncoder
+
+
+def _decode(message):
+    data = message['data']
+    if message.get('compression') == 'zlib':
+        data = zlib.decompress(data)
+    return np.frombuffer(data, dtype=message['dtype'])
+
+
+class TestTransport(ProgressiveTest):
+    def test_delta(self):
+        encoder = PayloadEncoder()
+        array = np.arange(1000, dtype=np.float64)
+        msg = encoder.encode('m', {'a': array, 'b': 'text'}, 1)
+        self.assertEqual(msg['b'], 'text')
+        self.assertEqual(msg['a']['__ndarray__'], 'full')
+        self.assertTrue(np.array_equal(_decode(msg['a']), array))
+        self.assertTrue(encoder.is_pending('m'))
+        array = array.copy()
+        array[10] = -1
+        msg = encoder.encode('m', {'a': array}, 2)
+        self.assertEqual(msg['a']['__ndarray__'], 'full')  # 1 not acked
+        encoder.ack('m', 1)
+        self.assertTrue(encoder.is_pending('m'))
+        encoder.ack('m', 2)
+        self.assertFalse(encoder.is_pending('m'))
+        array = array.copy()
+        array[20] = -2
+        msg = encoder.encode('m', {'a': array}, 3)
+        self.assertEqual(msg['a']['__ndarray__'], 'delta')
+        self.assertEqual(_decode(msg['a']['indices']).tolist(), [20])
+        self.assertEqual(_decode(msg['a']).tolist(), [-2])
+
+    def test_append(self):
+        encoder = PayloadEncoder(compress=True)
+        rows = np.arange(300, dtype=np.int32).reshape(100, 3)
+        msg = encoder.encode('m', [rows], 1)
+        self.assertEqual(msg[0]['compression'], 'zlib')
+        encoder.ack('m', 1)
+        rows = np.vstack([rows, rows])
+        msg = encoder.encode('m', [rows], 2)
+        self.assertEqual(msg[0]['__ndarray__'], 'append')
+        self.assertEqual(msg[0]['shape'], [100, 3])
+        self.assertTrue(np.array_equal(_decode(msg[0]), rows[100:].ravel()))
+        encoder.reset('m')
+        msg = encoder.encode('m', [rows], 3)
+        self.assertEqual(msg[0]['__ndarray__'], 'full')
+
+    def test_timeout(self):
+        encoder = PayloadEncoder(timeout=0.01)
+        array = np.arange(1000, dtype=np.float64)
+        encoder.encode('m', {'a': array}, 0)
+        encoder.ack('m', 0)
+        array = np.arange(2000, dtype=np.float64)
+        msg = encoder.encode('m', {'a': array}, 1)
+        self.assertEqual(msg['a']['__ndarray__'], 'append')
+        self.assertTrue(encoder.is_pending('m'))
+        time.sleep(0.02)  # never acknowledged
+        self.assertFalse(encoder.is_pending('m'))
+        encoder.ack('m', 1)  # too late
+        msg = encoder.encode('m', {'a': array}, 2)
+        self.assertEqual(msg['a']['__ndarray__'], 'full')
+
+
+if __name__ == '__main__':
+    ProgressiveTest.main()
@@ -0,0 +1,90 @@
+"Test for the compressed chunked storage engine"
+from . import ProgressiveTest
+
+from progressivis.storage import StorageEngine
+from progressivis.storage.chunked import ChunkedGroup, ChunkedDataset
+from progressivis.table.table import Table
+from numcodecs import Delta, Zstd
+
+import numpy as np
+
+
+class TestChunked(ProgressiveTest):
+    "Test compressed chunked storage"
+    def test_dataset(self):
+        arr = np.random.rand(1000)
+        dset = ChunkedDataset('d', data=arr, chunklen=64, cache_size=2)
+        self.assertEqual(dset.shape, (1000,))
+        self.assertEqual(len(dset._chunks), 16)
+        self.assertTrue(np.array_equal(dset[:], arr))
+        self.assertEqual(dset[10], arr[10])
+        self.assertEqual(dset[-1], arr[-1])
+        self.assertTrue(np.array_equal(dset[100:500:7], arr[100:500:7]))
+        idx = np.random.randint(0, 1000, 100)
+        self.assertTrue(np.array_equal(dset[idx], arr[idx]))
+        self.assertTrue(np.array_equal(dset[list(idx)], arr[idx]))
+        mask = arr > 0.5
+        self.assertTrue(np.array_equal(dset[mask], arr[mask]))
+        dset[idx] = -idx
+        arr[idx] = -idx
+        dset[300:700] = 1.0
+        arr[300:700] = 1.0
+        dset[3] = 42
+        arr[3] = 42
+        self.assertTrue(np.array_equal(dset[:], arr))
+        self.assertLessEqual(len(dset._cache), 2)
+        dset.resize(10)
+        dset.resize(100)
+        self.assertTrue(np.array_equal(dset[:10], arr[:10]))
+        self.assertTrue(np.isnan(dset[10:]).all())  # filled with fillvalue
+        with self.assertRaises(IndexError):
+            _ = dset[100]
+
+    def test_dataset_2d(self):
+        dset = ChunkedDataset('d2', shape=(0, 3), dtype=np.int32,
+                              chunklen=10, fillvalue=0)
+        dset.resize(25)
+        arr = np.arange(75, dtype=np.int32).reshape(25, 3)
+        dset[0:25] = arr
+        self.assertTrue(np.array_equal(dset[:], arr))
+        self.assertTrue(np.array_equal(dset[:, 1], arr[:, 1]))
+        self.assertTrue(np.array_equal(dset[7], arr[7]))
+        dset.resize((25, 5))
+        self.assertEqual(dset.shape, (25, 5))
+        self.assertTrue(np.array_equal(dset[:, :3], arr))
+        self.assertTrue((dset[:, 3:] == 0).all())
+
+    def test_compression(self):
+        n = 1000000
+        arr = np.arange(n, dtype=np.int64) // 3
+        dset = ChunkedDataset('c', data=arr, filters=[Delta(dtype='i8')],
+                              compressor=Zstd(level=3))
+        self.assertTrue(np.array_equal(dset[:], arr))
+        self.assertGreater(dset.nbytes / dset.cbytes, 10)
+        dset = ChunkedDataset('c', data=np.random.randint(0, 100, n))
+        self.assertGreater(dset.nbytes / dset.cbytes, 3)
+
+    def test_table(self):
+        group = StorageEngine.lookup('chunked').create_group('test_table')
+        self.assertIsInstance(group, ChunkedGroup)
+        n = 100000
+        data = {'a': np.arange(n), 'b': np.random.rand(n),
+                'c': ['s%d' % (i % 13) for i in range(n)]}
+        table = Table('table_chunked',
+                      dshape='{a: int64, b: float64, c: string}',
+                      data=data, storagegroup=group)
+        self.assertEqual(len(table), n)
+        self.assertTrue(np.array_equal(table['a'].values, data['a']))
+        self.assertTrue(np.array_equal(table['b'].values, data['b']))
+        self.assertEqual(list(table['c'].values), data['c'])
+        table.append({'a': np.arange(10), 'b': np.zeros(10),
+                      'c': ['x'] * 10})
+        self.assertEqual(len(table), n + 10)
+        self.assertEqual(table.at[n + 5, 'c'], 'x')
+        table.drop(slice(0, 10))
+        self.assertEqual(len(table), n)
+        self.assertEqual(table.at[10, 'a'], 10)
+
+
+if __name__ == '__main__':
+    ProgressiveTest.main()
@@ -5,7 +5,7 @@ import shutil
 import numpy as np
 
 from progressivis.storage.mmap import MMapGroup
-from progressivis.storage.mmap_enc import MAX_SHORT
+from progressivis.storage.mmap_enc import MAX_SHORT, MMapObject
 from progressivis.storage.base import Group, Dataset
 from progressivis.table.table import Table
 from . import ProgressiveTest, skip, skipIf
@@ -158,6 +158,66 @@ class TestMMap(ProgressiveTest):
         self.assertEqual(len(t), 67)
         self.assertEqual(_free_chunk_nb(t), 34)
 
+    def test_mmap_bulk_strings(self):
+        self._rmtree()
+        os.makedirs(self.tmp)
+        strings = MMapObject(os.path.join(self.tmp, 'strings'))
+        values = ['s%d' % i for i in range(1000)] + [None, '',
+                                                     'é'*LONG_SIZE]
+        indices = strings.add_many(values)
+        self.assertEqual(indices[1000], -1)
+        self.assertEqual(list(strings.get_many(indices)), values)
+        self.assertEqual(strings.get(indices[1002]), values[1002])
+        idx = strings.add('after')  # single adds still work after bulk adds
+        self.assertEqual(strings.get(idx), 'after')
+        self.assertEqual(strings.get(indices[999]), 's999')
+        strings.close()
+        dstrings = MMapObject(os.path.join(self.tmp, 'dstrings'),
+                              dictionary=True)
+        values = ['a', 'b', 'c'] * 1000
+        indices = dstrings.add_many(values)
+        self.assertEqual(len(np.unique(indices)), 3)
+        self.assertEqual(list(dstrings.get_many(indices)), values)
+        self.assertEqual(dstrings.add('b'), indices[1])
+        dstrings.close()
+        self._rmtree()
+
+    def test_mmap_bulk_table(self):
+        self._rmtree()
+        group = MMapGroup(self.tmp)
+        n = 10000
+        df = pd.DataFrame({'a': np.arange(n),
+                           'c': ['v%d' % (i % 17) for i in range(n)]})
+        table = Table('table_bulk', data=df, storagegroup=group)
+        self.assertEqual(len(table), n)
+        self.assertEqual(list(table['c'].values), list(df.c))
+        self.assertEqual(list(table['c'][[3, 1, 4]]), ['v3', 'v1', 'v4'])
+        table['c'][10:20] = 'x'
+        self.assertEqual(list(table['c'][9:21]), ['v9'] + ['x']*10 + ['v3'])
+        dset = group.create_dataset('dict', shape=(0,), dtype=object,
+                                    dictionary=True)
+        dset.resize(n)
+        dset[:] = df.c.values
+        self.assertEqual(len(set(dset.view)), 17)
+        self.assertEqual(list(dset[:]), list(df.c))
+        group.close_all()
+        self._rmtree()
+
+    def test_mmap_bulk_reuse(self):
+        self._rmtree()
+        group = MMapGroup(self.tmp)
+        dset = group.create_dataset('long', shape=(100,), dtype=object)
+        values = ['%03d' % i + 'a'*LONG_SIZE for i in range(100)]
+        dset[:] = values
+        size = len(dset._strings)
+        for k in range(5):  # rewritten entries reuse the released ones
+            values[10:60] = ['%03d' % i + 'b'*LONG_SIZE for i in range(50)]
+            dset[10:60] = values[10:60]
+            self.assertEqual(len(dset._strings), size)
+        self.assertEqual(list(dset[:]), values)
+        group.close_all()
+        self._rmtree()
+
     def _create_table(self, group):
         table = Table('table',
                       dshape='{a: int64, b: real, c: string, d: 10*int}',
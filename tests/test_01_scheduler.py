@@ -1,10 +1,14 @@
 from . import ProgressiveTest
 
 from time import sleep
+import threading
+
+import numpy as np
 
 from progressivis import Print, Scheduler, ProgressiveError
+from progressivis.core import DeadlinePolicy
 from progressivis.io import CSVLoader
-from progressivis.stats import Min
+from progressivis.stats import Min, Max, RandomTable, Histogram1D, Var
 from progressivis.datasets import get_dataset
 from progressivis.core import aio
 
@@ -47,6 +51,175 @@ class TestScheduler(ProgressiveTest):
         html = s._repr_html_()
         self.assertTrue(len(html) != 0)
 
+    def test_scheduler_n_jobs(self):
+        with self.assertRaises(ProgressiveError):
+            s = Scheduler(n_jobs=0)
+        s = Scheduler(n_jobs=4)
+        with s:
+            random = RandomTable(10, rows=10000, scheduler=s)
+            min_ = Min(scheduler=s)
+            min_.input.table = random.output.table
+            max_ = Max(scheduler=s)
+            max_.input.table = random.output.table
+            pr = Print(proc=self.terse, scheduler=s)
+            pr.input.df = min_.output.table
+            pr2 = Print(proc=self.terse, scheduler=s)
+            pr2.input.df = max_.output.table
+        lock = threading.Lock()
+        running = []
+        overlaps = []
+
+        def _traced(run_step):
+            def _run_step(*args):
+                with lock:
+                    running.append(run_step)
+                    overlaps.append(len(running))
+                sleep(0.01)
+                try:
+                    return run_step(*args)
+                finally:
+                    with lock:
+                        running.remove(run_step)
+            return _run_step
+        min_.run_step = _traced(min_.run_step)
+        max_.run_step = _traced(max_.run_step)
+        aio.run(s.start())
+        self.assertIsNone(s._executor)
+        self.assertGreater(max(overlaps), 1)  # min_ and max_ ran together
+        self.assertIn(random.name, s._ancestors[pr.name])
+        self.assertNotIn(min_.name, s._ancestors[max_.name])
+        self.assertNotIn(max_.name, s._ancestors[min_.name])
+        res1 = np.array(list(random.table().min().values()))
+        res2 = np.array(list(min_.table().values()))
+        self.assertTrue(np.allclose(res1, res2))
+        res1 = np.array(list(random.table().max().values()))
+        res2 = np.array(list(max_.table().values()))
+        self.assertTrue(np.allclose(res1, res2))
+
+    def test_scheduler_deadline_policy(self):
+        policy = DeadlinePolicy()
+        s = Scheduler(policy=policy)
+        with s:
+            random = RandomTable(10, rows=10000, scheduler=s)
+            var = Var(scheduler=s)
+            var.input.table = random.output.table
+            pr = Print(proc=self.terse, scheduler=s)
+            pr.input.df = var.output.table
+            min_ = Min(scheduler=s)
+            min_.input.table = random.output.table
+            max_ = Max(scheduler=s)
+            max_.input.table = random.output.table
+            histogram1d = Histogram1D('_1', scheduler=s)
+            histogram1d.input.table = random.output.table
+            histogram1d.input.min = min_.output.table
+            histogram1d.input.max = max_.output.table
+        aio.run(s.start())
+        run_list = [s[name] for name in s._runorder]
+        visible = policy.visible_modules(run_list)
+        self.assertEqual(visible, {random.name, min_.name, max_.name,
+                                   histogram1d.name})
+        order = [m.name for m in policy.start_round(run_list)]
+        self.assertEqual(set(order[:4]), visible)
+        self.assertEqual(set(order[4:]), {var.name, pr.name})
+        self.assertEqual(policy.quantum(var, 0.5), 0.5)
+        json = s.to_json()
+        self.assertEqual(json['policy']['classname'], 'DeadlinePolicy')
+        last = histogram1d.table().last().to_dict()
+        h1 = last['array']
+        bounds = (last['min'], last['max'])
+        v = random.table()['_1'].values
+        h2, _ = np.histogram(v, bins=histogram1d.params.bins, range=bounds)
+        self.assertListEqual(h1.tolist(), h2.tolist())
+
+    def test_scheduler_skip_clean(self):
+        s = Scheduler()
+        with s:
+            random = RandomTable(10, rows=10000, scheduler=s)
+            min_ = Min(scheduler=s)
+            min_.input.table = random.output.table
+            pr = Print(proc=self.terse, scheduler=s)
+            pr.input.df = min_.output.table
+        aio.run(s.start())
+        res1 = np.array(list(random.table().min().values()))
+        res2 = np.array(list(min_.table().values()))
+        self.assertTrue(np.allclose(res1, res2))
+        s._dirty.clear()
+        # a change made outside of a module run wakes up the consumers
+        random.table().loc[0, '_1'] = -1.0
+        self.assertIn(min_.name, s._dirty)
+        self.assertNotIn(pr.name, s._dirty)
+
+    def test_scheduler_profiler(self):
+        s = Scheduler()
+        with s:
+            random = RandomTable(10, rows=10000, scheduler=s)
+            min_ = Min(scheduler=s)
+            min_.input.table = random.output.table
+            pr = Print(proc=self.terse, scheduler=s)
+            pr.input.df = min_.output.table
+        self.assertNotIn('profile', s.to_json())
+        s.profiler.start_recording()
+        aio.run(s.start())
+        s.profiler.stop_recording()
+        json = s.to_json()['profile']
+        profiles = {p['name']: p for p in json['modules']}
+        self.assertEqual(profiles[random.name]['steps'], 10000)
+        self.assertEqual(profiles[min_.name]['steps'], 10000)
+        self.assertGreater(profiles[random.name]['rows_per_second'], 0)
+        overhead = json['overhead']
+        self.assertGreater(overhead['elapsed'], 0)
+        self.assertGreater(overhead['update'], 0)
+        self.assertAlmostEqual(overhead['total'],
+                               overhead['update'] + overhead['tracer'] +
+                               overhead['scheduling'])
+        trace = s.profiler.to_chrome_trace()['traceEvents']
+        runs = [e for e in trace
+                if e['cat'] == 'run' and e['name'] == min_.name]
+        self.assertEqual(len(runs), profiles[min_.name]['runs'])
+        speedscope = s.profiler.to_speedscope()
+        for profile in speedscope['profiles']:
+            stack = []
+            for event in profile['events']:  # properly nested frames
+                if event['type'] == 'O':
+                    stack.append(event['frame'])
+                else:
+                    self.assertEqual(stack.pop(), event['frame'])
+            self.assertEqual(stack, [])
+        # the tracer methods are still available
+        self.assertIsNotNone(min_.tracer.get_speed())
+
+    def test_scheduler_profiler_n_jobs(self):
+        s = Scheduler(n_jobs=2)
+        with s:
+            random = RandomTable(10, rows=10000, scheduler=s)
+            min_ = Min(scheduler=s)
+            min_.input.table = random.output.table
+            max_ = Max(scheduler=s)
+            max_.input.table = random.output.table
+            pr = Print(proc=self.terse, scheduler=s)
+            pr.input.df = min_.output.table
+            pr2 = Print(proc=self.terse, scheduler=s)
+            pr2.input.df = max_.output.table
+        step_threads = set()
+        run_step = min_.run_step
+
+        def _run_step(*args):
+            step_threads.add(threading.get_ident())
+            return run_step(*args)
+        min_.run_step = _run_step
+        s.profiler.start_recording()
+        aio.run(s.start())
+        s.profiler.stop_recording()
+        profile = s.profiler.module_profile(min_.name)
+        self.assertEqual(profile.steps, 10000)
+        self.assertGreater(profile.cpu_time, 0)
+        # some steps ran in the workers, and were measured there
+        self.assertTrue(step_threads - {threading.get_ident()})
+        trace = s.profiler.to_chrome_trace()['traceEvents']
+        tids = {e['tid'] for e in trace
+                if e['name'] == '%s.run_step' % min_.name}
+        self.assertEqual(tids, step_threads)
+
 
 if __name__ == '__main__':
     ProgressiveTest.main()
@@ -0,0 +1,73 @@
+from . import ProgressiveTest, skipIf
+
+from progressivis.table.table import Table
+from progressivis.table.table_selected import TableSelectedView
+from progressivis.core.bitmap import bitmap
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+class TestTableExport(ProgressiveTest):
+    def _table(self, name):
+        t = Table(name, dshape="{a: int64, b: float64, c: 3 * float64}",
+                  create=True)
+        t.resize(10)
+        t['a'] = np.arange(10)
+        t['b'] = np.random.rand(10)
+        t['c'] = np.random.rand(10, 3)
+        return t
+
+    def test_to_buffers_identity(self):
+        t = self._table('table_export_identity')
+        take, buffers = t.to_buffers()
+        self.assertIsNone(take)
+        self.assertEqual(list(buffers.keys()), ['a', 'b', 'c'])
+        self.assertTrue(np.array_equal(buffers['c'], t['c'].value))
+        buffers['b'][3] = -1  # shares the storage
+        self.assertEqual(t.at[3, 'b'], -1)
+
+    def test_to_buffers_selection(self):
+        t = self._table('table_export_selection')
+        view = TableSelectedView(t, bitmap([1, 4, 5, 8]))
+        take, buffers = view.to_buffers(['a', 'b'])
+        self.assertTrue(np.array_equal(take, [1, 4, 5, 8]))
+        self.assertTrue(np.shares_memory(buffers['b'],
+                                         t.to_buffers()[1]['b']))
+        self.assertTrue(np.array_equal(buffers['b'][take],
+                                       view.to_array(columns=['b'])[:, 0]))
+        view.selection = bitmap(range(2, 6))
+        take, buffers = view.to_buffers(['a'])
+        self.assertIsNone(take)  # contiguous rows are sliced
+        self.assertTrue(np.array_equal(buffers['a'], [2, 3, 4, 5]))
+        del t.loc[[9]]  # no freelist for trailing rows
+        take, buffers = t.to_buffers(['a'])
+        self.assertIsNone(take)
+        self.assertTrue(np.array_equal(buffers['a'], np.arange(9)))
+        del t.loc[[3, 7]]
+        take, buffers = t.to_buffers(['a'])
+        self.assertTrue(np.array_equal(buffers['a'][take],
+                                       [0, 1, 2, 4, 5, 6, 8]))
+
+    @skipIf(pa is None, "pyarrow is not installed")
+    def test_to_arrow(self):
+        t = self._table('table_export_arrow')
+        batch, take = t.to_arrow()
+        self.assertIsNone(take)
+        self.assertEqual(batch.num_rows, 10)
+        self.assertEqual(batch.column(0).buffers()[1].address,
+                         t.to_buffers()[1]['a'].ctypes.data)
+        self.assertTrue(np.array_equal(
+            np.array(batch.column(2).to_pylist()), t['c'].value))
+        view = TableSelectedView(t, bitmap([0, 9]))
+        batch, take = view.to_arrow(['b'])
+        self.assertEqual(batch.take(take).column(0).to_pylist(),
+                         view.to_array(columns=['b'])[:, 0].tolist())
+
+
+if __name__ == '__main__':
+    ProgressiveTest.main()
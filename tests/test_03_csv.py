@@ -5,6 +5,8 @@ from progressivis.table.constant import Constant
 from progressivis.table.table import Table
 from progressivis.datasets import get_dataset#, RandomBytesIO
 from progressivis.core.utils import RandomBytesIO
+import pandas as pd
+import numpy as np
 #import logging, sys
 
 class TestProgressiveLoadCSV(ProgressiveTest):
@@ -47,6 +49,17 @@ class TestProgressiveLoadCSV(ProgressiveTest):
         
 
 
+    def test_read_csv_n_jobs(self):
+        s=self.scheduler()
+        module=CSVLoader(get_dataset('bigfile'), index_col=False, header=None,
+                         n_jobs=4, scheduler=s)
+        aio.run(s.start())
+        table = module.table()
+        self.assertEqual(len(table), 1000000)
+        df = pd.read_csv(get_dataset('bigfile'), index_col=False, header=None)
+        self.assertTrue(np.array_equal(table['_1'].values, df[1].values))
+        self.assertTrue(np.array_equal(table['_29'].values, df[29].values))
+
     def test_read_fake_csv(self):
         s=self.scheduler()
         module=CSVLoader(RandomBytesIO(cols=30, rows=1000000), index_col=False, header=None, scheduler=s)
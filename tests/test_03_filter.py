@@ -60,5 +60,21 @@ class TestFilter(ProgressiveTest):
         dfe = df.eval('_1>0.5')
         self.assertEqual(filter_._table.selection, bitmap(df.index[dfe]))
 
+    def test_filter_user_dict(self):
+        s = Scheduler()
+        random = RandomTable(2, rows=100000, scheduler=s)
+        stirrer = Stirrer(update_column='_1', update_rows=5,
+                          fixed_step_size=100, scheduler=s)
+        stirrer.input.table = random.output.table
+        filter_ = FilterMod(expr='(_1 > low) & (_2 < 0.5)',
+                            user_dict={'low': 0.25}, scheduler=s)
+        filter_.input.table = stirrer.output.table
+        pr = Print(proc=self.terse, scheduler=s)
+        pr.input.df = filter_.output.table
+        aio.run(s.start())
+        tbl = filter_.get_input_slot('table').data()
+        idx = tbl.eval('(_1>0.25) & (_2<0.5)', result_object='index')
+        self.assertEqual(filter_._table.selection, bitmap(idx))
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,116 @@
+from . import ProgressiveTest
+
+from progressivis.core import aio
+from progressivis import Print
+from progressivis.table.stirrer import Stirrer
+from progressivis.linalg import (Log, Add, Multiply, ColsSubtract, Floor,
+                                 FusedUfunc, fuse_elementwise)
+from progressivis.core.bitmap import bitmap
+from progressivis.stats import RandomTable, RandomDict
+import numpy as np
+
+
+class TestFused(ProgressiveTest):
+    def _chain(self, s, random1, random2, dict_=None):
+        log = Log(columns=['_1', '_2', '_3'], scheduler=s)
+        log.input.table = random1.output.table
+        add = Add(scheduler=s)
+        add.input.first = log.output.table
+        add.input.second = (dict_ or random2).output.table
+        mul = Multiply(scheduler=s)
+        mul.input.first = add.output.table
+        mul.input.second = random2.output.table
+        return mul
+
+    def test_fused_chain(self):
+        s = self.scheduler()
+        random1 = RandomTable(3, rows=100_000, scheduler=s)
+        random2 = RandomTable(3, rows=100_000, scheduler=s)
+        mul = self._chain(s, random1, random2)
+        pr = Print(proc=self.terse, scheduler=s)
+        pr.input.df = mul.output.table
+        fused = fuse_elementwise(s)
+        self.assertEqual(len(fused), 1)
+        module = fused[0]
+        self.assertIsInstance(module, FusedUfunc)
+        self.assertEqual(module.fused_modules,
+                         ['log_1', 'add_1', 'multiply_1'])
+        self.assertNotIn('add_1', s.dataflow)
+        aio.run(s.start())
+        arr1 = random1.table().to_array()
+        arr2 = random2.table().to_array()
+        res1 = (np.log(arr1) + arr2) * arr2
+        res2 = module.table().to_array()
+        self.assertTrue(np.allclose(res1, res2, equal_nan=True))
+        self.assertIsNotNone(module._numexpr)
+        inter = module.intermediate('add_1', bitmap(range(10)))
+        self.assertTrue(np.allclose(inter['_2'],
+                                    np.log(arr1[:10, 1]) + arr2[:10, 1]))
+
+    def test_fused_dict(self):
+        s = self.scheduler()
+        random1 = RandomTable(3, rows=100_000, scheduler=s)
+        random2 = RandomTable(3, rows=100_000, scheduler=s)
+        dict_ = RandomDict(3, scheduler=s)
+        mul = self._chain(s, random1, random2, dict_)
+        module = fuse_elementwise(s)[0]
+        pr = Print(proc=self.terse, scheduler=s)
+        pr.input.df = module.output.table
+        aio.run(s.start())
+        values = np.array(list(dict_.table().values()))
+        res1 = (np.log(random1.table().to_array()) + values) * \
+            random2.table().to_array()
+        res2 = module.table().to_array()
+        self.assertTrue(np.allclose(res1, res2, equal_nan=True))
+
+    def test_fused_cast(self):
+        "Intermediate tables cast the values to the type of their input"
+        s = self.scheduler()
+        random = RandomTable(3, random=lambda x: np.random.randint(1000, size=x),
+                             dtype='int64', rows=10_000, scheduler=s)
+        sub = ColsSubtract(['_1'], ['_2'], cols_out=['_x'], scheduler=s)
+        sub.input.table = random.output.table
+        floor = Floor(scheduler=s)
+        floor.input.table = sub.output.table
+        module = fuse_elementwise(s)[0]
+        pr = Print(proc=self.terse, scheduler=s)
+        pr.input.df = module.output.table
+        aio.run(s.start())
+        arr = random.table().to_array()
+        self.assertIsNone(module._numexpr)
+        self.assertEqual(module.table()['_x'].dtype, np.int64)
+        self.assertTrue(np.array_equal(module.table()['_x'].value,
+                                       arr[:, 0] - arr[:, 1]))
+
+    def _t_stirred_fused(self, **kw):
+        s = self.scheduler()
+        random1 = RandomTable(3, rows=100_000, scheduler=s)
+        random2 = RandomTable(3, rows=100_000, scheduler=s)
+        stirrer1 = Stirrer(update_column='_2',
+                           fixed_step_size=1000, scheduler=s, **kw)
+        stirrer1.input.table = random1.output.table
+        stirrer2 = Stirrer(update_column='_3',
+                           fixed_step_size=1000, scheduler=s, **kw)
+        stirrer2.input.table = random2.output.table
+        self._chain(s, stirrer1, stirrer2)
+        module = fuse_elementwise(s)[0]
+        pr = Print(proc=self.terse, scheduler=s)
+        pr.input.df = module.output.table
+        aio.run(s.start())
+        idx1 = stirrer1.table().index.to_array()
+        idx2 = stirrer2.table().index.to_array()
+        common = bitmap(idx1) & bitmap(idx2)
+        arr1 = stirrer1.table().loc[common, :].to_array()
+        arr2 = stirrer2.table().loc[common, :].to_array()
+        res1 = (np.log(arr1) + arr2) * arr2
+        res2 = module.table().to_array()
+        ix = module.table().index.to_array()
+        self.assertEqual(bitmap(ix), common)
+        res2 = res2[ix.argsort()]
+        self.assertTrue(np.allclose(res1, res2, equal_nan=True))
+
+    def test_stirred_fused1(self):
+        self._t_stirred_fused(delete_rows=5)
+
+    def test_stirred_fused2(self):
+        self._t_stirred_fused(update_rows=5)
@@ -0,0 +1,118 @@
+from . import ProgressiveTest
+
+from progressivis.core import aio
+from progressivis.core.bitmap import bitmap
+from progressivis.stats import RandomTable
+from progressivis.table.table import Table
+from progressivis.table.constant import Constant
+from progressivis.table.join import join, Join
+from progressivis.table.merge import merge, Merge
+from progressivis.table.stirrer import Stirrer
+from progressivis.table.hash_join import HashJoinState, LEFT, RIGHT
+
+import numpy as np
+
+
+def _pairs(table, left, right):
+    ids = table.index.values
+    ids = ids[ids >= 0]
+    return sorted(zip(table[left].loc[ids].tolist(),
+                      table[right].loc[ids].tolist()))
+
+
+def _expected(left, lkey, lcol, right, rkey, rcol):
+    lids = left.index.values
+    lids = lids[lids >= 0]
+    rids = right.index.values
+    rids = rids[rids >= 0]
+    lk, lv = left[lkey].loc[lids], left[lcol].loc[lids]
+    rk, rv = right[rkey].loc[rids], right[rcol].loc[rids]
+    return sorted((a, b) for (k, a) in zip(lk.tolist(), lv.tolist())
+                  for (l, b) in zip(rk.tolist(), rv.tolist()) if k == l)
+
+
+class TestHashJoin(ProgressiveTest):
+    def _dimension(self, key='key'):
+        return Table(None, dshape='{%s: int64, label: string}' % key,
+                     data={key: np.arange(10),
+                           'label': ['l%d' % i for i in range(10)]},
+                     create=True)
+
+    def test_hash_join_state(self):
+        left = Table('hash_join_left', dshape='{k: int64, a: float64}',
+                     data={'k': np.array([1, 2, 2, 3]),
+                           'a': np.array([0.1, 0.2, 0.3, 0.4])}, create=True)
+        right = Table('hash_join_right', dshape='{k: int64, b: float64}',
+                      data={'k': np.array([2, 3, 3, 4]),
+                            'b': np.array([1., 2., 3., 4.])}, create=True)
+        state = HashJoinState(left, right, on='k')
+        self.assertEqual(list(state.table.columns), ['k', 'a', 'b'])
+        state.create(LEFT, left, bitmap([0, 1]), right)
+        state.create(RIGHT, right, bitmap(range(4)), left)
+        self.assertEqual(_pairs(state.table, 'a', 'b'), [(0.2, 1.)])
+        state.create(LEFT, left, bitmap([2, 3]), right)
+        self.assertEqual(_pairs(state.table, 'a', 'b'),
+                         _expected(left, 'k', 'a', right, 'k', 'b'))
+        right.loc[1, 'b'] = 5.  # same key, updated in place
+        self.assertEqual(len(state.update(RIGHT, right, [1], left)), 1)
+        left.loc[0, 'k'] = 4  # new key
+        state.update(LEFT, left, [0], right)
+        self.assertEqual(_pairs(state.table, 'a', 'b'),
+                         _expected(left, 'k', 'a', right, 'k', 'b'))
+        removed = state.delete(RIGHT, [0])
+        self.assertEqual(len(removed), 2)
+        del right.loc[[0]]
+        self.assertEqual(_pairs(state.table, 'a', 'b'),
+                         _expected(left, 'k', 'a', right, 'k', 'b'))
+
+    def test_join_on(self):
+        left = Table('hash_join_str', dshape='{name: string, x: int64}',
+                     data={'name': ['a', 'b', 'a', 'c'],
+                           'x': np.arange(4)}, create=True)
+        right = Table('hash_join_str2', dshape='{name: string, y: int64}',
+                      data={'name': ['c', 'a'], 'y': [10, 20]}, create=True)
+        res = join(left, right, on='name', how='inner', sort=True)
+        self.assertEqual(res['name'].value.tolist(), ['a', 'a', 'c'])
+        self.assertEqual(res['y'].value.tolist(), [20, 20, 10])
+        res = merge(left, right, left_on=['name'], right_on=['name'])
+        self.assertEqual(list(res.columns), ['name_x', 'x', 'name_y', 'y'])
+        self.assertEqual(_pairs(res, 'x', 'y'), [(0, 20), (2, 20), (3, 10)])
+        with self.assertRaises(ValueError):
+            join(left, right, on='name')  # how='left' is not implemented
+
+    def test_join_dimension(self):
+        s = self.scheduler()
+        random = RandomTable(2, rows=10000, random=lambda n: np.random.randint(
+            0, 12, size=n), dtype='int64', scheduler=s)
+        dim = Constant(self._dimension('_1'), scheduler=s)
+        jn = Join(on=['_1'], how='inner', scheduler=s)
+        jn.input.table = random.output.table
+        jn.input.table = dim.output.table
+        aio.run(s.start())
+        table = jn.table()
+        facts = random.table()
+        self.assertEqual(len(table), int(np.sum(facts['_1'].value < 10)))
+        self.assertEqual(_pairs(table, '_2', 'label'),
+                         _expected(facts, '_1', '_2',
+                                   dim.table(), '_1', 'label'))
+
+    def test_merge_stirred(self):
+        s = self.scheduler()
+        random = RandomTable(2, rows=10000, random=lambda n: np.random.randint(
+            0, 12, size=n), scheduler=s)
+        stirrer = Stirrer(update_column='_1', delete_rows=5,
+                          update_rows=5, fixed_step_size=100, scheduler=s)
+        stirrer.input.table = random.output.table
+        dim = Constant(self._dimension(), scheduler=s)
+        mg = Merge(left_on='_1', right_on='key', scheduler=s)
+        mg.input.table = stirrer.output.table
+        mg.input.table = dim.output.table
+        aio.run(s.start())
+        facts = stirrer.table()
+        self.assertEqual(_pairs(mg.table(), '_2', 'label'),
+                         _expected(facts, '_1', '_2',
+                                   dim.table(), 'key', 'label'))
+
+
+if __name__ == '__main__':
+    ProgressiveTest.main()
@@ -20,7 +20,7 @@ class TestPercentiles(ProgressiveTest):
     def tearDown(self):
         TestPercentiles.cleanup()
 
-    def _impl_tst_percentiles(self, accuracy):
+    def _impl_tst_percentiles(self, accuracy, **kw):
         """
         """
         s = self.scheduler()
@@ -32,7 +32,8 @@ class TestPercentiles(ProgressiveTest):
                                     '_50': 50.0,
                                     '_75': 75.0})
             which_percentiles = Constant(table=t_percentiles, scheduler=s)
-            percentiles = Percentiles(hist_index, accuracy=accuracy, scheduler=s)
+            percentiles = Percentiles(hist_index, accuracy=accuracy,
+                                      scheduler=s, **kw)
             percentiles.input.table = random.output.table
             percentiles.input.percentiles = which_percentiles.output.table
             prt = Print(proc=self.terse, scheduler=s)
@@ -93,6 +94,12 @@ class TestPercentiles(ProgressiveTest):
         """
         return self._impl_tst_percentiles(2.0)
 
+    def test_percentiles_sketch(self):
+        """test_percentiles: HistIndex based percentiles read from the
+        KLL sketch of the index
+        """
+        return self._impl_tst_percentiles(2.0, approximate=True)
+
     def test_percentiles_fast2(self):
         """test_percentiles: Simple test for HistIndex based percentiles
         low accurracy => faster mode
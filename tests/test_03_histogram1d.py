@@ -2,9 +2,12 @@ from . import ProgressiveTest
 from progressivis.core import aio
 from progressivis import Scheduler, Every
 from progressivis.io import CSVLoader
-from progressivis.stats import Histogram1D, Min, Max
+from progressivis.stats import Histogram1D, Min, Max, RandomTable
+from progressivis.io import Variable
+from progressivis.utils.psdict import PsDict
 from progressivis.datasets import get_dataset
 from progressivis.table.stirrer import Stirrer
+from progressivis.stats.rebinning import RebinningHistogram
 import pandas as pd
 import numpy as np
 import logging
@@ -91,5 +94,62 @@ class TestHistogram1D(ProgressiveTest):
     def test_histogram1d3(self):
         return self.t_histogram1d_impl(update_rows=5)
 
+    def test_histogram1d_refine(self):
+        s = self.scheduler()
+        random = RandomTable(2, rows=50000, scheduler=s)
+        min_ = Variable(PsDict({'_1': -10.0}), name='min_var', scheduler=s)
+        max_ = Variable(PsDict({'_1': 10.0}), name='max_var', scheduler=s)
+        histogram1d = Histogram1D('_1', scheduler=s)
+        histogram1d.input.table = random.output.table
+        histogram1d.input.min = min_.output.table
+        histogram1d.input.max = max_.output.table
+        pr = Every(proc=self.terse, scheduler=s)
+        pr.input.df = histogram1d.output.table
+
+        def _refined():
+            if (histogram1d._refinement is not None or
+                    not random.is_terminated()):
+                return False
+            last = histogram1d._table.last().to_dict()
+            return (last['min'] > -1 and
+                    np.sum(last['array']) == len(random.table()))
+
+        async def _narrow():
+            while len(histogram1d._table) == 0:
+                await aio.sleep(0.1)
+            await min_.from_input({'_1': 0.0})
+            await max_.from_input({'_1': 1.0})
+            while not _refined():
+                await aio.sleep(0.1)
+            await s.stop()
+        aio.run_gather(s.start(), _narrow())
+        last = histogram1d._table.last().to_dict()
+        self.assertAlmostEqual(last['min'], -0.05)
+        self.assertAlmostEqual(last['max'], 1.05)
+        v = random.table()['_1'].values
+        h2, _ = np.histogram(v, bins=histogram1d.params.bins,
+                             range=(last['min'], last['max']))
+        self.assertListEqual(last['array'].tolist(), h2.tolist())
+
+    def test_rebinning_histogram(self):
+        rng = np.random.default_rng(42)
+        histo = RebinningHistogram([64], [(0, 1)])
+        values = rng.random(10000)
+        counts, _ = np.histogram(values, bins=64, range=histo.bounds(0))
+        histo.histo += counts
+        self.assertFalse(histo.cover(0, 0.1, 0.9))
+        more = rng.random(10000) * 7 - 3
+        self.assertTrue(histo.cover_values(0, more))
+        lo, hi = histo.bounds(0)
+        self.assertTrue(lo <= more.min() and more.max() < hi)
+        self.assertEqual(histo.width(0), 1 / 64 * 8)
+        self.assertEqual(histo.coarseness([(0, 1)]), 8)
+        counts, _ = np.histogram(more, bins=64, range=histo.bounds(0))
+        histo.histo += counts
+        values = np.concatenate([values, more])
+        counts, _ = np.histogram(values, bins=64, range=histo.bounds(0))
+        self.assertListEqual(histo.histo.tolist(), counts.tolist())
+
+
 if __name__ == '__main__':
     ProgressiveTest.main()
@@ -6,6 +6,8 @@ from progressivis.stats import RandomTable
 from progressivis.stats import Histogram2D, Min, Max
 from progressivis.vis import Heatmap
 from progressivis.datasets import get_dataset
+from progressivis.io import Variable
+from progressivis.utils.psdict import PsDict
 from progressivis.table.stirrer import Stirrer, StirrerView
 import pandas as pd
 import numpy as np
@@ -131,6 +133,51 @@ class TestHistogram2D(ProgressiveTest):
     def test_histogram2d3(self):
         return self.t_histogram2d_impl(update_rows=5)
 
+    def test_histogram2d_refine(self):
+        s = self.scheduler()
+        random = RandomTable(2, rows=50000, scheduler=s)
+        min_ = Variable(PsDict({'_1': -10.0, '_2': -10.0}),
+                        name='min_var', scheduler=s)
+        max_ = Variable(PsDict({'_1': 10.0, '_2': 10.0}),
+                        name='max_var', scheduler=s)
+        histogram2d = Histogram2D(0, 1, xbins=64, ybins=64,
+                                  scheduler=s)
+        histogram2d.input.table = random.output.table
+        histogram2d.input.min = min_.output.table
+        histogram2d.input.max = max_.output.table
+        pr = Every(proc=self.terse, scheduler=s)
+        pr.input.df = histogram2d.output.table
+
+        def _refined():
+            if (histogram2d._refinement is not None or
+                    not random.is_terminated()):
+                return False
+            last = histogram2d._table.last().to_dict()
+            return (last['xmin'] > -1 and last['ymin'] > -1 and
+                    np.sum(last['array']) == len(random.table()))
+
+        async def _narrow():
+            while len(histogram2d._table) == 0:
+                await aio.sleep(0.1)
+            await min_.from_input({'_1': 0.0, '_2': 0.0})
+            await max_.from_input({'_1': 1.0, '_2': 1.0})
+            while not _refined():
+                await aio.sleep(0.1)
+            await s.stop()
+        aio.run_gather(s.start(), _narrow())
+        last = histogram2d._table.last().to_dict()
+        self.assertAlmostEqual(last['xmin'], -0.05)
+        self.assertAlmostEqual(last['xmax'], 1.05)
+        self.assertAlmostEqual(last['ymin'], -0.05)
+        self.assertAlmostEqual(last['ymax'], 1.05)
+        bounds = [[last['ymin'], last['ymax']], [last['xmin'], last['xmax']]]
+        v = random.table().to_array(columns=['_1', '_2'])
+        bins = [histogram2d.params.ybins, histogram2d.params.xbins]
+        h2 = fh.histogram2d(v[:, 1], v[:, 0], bins=bins, range=bounds)
+        h2 = np.flip(h2, axis=0)
+        self.assertListEqual(last['array'].reshape(-1).tolist(),
+                             h2.reshape(-1).tolist())
+
         
 if __name__ == '__main__':
     ProgressiveTest.main()
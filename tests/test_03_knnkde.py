@@ -0,0 +1,64 @@
+from . import ProgressiveTest
+
+from progressivis.core import aio
+from progressivis.stats import RandomTable, KernelDensity
+from progressivis.stats.ann import RPForestIndex
+from progressivis.stats.knnkde import KNNKernelDensity
+import numpy as np
+
+
+class TestKNNKDE(ProgressiveTest):
+    def test_ann_exact(self):
+        X = np.random.rand(1000, 3)
+        index = RPForestIndex(X, leaf_size=16, exact_threshold=10_000)
+        index.run(600)
+        self.assertEqual(len(index), 600)
+        index.run_ids(np.arange(600, 1000))
+        ids, dists = index.knn_search_points(X[:10], k=5)
+        d = np.sqrt(((X[:10, np.newaxis, :] - X) ** 2).sum(axis=2))
+        truth = np.argsort(d, axis=1)[:, :5]
+        self.assertTrue(np.array_equal(ids, truth))
+        self.assertTrue(np.allclose(dists, np.sort(d, axis=1)[:, :5]))
+        ids, dists = RPForestIndex(X[:3]).knn_search_points(X[:2], k=5)
+        self.assertEqual(ids.shape, (2, 5))
+        self.assertTrue((ids[:, 3:] == -1).all())
+
+    def test_ann_approximate(self):
+        X = np.random.randn(20_000, 2)
+        queries = np.random.randn(200, 2)
+        index = RPForestIndex(X, leaf_size=32)
+        for _ in range(0, len(X), 1000):
+            index.run(1000)
+        ids, dists = index.knn_search_points(queries, k=10)
+        exact_ids, exact_dists = index._exact(queries, 10)
+        recall = np.mean([len(set(a) & set(b)) / 10
+                          for (a, b) in zip(ids, exact_ids)])
+        self.assertGreater(recall, 0.9)
+        self.assertTrue((dists >= exact_dists - 1e-9).all())
+        index2 = RPForestIndex(X, leaf_size=32)
+        for _ in range(0, len(X), 1000):
+            index2.add_points(1000)
+        ids2, _ = index2.knn_search_points(queries, k=10)
+        self.assertTrue(np.array_equal(ids, ids2))  # deterministic
+
+    def test_kernel_density(self):
+        s = self.scheduler()
+        random = RandomTable(2, rows=10_000, scheduler=s)
+        samples = np.indices((11, 11)).reshape(2, -1).T / 10
+        kde = KernelDensity(samples=samples, bins=10, threshold=1000,
+                            knn=20, scheduler=s)
+        kde.input.table = random.output.table
+        aio.run(s.start())
+        json = kde.to_json()
+        self.assertEqual(len(json['samples']), len(samples))
+        self.assertEqual(len(json['points']), 500)
+        scores = np.array([score for (_, score) in json['samples']])
+        exact = KNNKernelDensity(random.table().to_array(),
+                                 exact_threshold=10_000)
+        self.assertTrue(np.allclose(scores,
+                                    exact.score_samples(samples, k=20),
+                                    rtol=0.1))
+
+
+if __name__ == '__main__':
+    ProgressiveTest.main()
@@ -3,6 +3,9 @@ from . import ProgressiveTest
 from progressivis.core import aio
 from progressivis import Print
 from progressivis.stats import Min, Max, RandomTable
+from progressivis.stats.extremum import ExtremumTree
+from progressivis.table.stirrer import Stirrer
+from progressivis.table.table import Table
 
 import numpy as np
 
@@ -40,6 +43,58 @@ class TestMinMax(ProgressiveTest):
         res2 = max_.table()
         self.compare(res1, res2)
 
+    def test_min_max_stirrer(self):
+        s = self.scheduler()
+        random = RandomTable(10, rows=10000, scheduler=s)
+        stirrer = Stirrer(update_column='_1', delete_rows=5,
+                          update_rows=5, fixed_step_size=100, scheduler=s)
+        stirrer.input.table = random.output.table
+        min_ = Min(scheduler=s)
+        min_.input.table = stirrer.output.table
+        max_ = Max(scheduler=s)
+        max_.input.table = stirrer.output.table
+        pr = Print(proc=self.terse, scheduler=s)
+        pr.input.df = min_.output.table
+        pr2 = Print(proc=self.terse, scheduler=s)
+        pr2.input.df = max_.output.table
+        aio.run(s.start())
+        self.compare(stirrer.table().min(), min_.table())
+        self.compare(stirrer.table().max(), max_.table())
+
+    def test_extremum_tree(self):
+        rng = np.random.default_rng(42)
+        big = 2**62
+        table = Table('test_extremum_tree', create=True,
+                      data={'a': big + np.arange(1000, dtype=np.int64),
+                            'b': rng.random(1000)})
+        tree = ExtremumTree(table, ['a', 'b'], op='min', chunk_size=16)
+        live = np.zeros(1000, dtype=bool)
+        for _ in range(50):
+            ids = rng.choice(1000, size=20, replace=False)
+            table.loc[ids, 'a'] = big + rng.integers(1000, size=20)
+            table.loc[ids, 'b'] = rng.random(20)
+            tree.update(ids)
+            live[ids] = True
+            ids = rng.choice(1000, size=10, replace=False)
+            tree.delete(ids)
+            live[ids] = False
+            for (i, col) in enumerate(['a', 'b']):
+                values = table[col].values
+                expected = np.flatnonzero(live)[values[live].argmin()]
+                self.assertEqual(tree.ids()[i], expected)
+                self.assertEqual(tree.values()[i], values[expected])
+        self.assertEqual(tree.values()[0].dtype, np.int64)
+        self.assertEqual(len(tree), live.sum())
+        table = Table('test_extremum_tree_nan', create=True,
+                      data={'c': [0.0, 0.0, 0.0, 1.0, 0.0, np.nan, 0.0, 3.0]})
+        tree = ExtremumTree(table, ['c'], op='max')
+        tree.update([3, 5, 7])
+        self.assertEqual(tree.values()[0], 3.0)
+        tree.delete([7])
+        self.assertEqual(tree.ids()[0], 3)
+        tree.delete([3])
+        self.assertEqual(tree.values()[0], -np.inf)
+        self.assertEqual(tree.ids()[0], -1)
 
 if __name__ == '__main__':
     ProgressiveTest.main()
@@ -6,6 +6,8 @@ from progressivis.linalg import MixUfuncABC
 import numpy as np
 from progressivis.stats import RandomTable, RandomDict
 from progressivis.table.table import Table
+from progressivis.table.stirrer import Stirrer
+from progressivis.core.bitmap import bitmap
 from progressivis.core.decorators import *
 from progressivis.core import  SlotDescriptor
 
@@ -117,3 +119,40 @@ class TestMixUfunc(ProgressiveTest):
     def test_mix_ufunc3(self):
         return self.t_mix_ufunc_table_dict_impl(MixUfuncSample2)
 
+    def _t_stirred_mix_ufunc(self, **kw):
+        s = self.scheduler()
+        random1 = RandomTable(10, rows=100000, scheduler=s)
+        random2 = RandomTable(10, rows=100000, scheduler=s)
+        stirrer1 = Stirrer(update_column='_2',
+                           fixed_step_size=1000, scheduler=s, **kw)
+        stirrer1.input.table = random1.output.table
+        stirrer2 = Stirrer(update_column='_3',
+                           fixed_step_size=1000, scheduler=s, **kw)
+        stirrer2.input.table = random2.output.table
+        module = MixUfuncSample2(columns={'first': ['_1', '_2', '_3'],
+                                          'second': ['_1', '_2', '_3']},
+                                 scheduler=s)
+        module.input.first = stirrer1.output.table
+        module.input.second = stirrer2.output.table
+        pr=Print(proc=self.terse, scheduler=s)
+        pr.input.df = module.output.table
+        aio.run(s.start())
+        idx1 = stirrer1.table().index.to_array()
+        idx2 = stirrer2.table().index.to_array()
+        common = bitmap(idx1)&bitmap(idx2)
+        first = stirrer1.table().loc[common, :].to_array()
+        second = stirrer2.table().loc[common, :].to_array()
+        ne_1 = np.add(first[:, 1], second[:, 2])
+        ne_2 = np.log(second[:, 2])
+        res = module.table().to_array()
+        ix = module.table().index.to_array()
+        self.assertEqual(bitmap(ix), common)
+        res = res[ix.argsort()]
+        self.assertTrue(np.allclose(res[:,0], ne_1, equal_nan=True))
+        self.assertTrue(np.allclose(res[:,1], ne_2, equal_nan=True))
+
+    def test_stirred_mix_ufunc1(self):
+        self._t_stirred_mix_ufunc(delete_rows=5)
+
+    def test_stirred_mix_ufunc2(self):
+        self._t_stirred_mix_ufunc(update_rows=5)
@@ -6,6 +6,8 @@ from progressivis.linalg import NumExprABC
 import numpy as np
 from progressivis.stats import RandomTable
 from progressivis.table.table import Table
+from progressivis.table.stirrer import Stirrer
+from progressivis.core.bitmap import bitmap
 from progressivis.core.decorators import *
 from progressivis.core import  SlotDescriptor
 import numexpr as ne
@@ -57,3 +59,45 @@ class TestNumExpr(ProgressiveTest):
 
     def test_num_expr2(self):
         return self.t_num_expr_impl(NumExprSample2)
+
+    def _t_stirred_num_expr(self, **kw):
+        s = self.scheduler()
+        random1 = RandomTable(10, rows=100000, scheduler=s)
+        random2 = RandomTable(10, rows=100000, scheduler=s)
+        stirrer1 = Stirrer(update_column='_2',
+                           fixed_step_size=1000, scheduler=s, **kw)
+        stirrer1.input.table = random1.output.table
+        stirrer2 = Stirrer(update_column='_3',
+                           fixed_step_size=1000, scheduler=s, **kw)
+        stirrer2.input.table = random2.output.table
+        module = NumExprSample2(columns={'first': ['_1', '_2', '_3'],
+                                         'second': ['_1', '_2', '_3']},
+                                scheduler=s)
+        module.input.first = stirrer1.output.table
+        module.input.second = stirrer2.output.table
+        pr=Print(proc=self.terse, scheduler=s)
+        pr.input.df = module.output.table
+        aio.run(s.start())
+        idx1 = stirrer1.table().index.to_array()
+        idx2 = stirrer2.table().index.to_array()
+        common = bitmap(idx1)&bitmap(idx2)
+        first = stirrer1.table().loc[common, :].to_array()
+        second = stirrer2.table().loc[common, :].to_array()
+        first_2 = first[:, 1]
+        first_3 = first[:, 2]
+        second_2 = second[:, 1]
+        second_3 = second[:, 2]
+        ne_1 = ne.evaluate('first_2+2*second_3')
+        ne_2 = ne.evaluate('first_3-5*second_2')
+        res = module.table().to_array()
+        ix = module.table().index.to_array()
+        self.assertEqual(bitmap(ix), common)
+        res = res[ix.argsort()]
+        self.assertTrue(np.allclose(res[:,0], ne_1, equal_nan=True))
+        self.assertTrue(np.allclose(res[:,1], ne_2, equal_nan=True))
+
+    def test_stirred_num_expr1(self):
+        self._t_stirred_num_expr(delete_rows=5)
+
+    def test_stirred_num_expr2(self):
+        self._t_stirred_num_expr(update_rows=5)
@@ -1,8 +1,11 @@
 from . import ProgressiveTest
 
+import os
+
 from progressivis import Every
 from progressivis.io import VECLoader, CSVLoader
-#from progressivis.metrics import PairwiseDistances
+from progressivis.metrics import PairwiseDistances
+from progressivis.stats import RandomTable
 from progressivis.datasets import get_dataset
 from progressivis.core import aio
 
@@ -65,5 +68,54 @@ class TestPairwiseDistances(ProgressiveTest):
 #        dist = computed[offset:size,offset:size]
 #        self.assertTrue(np.allclose(truth, dist,atol=1e-7)) # reduce tolerance
 
+    def _random_distances(self, rows=3000, **kwds):
+        s = self.scheduler()
+        random = RandomTable(3, rows=rows, scheduler=s)
+        dis = PairwiseDistances(scheduler=s, **kwds)
+        dis.input.table = random.output.table
+        pr = Every(proc=self.terse, scheduler=s)
+        pr.input.df = dis.output.table
+        aio.run(s.start())
+        return random.table().to_array(locs=dis.ids()), dis
+
+    def test_tiled_distances(self):
+        data, dis = self._random_distances(tile_size=256, n_jobs=2)
+        computed = dis.dist()
+        self.assertEqual(len(computed), len(data))
+        truth = pairwise_distances(data)
+        self.assertTrue(np.allclose(truth, computed.matrix()))
+        self.assertTrue(np.allclose(truth[300:700, 2000:2100],
+                                    computed.get_block(300, 2000, 400, 100)))
+
+    def test_mmap_distances(self):
+        s = self.scheduler()
+        random = RandomTable(3, rows=1000, scheduler=s)
+        dis = PairwiseDistances(tile_size=128, mmap=True, scheduler=s)
+        dis.input.table = random.output.table
+        tmpdir = dis._tmpdir
+        self.assertTrue(os.path.isdir(tmpdir))
+        aio.run(s.start())
+        data = random.table().to_array(locs=dis.ids())
+        self.assertTrue(np.allclose(pairwise_distances(data),
+                                    dis.dist().matrix()))
+        self.assertFalse(os.path.exists(tmpdir))  # removed when ending
+
+    def test_knn_distances(self):
+        k = 5
+        data, dis = self._random_distances(k=k, tile_size=256, n_jobs=2)
+        truth = pairwise_distances(data)
+        np.fill_diagonal(truth, np.inf)
+        nearest = np.sort(truth, axis=1)[:, :k]
+        table = dis.table()
+        ids = dis.ids()
+        self.assertEqual(len(table), len(data))
+        distances = np.array(table['distances'].loc[ids])
+        neighbors = np.array(table['neighbors'].loc[ids])
+        self.assertTrue(np.allclose(distances, nearest))
+        pos = {id_: i for (i, id_) in enumerate(ids)}
+        for (row, nbrs) in enumerate(neighbors[:100]):
+            self.assertTrue(np.allclose(truth[row, [pos[n] for n in nbrs]],
+                                        nearest[row]))
+
 if __name__ == '__main__':
     ProgressiveTest.main()
@@ -0,0 +1,109 @@
+from . import ProgressiveTest, skipIf
+from progressivis.core import aio
+from progressivis.io import ParquetLoader, ArrowLoader
+import tempfile
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+
+def _dataframe(n=10000):
+    np.random.seed(42)
+    return pd.DataFrame({'a': np.arange(n, dtype=np.int64),
+                         'b': np.random.rand(n),
+                         'c': ['s%d' % (i % 7) for i in range(n)]})
+
+
+@skipIf(pa is None, "pyarrow not installed")
+class TestProgressiveLoadParquet(ProgressiveTest):
+    def setUp(self):
+        super(TestProgressiveLoadParquet, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.df = _dataframe()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+        super(TestProgressiveLoadParquet, self).tearDown()
+
+    def test_read_parquet(self):
+        path = os.path.join(self.tmpdir, 'data.parquet')
+        pq.write_table(pa.Table.from_pandas(self.df), path,
+                       row_group_size=1000)
+        s = self.scheduler()
+        module = ParquetLoader(path, batch_size=300, scheduler=s)
+        self.assertTrue(module.table() is None)
+        aio.run(s.start())
+        table = module.table()
+        self.assertEqual(len(table), len(self.df))
+        self.assertEqual(list(table.columns), ['a', 'b', 'c'])
+        self.assertTrue(np.array_equal(table['a'].values,
+                                       self.df['a'].values))
+        self.assertTrue(np.allclose(table['b'].values, self.df['b'].values))
+        self.assertEqual(list(table['c'].values), list(self.df['c'].values))
+
+    def test_read_parquet_filters(self):
+        path = os.path.join(self.tmpdir, 'data.parquet')
+        pq.write_table(pa.Table.from_pandas(self.df), path,
+                       row_group_size=1000)
+        s = self.scheduler()
+        module = ParquetLoader(path, columns=['b', 'c'],
+                               filters=[('a', '>=', 2500), ('a', '<', 4200)],
+                               scheduler=s)
+        aio.run(s.start())
+        table = module.table()
+        # row groups 0, 1 and 5 to 9 cannot match
+        self.assertEqual(module.skipped_row_groups, 7)
+        self.assertEqual(list(table.columns), ['b', 'c'])
+        expected = self.df[(self.df.a >= 2500) & (self.df.a < 4200)]
+        self.assertEqual(len(table), len(expected))
+        self.assertTrue(np.allclose(table['b'].values, expected['b'].values))
+
+    def test_read_parquet_times_nulls(self):
+        path = os.path.join(self.tmpdir, 'times.parquet')
+        times = pd.date_range('2020-01-01', periods=6, freq='H')
+        pq.write_table(pa.table({
+            't': pa.array(list(times[:5]) + [None], pa.timestamp('us')),
+            'd': pa.array([times[0].date()] * 6, pa.date32()),
+            'i': pa.array([1, None, 3, None, 5, 6], pa.int64()),
+            'f': pa.array([0.5, None, 1.5, 2, 3, 4], pa.float64())}), path,
+                       row_group_size=4)
+        s = self.scheduler()
+        module = ParquetLoader(path, fillvalues={'i': -1},
+                               filters=[('t', '>=', times[1])], scheduler=s)
+        aio.run(s.start())
+        table = module.table()
+        self.assertEqual(module.get_progress(), (4, 6))  # kept after close
+        self.assertEqual(table['t'].dtype, np.int64)
+        self.assertEqual(table['t'].values.tolist(),
+                         times[1:5].asi8.tolist())
+        self.assertEqual(table['d'].values[0], times[0].value)
+        self.assertEqual(table['i'].values.tolist(), [-1, 3, -1, 5])
+        self.assertTrue(np.isnan(table['f'].values[0]))
+
+    def test_read_arrow(self):
+        path = os.path.join(self.tmpdir, 'data.arrow')
+        feather.write_feather(self.df, path, chunksize=777,
+                              compression='uncompressed')
+        s = self.scheduler()
+        module = ArrowLoader(path, columns=['c', 'a'],
+                             filters=[('c', 'in', ['s1', 's3'])],
+                             scheduler=s)
+        aio.run(s.start())
+        table = module.table()
+        self.assertEqual(list(table.columns), ['c', 'a'])
+        expected = self.df[self.df.c.isin(['s1', 's3'])]
+        self.assertEqual(len(table), len(expected))
+        self.assertTrue(np.array_equal(table['a'].values,
+                                       expected['a'].values))
+
+
+if __name__ == '__main__':
+    ProgressiveTest.main()
@@ -1,10 +1,14 @@
 from . import ProgressiveTest
 
 from progressivis import Every
-from progressivis.stats import Percentiles
+from progressivis.stats import Percentiles, RandomTable
+from progressivis.table.stirrer import Stirrer
 from progressivis.io import CSVLoader
 from progressivis.datasets import get_dataset
+from progressivis.stats.kll import KLLSketch
+from progressivis.utils.errors import ProgressiveError
 from progressivis.core import aio
+import numpy as np
 
 class TestPercentiles(ProgressiveTest):
     def test_percentile(self):
@@ -23,6 +27,51 @@ class TestPercentiles(ProgressiveTest):
         #print "Done. Run time: %gs, loaded %d rows" % (s['duration'].irow(-1), len(module.df()))
         #pd.set_option('display.expand_frame_repr', False)
         #print(repr(module.table()))
+        values = csv_module.table()['_1'].values
+        last = module.table().last().to_dict()
+        for name, p in zip(['_10', '_25', '_50', '_75', '_90'],
+                           [0.1, 0.25, 0.5, 0.75, 0.9]):
+            rank = np.searchsorted(np.sort(values), last[name]) / len(values)
+            self.assertAlmostEqual(rank, p, delta=0.01)
+
+    def test_percentile_reset(self):
+        s = self.scheduler()
+        random = RandomTable(2, rows=10000, scheduler=s)
+        stirrer = Stirrer(update_column='_2', delete_rows=5,
+                          fixed_step_size=1000, scheduler=s)
+        stirrer.input.table = random.output.table
+        module = Percentiles('_1', scheduler=s)
+        module.input.table = stirrer.output.table
+        prt = Every(proc=self.terse, name='print_reset', scheduler=s)
+        prt.input.df = module.output.table
+        aio.run(s.start())
+        values = stirrer.table().to_array(columns=['_1'])[:, 0]
+        self.assertEqual(module.sketch().n, len(values))  # deleted removed
+        last = module.table().last().to_dict()
+        for name, p in zip(['_25', '_50', '_75'], [0.25, 0.5, 0.75]):
+            rank = np.searchsorted(np.sort(values), last[name]) / len(values)
+            self.assertAlmostEqual(rank, p, delta=0.02)
+
+    def test_kll_sketch(self):
+        values = np.random.randn(200_000)
+        sketches = [KLLSketch(256).update(chunk)
+                    for chunk in np.array_split(values, 10)]
+        sketch = KLLSketch.merged(sketches, 256)
+        self.assertEqual(sketch.n, len(values))
+        self.assertLess(sum(len(level) for level in sketch.levels), 2000)
+        qs = np.array([0, 0.1, 0.5, 0.9, 1])
+        estimates = sketch.quantiles(qs)
+        self.assertEqual(estimates[0], values.min())
+        self.assertEqual(estimates[-1], values.max())
+        ranks = np.searchsorted(np.sort(values), estimates) / len(values)
+        self.assertTrue(np.allclose(ranks, qs, atol=0.02))
+        self.assertTrue(np.allclose(sketch.ranks(estimates[1:4]), qs[1:4],
+                                    atol=0.02))
+        copy = KLLSketch.from_dict(sketch.to_dict())
+        self.assertTrue(np.array_equal(copy.quantiles(qs), estimates))
+        self.assertEqual(KLLSketch.merged(sketches).k, 256)  # from the inputs
+        with self.assertRaises(ProgressiveError):
+            sketch.merge(KLLSketch(256, c=0.5).update(values[:10]))
 
 if __name__ == '__main__':
     ProgressiveTest.main()
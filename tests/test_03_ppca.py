@@ -3,11 +3,14 @@ from progressivis import Print, Scheduler, Every
 from progressivis.core import aio
 from progressivis.io import CSVLoader
 from progressivis.stats.ppca import PPCA
+from progressivis.stats.incremental_pca import IncrementalPCA
+from progressivis.stats import RandomTable
 from progressivis.datasets import get_dataset
 from progressivis.table.module import TableModule
 from progressivis.table.table import Table
 from progressivis.utils.psdict import PsDict
 from progressivis.core.slot import SlotDescriptor
+from sklearn.decomposition import IncrementalPCA as SKIncrementalPCA
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.utils.random import sample_without_replacement
 import numpy as np
@@ -144,6 +147,44 @@ class TestPPCA(ProgressiveTest):
         print("resetter 30K=>score", score)
         self.assertGreater(score, 0.77)
 
+    def test_incremental_pca(self):
+        X = np.random.randn(3000, 10) @ np.random.randn(10, 10)
+        ipca = IncrementalPCA(3)
+        skpca = SKIncrementalPCA(3)
+        for i in range(0, len(X), 300):
+            ipca.partial_fit(X[i:i+300])
+            skpca.partial_fit(X[i:i+300])
+        self.assertTrue(np.allclose(ipca.explained_variance_,
+                                    skpca.explained_variance_))
+        self.assertTrue(np.allclose(np.abs(ipca.components_),
+                                    np.abs(skpca.components_)))
+        # merged states of a rank 3 stream span the same subspace
+        X = np.random.randn(3000, 3) @ np.random.randn(3, 10)
+        ipca = IncrementalPCA(3).partial_fit(X)
+        left, right = IncrementalPCA(3), IncrementalPCA(3)
+        left.partial_fit(X[:1000])
+        right.partial_fit(X[1000:])
+        left.merge(right)
+        self.assertAlmostEqual(left.subspace_angle(ipca), 0.0, places=5)
+        self.assertTrue(np.allclose(left.mean_, X.mean(axis=0)))
+
+    def test_reprojection(self):
+        s = Scheduler()
+        random = RandomTable(10, rows=20000, scheduler=s)
+        ppca = PPCA(scheduler=s)
+        ppca.input.table = random.output.table
+        ppca.params.n_components = 3
+        ppca.create_dependent_modules(rtol=0.01, max_angle=0.05, trace=True)
+        prn = Every(scheduler=s, proc=_print)
+        prn.input.df = ppca.reduced.output.table
+        aio.run(s.start())
+        reduced = ppca.reduced.table()
+        self.assertEqual(len(reduced), 20000)
+        self.assertIn("RESET", ppca.reduced._trace_df.Action.values)
+        pca_ = ppca._transformer['inc_pca']
+        self.assertTrue(np.allclose(reduced.to_array(),
+                                    pca_.transform(random.table().to_array())))
+
 
 if __name__ == '__main__':
     unittest.main()
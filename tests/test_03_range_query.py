@@ -6,9 +6,11 @@ from progressivis import Print
 from progressivis.stats import RandomTable, Min, Max
 from progressivis.core.bitmap import bitmap
 from progressivis.table.range_query import RangeQuery
+from progressivis.table.hist_index import _HistogramIndexImpl
 from progressivis.utils.psdict import PsDict
 from progressivis.core import aio
 from . import ProgressiveTest, main
+import numpy as np
 
 
 class TestRangeQuery(ProgressiveTest):
@@ -38,6 +40,29 @@ class TestRangeQuery(ProgressiveTest):
                        .data().eval('(_1>0.3)&(_1<0.8)', result_object='index')
         self.assertEqual(range_qry.table().selection, bitmap(idx))
 
+    def test_range_query_count(self):
+        "Test the count output of the RangeQuery module"
+        s = self.scheduler()
+        with s:
+            random = RandomTable(2, rows=100000, scheduler=s)
+            t_min = PsDict({'_1': 0.3})
+            min_value = Constant(table=t_min, scheduler=s)
+            t_max = PsDict({'_1': 0.8})
+            max_value = Constant(table=t_max, scheduler=s)
+            range_qry = RangeQuery(column='_1', scheduler=s)
+            range_qry.create_dependent_modules(random, 'table',
+                                               min_value=min_value,
+                                               max_value=max_value)
+            prt = Print(proc=self.terse, scheduler=s)
+            prt.input.df = range_qry.output.table
+            prt2 = Print(proc=self.terse, scheduler=s)
+            prt2.input.df = range_qry.output.count
+        aio.run(s.start())
+        idx = random.table().eval('(_1>=0.3)&(_1<0.8)',
+                                  result_object='index')
+        self.assertEqual(range_qry.get_data('count')['_1'], len(idx))
+        self.assertEqual(len(range_qry.table()), len(idx))
+
     def test_hist_index_min_max(self):
         "Test min_out and max_out on HistogramIndex"
         s = self.scheduler()
@@ -70,6 +95,67 @@ class TestRangeQuery(ProgressiveTest):
         res2 = max_.table()['_1']
         self.assertAlmostEqual(res1, res2)
 
+    def test_hist_index_impl(self):
+        "Test the divisions, updates and range counts of the index"
+        values = np.random.exponential(size=50000)
+        table = Table('hist_index_impl', data={'x': values})
+        impl = _HistogramIndexImpl('x', table, 0, 10, 16)
+        self.assertEqual(impl.counts.sum(), len(values))
+        self.assertTrue(impl.needs_reshape())  # skewed distribution
+        work = impl.reshape(500)
+        self.assertLessEqual(work, 500)
+        while impl.needs_reshape():
+            impl.reshape(5000)
+        self.assertGreater(len(impl.bins), 16)
+        self.assertEqual(len(impl.bins)+1, len(impl.bitmaps))
+        self.assertTrue(np.all(np.diff(impl.bins) > 0))
+        for i, bm in enumerate(impl.bitmaps):
+            self.assertEqual(len(bm), impl.counts[i])
+        table.loc[0:99, 'x'] = 20.0  # inclusive, 100 rows
+        impl.update_histogram(created=None, updated=bitmap(range(100)))
+        table.drop(slice(100, 200))
+        impl.update_histogram(created=None, deleted=bitmap(range(100, 200)))
+        self.assertEqual(impl.counts.sum(), len(table))
+        x = table['x'].loc[table.index]
+        ids = np.array(table.index, dtype=np.int64)
+        for lower, upper in [(0.1, 0.5), (0.5, 3), (2, 30), (0.3, 0.31)]:
+            expected = ids[(lower <= x) & (x < upper)]
+            self.assertEqual(impl.range_query(lower, upper),
+                             bitmap(expected))
+            self.assertEqual(impl.range_count(lower, upper), len(expected))
+            approx = impl.range_count(lower, upper, approximate=True)
+            self.assertAlmostEqual(approx, len(expected),
+                                   delta=0.1*len(expected)+100)
+
+    def test_hist_index_sketch(self):
+        "The sketch is rebuilt from the indexed rows only"
+        table = Table('hist_index_sketch', data={'x': np.random.rand(10000)})
+        impl = _HistogramIndexImpl('x', table, 0, 1, 16)
+        table.append({'x': np.random.rand(10000) + 10})  # not indexed yet
+        table.drop(slice(0, 2000))
+        impl.update_histogram(created=None, deleted=bitmap(range(2000)))
+        self.assertEqual(impl.sketch.n, 8000)
+        self.assertLess(impl.sketch.quantile(0.99), 1)
+        impl.update_histogram(created=bitmap(range(10000, 20000)))
+        self.assertEqual(impl.sketch.n, 18000)
+        self.assertAlmostEqual(impl.sketch.ranks([1.0])[0], 8/18, delta=0.02)
+
+    def test_hist_index_undividable(self):
+        "A bin of identical values does not starve the other large bins"
+        values = np.concatenate([np.zeros(100000),
+                                 np.random.normal(0.5, 0.001, 50000),
+                                 np.random.rand(50000)])
+        table = Table('hist_index_undividable', data={'x': values})
+        impl = _HistogramIndexImpl('x', table, 0, 1, 126)
+        for _ in range(200):
+            if not impl.needs_reshape():
+                break
+            impl.reshape(10000)
+        self.assertFalse(impl.needs_reshape())
+        self.assertGreater(len(impl.bins), 126)
+        i = int(np.searchsorted(impl.bins, 0.5, side='right'))
+        self.assertLess(impl.counts[i], 50000)  # the cluster was divided
+
     def _query_min_max_impl(self, random, t_min, t_max, s):
         min_value = Constant(table=t_min, scheduler=s)
         max_value = Constant(table=t_max, scheduler=s)
@@ -108,7 +108,7 @@ class TestRepairMax(ProgressiveTest):
         pr=Print(proc=self.terse, scheduler=s)
         pr.input.df = max_.output.table
         aio.run(s.start())
-        self.assertEqual(ScalarMax._reset_calls_counter, 1)
+        self.assertEqual(ScalarMax._reset_calls_counter, 0)  # repaired without rescan
         res1 = stirrer.table().max()
         res2 = max_.table()
         self.compare(res1, res2)
@@ -168,7 +168,7 @@ class TestRepairMax(ProgressiveTest):
         pr=Print(proc=self.terse, scheduler=s)
         pr.input.df = max_.output.table
         aio.run(s.start())
-        self.assertEqual(ScalarMax._reset_calls_counter, 1)
+        self.assertEqual(ScalarMax._reset_calls_counter, 0)  # repaired without rescan
         res1 = stirrer.table().max()
         res2 = max_.table()
         self.compare(res1, res2)
@@ -233,7 +233,7 @@ class TestRepairMin(ProgressiveTest):
         pr=Print(proc=self.terse, scheduler=s)
         pr.input.df = min_.output.table
         aio.run(s.start())
-        self.assertEqual(ScalarMin._reset_calls_counter, 1)
+        self.assertEqual(ScalarMin._reset_calls_counter, 0)  # repaired without rescan
         res1 = stirrer.table().min()
         res2 = min_.table()
         self.compare(res1, res2)
@@ -293,7 +293,7 @@ class TestRepairMin(ProgressiveTest):
         pr=Print(proc=self.terse, scheduler=s)
         pr.input.df = min_.output.table
         aio.run(s.start())
-        self.assertEqual(ScalarMin._reset_calls_counter, 1)
+        self.assertEqual(ScalarMin._reset_calls_counter, 0)  # repaired without rescan
         res1 = stirrer.table().min()
         res2 = min_.table()
         self.compare(res1, res2)
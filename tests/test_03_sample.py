@@ -2,9 +2,13 @@ from . import ProgressiveTest
 
 from progressivis import Print
 from progressivis.io import CSVLoader
-from progressivis.stats import Sample
+from progressivis.stats import Sample, RandomTable
+from progressivis.stats.sample import Reservoir
+from progressivis.table.stirrer import Stirrer
+from progressivis.core.bitmap import bitmap
 from progressivis.datasets import get_dataset
 from progressivis.core import aio
+import numpy as np
 
 def print_repr(x):
     print(repr(x))
@@ -25,5 +29,51 @@ class TestSample(ProgressiveTest):
         #print(repr(smp.table()))
         self.assertEqual(len(smp.table()), 10)
 
+    def test_reservoir(self):
+        counts = np.zeros(1000)
+        for _ in range(1000):
+            res = Reservoir(20)
+            for i in range(0, 1000, 77):
+                res.add(np.arange(i, min(i+77, 1000)))
+            res.remove(np.arange(0, 1000, 2))
+            self.assertEqual(len(res), 500)
+            counts[res.ids] += 1
+        self.assertEqual(counts[0::2].sum(), 0)
+        # each remaining id is sampled with probability 20/500
+        self.assertTrue(np.allclose(counts[1::2].mean(), 40))
+        self.assertLess(abs(counts[1:500:2].mean() -
+                            counts[501::2].mean()), 4)
+
+    def test_sample_stirred(self):
+        s = self.scheduler()
+        random = RandomTable(3, rows=100_000, scheduler=s)
+        stirrer = Stirrer(delete_rows=5, fixed_step_size=1000, scheduler=s)
+        stirrer.input.table = random.output.table
+        smp = Sample(samples=100, scheduler=s)
+        smp.input.table = stirrer.output.table
+        prt = Print(proc=self.terse, scheduler=s)
+        prt.input.df = smp.output.select
+        aio.run(s.start())
+        select = smp.get_data('select')
+        self.assertEqual(len(select), 100)
+        self.assertEqual(select - bitmap(stirrer.table().index), bitmap())
+
+    def test_sample_stratified(self):
+        s = self.scheduler()
+        random = RandomTable(2, rows=10_000, dtype='int64',
+                             random=lambda x: np.random.randint(3, size=x),
+                             scheduler=s)
+        smp = Sample(samples=10, class_column='_1', weight_column='_2',
+                     scheduler=s)
+        smp.input.table = random.output.table
+        prt = Print(proc=self.terse, scheduler=s)
+        prt.input.df = smp.output.select
+        aio.run(s.start())
+        select = smp.get_data('select')
+        self.assertEqual(len(select), 30)
+        arr = random.table().to_array(locs=select.to_array())
+        self.assertEqual(np.bincount(arr[:, 0]).tolist(), [10, 10, 10])
+        self.assertFalse((arr[:, 1] == 0).any())  # zero weights
+
 if __name__ == '__main__':
     ProgressiveTest.main()
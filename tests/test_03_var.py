@@ -1,7 +1,8 @@
 from . import ProgressiveTest
 
 from progressivis import Print
-from progressivis.stats import Var, RandomTable
+from progressivis.stats import Var, Covariance, RandomTable
+from progressivis.stats.var import OnlineVariance, OnlineCovariance
 from progressivis.core import aio
 import numpy as np
 
@@ -21,5 +22,44 @@ class Testvar(ProgressiveTest):
         print('res2:', res2)
         self.assertTrue(np.allclose(res1, res2))
 
+    def test_online_variance(self):
+        values = np.random.rand(1000)
+        values[10] = np.nan
+        var = OnlineVariance()
+        for chunk in np.array_split(values, 7):
+            var.add(chunk)
+        expected = values[~np.isnan(values)]
+        self.assertEqual(var.n, 999)
+        self.assertAlmostEqual(var.mean, expected.mean())
+        self.assertAlmostEqual(var.variance, expected.var(ddof=1))
+        var2 = OnlineVariance()
+        for datum in values:
+            var2.include(datum)
+        self.assertAlmostEqual(var.variance, var2.variance)
+
+    def test_online_covariance(self):
+        values = np.random.rand(1000, 3)
+        cov = OnlineCovariance()
+        for chunk in np.array_split(values, 7):
+            cov.add(chunk)
+        self.assertTrue(np.allclose(cov.covariance,
+                                    np.cov(values, rowvar=False)))
+
+    def test_covariance(self):
+        s = self.scheduler()
+        random = RandomTable(4, rows=100000, scheduler=s)
+        cov = Covariance(groups=[['_1', '_2'], ['_1', '_3', '_4']],
+                         scheduler=s)
+        cov.input.table = random.output.table
+        pr = Print(proc=self.terse, scheduler=s)
+        pr.input.df = cov.output.table
+        aio.run(s.start())
+        table = random.table()
+        res = cov.table()
+        for cols in (['_1', '_2'], ['_1', '_3', '_4']):
+            expected = np.cov(table.to_array(columns=cols), rowvar=False)
+            self.assertTrue(np.allclose(res[','.join(cols)], expected))
+
+
 if __name__ == '__main__':
     ProgressiveTest.main()
@@ -2,6 +2,9 @@ from . import ProgressiveTest
 
 from progressivis import Print, Every #, log_level
 from progressivis.cluster import MBKMeans
+from progressivis.cluster.kmeans import StreamingKMeans
+from progressivis.stats import RandomTable
+from progressivis.table.stirrer import Stirrer
 from progressivis.io import CSVLoader
 from progressivis.datasets import get_dataset
 from progressivis.core import aio
@@ -10,7 +13,8 @@ from progressivis.core import aio
 #from sklearn.cluster import MiniBatchKMeans
 #from sklearn.utils.extmath import squared_norm
 
-#import numpy as np
+import numpy as np
+import threading
 #import pandas as pd
 
 # times = 0
@@ -52,6 +56,75 @@ class TestMBKmeans(ProgressiveTest):
         # print km.mbk.cluster_centers_
         # self.assertTrue(np.allclose(mbk.cluster_centers_, km.mbk.cluster_centers_))
 
+    def test_streaming_kmeans(self):
+        centers = np.array([[0., 0.], [10., 10.], [0., 10.]])
+        X = np.concatenate([c + np.random.randn(1000, 2) for c in centers])
+        np.random.shuffle(X)
+        km = StreamingKMeans(3, batch_size=100, random_state=0, n_jobs=2,
+                             chunk_size=50)
+        labels = km.partial_fit(X)
+        order = np.argsort(km.cluster_centers_.sum(axis=1))
+        self.assertTrue(np.allclose(km.cluster_centers_[order][[0, 2]],
+                                    centers[[0, 1]], atol=0.3))
+        self.assertEqual(km.counts.sum(), len(X))
+        for c in range(3):  # the centers are the means of their points
+            self.assertTrue(np.allclose(km.cluster_centers_[c],
+                                        X[labels == c].mean(axis=0)))
+        km.remove(X[:1000], labels[:1000])
+        self.assertEqual(km.counts.sum(), 2000)
+        for c in range(3):
+            self.assertTrue(np.allclose(km.cluster_centers_[c],
+                                        X[1000:][labels[1000:] == c]
+                                        .mean(axis=0)))
+
+    def test_mb_k_means_stirred(self):
+        s = self.scheduler()
+        random = RandomTable(2, rows=10000, scheduler=s)
+        stirrer = Stirrer(update_column='_1', delete_rows=5, update_rows=5,
+                          fixed_step_size=100, scheduler=s)
+        stirrer.input.table = random.output.table
+        km = MBKMeans(n_clusters=4, random_state=42, is_input=False,
+                      is_greedy=False, scheduler=s)
+        km.input.table = stirrer.output.table
+        e = Every(proc=self.terse, scheduler=s)
+        e.input.df = km.output.labels
+        aio.run(s.start())
+        table = stirrer.table()
+        labels = km.labels()
+        self.assertEqual(len(table), len(labels))
+        self.assertEqual(km.mbk.counts.sum(), len(table))
+        ids = table.index.values
+        ids = ids[ids >= 0]
+        X = table.to_array(locs=ids)
+        lab = labels['labels'].loc[ids]
+        for c in range(4):
+            self.assertTrue(np.allclose(km.mbk.cluster_centers_[c],
+                                        X[lab == c].mean(axis=0)))
+
+    def test_mb_k_means_n_jobs(self):
+        s = self.scheduler()
+        random = RandomTable(2, rows=10000, scheduler=s)
+        km = MBKMeans(n_clusters=4, random_state=42, is_input=False,
+                      is_greedy=False, n_jobs=2, scheduler=s)
+        km.input.table = random.output.table
+        self.assertEqual(km.mbk.chunk_size, 50)
+        assign_chunk = km.mbk._assign_chunk
+        threads = set()
+        sizes = []
+
+        def _assign_chunk(X):
+            threads.add(threading.current_thread().name)
+            sizes.append(len(X))
+            return assign_chunk(X)
+        km.mbk._assign_chunk = _assign_chunk
+        e = Every(proc=self.terse, scheduler=s)
+        e.input.df = km.output.table
+        aio.run(s.start())
+        self.assertEqual(km.mbk.counts.sum(), len(random.table()))
+        self.assertEqual(max(sizes), 50)
+        self.assertTrue(all(name.startswith('ThreadPoolExecutor')
+                            for name in threads))
+
 
 if __name__ == '__main__':
     ProgressiveTest.main()